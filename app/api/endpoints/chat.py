@@ -1,24 +1,134 @@
 from fastapi import APIRouter, HTTPException
 from fastapi.responses import StreamingResponse
-from pydantic import BaseModel
-from app.services.chat_service import chat_service
+import json
+import uuid
+from typing import List, Literal
+from pydantic import BaseModel, Field
+from app.api.sse import coalesce_sse
+from app.core.config import settings
+from app.core.profiling import ProfileSession, aprofiled, should_profile
+from app.services.ann_index import vector_mirror
+from app.services.chat_metrics import chat_metrics
+from app.services.chat_service import ChatTrace, chat_service
+from app.services.graph_namespaces import NAMESPACE_PATTERN
+from app.services.semantic_cache import semantic_cache
+from app.services.subgraph_cache import subgraph_cache
 
 router = APIRouter()
 
 class ChatRequest(BaseModel):
     message: str
+    # Conversation memory is scoped to this id. Omit it for a one-off (stateless) question.
+    session_id: str | None = None
+    # "local": retrieve chunks/entities for the question. "global": answer from community summaries.
+    mode: Literal["local", "global"] = "local"
+    # Restricts local retrieval to one ingested topic / collection (see GET /namespaces)
+    namespace: str | None = Field(default=None, pattern=NAMESPACE_PATTERN)
+    # Stores a CPU/wall profile of this request; its id is returned in the X-Profile-Id header
+    profile: bool = False
 
-# CHANGED: 'async def' -> 'def' (Fixes blocking stream issue)
 @router.post("/stream")
-def chat_stream(request: ChatRequest):
+async def chat_stream(request: ChatRequest):
     """
-    Streams the chatbot response token by token.
-    Runs in a threadpool to support synchronous LLM calls.
+    Streams the chatbot response as Server-Sent Events.
+      - `token`: {"text": ...} coalesced answer text (time/size based frames)
+      - `done`:  {"sources": [...], "timings": {...}, "cache_hit": ...} once the answer is complete
+      - `error`: {"message": ...} if generation failed
+    Comment frames are sent as heartbeats while the answer is being prepared.
+    Fully async (retrieval, generation and rate-limit pacing), so no threadpool worker
+    is held for the duration of the stream.
     """
     if not request.message:
         raise HTTPException(status_code=400, detail="Message cannot be empty")
 
+    trace = ChatTrace()
+    tokens = chat_service.astream_chat(
+        request.message, session_id=request.session_id, trace=trace, mode=request.mode, namespace=request.namespace,
+    )
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    if should_profile(request.profile):
+        profile_id = f"chat-{uuid.uuid4().hex}"
+        tokens = aprofiled(tokens, ProfileSession(profile_id, "chat"))
+        headers["X-Profile-Id"] = profile_id
     return StreamingResponse(
-        chat_service.stream_chat(request.message),
-        media_type="text/event-stream"
-    )
\ No newline at end of file
+        coalesce_sse(
+            tokens,
+            trace,
+            flush_interval=settings.SSE_FLUSH_INTERVAL_MS / 1000,
+            flush_chars=settings.SSE_FLUSH_CHARS,
+            heartbeat=settings.SSE_HEARTBEAT_SECONDS,
+        ),
+        media_type="text/event-stream",
+        # Disable proxy buffering (nginx) so frames reach the client as they are sent
+        headers=headers,
+    )
+
+class BatchRequest(BaseModel):
+    questions: List[str]
+    concurrency: int | None = Field(default=None, ge=1)
+    namespace: str | None = Field(default=None, pattern=NAMESPACE_PATTERN)
+
+async def _ndjson(results):
+    async for result in results:
+        yield json.dumps(result, ensure_ascii=False) + "\n"
+
+@router.post("/batch")
+async def chat_batch(request: BatchRequest):
+    """
+    Answers many independent questions (e.g. an evaluation set) in one request.
+    Streams NDJSON: one line per question as it completes (answer, sources, timings),
+    then a final {"summary": ...} line.
+    """
+    questions = [q for q in request.questions if q.strip()]
+    if not questions:
+        raise HTTPException(status_code=400, detail="No questions given")
+    if len(questions) > settings.BATCH_MAX_QUESTIONS:
+        raise HTTPException(status_code=400, detail=f"At most {settings.BATCH_MAX_QUESTIONS} questions per batch")
+
+    concurrency = min(request.concurrency or settings.BATCH_CONCURRENCY, settings.BATCH_CONCURRENCY)
+    return StreamingResponse(
+        _ndjson(chat_service.abatch(questions, concurrency=concurrency, namespace=request.namespace)),
+        media_type="application/x-ndjson",
+    )
+
+@router.delete("/session/{session_id}")
+def reset_session(session_id: str):
+    """
+    Drops a session's conversation memory (e.g. when the user clears the chat).
+    """
+    return {"session_id": session_id, "reset": chat_service.reset_session(session_id)}
+
+@router.get("/sessions")
+def session_stats():
+    """
+    Pool occupancy: live sessions and total history tokens held in memory.
+    """
+    return chat_service.session_stats()
+
+@router.get("/stats")
+def chat_stats():
+    """
+    Latency percentiles over recent requests: retrieval, time-to-first-token, total and tokens/sec.
+    """
+    return chat_metrics.summary()
+
+@router.get("/cache")
+def cache_stats():
+    """
+    Semantic answer cache: entries, hit rate and the graph version it is synced to.
+    """
+    return semantic_cache.stats()
+
+@router.get("/subgraphs")
+def subgraph_stats():
+    """
+    Expansion cache: local/Redis hit rate, invalidations and expansion latency percentiles.
+    """
+    return subgraph_cache.stats()
+
+@router.get("/ann")
+def ann_stats():
+    """
+    In-process vector mirror: readiness, mirrored graph version and row counts.
+    """
+    return vector_mirror.stats()
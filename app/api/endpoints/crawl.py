@@ -0,0 +1,78 @@
+import logging
+import uuid
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel, Field
+from sqlalchemy.exc import SQLAlchemyError
+from app.core.config import settings
+from app.services.crawl_frontier import crawl_frontier
+from app.services.graph_namespaces import NAMESPACE_PATTERN, namespace_slug
+from app.workers.tasks import crawl_pipeline_task, crawl_worker_task
+
+router = APIRouter()
+logger = logging.getLogger("crawl")
+
+class CrawlRequest(BaseModel):
+    query: str
+    num_seeds: int = Field(default=3, ge=1, le=20)   # Search hits the crawl starts from
+    max_depth: int = Field(default=settings.CRAWL_MAX_DEPTH, ge=0, le=10)
+    max_pages: int = Field(default=settings.CRAWL_MAX_PAGES, ge=1, le=10_000)
+    workers: int = Field(default=settings.CRAWL_WORKERS, ge=1, le=32)
+    # Collection the pages are tagged with; defaults to the query's slug
+    namespace: str | None = Field(default=None, pattern=NAMESPACE_PATTERN)
+
+class CrawlResponse(BaseModel):
+    crawl_id: str
+    task_id: str
+    message: str
+    namespace: str | None = None
+
+@router.post("/crawl", response_model=CrawlResponse)
+async def start_crawl(payload: CrawlRequest):
+    """
+    Starts a link-following crawl (bulk queue): search hits seed the frontier, then
+    `workers` crawl workers follow in-domain links up to `max_depth` hops, most
+    relevant first, until `max_pages` pages have been ingested.
+    """
+    crawl_id = uuid.uuid4().hex
+    namespace = payload.namespace or namespace_slug(payload.query)
+    try:
+        await crawl_frontier.create_crawl(crawl_id, payload.query, payload.max_depth, payload.max_pages, namespace)
+    except (SQLAlchemyError, OSError) as e:
+        logger.error(f"❌ Crawl frontier unavailable: {e}")
+        raise HTTPException(status_code=503, detail="Crawl frontier (Postgres) is unavailable")
+
+    task = crawl_pipeline_task.delay(crawl_id, payload.query, payload.num_seeds, payload.workers)
+    return {"crawl_id": crawl_id, "task_id": task.id, "message": "Crawl started", "namespace": namespace}
+
+async def _crawl_stats(crawl_id: str) -> dict:
+    try:
+        return await crawl_frontier.stats(crawl_id)
+    except (SQLAlchemyError, OSError) as e:
+        logger.error(f"❌ Crawl frontier unavailable: {e}")
+        raise HTTPException(status_code=503, detail="Crawl frontier (Postgres) is unavailable")
+
+@router.get("/crawl/{crawl_id}")
+async def crawl_status(crawl_id: str):
+    """Frontier counts (pending / claimed / done / failed) and budget usage of a crawl."""
+    stats = await _crawl_stats(crawl_id)
+    if not stats:
+        raise HTTPException(status_code=404, detail="Crawl not found")
+    return stats
+
+@router.post("/crawl/{crawl_id}/resume", response_model=CrawlResponse)
+async def resume_crawl(crawl_id: str, workers: int = settings.CRAWL_WORKERS):
+    """
+    Restarts workers for a crawl whose workers died (e.g. a worker restart).
+    URLs they had claimed are picked up again once their lease expires.
+    """
+    stats = await _crawl_stats(crawl_id)
+    if not stats:
+        raise HTTPException(status_code=404, detail="Crawl not found")
+    if stats["status"] != "running":
+        raise HTTPException(status_code=409, detail=f"Crawl is {stats['status']}")
+
+    task_ids = [crawl_worker_task.delay(crawl_id).id for _ in range(max(1, workers))]
+    return {
+        "crawl_id": crawl_id, "task_id": task_ids[0], "message": f"Resumed with {len(task_ids)} workers",
+        "namespace": stats["namespace"],
+    }
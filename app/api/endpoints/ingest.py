@@ -1,25 +1,130 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+import json
+import logging
+import time
+import redis
+import redis.asyncio as aioredis
+from typing import Literal, Optional, Tuple
+from fastapi import APIRouter, Header, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
 from celery.result import AsyncResult
-from app.workers.tasks import ingest_pipeline_task
+from app.api.sse import sse_comment, sse_event
+from app.core.config import settings
+from app.services.ingest_admission import PRIORITY_QUEUES, AdmissionRejected, ingest_admission
+from app.services.graph_maintenance import graph_maintenance
+from app.services.graph_namespaces import NAMESPACE_PATTERN, namespace_slug
+from app.services.ingest_registry import ingest_registry
+from app.services.progress import TERMINAL_STAGES, progress_channel, progress_log_key
+from app.workers.tasks import graph_maintenance_task, ingest_pipeline_task, refresh_communities_task
 
 router = APIRouter()
+logger = logging.getLogger("ingest")
 
 class IngestRequest(BaseModel):
     query: str
     num_results: int = 1
+    idempotency_key: Optional[str] = None
+    priority: Literal["interactive", "bulk"] = "interactive"
+    # Collection the documents are tagged with (chat can be scoped to it); defaults to the query's slug
+    namespace: Optional[str] = Field(default=None, pattern=NAMESPACE_PATTERN)
+    # Stores a CPU/wall profile under the task id (GET /profiles/{task_id})
+    profile: bool = False
 
 class IngestResponse(BaseModel):
     task_id: str
     message: str
+    namespace: Optional[str] = None
+    deduplicated: bool = False
+    queue: Optional[str] = None
+    estimated_wait_seconds: Optional[int] = None
+    estimated_completion_seconds: Optional[int] = None
 
 @router.post("/ingest", response_model=IngestResponse)
-async def start_ingest(payload: IngestRequest):
+async def start_ingest(
+    payload: IngestRequest,
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key"),
+):
     """
     Starts the background ingestion pipeline (Search -> Scrape -> Graph).
+
+    1. Key: the `Idempotency-Key` header or body field, else derived from the
+       normalized query and `num_results`.
+    2. A new key dispatches the pipeline; a key seen within the TTL returns the
+       task already running (or recently finished) for it instead.
+    3. New work is admitted onto the interactive or bulk queue, or rejected with
+       429 + Retry-After when that queue's estimated backlog is too long.
+    """
+    key = idempotency_key or payload.idempotency_key or ingest_registry.derive_key(
+        payload.query, payload.num_results, payload.namespace,
+    )
+    queue = PRIORITY_QUEUES[payload.priority]
+    namespace = payload.namespace or namespace_slug(payload.query)
+    args = (payload.query, payload.num_results, payload.profile, namespace)
+    estimate = {}
+
+    def dispatch(task_id: str):
+        estimate.update(ingest_admission.admit(task_id, queue, payload.num_results))
+        try:
+            ingest_pipeline_task.apply_async(
+                args=args, kwargs={"idempotency_key": key}, task_id=task_id, queue=queue,
+            )
+        except Exception:
+            ingest_admission.release(task_id)
+            raise
+
+    def is_failed(task_id: str) -> bool:
+        return AsyncResult(task_id).state in ("FAILURE", "REVOKED")
+
+    try:
+        task_id, deduplicated = await run_in_threadpool(ingest_registry.submit, key, dispatch, is_failed)
+        if deduplicated:
+            estimate = await run_in_threadpool(ingest_admission.estimate, task_id) or {}
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=429,
+            detail=f"Ingestion queue is overloaded: {e}",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    except redis.RedisError as e:
+        # Without Redis we can neither coalesce nor measure the backlog; still accept the work
+        logger.warning(f"⚠️ Ingest registry unavailable, dispatching without dedup or admission control: {e}")
+        task = ingest_pipeline_task.apply_async(args=args, queue=queue)
+        task_id, deduplicated = task.id, False
+
+    message = "Attached to existing ingestion" if deduplicated else "Ingestion started"
+    return {"task_id": task_id, "message": message, "deduplicated": deduplicated, "namespace": namespace, **estimate}
+
+@router.get("/ingest/admission")
+async def admission_stats():
+    """Backlog per priority queue, in pending jobs and estimated seconds of LLM work."""
+    return await run_in_threadpool(ingest_admission.stats)
+
+@router.post("/ingest/communities", response_model=IngestResponse)
+async def refresh_communities(force: bool = False):
+    """
+    Re-runs community detection and summarization in the background.
+    Normally triggered after each ingest; `force` re-summarizes every community.
+    """
+    task = refresh_communities_task.delay(force)
+    return {"task_id": task.id, "message": "Community refresh started"}
+
+@router.post("/ingest/maintenance", response_model=IngestResponse)
+async def run_maintenance():
+    """
+    Runs graph maintenance now (it also runs on the Celery beat schedule):
+    merge duplicates, prune orphans, re-embed stale nodes, refresh indexes.
     """
-    task = ingest_pipeline_task.delay(payload.query, payload.num_results)
-    return {"task_id": task.id, "message": "Ingestion started"}
+    task = graph_maintenance_task.delay()
+    return {"task_id": task.id, "message": "Graph maintenance started"}
+
+@router.get("/ingest/maintenance")
+async def maintenance_report():
+    """Report of the last maintenance run: graph size, degrees and retrieval latency before / after."""
+    report = await run_in_threadpool(graph_maintenance.last_report)
+    if report is None:
+        raise HTTPException(status_code=404, detail="No maintenance run recorded yet")
+    return report
 
 # --- THIS WAS MISSING ---
 @router.get("/ingest/status/{task_id}")
@@ -39,4 +144,95 @@ async def get_status(task_id: str):
     if task_result.status == "FAILURE":
         response["result"] = str(task_result.result)
         
-    return response
\ No newline at end of file
+    return response
+
+def _unfinished_task_end(task_id: str, progressed: bool) -> Optional[Tuple[str, str]]:
+    """
+    (stage, message) to end a progress stream whose task will never publish a terminal event:
+    it failed / was revoked without reporting it (e.g. the worker was killed), it finished after
+    its progress log expired, or it is PENDING with no progress and was never admitted (unknown id).
+    None while the task may still report.
+    """
+    state = AsyncResult(task_id).state
+    if state in ("FAILURE", "REVOKED"):
+        return "failed", f"Task ended in state {state}"
+    if state == "SUCCESS":
+        return "completed", "Task finished (its progress log expired)"
+    if state == "PENDING" and not progressed:
+        try:
+            queued = ingest_admission.estimate(task_id) is not None
+        except redis.RedisError:
+            queued = True  # Can't tell; the max stream duration still applies
+        if not queued:
+            return "unknown", "Unknown task (never submitted, or its progress expired)"
+    return None
+
+async def _progress_events(task_id: str, request: Request):
+    client = aioredis.Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT, db=0, decode_responses=True)
+    pubsub = client.pubsub()
+    started = time.monotonic()
+    deadline = started + settings.INGEST_PROGRESS_MAX_SECONDS
+
+    def end_event(stage: str, message: str) -> str:
+        return sse_event({
+            "seq": last_seq + 1, "stage": stage, "message": message,
+            "elapsed_ms": round((time.monotonic() - started) * 1000),
+        }, event="progress")
+
+    try:
+        # 1. Subscribe first, then replay the log, so nothing published in between is lost
+        await pubsub.subscribe(progress_channel(task_id))
+        last_seq = 0
+        for raw in await client.lrange(progress_log_key(task_id), 0, -1):
+            event = json.loads(raw)
+            last_seq = event["seq"]
+            yield sse_event(event, event="progress")
+            if event["stage"] in TERMINAL_STAGES:
+                return
+
+        # 2. Follow the live channel (at most INGEST_PROGRESS_MAX_SECONDS)
+        while not await request.is_disconnected():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                yield end_event("timeout", f"Progress stream closed; poll /ingest/status/{task_id} for the result")
+                return
+            message = await pubsub.get_message(
+                ignore_subscribe_messages=True, timeout=min(settings.SSE_HEARTBEAT_SECONDS, remaining),
+            )
+            if message is None:
+                # 3. Idle: make sure the task can still report before sending a heartbeat
+                try:
+                    end = await run_in_threadpool(_unfinished_task_end, task_id, last_seq > 0)
+                except Exception as e:
+                    logger.warning(f"⚠️ Could not check task {task_id}: {e}")
+                    end = None
+                if end:
+                    yield end_event(*end)
+                    return
+                yield sse_comment()
+                continue
+            event = json.loads(message["data"])
+            if event["seq"] <= last_seq:
+                continue  # Already sent during the replay
+            last_seq = event["seq"]
+            yield sse_event(event, event="progress")
+            if event["stage"] in TERMINAL_STAGES:
+                return
+    finally:
+        await pubsub.aclose()
+        await client.aclose()
+
+@router.get("/ingest/progress/{task_id}")
+async def stream_progress(task_id: str, request: Request):
+    """
+    Live ingestion progress as Server-Sent Events (`progress` events), pushed by the worker
+    over Redis pub/sub: search, each scraped URL, each extracted chunk, nodes written.
+    Events already published are replayed first; the stream ends after `completed`/`failed`.
+    A task that can no longer report ends the stream with `failed` (killed / revoked) or
+    `unknown` (no such task); any stream ends with `timeout` after INGEST_PROGRESS_MAX_SECONDS.
+    """
+    return StreamingResponse(
+        _progress_events(task_id, request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
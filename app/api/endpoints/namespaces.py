@@ -0,0 +1,32 @@
+import logging
+from fastapi import APIRouter, HTTPException, Path
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel
+from app.services.graph_namespaces import NAMESPACE_PATTERN, graph_namespaces
+from app.workers.tasks import delete_namespace_task
+
+router = APIRouter()
+logger = logging.getLogger("namespaces")
+
+class NamespaceTaskResponse(BaseModel):
+    namespace: str
+    task_id: str
+    message: str
+
+@router.get("/namespaces")
+async def list_namespaces():
+    """Namespaces present in the graph, with their chunk and document counts."""
+    try:
+        return await run_in_threadpool(graph_namespaces.stats)
+    except Exception as e:
+        logger.error(f"❌ Failed to list namespaces: {e}")
+        raise HTTPException(status_code=503, detail="Knowledge graph (Neo4j) is unavailable")
+
+@router.delete("/namespaces/{namespace}", response_model=NamespaceTaskResponse)
+async def delete_namespace(namespace: str = Path(pattern=NAMESPACE_PATTERN)):
+    """
+    Deletes a namespace in the background (bulk queue): its chunks, and the entities and
+    relationships no remaining chunk mentions. Shared ones only lose the tag.
+    """
+    task = delete_namespace_task.delay(namespace)
+    return {"namespace": namespace, "task_id": task.id, "message": "Namespace deletion started"}
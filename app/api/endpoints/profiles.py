@@ -0,0 +1,53 @@
+import json
+from typing import Literal
+import redis.asyncio as aioredis
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import PlainTextResponse
+from app.core.config import settings
+from app.core.profiling import PROFILE_INDEX_KEY, profile_key
+
+router = APIRouter()
+
+def _client() -> aioredis.Redis:
+    return aioredis.Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT, db=0, decode_responses=True)
+
+@router.get("/profiles")
+async def list_profiles(limit: int = 50):
+    """
+    Most recent profiles (ingest task ids and chat profile ids), newest first.
+    """
+    client = _client()
+    try:
+        ids = await client.zrevrange(PROFILE_INDEX_KEY, 0, limit - 1)
+    finally:
+        await client.aclose()
+    return {"profiles": ids}
+
+@router.get("/profiles/{profile_id}")
+async def get_profile(profile_id: str):
+    """
+    Wall vs CPU breakdown per pipeline stage, plus the top CPU functions.
+    """
+    client = _client()
+    try:
+        report = await client.get(profile_key(profile_id, "report"))
+    finally:
+        await client.aclose()
+    if report is None:
+        raise HTTPException(status_code=404, detail="Profile not found (still running, expired or never taken)")
+    return json.loads(report)
+
+@router.get("/profiles/{profile_id}/{kind}.folded", response_class=PlainTextResponse)
+async def get_folded_stacks(profile_id: str, kind: Literal["wall", "cpu"]):
+    """
+    Folded stacks for flamegraph.pl / speedscope, e.g.
+    `curl .../profiles/<id>/wall.folded | flamegraph.pl > wall.svg`.
+    """
+    client = _client()
+    try:
+        folded = await client.get(profile_key(profile_id, kind))
+    finally:
+        await client.aclose()
+    if folded is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return folded
@@ -0,0 +1,119 @@
+import asyncio
+import json
+import logging
+import time
+from typing import AsyncIterator, Optional
+
+logger = logging.getLogger("sse")
+
+_END = object()
+
+def sse_event(data: dict, event: Optional[str] = None) -> str:
+    """Formats one Server-Sent Event. Data is JSON, so newlines in tokens survive framing."""
+    lines = []
+    if event:
+        lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False)}")
+    return "\n".join(lines) + "\n\n"
+
+def sse_comment(text: str = "ping") -> str:
+    """Comment line; ignored by clients but keeps proxies from closing an idle stream."""
+    return f": {text}\n\n"
+
+def trace_summary(trace) -> dict:
+    """Terminal-event payload: sources and timings of a finished ChatTrace."""
+    sources = []
+    for n in trace.source_nodes or []:
+        metadata = n.node.metadata or {}
+        sources.append({
+            "id": n.node.node_id,
+            "url": metadata.get("url"),
+            "title": metadata.get("title"),
+            "score": round(n.score, 4) if n.score is not None else None,
+            "snippet": n.node.get_content()[:200],
+        })
+    return {
+        "sources": sources,
+        "cache_hit": trace.cache_hit,
+        "timings": {
+            "retrieval_ms": trace.retrieval_ms,
+            "ttft_ms": trace.ttft_ms,
+            "total_ms": trace.total_ms,
+            "output_tokens": trace.output_tokens,
+            "tokens_per_sec": trace.tokens_per_sec,
+            "prompt_tokens_before": trace.prompt_tokens_before,
+            "prompt_tokens_after": trace.prompt_tokens_after,
+        },
+    }
+
+async def coalesce_sse(
+    tokens: AsyncIterator[str],
+    trace,
+    flush_interval: float,
+    flush_chars: int,
+    heartbeat: float,
+) -> AsyncIterator[str]:
+    """
+    Frames a token stream as SSE.
+
+    1. The first token is sent immediately (time-to-first-token); later tokens are
+       buffered and flushed as one `token` event when the buffer reaches
+       `flush_chars` or has been waiting `flush_interval` seconds.
+    2. While nothing arrives (e.g. during retrieval) a comment is sent every `heartbeat` seconds.
+    3. The stream ends with a `done` event carrying sources and timings (or an `error` event).
+    The producer runs in its own task, so a slow client never stalls generation and a
+    disconnected client cancels it.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def pump():
+        try:
+            async for token in tokens:
+                await queue.put(token)
+            await queue.put(_END)
+        except Exception as e:
+            await queue.put(e)
+
+    producer = asyncio.create_task(pump())
+    buffer, buffer_started = "", None
+    last_sent = time.monotonic()
+    first_frame = True
+    try:
+        while True:
+            now = time.monotonic()
+            if buffer:
+                timeout = max(0.0, buffer_started + flush_interval - now)
+            else:
+                timeout = max(0.0, last_sent + heartbeat - now)
+
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout=timeout)
+            except asyncio.TimeoutError:
+                if buffer:
+                    yield sse_event({"text": buffer}, event="token")
+                    buffer = ""
+                else:
+                    yield sse_comment()
+                last_sent = time.monotonic()
+                continue
+
+            if item is _END or isinstance(item, Exception):
+                if buffer:
+                    yield sse_event({"text": buffer}, event="token")
+                if isinstance(item, Exception):
+                    logger.error(f"❌ Chat stream failed: {item}")
+                    yield sse_event({"message": str(item)}, event="error")
+                else:
+                    yield sse_event(trace_summary(trace), event="done")
+                return
+
+            if not buffer:
+                buffer_started = time.monotonic()
+            buffer += item
+            if first_frame or len(buffer) >= flush_chars:
+                yield sse_event({"text": buffer}, event="token")
+                buffer, first_frame = "", False
+                last_sent = time.monotonic()
+    finally:
+        if not producer.done():
+            producer.cancel()  # Client went away
@@ -1,3 +1,5 @@
+from urllib.parse import quote_plus
+from pydantic import Field
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -15,6 +17,12 @@ class Settings(BaseSettings):
     NEO4J_USER: str
     NEO4J_PASSWORD: str
 
+    # Neo4j Vector Indexes (must match the embedding model)
+    EMBEDDING_DIMENSIONS: int = 768          # text-embedding-004
+    VECTOR_SIMILARITY: str = "cosine"        # or "euclidean"
+    VECTOR_HNSW_M: int = 16                  # HNSW graph degree
+    VECTOR_HNSW_EF_CONSTRUCTION: int = 100   # HNSW build-time beam width
+
     # Redis (Celery)
     REDIS_HOST: str = "localhost"
     REDIS_PORT: int = 6379
@@ -22,6 +30,130 @@ class Settings(BaseSettings):
     # LLM Keys
     GOOGLE_API_KEY: str | None = None
     SERPER_API_KEY: str | None = None
+    SERPER_URL: str = "https://google.serper.dev/search"  # Overridden by the offline benchmark's stub
+
+    # Gemini Pacing (per process)
+    GEMINI_RPM: float = 15.0  # Generation requests per minute
+    GEMINI_BURST: int = 1     # Requests allowed back-to-back before pacing kicks in
+
+    # Retrieval (hybrid vector + full-text, fused with RRF)
+    RETRIEVAL_TOP_K: int = 5          # Hits per leg (vector / full-text) and fused seeds kept
+    RETRIEVAL_RRF_K: int = 60         # Reciprocal-rank-fusion damping constant
+    RETRIEVAL_PATH_DEPTH: int = 1     # Graph expansion hops from the fused entities
+    RETRIEVAL_TRIPLET_LIMIT: int = 30 # Max triplets returned by expansion
+
+    # Graph Namespaces (ingests tagged by topic / collection id; chat can be scoped to one)
+    NAMESPACE_OVERSAMPLE: int = 4          # Index candidates fetched per kept hit when filtering by namespace
+    NAMESPACE_DELETE_BATCH: int = 1000     # Rows per transaction when a namespace is deleted
+
+    # Context Assembly (between retrieval and generation)
+    CONTEXT_TOKEN_BUDGET: int = 3000         # Max tokens of retrieved context put in the prompt
+    CONTEXT_MAX_NODE_TOKENS: int = 600       # Longer chunks are compressed to their most relevant sentences
+    CONTEXT_DEDUPE_THRESHOLD: float = 0.8    # Shingle overlap at which two chunks count as duplicates
+
+    # Subgraph Cache (k-hop neighbourhoods used by retrieval expansion)
+    SUBGRAPH_CACHE_ENABLED: bool = True
+    SUBGRAPH_CACHE_MAX_ENTRIES: int = 5000            # In-process LRU capacity
+    SUBGRAPH_CACHE_REDIS: bool = True                 # Shared tier across API workers
+    SUBGRAPH_CACHE_REDIS_TTL_SECONDS: int = 3600
+
+    # In-process ANN Mirror (serves the vector legs locally instead of over Bolt)
+    ANN_MIRROR_ENABLED: bool = False
+    ANN_SNAPSHOT_DIR: str = "data/ann"        # Memory-mapped snapshot of the mirror
+    ANN_NPROBE: int = 8                       # IVF lists scanned per query (recall vs latency)
+    ANN_SYNC_INTERVAL_SECONDS: float = 5.0    # How often the graph version is polled
+
+    # Communities (offline Louvain clustering + LLM summaries for global questions)
+    COMMUNITY_MIN_SIZE: int = 3                  # Smaller clusters are not summarized
+    COMMUNITY_RESOLUTION: float = 1.0            # Louvain resolution (>1 favours smaller communities)
+    COMMUNITY_MAX_SUMMARIES_PER_RUN: int = 50    # LLM budget per refresh; the rest wait for the next run
+    COMMUNITY_SUMMARY_MAX_RELATIONS: int = 80    # Relationships shown to the LLM per community
+    COMMUNITY_REFRESH_DELAY_SECONDS: int = 60    # Debounce after an ingest finishes
+    COMMUNITY_REFRESH_MAX_RETRIES: int = 30      # Delayed retries while another refresh holds the lock
+
+    # Global Search (chat mode answering from community summaries)
+    GLOBAL_SEARCH_TOP_COMMUNITIES: int = 12      # Summaries considered per question
+    GLOBAL_SEARCH_MAP_CALLS: int = 3             # Map LLM calls (plus one reduce call)
+
+    # Chat Streaming (SSE framing)
+    SSE_FLUSH_INTERVAL_MS: int = 50          # Max time a token waits before its frame is sent
+    SSE_FLUSH_CHARS: int = 64                # Frame is sent early once this many characters are buffered
+    SSE_HEARTBEAT_SECONDS: float = 15.0      # Comment frame while idle (e.g. during retrieval)
+
+    # Page Size Limits (bounded worker memory)
+    PAGE_MAX_CHARS: int = Field(200_000, gt=0)       # Longer pages are truncated at a section boundary
+    INGEST_WINDOW_CHARS: int = Field(20_000, gt=0)   # Pages are chunked, extracted and written one window at a time
+    PAYLOAD_MAX_STRING_CHARS: int = 1000             # Longer strings are cut from Celery results and progress events
+
+    # Graph Extraction (ingest-side LLM calls)
+    EXTRACTION_MODE: str = "json"             # "json": Gemini JSON mode + local repair; "schema_llm": LlamaIndex SchemaLLMPathExtractor
+    EXTRACTION_MAX_TRIPLETS_PER_CHUNK: int = 10
+
+    # Ingest Submission (idempotency / request coalescing)
+    INGEST_IDEMPOTENCY_TTL_SECONDS: int = 3600  # Identical submissions within this window attach to the same task
+
+    # Ingest Progress Streams (GET /ingest/progress/{task_id})
+    INGEST_PROGRESS_MAX_SECONDS: int = 2 * 3600  # The stream ends with a `timeout` event after this long
+
+    # Ingest Admission Control (interactive vs bulk queues, 429 when overloaded)
+    INGEST_WORKER_PROCESSES: int = 1               # Worker processes consuming ingest queues (each has its own Gemini pacing)
+    INGEST_LLM_CALLS_PER_DOCUMENT: int = 8         # Initial cost estimate; refined from finished jobs
+    INGEST_INTERACTIVE_MAX_WAIT_SECONDS: int = 600 # Reject interactive jobs that would wait longer than this
+    INGEST_INTERACTIVE_MAX_PENDING: int = 20
+    INGEST_BULK_MAX_WAIT_SECONDS: int = 4 * 3600
+    INGEST_BULK_MAX_PENDING: int = 500
+    INGEST_PENDING_MAX_AGE_SECONDS: int = 6 * 3600 # Entries of workers that died are dropped after this
+
+    # Crawling (link-following ingest seeded from search; frontier persisted in Postgres)
+    CRAWL_MAX_DEPTH: int = 2                 # Link hops followed from the seed pages
+    CRAWL_MAX_PAGES: int = 50                # Page budget per crawl
+    CRAWL_WORKERS: int = 2                   # Worker tasks started per crawl (each claims batches from the frontier)
+    CRAWL_CLAIM_BATCH: int = 5               # URLs claimed (and scraped in parallel) per round trip
+    CRAWL_LEASE_SECONDS: int = 900           # Claims of a worker that died become claimable again after this
+    CRAWL_MAX_ATTEMPTS: int = 3              # Failed URLs are retried until this many attempts
+    CRAWL_MAX_LINKS_PER_PAGE: int = 100      # Highest-scoring in-domain links kept per page
+    CRAWL_DEPTH_DECAY: float = 0.7           # Priority multiplier per hop away from the seeds
+
+    # Graph Maintenance (scheduled compaction: merge duplicates, prune orphans, re-embed, indexes)
+    MAINTENANCE_INTERVAL_HOURS: float = 24.0       # Celery beat schedule; 0 disables it (POST /ingest/maintenance still works)
+    MAINTENANCE_BATCH_SIZE: int = 500              # Rows or duplicate groups per transaction
+    MAINTENANCE_REEMBED_LIMIT: int = 2000          # Stale embeddings refreshed per run (embedding API budget)
+    MAINTENANCE_PRUNE_UNLINKED_CHUNKS: bool = True # Chunks linked to no entity are never reached by graph expansion
+    MAINTENANCE_PROBES: int = 20                   # Retrieval probes timed before and after each run
+
+    # Graph Snapshots (python -m app.db.snapshot export|import <dir>; Parquet with float32 embeddings)
+    SNAPSHOT_BATCH_SIZE: int = 2000                # Rows per Parquet row group and per UNWIND write transaction
+
+    # Batch Question Answering (offline evaluation)
+    BATCH_MAX_QUESTIONS: int = 1000
+    BATCH_CONCURRENCY: int = 8               # Questions retrieved/generated at once (Gemini pacing still applies)
+
+    # Metrics (Prometheus; the API serves /metrics, each Celery worker runs its own exporter)
+    METRICS_WORKER_PORT: int = 9808          # 0 disables the worker exporter
+
+    # Profiling (opt-in per request via `profile: true`, or a sampled fraction of all requests)
+    PROFILE_SAMPLE_RATE: float = 0.0         # 0.01 profiles 1% of ingests and chat requests
+    PROFILE_INTERVAL_MS: float = 10.0        # Stack sampling interval
+    PROFILE_TTL_SECONDS: int = 86400         # How long reports and folded stacks are kept
+
+    # Chat Sessions
+    CHAT_MAX_SESSIONS: int = 256             # LRU cap on live session engines
+    CHAT_SESSION_TTL_SECONDS: int = 1800     # Idle sessions are dropped after this
+    CHAT_MEMORY_TOKEN_LIMIT: int = 2000      # Full-text history kept per session before summarizing
+    CHAT_MEMORY_TOTAL_TOKENS: int = 200_000  # Pool-wide history budget (evicts LRU sessions)
+
+    # Semantic Answer Cache
+    SEMANTIC_CACHE_ENABLED: bool = True
+    SEMANTIC_CACHE_THRESHOLD: float = 0.92   # Cosine similarity needed to reuse an answer
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 2000
+    SEMANTIC_CACHE_TTL_SECONDS: int = 86400
+
+    @property
+    def DATABASE_URL(self) -> str:
+        return (
+            f"postgresql+asyncpg://{quote_plus(self.POSTGRES_USER)}:{quote_plus(self.POSTGRES_PASSWORD)}"
+            f"@{self.POSTGRES_SERVER}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
+        )
 
     @property
     def CELERY_BROKER_URL(self) -> str:
@@ -37,4 +37,18 @@ Rules:
 1. If an entity does not fit a category, ignore it or fit it into "Concept".
 2. Do not invent new Relationship Types. Use "RELATES_TO" if unsure.
 3. Ensure entity names are canonical (e.g., use "Google" instead of "Google Inc.").
-"""
\ No newline at end of file
+"""
+
+# 4. Search Indexes (created by app/db/init_graph.py, queried by the hybrid retriever)
+# "entity" matches the name LlamaIndex's Neo4jPropertyGraphStore uses, so it never creates
+# an unconfigured duplicate.
+ENTITY_VECTOR_INDEX = "entity"
+CHUNK_VECTOR_INDEX = "chunk_embedding"
+ENTITY_FULLTEXT_INDEX = "entity_name_fulltext"
+CHUNK_FULLTEXT_INDEX = "chunk_text_fulltext"
+
+# 5. Communities (built by app/services/community_service.py)
+# Community nodes carry neither __Entity__ nor __Node__, so the entity retrievers never see them;
+# graph expansion must skip COMMUNITY_REL edges.
+COMMUNITY_LABEL = "Community"
+COMMUNITY_REL = "IN_COMMUNITY"
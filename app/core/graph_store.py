@@ -0,0 +1,76 @@
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple
+import neo4j
+from llama_index.core.graph_stores.types import LabelledNode, Relation, Triplet
+from llama_index.core.graph_stores.utils import value_sanitize
+from llama_index.core.schema import BaseNode
+from llama_index.core.vector_stores.types import VectorStoreQuery
+from llama_index.graph_stores.neo4j import Neo4jPropertyGraphStore
+from app.core.metrics import observe_stage
+
+class AsyncNeo4jPropertyGraphStore(Neo4jPropertyGraphStore):
+    """
+    Neo4jPropertyGraphStore whose async API does not block the event loop.
+
+    The upstream store only implements sync methods; its async variants call them
+    inline. Here raw Cypher goes through the driver's native async session, and the
+    composite read helpers (which build their Cypher internally) run in a worker thread.
+    """
+
+    async def astructured_query(self, query: str, param_map: Optional[Dict[str, Any]] = None) -> Any:
+        data, _, _ = await self._async_driver.execute_query(
+            neo4j.Query(text=query, timeout=self._timeout),
+            database_=self._database,
+            parameters_=param_map or {},
+        )
+        full_result = [d.data() for d in data]
+        if self.sanitize_query_output:
+            return [value_sanitize(el) for el in full_result]
+        return full_result
+
+    async def avector_query(self, query: VectorStoreQuery, **kwargs: Any) -> Tuple[List[LabelledNode], List[float]]:
+        return await asyncio.to_thread(self.vector_query, query, **kwargs)
+
+    async def aget(self, properties: Optional[dict] = None, ids: Optional[List[str]] = None) -> List[LabelledNode]:
+        return await asyncio.to_thread(self.get, properties=properties, ids=ids)
+
+    async def aget_triplets(
+        self,
+        entity_names: Optional[List[str]] = None,
+        relation_names: Optional[List[str]] = None,
+        properties: Optional[dict] = None,
+        ids: Optional[List[str]] = None,
+    ) -> List[Triplet]:
+        return await asyncio.to_thread(
+            self.get_triplets,
+            entity_names=entity_names,
+            relation_names=relation_names,
+            properties=properties,
+            ids=ids,
+        )
+
+    async def aget_rel_map(
+        self,
+        graph_nodes: List[LabelledNode],
+        depth: int = 2,
+        limit: int = 30,
+        ignore_rels: Optional[List[str]] = None,
+    ) -> List[Triplet]:
+        return await asyncio.to_thread(
+            self.get_rel_map, graph_nodes, depth=depth, limit=limit, ignore_rels=ignore_rels
+        )
+
+    async def aget_llama_nodes(self, node_ids: List[str]) -> List[BaseNode]:
+        return await asyncio.to_thread(self.get_llama_nodes, node_ids)
+
+class InstrumentedNeo4jPropertyGraphStore(Neo4jPropertyGraphStore):
+    """Neo4jPropertyGraphStore that times its writes into rag_stage_seconds{stage="neo4j_write"}."""
+
+    def upsert_nodes(self, nodes: List[LabelledNode]) -> None:
+        # Chunk nodes (upsert_llama_nodes) are written through here as well
+        with observe_stage("neo4j_write"):
+            super().upsert_nodes(nodes)
+
+    def upsert_relations(self, relations: List[Relation]) -> None:
+        with observe_stage("neo4j_write"):
+            super().upsert_relations(relations)
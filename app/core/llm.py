@@ -1,41 +1,107 @@
 import time
 import logging
+import threading
+from collections import OrderedDict
 from typing import Any, List
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
 
 # LlamaIndex Imports
-from llama_index.core.llms import CustomLLM, LLMMetadata, CompletionResponse, CompletionResponseGen
+from llama_index.core.llms import CustomLLM, LLMMetadata, CompletionResponse, CompletionResponseGen, CompletionResponseAsyncGen
 from llama_index.core.llms.callbacks import llm_completion_callback
 from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.bridge.pydantic import PrivateAttr
 
 # Google Imports
 import google.generativeai as genai
 from google.api_core.exceptions import ResourceExhausted, InternalServerError, ServiceUnavailable, NotFound
 
+# Config Imports
+from app.core.config import settings
+from app.core.metrics import GEMINI_RATE_LIMIT_WAIT, GEMINI_RETRIES, gemini_request, observe_stage, record_usage
+from app.core.rate_limiter import RateLimiter
+
 logger = logging.getLogger("llm_core")
 
+# Shared pacing for every Gemini generation call in this process
+# (replaces the old fixed 4s sleep before each request).
+gemini_limiter = RateLimiter(rate_per_minute=settings.GEMINI_RPM, burst=settings.GEMINI_BURST)
+
 def log_retry_attempt(retry_state):
+    GEMINI_RETRIES.labels(kind="generate").inc()
     logger.warning(f"⚠️ Rate Limit hit. Sleeping {retry_state.next_action.sleep}s...")
 
 # -----------------------------------------------------------------------------
 # 1. Custom Sync Embedder (Shared)
 # -----------------------------------------------------------------------------
 class SyncGeminiEmbedding(BaseEmbedding):
+    # Small memo so the same question is embedded once per request
+    # (semantic cache lookup + retriever both need it).
+    _query_cache: OrderedDict = PrivateAttr(default_factory=OrderedDict)
+    _query_cache_lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _query_cache_size: int = 256
+
     def __init__(self, api_key: str, model_name: str = "models/text-embedding-004", **kwargs: Any):
         super().__init__(model_name=model_name, **kwargs)
         genai.configure(api_key=api_key)
 
+    def _cached_query_embedding(self, query: str) -> List[float] | None:
+        with self._query_cache_lock:
+            if query in self._query_cache:
+                self._query_cache.move_to_end(query)
+                return self._query_cache[query]
+        return None
+
+    def _remember_query_embedding(self, query: str, embedding: List[float]) -> None:
+        with self._query_cache_lock:
+            self._query_cache[query] = embedding
+            if len(self._query_cache) > self._query_cache_size:
+                self._query_cache.popitem(last=False)
+
     def _get_query_embedding(self, query: str) -> List[float]:
-        return genai.embed_content(model=self.model_name, content=query, task_type="retrieval_query")['embedding']
+        embedding = self._cached_query_embedding(query)
+        if embedding is None:
+            with observe_stage("embedding"), gemini_request("embed"):
+                embedding = genai.embed_content(model=self.model_name, content=query, task_type="retrieval_query")['embedding']
+            self._remember_query_embedding(query, embedding)
+        return embedding
 
     async def _aget_query_embedding(self, query: str) -> List[float]:
-        return self._get_query_embedding(query)
+        embedding = self._cached_query_embedding(query)
+        if embedding is None:
+            with observe_stage("embedding"), gemini_request("embed"):
+                result = await genai.embed_content_async(model=self.model_name, content=query, task_type="retrieval_query")
+            embedding = result['embedding']
+            self._remember_query_embedding(query, embedding)
+        return embedding
+
+    async def aget_query_embedding_batch(self, queries: List[str], batch_size: int = 100) -> List[List[float]]:
+        """Embeds many questions with one API request per `batch_size` (the API's per-request cap)."""
+        embeddings = []
+        for i in range(0, len(queries), batch_size):
+            batch = queries[i:i + batch_size]
+            with observe_stage("embedding"), gemini_request("embed"):
+                result = await genai.embed_content_async(model=self.model_name, content=batch, task_type="retrieval_query")
+            embeddings.extend(result['embedding'])
+        return embeddings
+
+    def get_document_embedding_batch(self, texts: List[str], batch_size: int = 100) -> List[List[float]]:
+        """Embeds many documents with one API request per `batch_size` (re-embedding existing nodes)."""
+        embeddings = []
+        for i in range(0, len(texts), batch_size):
+            batch = texts[i:i + batch_size]
+            with observe_stage("embedding"), gemini_request("embed"):
+                result = genai.embed_content(model=self.model_name, content=batch, task_type="retrieval_document")
+            embeddings.extend(result['embedding'])
+        return embeddings
 
     def _get_text_embedding(self, text: str) -> List[float]:
-        return genai.embed_content(model=self.model_name, content=text, task_type="retrieval_document")['embedding']
+        with observe_stage("embedding"), gemini_request("embed"):
+            return genai.embed_content(model=self.model_name, content=text, task_type="retrieval_document")['embedding']
 
     async def _aget_text_embedding(self, text: str) -> List[float]:
-        return self._get_text_embedding(text)
+        with observe_stage("embedding"), gemini_request("embed"):
+            result = await genai.embed_content_async(model=self.model_name, content=text, task_type="retrieval_document")
+        return result['embedding']
 
     def _get_text_embedding_batch(self, texts: List[str]) -> List[List[float]]:
         embeddings = []
@@ -72,26 +138,67 @@ class SyncGeminiLLM(CustomLLM):
     )
     @llm_completion_callback()
     def complete(self, prompt: str, **kwargs: Any) -> CompletionResponse:
-        time.sleep(4.0) 
-        response = self._model.generate_content(prompt)
+        GEMINI_RATE_LIMIT_WAIT.inc(gemini_limiter.acquire())
+        with gemini_request("generate"):
+            response = self._model.generate_content(prompt)
+        record_usage(response)
         return CompletionResponse(text=response.text)
 
+    @retry(
+        retry=retry_if_exception_type((ResourceExhausted, InternalServerError, ServiceUnavailable)),
+        stop=stop_after_attempt(10), 
+        wait=wait_exponential(multiplier=2, min=5, max=60),
+        before_sleep=log_retry_attempt
+    )
+    @llm_completion_callback()
+    async def acomplete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        GEMINI_RATE_LIMIT_WAIT.inc(await gemini_limiter.aacquire())
+        with gemini_request("generate"):
+            response = await self._model.generate_content_async(prompt)
+        record_usage(response)
+        return CompletionResponse(text=response.text)
+
+    @staticmethod
+    def _chunk_text(chunk) -> str:
+        # --- FIX: SAFE TEXT EXTRACTION ---
+        # Check if the chunk actually contains text before accessing .text
+        # to prevent ValueError on empty/safety-blocked chunks.
+        if not chunk.parts:
+            return ""
+        try:
+            return chunk.text or ""
+        except ValueError:
+            return "" # Skip chunks blocked by safety filters
+
     @llm_completion_callback()
     def stream_complete(self, prompt: str, **kwargs: Any) -> CompletionResponseGen:
-        time.sleep(4.0)
+        GEMINI_RATE_LIMIT_WAIT.inc(gemini_limiter.acquire())
         try:
-            response = self._model.generate_content(prompt, stream=True)
-            for chunk in response:
-                # --- FIX: SAFE TEXT EXTRACTION ---
-                # Check if the chunk actually contains text before accessing .text
-                # to prevent ValueError on empty/safety-blocked chunks.
-                if chunk.parts: 
-                    try:
-                        chunk_text = chunk.text
-                        if chunk_text:
-                            yield CompletionResponse(text=chunk_text, delta=chunk_text)
-                    except ValueError:
-                        pass # Skip chunks blocked by safety filters
+            with gemini_request("stream"):
+                response = self._model.generate_content(prompt, stream=True)
+                for chunk in response:
+                    chunk_text = self._chunk_text(chunk)
+                    if chunk_text:
+                        yield CompletionResponse(text=chunk_text, delta=chunk_text)
+            record_usage(response)
         except Exception as e:
             logger.error(f"Streaming failed: {e}")
-            yield CompletionResponse(text=f"[Error: {str(e)}]")
\ No newline at end of file
+            yield CompletionResponse(text=f"[Error: {str(e)}]")
+
+    @llm_completion_callback()
+    async def astream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponseAsyncGen:
+        async def gen() -> CompletionResponseAsyncGen:
+            GEMINI_RATE_LIMIT_WAIT.inc(await gemini_limiter.aacquire())
+            try:
+                with gemini_request("stream"):
+                    response = await self._model.generate_content_async(prompt, stream=True)
+                    async for chunk in response:
+                        chunk_text = self._chunk_text(chunk)
+                        if chunk_text:
+                            yield CompletionResponse(text=chunk_text, delta=chunk_text)
+                record_usage(response)
+            except Exception as e:
+                logger.error(f"Streaming failed: {e}")
+                yield CompletionResponse(text=f"[Error: {str(e)}]")
+
+        return gen()
@@ -0,0 +1,152 @@
+import os
+import time
+from contextlib import contextmanager
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    REGISTRY,
+    generate_latest,
+    start_http_server,
+)
+from prometheus_client import multiprocess
+from app.core.profiling import current_profile
+
+# Prometheus metrics shared by the API and the Celery workers.
+# With several processes per service (uvicorn --workers, Celery prefork), set
+# PROMETHEUS_MULTIPROC_DIR so every process writes to it and one exporter merges them.
+
+# Seconds; covers sub-ms cache hits up to multi-minute LLM extractions
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# -----------------------------------------------------------------------------
+# 1. Pipeline Stages
+# -----------------------------------------------------------------------------
+STAGE_SECONDS = Histogram(
+    "rag_stage_seconds",
+    "Duration of one pipeline stage "
+    "(search, text_extraction, llm_extraction, embedding, neo4j_write, retrieval, ttft)",
+    ["stage"],
+    buckets=BUCKETS,
+)
+SCRAPE_SECONDS = Histogram(
+    "rag_scrape_seconds",
+    "Duration of scraping one URL",
+    ["tier", "outcome"],
+    buckets=BUCKETS,
+)
+
+# -----------------------------------------------------------------------------
+# 2. Gemini
+# -----------------------------------------------------------------------------
+GEMINI_REQUESTS = Counter(
+    "rag_gemini_requests_total",
+    "Gemini API requests",
+    ["kind", "outcome"],  # kind: generate / stream / embed
+)
+GEMINI_TOKENS = Counter(
+    "rag_gemini_tokens_total",
+    "Tokens reported by Gemini usage metadata",
+    ["direction"],  # prompt / output
+)
+GEMINI_RETRIES = Counter(
+    "rag_gemini_retries_total",
+    "Gemini calls retried after a rate-limit or server error",
+    ["kind"],
+)
+GEMINI_RATE_LIMIT_WAIT = Counter(
+    "rag_gemini_rate_limit_wait_seconds_total",
+    "Time spent waiting for the local Gemini rate limiter",
+)
+
+# -----------------------------------------------------------------------------
+# 3. Graph Extraction
+# -----------------------------------------------------------------------------
+EXTRACTION_CHUNKS = Counter(
+    "rag_extraction_chunks_total",
+    "Chunks sent to graph extraction, by how their output was used",
+    ["outcome"],  # ok / repaired / failed
+)
+EXTRACTION_COERCIONS = Counter(
+    "rag_extraction_coercions_total",
+    "Off-schema types in extraction output coerced to Concept / RELATES_TO",
+    ["kind"],  # entity_type / relation
+)
+
+# -----------------------------------------------------------------------------
+# 4. Capacity
+# -----------------------------------------------------------------------------
+QUEUE_DEPTH = Gauge(
+    "rag_ingest_queue_depth",
+    "Jobs in a Celery broker queue (waiting, not yet picked up)",
+    ["queue"],
+    multiprocess_mode="livemax",
+)
+BROWSER_PAGES_IN_USE = Gauge(
+    "rag_browser_pages_in_use",
+    "Playwright pages currently open",
+    multiprocess_mode="livesum",
+)
+BROWSER_PAGES_LIMIT = Gauge(
+    "rag_browser_pages_limit",
+    "Maximum concurrent Playwright pages per scraper",
+    multiprocess_mode="livemax",
+)
+
+@contextmanager
+def observe_stage(stage: str):
+    """Times the wrapped block into rag_stage_seconds{stage} (and the active profile, if any)."""
+    profile = current_profile()
+    started = time.perf_counter()
+    cpu_started = time.process_time() if profile else 0.0
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.labels(stage=stage).observe(elapsed)
+        if profile:
+            profile.add_stage(stage, elapsed, time.process_time() - cpu_started)
+
+@contextmanager
+def gemini_request(kind: str):
+    """Counts the wrapped Gemini call into rag_gemini_requests_total{kind, outcome}."""
+    try:
+        yield
+    except Exception:
+        GEMINI_REQUESTS.labels(kind=kind, outcome="error").inc()
+        raise
+    GEMINI_REQUESTS.labels(kind=kind, outcome="ok").inc()
+
+def record_usage(response) -> None:
+    """Counts tokens from a Gemini response's usage metadata (if the SDK returned any)."""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    GEMINI_TOKENS.labels(direction="prompt").inc(getattr(usage, "prompt_token_count", 0) or 0)
+    GEMINI_TOKENS.labels(direction="output").inc(getattr(usage, "candidates_token_count", 0) or 0)
+
+def _registry():
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+def render_metrics():
+    """(body, content type) for a /metrics response."""
+    return generate_latest(_registry()), CONTENT_TYPE_LATEST
+
+def start_exporter(port: int) -> None:
+    """Serves /metrics from a background thread (used by Celery workers)."""
+    try:
+        start_http_server(port, registry=_registry())
+        print(f"📈 Metrics exporter listening on :{port}")
+    except OSError as e:
+        # e.g. a second worker on the same host; give it its own METRICS_WORKER_PORT
+        print(f"⚠️ Metrics exporter not started on :{port}: {e}")
+
+def mark_process_dead(pid: int) -> None:
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(pid)
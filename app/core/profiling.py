@@ -0,0 +1,218 @@
+import asyncio
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Dict, Optional
+import redis
+from app.core.config import settings
+
+# Active profile of the current task / request (None when not profiling)
+_current: ContextVar[Optional["ProfileSession"]] = ContextVar("profile_session", default=None)
+
+PROFILE_INDEX_KEY = "rag:profiles"
+
+def profile_key(profile_id: str, part: str) -> str:
+    # part: report / wall / cpu
+    return f"rag:profile:{profile_id}:{part}"
+
+def current_profile() -> Optional["ProfileSession"]:
+    return _current.get()
+
+def should_profile(requested: bool) -> bool:
+    """Explicit request flag, or a random sample of all requests."""
+    return requested or random.random() < settings.PROFILE_SAMPLE_RATE
+
+def _thread_cpu_clock(thread_id: int):
+    try:
+        return time.pthread_getcpuclockid(thread_id)
+    except (AttributeError, OSError):
+        return None  # Not available on Windows / thread already gone
+
+class StackSampler(threading.Thread):
+    """
+    Statistical profiler built on sys._current_frames().
+
+    1. Wall: every `interval` the target thread's stack is recorded, whether it is
+       running or waiting (a blocked Gemini call shows up under its caller).
+    2. CPU: every thread's stack is weighted by the CPU time that thread used since
+       the previous sample (per-thread CPU clocks; Linux/macOS only).
+    Stacks are kept in folded form ("root;...;leaf" -> weight), ready for flamegraph.pl
+    or speedscope.
+    """
+    MAX_DEPTH = 128
+
+    def __init__(self, target_thread: int, interval: float):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.target_thread = target_thread
+        self.interval = interval
+        self.wall: Counter = Counter()  # stack -> samples
+        self.cpu: Counter = Counter()   # stack -> CPU microseconds
+        self.samples = 0
+        self._clocks: Dict[int, object] = {}
+        self._last_cpu: Dict[int, float] = {}
+        self._stop_event = threading.Event()
+
+    def _folded(self, thread_name: str, frame) -> str:
+        names = []
+        while frame is not None and len(names) < self.MAX_DEPTH:
+            code = frame.f_code
+            names.append(f"{os.path.basename(code.co_filename)}:{code.co_qualname}")
+            frame = frame.f_back
+        return ";".join([thread_name] + names[::-1])
+
+    def _thread_cpu_delta(self, thread_id: int) -> float:
+        if thread_id not in self._clocks:
+            self._clocks[thread_id] = _thread_cpu_clock(thread_id)
+        clock = self._clocks[thread_id]
+        if clock is None:
+            return 0.0
+        try:
+            now = time.clock_gettime(clock)
+        except OSError:
+            return 0.0
+        delta = now - self._last_cpu.get(thread_id, now)
+        self._last_cpu[thread_id] = now
+        return delta
+
+    def run(self):
+        own = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            self.samples += 1
+            thread_names = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                cpu = self._thread_cpu_delta(thread_id)
+                if thread_id != self.target_thread and cpu <= 0:
+                    continue  # Idle helper thread: not part of either profile
+                stack = self._folded(thread_names.get(thread_id, str(thread_id)), frame)
+                if thread_id == self.target_thread:
+                    self.wall[stack] += 1
+                if cpu > 0:
+                    self.cpu[stack] += round(cpu * 1_000_000)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join(timeout=1.0)
+
+class ProfileSession:
+    """
+    One profiled ingest task or chat request.
+
+    Samples stacks while active and collects per-stage wall and CPU time from
+    `observe_stage` (app.core.metrics). On stop it stores, under the profile id, the
+    wall and CPU folded stacks plus a report splitting each stage into CPU and wait
+    (wall - CPU: network, Gemini, Neo4j, Chromium and lock waits).
+    Stage CPU is process CPU, exact for a worker running one task at a time; in the
+    API it also includes concurrent requests.
+    """
+
+    def __init__(self, profile_id: str, kind: str, interval: Optional[float] = None):
+        self.profile_id = profile_id
+        self.kind = kind
+        self.interval = interval or settings.PROFILE_INTERVAL_MS / 1000
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+        self._sampler: Optional[StackSampler] = None
+        self._token = None
+
+    def start(self) -> "ProfileSession":
+        self._started_at = time.time()
+        self._wall_started = time.perf_counter()
+        self._cpu_started = time.process_time()
+        self._token = _current.set(self)
+        self._sampler = StackSampler(threading.get_ident(), self.interval)
+        self._sampler.start()
+        return self
+
+    def add_stage(self, stage: str, wall: float, cpu: float) -> None:
+        with self._lock:
+            entry = self.stages.setdefault(stage, {"calls": 0, "wall": 0.0, "cpu": 0.0})
+            entry["calls"] += 1
+            entry["wall"] += wall
+            entry["cpu"] += min(cpu, wall)  # Other threads' CPU can exceed this stage's wall time
+
+    def stop(self, save: bool = True) -> dict:
+        wall = time.perf_counter() - self._wall_started
+        cpu = time.process_time() - self._cpu_started
+        self._sampler.stop()
+        if self._token is not None:
+            try:
+                _current.reset(self._token)
+            except ValueError:
+                _current.set(None)  # Stopped from another context (e.g. async generator cleanup)
+
+        report = self._report(wall, cpu)
+        if save:
+            self._save(report)
+        print(f"🔬 Profile {self.profile_id}: wall={report['wall_ms']}ms cpu={report['cpu_ms']}ms "
+              f"samples={report['samples']}")
+        return report
+
+    def _report(self, wall: float, cpu: float) -> dict:
+        ms = lambda seconds: round(seconds * 1000, 1)
+        stages = {}
+        for name, s in sorted(self.stages.items(), key=lambda kv: kv[1]["wall"], reverse=True):
+            stages[name] = {
+                "calls": s["calls"],
+                "wall_ms": ms(s["wall"]),
+                "cpu_ms": ms(s["cpu"]),
+                "wait_ms": ms(s["wall"] - s["cpu"]),
+                "share_of_wall": round(s["wall"] / wall, 3) if wall else None,
+            }
+
+        # Self CPU per function (leaf of each CPU stack)
+        leaves: Counter = Counter()
+        for stack, micros in self._sampler.cpu.items():
+            leaves[stack.rsplit(";", 1)[-1]] += micros
+
+        return {
+            "id": self.profile_id,
+            "kind": self.kind,
+            "started_at": self._started_at,
+            "wall_ms": ms(wall),
+            "cpu_ms": ms(cpu),
+            "wait_ms": ms(max(wall - cpu, 0.0)),
+            "samples": self._sampler.samples,
+            "interval_ms": ms(self.interval),
+            # Stages may nest or overlap (e.g. concurrent page scrapes), so they need not sum to wall_ms
+            "stages": stages,
+            "top_cpu_functions": [
+                {"function": fn, "cpu_ms": round(micros / 1000, 1)} for fn, micros in leaves.most_common(15)
+            ],
+        }
+
+    @staticmethod
+    def _fold_text(counts: Counter) -> str:
+        return "\n".join(f"{stack} {weight}" for stack, weight in counts.most_common() if weight > 0)
+
+    def _save(self, report: dict) -> None:
+        try:
+            client = redis.Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT, db=0, decode_responses=True)
+            ttl = settings.PROFILE_TTL_SECONDS
+            pipe = client.pipeline()
+            pipe.set(profile_key(self.profile_id, "report"), json.dumps(report), ex=ttl)
+            pipe.set(profile_key(self.profile_id, "wall"), self._fold_text(self._sampler.wall), ex=ttl)
+            pipe.set(profile_key(self.profile_id, "cpu"), self._fold_text(self._sampler.cpu), ex=ttl)
+            pipe.zadd(PROFILE_INDEX_KEY, {self.profile_id: report["started_at"]})
+            pipe.zremrangebyscore(PROFILE_INDEX_KEY, "-inf", time.time() - ttl)
+            pipe.execute()
+        except Exception as e:
+            print(f"⚠️ Failed to store profile {self.profile_id}: {e}")
+
+def start_profile(profile_id: str, kind: str) -> ProfileSession:
+    return ProfileSession(profile_id, kind).start()
+
+async def aprofiled(tokens, session: ProfileSession):
+    """Wraps an async token stream so the profile covers exactly its iteration."""
+    session.start()
+    try:
+        async for token in tokens:
+            yield token
+    finally:
+        await asyncio.to_thread(session.stop)
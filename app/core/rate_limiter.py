@@ -0,0 +1,42 @@
+import asyncio
+import threading
+import time
+
+class RateLimiter:
+    """
+    Token-bucket limiter usable from both threads and the event loop.
+
+    Callers reserve the next free slot under a lock and then wait outside it,
+    so concurrent requests are paced evenly instead of all sleeping a fixed
+    amount. Limits are per process (API and each Celery worker pace themselves).
+    """
+
+    def __init__(self, rate_per_minute: float, burst: int = 1):
+        self._interval = 60.0 / rate_per_minute
+        self._burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Takes one token (possibly going into debt) and returns how long to wait for it."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self._burst, self._tokens + (now - self._updated) / self._interval)
+            self._updated = now
+            self._tokens -= 1.0
+            return 0.0 if self._tokens >= 0 else -self._tokens * self._interval
+
+    def acquire(self) -> float:
+        """Blocks the calling thread until a slot is free. Returns the time waited."""
+        delay = self._reserve()
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    async def aacquire(self) -> float:
+        """Awaits a free slot without blocking the event loop. Returns the time waited."""
+        delay = self._reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return delay
@@ -0,0 +1,46 @@
+"""
+Client side of the SSE framing in app/api/sse.py. Standard library only, so the Streamlit UI
+and the scripts can parse the API's streams without importing FastAPI or the settings.
+"""
+import codecs
+import json
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator, List, Tuple
+
+def _parse_frames(buffer: str) -> Tuple[List[Tuple[str, dict]], str]:
+    """Splits complete frames off `buffer`; returns (events, unconsumed rest)."""
+    events = []
+    while "\n\n" in buffer:
+        frame, buffer = buffer.split("\n\n", 1)
+        event, data = "message", []
+        for line in frame.split("\n"):
+            if line.startswith(":"):
+                continue
+            field, _, value = line.partition(":")
+            value = value[1:] if value.startswith(" ") else value
+            if field == "event":
+                event = value
+            elif field == "data":
+                data.append(value)
+        if data:
+            events.append((event, json.loads("\n".join(data))))
+    return events, buffer
+
+def iter_sse_events(chunks: Iterable[bytes]) -> Iterator[Tuple[str, dict]]:
+    """
+    Client side: incrementally parses raw response chunks into (event, data) pairs.
+    Chunks may split events (or UTF-8 characters) anywhere; comments are skipped.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    for chunk in chunks:
+        events, buffer = _parse_frames(buffer + decoder.decode(chunk))
+        yield from events
+
+async def aiter_sse_events(chunks: AsyncIterable[bytes]) -> AsyncIterator[Tuple[str, dict]]:
+    """Async variant of iter_sse_events (e.g. over httpx's `aiter_raw()`)."""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    async for chunk in chunks:
+        events, buffer = _parse_frames(buffer + decoder.decode(chunk))
+        for event in events:
+            yield event
@@ -1,11 +1,60 @@
 from neo4j import GraphDatabase
 from app.core.config import settings
-from app.core.graph_schema import VALID_NODES
+from app.core.graph_schema import (
+    VALID_NODES,
+    ENTITY_VECTOR_INDEX,
+    CHUNK_VECTOR_INDEX,
+    ENTITY_FULLTEXT_INDEX,
+    CHUNK_FULLTEXT_INDEX,
+)
+
+def _vector_index_config() -> dict:
+    return {
+        "vector.dimensions": settings.EMBEDDING_DIMENSIONS,
+        "vector.similarity_function": settings.VECTOR_SIMILARITY,
+        "vector.hnsw.m": settings.VECTOR_HNSW_M,
+        "vector.hnsw.ef_construction": settings.VECTOR_HNSW_EF_CONSTRUCTION,
+    }
+
+def ensure_vector_index(session, name: str, label: str, prop: str = "embedding"):
+    """
+    Creates a vector index with our explicit configuration.
+    If an index with this name exists but was built with different settings
+    (e.g. the unconfigured one LlamaIndex creates on first connect), it is rebuilt.
+    """
+    config = _vector_index_config()
+    existing = session.run(
+        "SHOW VECTOR INDEXES YIELD name, options WHERE name = $name RETURN options",
+        name=name,
+    ).single()
+
+    if existing:
+        current = existing["options"].get("indexConfig", {})
+        # Neo4j reports e.g. the similarity function upper-cased
+        if all(str(current.get(key)).lower() == str(value).lower() for key, value in config.items()):
+            print(f"✅ Vector index up to date: {name}")
+            return
+        print(f"♻️ Rebuilding vector index {name} (config changed)")
+        session.run(f"DROP INDEX `{name}` IF EXISTS")
+
+    options = ", ".join(f"`{key}`: ${key.replace('.', '_')}" for key in config)
+    session.run(
+        f"CREATE VECTOR INDEX `{name}` IF NOT EXISTS FOR (n:`{label}`) ON (n.`{prop}`) "
+        f"OPTIONS {{indexConfig: {{{options}}}}}",
+        **{key.replace(".", "_"): value for key, value in config.items()},
+    )
+    print(f"✅ Vector index applied: {name} on {label}({prop})")
+
+def ensure_fulltext_index(session, name: str, label: str, props: list[str]):
+    fields = ", ".join(f"n.`{p}`" for p in props)
+    session.run(f"CREATE FULLTEXT INDEX `{name}` IF NOT EXISTS FOR (n:`{label}`) ON EACH [{fields}]")
+    print(f"✅ Full-text index applied: {name} on {label}({', '.join(props)})")
 
 def init_db_constraints():
     """
     Connects to Neo4j and applies uniqueness constraints for all valid node types.
     This ensures we don't have duplicate nodes (e.g. two 'Python' nodes).
+    Also creates the vector and full-text indexes used by the hybrid chat retriever.
     """
     driver = GraphDatabase.driver(
         settings.NEO4J_URI,
@@ -14,7 +63,7 @@ def init_db_constraints():
 
     with driver.session() as session:
         print("Initializing Graph Constraints...")
-        
+
         for node_type in VALID_NODES:
             # Cypher query to ensure 'name' property is unique for each label
             query = f"CREATE CONSTRAINT constraint_{node_type.lower()}_id IF NOT EXISTS FOR (n:{node_type}) REQUIRE n.id IS UNIQUE"
@@ -23,16 +72,37 @@ def init_db_constraints():
                 print(f"✅ Constraint applied: {node_type}(id)")
             except Exception as e:
                 print(f"⚠️ Failed to apply constraint for {node_type}: {e}")
-        
-        # Create Vector Index (Optional, but good to prep)
-        # LlamaIndex usually handles this, but explicit is better.
+
         try:
             session.run("CREATE INDEX node_name_lookup IF NOT EXISTS FOR (n:Concept) ON (n.name)")
             print("✅ Lookup index applied.")
         except Exception as e:
             print(f"⚠️ Index error: {e}")
 
+        # Namespace Indexes (namespace listing / deletion start from chunks; ingest tagging by document)
+        try:
+            session.run("CREATE INDEX chunk_namespace IF NOT EXISTS FOR (n:Chunk) ON (n.namespace)")
+            session.run("CREATE INDEX chunk_ref_doc_id IF NOT EXISTS FOR (n:Chunk) ON (n.ref_doc_id)")
+            print("✅ Namespace indexes applied.")
+        except Exception as e:
+            print(f"⚠️ Namespace index error: {e}")
+
+        # Vector Indexes (explicit dimensions, similarity and HNSW parameters)
+        print("Initializing Search Indexes...")
+        try:
+            ensure_vector_index(session, ENTITY_VECTOR_INDEX, "__Entity__")
+            ensure_vector_index(session, CHUNK_VECTOR_INDEX, "Chunk")
+        except Exception as e:
+            print(f"⚠️ Vector index error: {e}")
+
+        # Full-text Indexes (keyword leg of hybrid retrieval)
+        try:
+            ensure_fulltext_index(session, ENTITY_FULLTEXT_INDEX, "__Entity__", ["name"])
+            ensure_fulltext_index(session, CHUNK_FULLTEXT_INDEX, "Chunk", ["text"])
+        except Exception as e:
+            print(f"⚠️ Full-text index error: {e}")
+
     driver.close()
 
 if __name__ == "__main__":
-    init_db_constraints()
\ No newline at end of file
+    init_db_constraints()
@@ -0,0 +1,65 @@
+import asyncio
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import BigInteger, DateTime, Float, ForeignKey, Index, Integer, String, Text, UniqueConstraint, func, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+from sqlalchemy.pool import NullPool
+from app.core.config import settings
+
+# NullPool: Celery tasks drive async code through async_to_sync, which runs each call on
+# a fresh event loop, and asyncpg connections cannot be reused across loops.
+engine = create_async_engine(settings.DATABASE_URL, poolclass=NullPool)
+SessionLocal = async_sessionmaker(engine, expire_on_commit=False)
+
+class Base(DeclarativeBase):
+    pass
+
+class Crawl(Base):
+    """One link-following crawl: its seed query, limits and page budget."""
+    __tablename__ = "crawls"
+
+    id: Mapped[str] = mapped_column(String(64), primary_key=True)
+    query: Mapped[str] = mapped_column(Text)
+    namespace: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)  # Graph namespace pages are tagged with
+    max_depth: Mapped[int] = mapped_column(Integer)
+    max_pages: Mapped[int] = mapped_column(Integer)
+    # Budget reserved by claims (not re-counted when an expired lease is reclaimed)
+    pages_claimed: Mapped[int] = mapped_column(Integer, default=0)
+    status: Mapped[str] = mapped_column(String(16), default="running")  # running | completed | failed
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+
+class FrontierUrl(Base):
+    """A URL discovered by a crawl; the row's status moves pending -> claimed -> done | failed."""
+    __tablename__ = "crawl_frontier"
+    __table_args__ = (
+        UniqueConstraint("crawl_id", "url_hash", name="uq_crawl_frontier_url"),
+        # Serves the claim query: best pending URLs of one crawl
+        Index("ix_crawl_frontier_claim", "crawl_id", "status", "score"),
+    )
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    crawl_id: Mapped[str] = mapped_column(ForeignKey("crawls.id", ondelete="CASCADE"))
+    url: Mapped[str] = mapped_column(Text)
+    url_hash: Mapped[str] = mapped_column(String(64))  # sha256 of the normalized URL (dedup key)
+    depth: Mapped[int] = mapped_column(Integer)
+    score: Mapped[float] = mapped_column(Float)
+    parent_url: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    status: Mapped[str] = mapped_column(String(16), default="pending")
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    claimed_by: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
+    lease_expires_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+async def init_postgres_tables():
+    """Creates missing tables (existing ones are left untouched, apart from the columns added below)."""
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        # Columns added after the table was first created
+        await conn.execute(text("ALTER TABLE crawls ADD COLUMN IF NOT EXISTS namespace VARCHAR(64)"))
+    print("✅ Postgres tables applied.")
+
+if __name__ == "__main__":
+    asyncio.run(init_postgres_tables())
@@ -0,0 +1,380 @@
+"""
+Graph snapshots: copy a built knowledge graph (with its embeddings) between environments
+instead of re-running hours of rate-limited ingestion.
+
+    python -m app.db.snapshot export data/snapshot
+    python -m app.db.snapshot import data/snapshot --clear
+
+A snapshot is a directory of Parquet files plus manifest.json:
+  - entities.parquet       id, labels, properties (JSON), embedding
+  - chunks.parquet         id, labels, text, url, ref_doc_id, namespace, properties (JSON), embedding
+  - communities.parquet    id, labels, properties (JSON), embedding
+  - relationships.parquet  source, source_kind, type, target, target_kind, properties (JSON)
+Embeddings are fixed-size float32 lists, i.e. one contiguous buffer per row group.
+Temporal, spatial and byte-array properties are stored as {"$type": ..., ...} objects and
+restored to the driver's types on import.
+"""
+import argparse
+import base64
+import json
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytz
+from neo4j import GraphDatabase
+from neo4j.spatial import CartesianPoint, Point, WGS84Point
+from neo4j.time import Date, DateTime, Duration, Time
+from app.core.config import settings
+from app.core.graph_schema import COMMUNITY_LABEL
+from app.db.init_graph import init_db_constraints
+
+SNAPSHOT_FORMAT = 2
+READABLE_FORMATS = (1, 2)  # 1: before typed properties (those were exported as strings)
+MANIFEST = "manifest.json"
+RELATIONSHIPS = "relationships"
+
+# Node kinds: label exported, label matched on import (carries an id constraint), columns kept
+# out of the properties JSON
+NODE_KINDS = {
+    "entities": {"kind": "entity", "label": "__Entity__", "match": "__Entity__", "columns": []},
+    "chunks": {"kind": "chunk", "label": "Chunk", "match": "__Node__", "columns": ["text", "url", "ref_doc_id", "namespace"]},
+    "communities": {"kind": "community", "label": COMMUNITY_LABEL, "match": COMMUNITY_LABEL, "columns": []},
+}
+MATCH_LABELS = {spec["kind"]: spec["match"] for spec in NODE_KINDS.values()}
+
+def _kind_case(var: str) -> str:
+    return "CASE " + " ".join(
+        f"WHEN {var}:`{spec['label']}` THEN '{spec['kind']}'" for spec in NODE_KINDS.values()
+    ) + " END"
+
+NODES_QUERY = "MATCH (n:`{label}`) WHERE n.id IS NOT NULL RETURN n.id AS id, labels(n) AS labels, properties(n) AS properties"
+
+RELATIONSHIPS_QUERY = f"""
+MATCH (s)-[r]->(t)
+WHERE s.id IS NOT NULL AND t.id IS NOT NULL
+WITH s, r, t, {_kind_case('s')} AS source_kind, {_kind_case('t')} AS target_kind
+WHERE source_kind IS NOT NULL AND target_kind IS NOT NULL
+RETURN s.id AS source, source_kind, type(r) AS type, t.id AS target, target_kind, properties(r) AS properties
+"""
+
+# MERGE keeps the import idempotent; relationships merge per (source, type, target) as at ingest
+IMPORT_NODES_QUERY = """
+UNWIND $rows AS row
+MERGE (n:`{match}` {{id: row.id}})
+SET n += row.properties{labels}
+WITH n, row WHERE row.embedding IS NOT NULL
+CALL db.create.setNodeVectorProperty(n, 'embedding', row.embedding)
+RETURN count(*) AS embedded
+"""
+
+IMPORT_RELATIONSHIPS_QUERY = """
+UNWIND $rows AS row
+MATCH (s:`{source}` {{id: row.source}}), (t:`{target}` {{id: row.target}})
+MERGE (s)-[r:`{type}`]->(t)
+SET r += row.properties
+RETURN count(*) AS written
+"""
+
+TYPE_TAG = "$type"
+WGS84_SRIDS = (4326, 4979)
+
+def encode_property(value: Any) -> Any:
+    """
+    JSON-safe form of a property value: the types JSON has no representation for become
+    tagged objects (Duration and Point are tuples, so json.dumps' `default` would never see them).
+    """
+    if value is None or isinstance(value, (str, bool, int, float)):
+        return value
+    if isinstance(value, list):
+        return [encode_property(item) for item in value]
+    if isinstance(value, DateTime):
+        tagged = {TYPE_TAG: "datetime", "iso": value.iso_format()}
+        zone = getattr(value.tzinfo, "zone", None)  # pytz, as hydrated by the driver
+        if zone:
+            tagged["zone"] = zone  # The ISO form only keeps the offset
+        return tagged
+    if isinstance(value, Date):
+        return {TYPE_TAG: "date", "iso": value.iso_format()}
+    if isinstance(value, Time):
+        return {TYPE_TAG: "time", "iso": value.iso_format()}
+    if isinstance(value, Duration):
+        return {TYPE_TAG: "duration", "parts": [value.months, value.days, value.seconds, value.nanoseconds]}
+    if isinstance(value, Point):
+        return {TYPE_TAG: "point", "srid": value.srid, "coordinates": list(value)}
+    if isinstance(value, (bytes, bytearray)):
+        return {TYPE_TAG: "bytes", "base64": base64.b64encode(value).decode("ascii")}
+    raise TypeError(f"Cannot snapshot a property of type {type(value).__name__}")
+
+def decode_property(obj: dict) -> Any:
+    """json.loads `object_hook`: inverse of encode_property (property values are never maps otherwise)."""
+    tag = obj.get(TYPE_TAG)
+    if tag is None:
+        return obj
+    if tag == "datetime":
+        value = DateTime.from_iso_format(obj["iso"])
+        return value.as_timezone(pytz.timezone(obj["zone"])) if "zone" in obj else value
+    if tag == "date":
+        return Date.from_iso_format(obj["iso"])
+    if tag == "time":
+        return Time.from_iso_format(obj["iso"])
+    if tag == "duration":
+        months, days, seconds, nanoseconds = obj["parts"]
+        return Duration(months=months, days=days, seconds=seconds, nanoseconds=nanoseconds)
+    if tag == "point":
+        point_type = WGS84Point if obj["srid"] in WGS84_SRIDS else CartesianPoint
+        return point_type(obj["coordinates"])
+    if tag == "bytes":
+        return base64.b64decode(obj["base64"])
+    raise ValueError(f"Unknown snapshot property type {tag!r}")
+
+def dump_properties(properties: dict) -> str:
+    return json.dumps({key: encode_property(value) for key, value in properties.items()})
+
+def load_properties(text: str) -> dict:
+    return json.loads(text or "{}", object_hook=decode_property)
+
+def _quote(name: str) -> str:
+    return "`" + name.replace("`", "``") + "`"
+
+def _batches(items: Iterable, size: int) -> Iterator[list]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def node_schema(columns: List[str], dim: int) -> pa.Schema:
+    return pa.schema(
+        [("id", pa.string()), ("labels", pa.list_(pa.string()))]
+        + [(column, pa.string()) for column in columns]
+        + [("properties", pa.string()), ("embedding", pa.list_(pa.float32(), dim))]
+    )
+
+RELATIONSHIP_SCHEMA = pa.schema([
+    ("source", pa.string()), ("source_kind", pa.string()), ("type", pa.string()),
+    ("target", pa.string()), ("target_kind", pa.string()), ("properties", pa.string()),
+])
+
+def embedding_array(vectors: List, dim: int) -> pa.FixedSizeListArray:
+    """Fixed-size float32 column; missing (or wrongly sized) vectors become nulls."""
+    missing = np.array([v is None or len(v) != dim for v in vectors], dtype=bool)
+    values = np.zeros((len(vectors), dim), dtype=np.float32)
+    for i, vector in enumerate(vectors):
+        if not missing[i]:
+            values[i] = vector
+    return pa.FixedSizeListArray.from_arrays(pa.array(values.reshape(-1)), dim, mask=pa.array(missing))
+
+def embedding_rows(column: pa.FixedSizeListArray, dim: int) -> List:
+    """Inverse of embedding_array: float lists (None where missing) for the UNWIND parameters."""
+    start = column.offset * dim
+    values = column.values.to_numpy(zero_copy_only=False)[start:start + len(column) * dim].reshape(-1, dim)
+    valid = column.is_valid().to_numpy(zero_copy_only=False)
+    return [vector.tolist() if ok else None for vector, ok in zip(values, valid)]
+
+class GraphSnapshot:
+    """
+    Columnar export / bulk import of the whole graph.
+
+    1. Export streams every node kind and relationship out of Neo4j and writes one Parquet
+       row group per batch, so memory stays bounded by SNAPSHOT_BATCH_SIZE.
+    2. Import applies init_db_constraints() first (the MERGE lookups need the id constraints),
+       then writes batched UNWIND queries grouped by label set / relationship type, and waits
+       for the vector and full-text indexes to catch up.
+    3. Caches in running API processes are invalidated through the graph version.
+    """
+
+    def __init__(self, batch_size: int = None):
+        self.batch_size = batch_size or settings.SNAPSHOT_BATCH_SIZE
+        self.dim = settings.EMBEDDING_DIMENSIONS
+
+    def export(self, directory: str) -> dict:
+        path = Path(directory)
+        path.mkdir(parents=True, exist_ok=True)
+        started = time.perf_counter()
+        counts = {}
+
+        driver = self._driver()
+        try:
+            with driver.session() as session:
+                for name, spec in NODE_KINDS.items():
+                    counts[name] = self._export_nodes(session, spec, path / f"{name}.parquet")
+                    print(f"📦 Exported {counts[name]} {name}")
+                counts[RELATIONSHIPS] = self._export_relationships(session, path / f"{RELATIONSHIPS}.parquet")
+                print(f"📦 Exported {counts[RELATIONSHIPS]} relationships")
+        finally:
+            driver.close()
+
+        manifest = {
+            "format": SNAPSHOT_FORMAT,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "embedding_dimensions": self.dim,
+            "counts": counts,
+        }
+        (path / MANIFEST).write_text(json.dumps(manifest, indent=2))
+        manifest["seconds"] = round(time.perf_counter() - started, 1)
+        return manifest
+
+    def import_(self, directory: str, clear: bool = False) -> dict:
+        path = Path(directory)
+        manifest = json.loads((path / MANIFEST).read_text())
+        if manifest.get("format") not in READABLE_FORMATS:
+            raise ValueError(f"Unsupported snapshot format {manifest.get('format')} (expected one of {READABLE_FORMATS})")
+        if manifest.get("embedding_dimensions") != self.dim:
+            raise ValueError(
+                f"Snapshot embeddings have {manifest.get('embedding_dimensions')} dimensions, "
+                f"EMBEDDING_DIMENSIONS is {self.dim}"
+            )
+        started = time.perf_counter()
+        counts, touched = {}, []
+
+        driver = self._driver()
+        try:
+            with driver.session() as session:
+                if clear:
+                    print("🧹 Clearing graph...")
+                    session.run(
+                        "MATCH (n) CALL (n) { DETACH DELETE n } IN TRANSACTIONS OF $batch ROWS",
+                        batch=self.batch_size,
+                    ).consume()
+
+                # 1. Constraints and indexes (LlamaIndex's store normally adds the __Node__ / __Entity__ ones)
+                init_db_constraints()
+                for label in MATCH_LABELS.values():
+                    session.run(f"CREATE CONSTRAINT IF NOT EXISTS FOR (n:`{label}`) REQUIRE n.id IS UNIQUE").consume()
+
+                # 2. Nodes, then the relationships between them
+                for name, spec in NODE_KINDS.items():
+                    ids = self._import_nodes(session, spec, path / f"{name}.parquet")
+                    counts[name] = len(ids)
+                    if spec["kind"] != "community":
+                        touched.extend(ids)
+                    print(f"📥 Imported {counts[name]} {name}")
+                counts[RELATIONSHIPS] = self._import_relationships(session, path / f"{RELATIONSHIPS}.parquet")
+                print(f"📥 Imported {counts[RELATIONSHIPS]} relationships")
+
+                print("⏳ Waiting for indexes to come online...")
+                session.run("CALL db.awaitIndexes(3600)").consume()
+        finally:
+            driver.close()
+
+        # 3. Running API processes drop cached subgraphs / answers for the imported ids
+        from app.services.graph_version import graph_versions
+        try:
+            graph_versions.bump(touched)
+        except Exception as e:
+            print(f"⚠️ Could not bump graph version: {e}")
+
+        return {"counts": counts, "seconds": round(time.perf_counter() - started, 1)}
+
+    def _export_nodes(self, session, spec: dict, file: Path) -> int:
+        columns = spec["columns"]
+        schema = node_schema(columns, self.dim)
+        result = session.run(NODES_QUERY.format(label=spec["label"]))
+        count = 0
+        with pq.ParquetWriter(file, schema, compression="zstd") as writer:
+            for records in _batches(result, self.batch_size):
+                data = {name: [] for name in schema.names}
+                for record in records:
+                    properties = dict(record["properties"])
+                    properties.pop("id", None)
+                    data["id"].append(record["id"])
+                    data["labels"].append(record["labels"])
+                    for column in columns:
+                        value = properties.pop(column, None)
+                        data[column].append(None if value is None else str(value))
+                    data["embedding"].append(properties.pop("embedding", None))
+                    data["properties"].append(dump_properties(properties))
+                arrays = [
+                    embedding_array(data[name], self.dim) if name == "embedding" else pa.array(data[name], type=schema.field(name).type)
+                    for name in schema.names
+                ]
+                writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+                count += len(records)
+        return count
+
+    def _export_relationships(self, session, file: Path) -> int:
+        result = session.run(RELATIONSHIPS_QUERY)
+        count = 0
+        with pq.ParquetWriter(file, RELATIONSHIP_SCHEMA, compression="zstd") as writer:
+            for records in _batches(result, self.batch_size):
+                rows = [
+                    {**record.data(), "properties": dump_properties(dict(record["properties"]))}
+                    for record in records
+                ]
+                writer.write_table(pa.Table.from_pylist(rows, schema=RELATIONSHIP_SCHEMA))
+                count += len(records)
+        return count
+
+    def _import_nodes(self, session, spec: dict, file: Path) -> List[str]:
+        ids = []
+        for batch in pq.ParquetFile(file).iter_batches(batch_size=self.batch_size):
+            embeddings = embedding_rows(batch.column("embedding"), self.dim)
+            table = batch.drop_columns(["embedding"]).to_pylist()
+
+            # Labels are part of the query text, so rows are written per label set
+            by_labels: Dict[tuple, list] = {}
+            for row, embedding in zip(table, embeddings):
+                properties = load_properties(row["properties"])
+                properties.update({c: row[c] for c in spec["columns"] if row[c] is not None})
+                by_labels.setdefault(tuple(row["labels"] or []), []).append(
+                    {"id": row["id"], "properties": properties, "embedding": embedding}
+                )
+                ids.append(row["id"])
+
+            for labels, rows in by_labels.items():
+                extra = [label for label in labels if label != spec["match"]]
+                query = IMPORT_NODES_QUERY.format(
+                    match=spec["match"],
+                    labels=", n:" + ":".join(_quote(label) for label in extra) if extra else "",
+                )
+                session.run(query, rows=rows).consume()
+        return ids
+
+    def _import_relationships(self, session, file: Path) -> int:
+        count = 0
+        for batch in pq.ParquetFile(file).iter_batches(batch_size=self.batch_size):
+            # Relationship type and endpoint labels are part of the query text
+            groups: Dict[tuple, list] = {}
+            for row in batch.to_pylist():
+                key = (row["type"], row["source_kind"], row["target_kind"])
+                groups.setdefault(key, []).append({
+                    "source": row["source"],
+                    "target": row["target"],
+                    "properties": load_properties(row["properties"]),
+                })
+
+            for (rel_type, source_kind, target_kind), rows in groups.items():
+                query = IMPORT_RELATIONSHIPS_QUERY.format(
+                    source=MATCH_LABELS[source_kind], target=MATCH_LABELS[target_kind], type=rel_type.replace("`", "``"),
+                )
+                session.run(query, rows=rows).consume()
+            count += batch.num_rows
+        return count
+
+    @staticmethod
+    def _driver():
+        return GraphDatabase.driver(settings.NEO4J_URI, auth=(settings.NEO4J_USER, settings.NEO4J_PASSWORD))
+
+def main():
+    parser = argparse.ArgumentParser(description="Export / import a graph snapshot (Parquet)")
+    parser.add_argument("command", choices=["export", "import"])
+    parser.add_argument("directory", help="Snapshot directory")
+    parser.add_argument("--batch", type=int, default=None, help="Rows per row group / write transaction")
+    parser.add_argument("--clear", action="store_true", help="import: delete the existing graph first")
+    args = parser.parse_args()
+
+    snapshot = GraphSnapshot(batch_size=args.batch)
+    if args.command == "export":
+        print(f"✅ Snapshot exported: {snapshot.export(args.directory)}")
+    else:
+        print(f"✅ Snapshot imported: {snapshot.import_(args.directory, clear=args.clear)}")
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,12 @@
 import sys
 import asyncio
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from app.core.config import settings
+from app.core.metrics import QUEUE_DEPTH, render_metrics
+from app.services.ingest_admission import ingest_admission
 
 # --- UPDATE IMPORTS: Add 'chat' to the list ---
-from app.api.endpoints import search, scrape, ingest, chat 
+from app.api.endpoints import search, scrape, ingest, chat, profiles, crawl, namespaces
 from app.workers.celery_app import celery_app
 
 # --- FIX: FORCE WINDOWS TO USE PROACTOR EVENT LOOP ---
@@ -19,10 +21,24 @@ app = FastAPI(title=settings.PROJECT_NAME)
 def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus scrape endpoint (API process; workers export on METRICS_WORKER_PORT)."""
+    try:
+        for queue, depth in ingest_admission.queue_depths().items():
+            QUEUE_DEPTH.labels(queue=queue).set(depth)
+    except Exception:
+        pass  # Broker down; keep serving the other metrics
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
 # Register Routers
 app.include_router(search.router, prefix="/api/v1", tags=["Search"])
 app.include_router(scrape.router, prefix="/api/v1", tags=["Scrape"])
 app.include_router(ingest.router, prefix="/api/v1", tags=["Ingestion"])
+app.include_router(crawl.router, prefix="/api/v1", tags=["Crawling"])
+app.include_router(namespaces.router, prefix="/api/v1", tags=["Namespaces"])
+app.include_router(profiles.router, prefix="/api/v1", tags=["Profiling"])
 
 # --- NEW: Register Chat Router ---
 # The endpoint will be available at: POST /api/v1/chat/stream
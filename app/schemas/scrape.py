@@ -3,8 +3,17 @@ from pydantic import BaseModel, HttpUrl
 class ScrapeRequest(BaseModel):
     urls: list[HttpUrl]
 
+class ScrapedLink(BaseModel):
+    url: str
+    text: str = ""
+
 class ScrapeResult(BaseModel):
     url: str
     title: str
     content: str
-    error: str | None = None
\ No newline at end of file
+    error: str | None = None
+    # Set when the page was longer than PAGE_MAX_CHARS and cut at a section boundary
+    truncated: bool = False
+    original_chars: int | None = None
+    # Outgoing links (absolute URLs with anchor text); only collected when crawling
+    links: list[ScrapedLink] = []
\ No newline at end of file
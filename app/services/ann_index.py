@@ -0,0 +1,432 @@
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from neo4j import GraphDatabase
+from app.core.config import settings
+from app.core.graph_schema import ENTITY_VECTOR_INDEX, CHUNK_VECTOR_INDEX
+from app.services.graph_version import graph_versions
+
+logger = logging.getLogger("ann_index")
+
+ENTITY_EMBEDDINGS_QUERY = """
+MATCH (e:__Entity__)
+WHERE e.embedding IS NOT NULL AND ($ids IS NULL OR e.id IN $ids)
+RETURN e.id AS id,
+       [l IN labels(e) WHERE NOT l IN ['__Entity__', '__Node__'] | l][0] AS type,
+       e.embedding AS embedding
+"""
+
+CHUNK_EMBEDDINGS_QUERY = """
+MATCH (c:Chunk)
+WHERE c.embedding IS NOT NULL
+RETURN c.id AS id, c.text AS text, c.url AS url, c.embedding AS embedding
+"""
+
+# Touched chunks (merged / re-embedded by maintenance) and chunks that mention a touched
+# entity (new documents always mention their entities)
+TOUCHED_CHUNKS_QUERY = """
+MATCH (c:Chunk)
+WHERE c.embedding IS NOT NULL AND (c.id IN $ids OR EXISTS {
+    MATCH (c)-[:MENTIONS]->(e:__Entity__) WHERE e.id IN $ids
+})
+RETURN c.id AS id, c.text AS text, c.url AS url, c.embedding AS embedding
+"""
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+class IVFIndex:
+    """
+    Inverted-file ANN index over unit vectors (cosine similarity).
+
+    1. The base matrix is clustered with a few rounds of k-means; each row is
+       filed under its nearest centroid.
+    2. A query scores the centroids, then only the rows of the `nprobe` best lists.
+    3. Rows added after the build live in a small in-memory delta that is
+       always scanned exhaustively; replaced/deleted rows are tombstoned.
+
+    The base matrix can be a read-only memmap, so a snapshot is paged in
+    on demand instead of being copied into the process heap.
+    """
+
+    def __init__(self, dim: int, nprobe: int = 8):
+        self.dim = dim
+        self.nprobe = nprobe
+
+        self._base = np.zeros((0, dim), dtype=np.float32)
+        self._centroids = np.zeros((0, dim), dtype=np.float32)
+        self._assignments = np.zeros(0, dtype=np.int32)
+        self._lists: List[np.ndarray] = []
+
+        self._ids: List[str] = []           # Row -> id (base rows first, then delta rows)
+        self._payloads: List[dict] = []     # Row -> metadata returned with hits
+        self._rows: Dict[str, int] = {}     # Live id -> row
+        self._alive = np.zeros(0, dtype=bool)
+
+        self._delta: List[np.ndarray] = []
+        self._delta_matrix: Optional[np.ndarray] = None
+
+    # --- Build / load ---
+
+    def build(self, ids: List[str], vectors: np.ndarray, payloads: List[dict], iterations: int = 8) -> None:
+        vectors = _normalize(vectors).reshape(-1, self.dim)
+        n = len(ids)
+        nlist = max(1, int(np.sqrt(n)))
+
+        rng = np.random.default_rng(0)
+        centroids = vectors[rng.choice(n, size=nlist, replace=False)] if n else np.zeros((0, self.dim), np.float32)
+        assignments = np.zeros(n, dtype=np.int32)
+        # Train on a sample; 256 points per list is plenty for a coarse quantizer
+        sample = vectors[rng.choice(n, size=min(n, nlist * 256), replace=False)] if n else vectors
+        for _ in range(iterations if n else 0):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = sample[labels == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+            centroids = _normalize(centroids)
+        if n:
+            assignments = np.argmax(vectors @ centroids.T, axis=1).astype(np.int32)
+
+        self._load(ids, vectors, payloads, centroids, assignments)
+
+    def _load(self, ids, base, payloads, centroids, assignments) -> None:
+        self._base = base
+        self._centroids = np.asarray(centroids, dtype=np.float32)
+        self._assignments = np.asarray(assignments, dtype=np.int32)
+        order = np.argsort(self._assignments, kind="stable")
+        bounds = np.searchsorted(self._assignments[order], np.arange(len(self._centroids) + 1))
+        self._lists = [order[bounds[c]:bounds[c + 1]] for c in range(len(self._centroids))]
+
+        self._ids = list(ids)
+        self._payloads = list(payloads)
+        self._rows = {id_: row for row, id_ in enumerate(self._ids)}
+        self._alive = np.ones(len(self._ids), dtype=bool)
+        self._delta = []
+        self._delta_matrix = None
+
+    # --- Incremental updates ---
+
+    def upsert(self, id_: str, vector, payload: dict) -> None:
+        self.remove(id_)
+        self._delta.append(_normalize(np.asarray(vector, dtype=np.float32).reshape(self.dim)))
+        self._delta_matrix = None
+        self._rows[id_] = len(self._ids)
+        self._ids.append(id_)
+        self._payloads.append(payload)
+        self._alive = np.append(self._alive, True)
+
+    def remove(self, id_: str) -> None:
+        row = self._rows.pop(id_, None)
+        if row is not None:
+            self._alive[row] = False
+
+    def needs_compaction(self) -> bool:
+        dead = len(self._alive) - len(self._rows)
+        return len(self._delta) > max(1000, len(self._base) // 10) or dead > max(1000, len(self._alive) // 5)
+
+    def live_items(self) -> Tuple[List[str], np.ndarray, List[dict]]:
+        rows = np.flatnonzero(self._alive)
+        base_rows = rows[rows < len(self._base)]
+        delta_rows = rows[rows >= len(self._base)] - len(self._base)
+        parts = [np.asarray(self._base[base_rows])]
+        if len(delta_rows):
+            parts.append(self._delta_array()[delta_rows])
+        return [self._ids[r] for r in rows], np.vstack(parts), [self._payloads[r] for r in rows]
+
+    # --- Search ---
+
+    def search(self, query, k: int) -> List[Tuple[str, float, dict]]:
+        q = _normalize(np.asarray(query, dtype=np.float32).reshape(self.dim))
+        rows_parts, score_parts = [], []
+
+        if len(self._centroids):
+            nprobe = min(self.nprobe, len(self._centroids))
+            probe = np.argpartition(-(self._centroids @ q), nprobe - 1)[:nprobe]
+            candidates = np.concatenate([self._lists[c] for c in probe])
+            candidates = candidates[self._alive[candidates]]
+            rows_parts.append(candidates)
+            score_parts.append(np.asarray(self._base[candidates]) @ q)
+
+        if self._delta:
+            delta_rows = np.arange(len(self._base), len(self._ids))
+            live = self._alive[delta_rows]
+            rows_parts.append(delta_rows[live])
+            score_parts.append((self._delta_array() @ q)[live])
+
+        if not rows_parts:
+            return []
+        rows = np.concatenate(rows_parts)
+        scores = np.concatenate(score_parts)
+        if len(rows) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            rows, scores = rows[top], scores[top]
+        order = np.argsort(-scores)
+        return [(self._ids[r], float(s), self._payloads[r]) for r, s in zip(rows[order], scores[order])]
+
+    def _delta_array(self) -> np.ndarray:
+        if self._delta_matrix is None:
+            self._delta_matrix = np.vstack(self._delta) if self._delta else np.zeros((0, self.dim), np.float32)
+        return self._delta_matrix
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    # --- Snapshot ---
+
+    def save(self, path: str) -> None:
+        if self._delta or len(self._rows) != len(self._ids):
+            self.build(*self.live_items())  # Compact: fold the delta in, drop tombstones
+
+        tmp = f"{path}.tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        np.save(os.path.join(tmp, "vectors.npy"), np.asarray(self._base, dtype=np.float32))
+        np.save(os.path.join(tmp, "centroids.npy"), self._centroids)
+        np.save(os.path.join(tmp, "assignments.npy"), self._assignments)
+        with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"ids": self._ids, "payloads": self._payloads}, f)
+
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp, path)
+        # Swap the heap copy for a memmap of the file we just wrote
+        self._base = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+
+    def load(self, path: str) -> None:
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        self._load(
+            meta["ids"],
+            np.load(os.path.join(path, "vectors.npy"), mmap_mode="r"),
+            meta["payloads"],
+            np.load(os.path.join(path, "centroids.npy")),
+            np.load(os.path.join(path, "assignments.npy")),
+        )
+
+class VectorMirror:
+    """
+    In-process mirror of the Neo4j entity and chunk embeddings.
+
+    The hybrid retriever asks it for the vector legs instead of going over Bolt;
+    full-text search and graph expansion still run in Neo4j.
+
+    1. On start the mirror loads its snapshot (or builds one from Neo4j).
+    2. A background thread polls the graph version. Entities touched since the
+       mirrored version (and the chunks mentioning them) are re-read and upserted.
+    3. When the delta grows large the index is rebuilt and the snapshot rewritten.
+
+    `search` never does I/O; it returns None until the mirror is ready,
+    so callers fall back to the Neo4j vector index. Rebuilds and compactions build
+    (and save) new indexes off `_lock` and only swap them in under it, so a k-means
+    run never blocks searches.
+    """
+    STATE_FILE = "state.json"
+
+    def __init__(self, snapshot_dir: str, dim: int, nprobe: int, sync_interval: float):
+        self._snapshot_dir = snapshot_dir
+        self._sync_interval = sync_interval
+        self._indexes = {
+            ENTITY_VECTOR_INDEX: IVFIndex(dim, nprobe),
+            CHUNK_VECTOR_INDEX: IVFIndex(dim, nprobe),
+        }
+        self._version = 0
+        self._ready = False
+        self._lock = threading.RLock()        # Readers vs. the published indexes / version
+        self._write_lock = threading.RLock()  # One writer (sync thread, rebuild) at a time
+        self._driver = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    @property
+    def driver(self):
+        if self._driver is None:
+            self._driver = GraphDatabase.driver(
+                settings.NEO4J_URI,
+                auth=(settings.NEO4J_USER, settings.NEO4J_PASSWORD),
+            )
+        return self._driver
+
+    # --- Lifecycle ---
+
+    def start(self) -> None:
+        """Loads the mirror and starts the sync thread (idempotent)."""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="ann-mirror-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        try:
+            if not self._load_snapshot():
+                self.rebuild()
+        except Exception as e:
+            logger.error(f"❌ ANN mirror failed to load, using Neo4j vector search: {e}")
+            self._thread = None
+            return
+
+        while not self._stop.wait(self._sync_interval):
+            try:
+                self.sync()
+            except Exception as e:
+                logger.warning(f"⚠️ ANN mirror sync failed: {e}")
+
+    # --- Search ---
+
+    def search(self, index_name: str, embedding, k: int) -> Optional[List[dict]]:
+        """Same row shape as the Cypher vector legs of the hybrid retriever, or None if not ready."""
+        if not self._ready or embedding is None:
+            return None
+        with self._lock:
+            hits = self._indexes[index_name].search(embedding, k)
+        return [{"id": id_, "score": score, **payload} for id_, score, payload in hits]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "ready": self._ready,
+                "version": self._version,
+                "entities": len(self._indexes[ENTITY_VECTOR_INDEX]),
+                "chunks": len(self._indexes[CHUNK_VECTOR_INDEX]),
+            }
+
+    # --- Sync ---
+
+    def rebuild(self) -> None:
+        """Full reload from Neo4j."""
+        with self._write_lock:
+            start = time.perf_counter()
+            version = graph_versions.current()  # Read first: later bumps will be replayed by sync()
+            entities = self._fetch(ENTITY_EMBEDDINGS_QUERY, ids=None)
+            chunks = self._fetch(CHUNK_EMBEDDINGS_QUERY)
+
+            indexes = {}
+            for index_name, rows in ((ENTITY_VECTOR_INDEX, entities), (CHUNK_VECTOR_INDEX, chunks)):
+                index = self._empty_like(self._indexes[index_name])
+                vectors = np.array([r["embedding"] for r in rows], dtype=np.float32).reshape(-1, index.dim)
+                index.build([r["id"] for r in rows], vectors, [self._payload(index_name, r) for r in rows])
+                indexes[index_name] = index
+            self._save_snapshot(indexes, version)
+            with self._lock:
+                self._indexes = indexes
+                self._version = version
+                self._ready = True
+
+        logger.info(
+            f"🧭 ANN mirror built: {len(entities)} entities, {len(chunks)} chunks "
+            f"@ v{version} in {time.perf_counter() - start:.1f}s"
+        )
+
+    def sync(self) -> None:
+        with self._write_lock:
+            self._sync()
+
+    def _sync(self) -> None:
+        current, touched = graph_versions.touched_since(self._version)
+        if current == self._version:
+            return
+        if current < self._version or len(touched) >= graph_versions.TOUCHED_MAX:
+            # Counter was reset, or the touch log was trimmed past our version
+            self.rebuild()
+            return
+
+        ids = list(touched)
+        entities = self._fetch(ENTITY_EMBEDDINGS_QUERY, ids=ids) if ids else []
+        chunks = self._fetch(TOUCHED_CHUNKS_QUERY, ids=ids) if ids else []
+
+        with self._lock:
+            entity_index = self._indexes[ENTITY_VECTOR_INDEX]
+            found = {r["id"] for r in entities}
+            for id_ in touched - found:
+                entity_index.remove(id_)  # Deleted or lost its embedding
+            for r in entities:
+                entity_index.upsert(r["id"], r["embedding"], self._payload(ENTITY_VECTOR_INDEX, r))
+
+            chunk_index = self._indexes[CHUNK_VECTOR_INDEX]
+            for id_ in touched - found - {r["id"] for r in chunks}:
+                chunk_index.remove(id_)  # Deleted chunks (e.g. of a deleted namespace) are published as touched
+            for r in chunks:
+                chunk_index.upsert(r["id"], r["embedding"], self._payload(CHUNK_VECTOR_INDEX, r))
+
+            self._version = current
+
+        # The snapshot keeps its older version until compaction; a restart replays the rest
+        if any(index.needs_compaction() for index in self._indexes.values()):
+            self._compact()
+
+        logger.info(f"🧭 ANN mirror synced to v{current}: {len(entities)} entities, {len(chunks)} chunks")
+
+    def _compact(self) -> None:
+        """Folds the deltas into freshly built indexes, saves them and swaps them in (caller holds _write_lock)."""
+        start = time.perf_counter()
+        # Reading the live indexes without _lock is safe: only the writer mutates them
+        indexes = {}
+        for index_name, index in self._indexes.items():
+            compacted = self._empty_like(index)
+            compacted.build(*index.live_items())
+            indexes[index_name] = compacted
+        self._save_snapshot(indexes, self._version)
+        with self._lock:
+            self._indexes = indexes
+        logger.info(f"🧭 ANN mirror compacted in {time.perf_counter() - start:.1f}s")
+
+    def _fetch(self, query: str, **params) -> List[dict]:
+        records, _, _ = self.driver.execute_query(query, parameters_=params)
+        return [r.data() for r in records]
+
+    @staticmethod
+    def _empty_like(index: IVFIndex) -> IVFIndex:
+        return IVFIndex(index.dim, index.nprobe)
+
+    @staticmethod
+    def _payload(index_name: str, row: dict) -> dict:
+        if index_name == ENTITY_VECTOR_INDEX:
+            return {"type": row.get("type"), "properties": {}}
+        return {"text": row.get("text"), "url": row.get("url")}
+
+    # --- Snapshot (caller holds self._write_lock) ---
+
+    def _save_snapshot(self, indexes: Dict[str, IVFIndex], version: int) -> None:
+        """Writes indexes that are not published yet (saving swaps their base matrix for a memmap)."""
+        os.makedirs(self._snapshot_dir, exist_ok=True)
+        for index_name, index in indexes.items():
+            index.save(os.path.join(self._snapshot_dir, index_name))
+        with open(os.path.join(self._snapshot_dir, self.STATE_FILE), "w", encoding="utf-8") as f:
+            json.dump({"version": version}, f)
+
+    def _load_snapshot(self) -> bool:
+        path = os.path.join(self._snapshot_dir, self.STATE_FILE)
+        if not os.path.exists(path):
+            return False
+        try:
+            with open(path, encoding="utf-8") as f:
+                version = json.load(f)["version"]
+            with self._lock:
+                for index_name, index in self._indexes.items():
+                    index.load(os.path.join(self._snapshot_dir, index_name))
+                self._version = version
+                self._ready = True
+        except Exception as e:
+            logger.warning(f"⚠️ ANN snapshot unreadable, rebuilding: {e}")
+            return False
+
+        logger.info(f"🧭 ANN mirror loaded from snapshot @ v{version}")
+        self.sync()  # Catch up on anything ingested while we were down
+        return True
+
+# Singleton
+vector_mirror = VectorMirror(
+    snapshot_dir=settings.ANN_SNAPSHOT_DIR,
+    dim=settings.EMBEDDING_DIMENSIONS,
+    nprobe=settings.ANN_NPROBE,
+    sync_interval=settings.ANN_SYNC_INTERVAL_SECONDS,
+)
@@ -0,0 +1,48 @@
+import threading
+from collections import deque
+import numpy as np
+
+class ChatMetrics:
+    """
+    Rolling window of per-request chat timings.
+    Every streamed answer records retrieval time, time-to-first-token, generation speed
+    and prompt size before/after context assembly.
+    """
+    FIELDS = ("retrieval_ms", "ttft_ms", "total_ms", "tokens_per_sec", "prompt_tokens_before", "prompt_tokens_after")
+
+    def __init__(self, window: int = 1000):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, trace) -> None:
+        with self._lock:
+            self._samples.append({
+                "cache_hit": trace.cache_hit,
+                "output_tokens": trace.output_tokens,
+                **{name: getattr(trace, name) for name in self.FIELDS},
+            })
+
+    def summary(self) -> dict:
+        with self._lock:
+            samples = list(self._samples)
+
+        result = {
+            "requests": len(samples),
+            "cache_hits": sum(1 for s in samples if s["cache_hit"]),
+        }
+        for name in self.FIELDS:
+            values = np.array([s[name] for s in samples if s[name] is not None], dtype=np.float64)
+            if values.size == 0:
+                result[name] = None
+                continue
+            p50, p95, p99 = np.percentile(values, [50, 95, 99])
+            result[name] = {
+                "p50": round(float(p50), 2),
+                "p95": round(float(p95), 2),
+                "p99": round(float(p99), 2),
+                "mean": round(float(values.mean()), 2),
+            }
+        return result
+
+# Singleton
+chat_metrics = ChatMetrics()
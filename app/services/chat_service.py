@@ -1,72 +1,422 @@
+import asyncio
 import logging
-from llama_index.core import PropertyGraphIndex, Settings
-from llama_index.graph_stores.neo4j import Neo4jPropertyGraphStore
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional
+from llama_index.core import Settings
+from llama_index.core.base.llms.types import ChatMessage, MessageRole
+from llama_index.core.chat_engine import ContextChatEngine
+from llama_index.core.memory import ChatSummaryMemoryBuffer
+from llama_index.core.response_synthesizers import ResponseMode, get_response_synthesizer
+from llama_index.core.schema import QueryBundle
+from llama_index.core.utils import get_tokenizer
 from app.core.config import settings
+from app.core.graph_store import AsyncNeo4jPropertyGraphStore
 from app.core.llm import SyncGeminiLLM, SyncGeminiEmbedding
+from app.core.metrics import STAGE_SECONDS
+from app.services.ann_index import vector_mirror
+from app.services.chat_metrics import chat_metrics
+from app.services.chat_sessions import ChatSession, ChatSessionPool
+from app.services.context_assembler import ContextAssembler, assembly_stats
+from app.services.global_search import GlobalSearch
+from app.services.graph_version import graph_versions
+from app.services.hybrid_retriever import HybridGraphRetriever, retrieval_namespace
+from app.services.semantic_cache import semantic_cache
+from app.services.subgraph_cache import subgraph_cache
 
 logger = logging.getLogger("chat_service")
 
+@dataclass
+class ChatTrace:
+    """
+    Per-request metadata, filled in while the answer streams.
+    Callers that need sources, cache status or timings pass one in and read it after the stream ends.
+    """
+    source_nodes: List = field(default_factory=list)
+    cache_hit: bool = False
+
+    # Timings (milliseconds, measured from the start of the request)
+    retrieval_ms: Optional[float] = None
+    ttft_ms: Optional[float] = None
+    total_ms: Optional[float] = None
+    output_tokens: int = 0
+    tokens_per_sec: Optional[float] = None
+
+    # Prompt size (history + question + retrieved context) before/after context assembly
+    prompt_tokens_before: Optional[int] = None
+    prompt_tokens_after: Optional[int] = None
+
 class ChatService:
     def __init__(self):
-        self._engine = None
+        # Shared across all sessions (built once)
+        self._llm = None
+        self._embed_model = None
+        self._graph_store = None
+        self._retriever = None
+        self._assembler = None
+        self._global_search = None
+        self._init_lock = threading.Lock()
+
+        # Per-session engines (each with its own memory)
+        self._sessions = ChatSessionPool(
+            factory=self._create_session,
+            max_sessions=settings.CHAT_MAX_SESSIONS,
+            idle_ttl=settings.CHAT_SESSION_TTL_SECONDS,
+            max_total_tokens=settings.CHAT_MEMORY_TOTAL_TOKENS,
+        )
 
     def _initialize_engine(self):
-        if self._engine:
+        if self._retriever:
+            return
+        with self._init_lock:
+            if self._retriever:
+                return
+            try:
+                logger.info("🔌 Connecting Chat Engine to Knowledge Graph...")
+
+                # 1. Setup Models
+                llm = SyncGeminiLLM(api_key=settings.GOOGLE_API_KEY)
+                embed_model = SyncGeminiEmbedding(api_key=settings.GOOGLE_API_KEY)
+
+                Settings.llm = llm
+                Settings.embed_model = embed_model
+                Settings.chunk_size = 512 # optimize for context window
+
+                # 2. Connect to Neo4j
+                graph_store = AsyncNeo4jPropertyGraphStore(
+                    username=settings.NEO4J_USER,
+                    password=settings.NEO4J_PASSWORD,
+                    url=settings.NEO4J_URI,
+                )
+
+                # 3. Shared Retriever
+                # One retriever serves every session; only the chat memory is per-session.
+                # Hybrid: vector + full-text over entities and chunks, fused, then graph expansion.
+                mirror = None
+                if settings.ANN_MIRROR_ENABLED:
+                    vector_mirror.start()  # Loads in the background; Neo4j serves vectors until ready
+                    mirror = vector_mirror
+
+                self._retriever = HybridGraphRetriever(
+                    graph_store=graph_store,
+                    embed_model=embed_model,
+                    similarity_top_k=settings.RETRIEVAL_TOP_K,
+                    rrf_k=settings.RETRIEVAL_RRF_K,
+                    path_depth=settings.RETRIEVAL_PATH_DEPTH,
+                    limit=settings.RETRIEVAL_TRIPLET_LIMIT,
+                    include_text=True,
+                    vector_mirror=mirror,
+                    subgraph_cache=subgraph_cache if settings.SUBGRAPH_CACHE_ENABLED else None,
+                )
+                # 4. Context Assembly (dedupe, rerank, compress, pack into a token budget)
+                self._assembler = ContextAssembler(
+                    token_budget=settings.CONTEXT_TOKEN_BUDGET,
+                    max_node_tokens=settings.CONTEXT_MAX_NODE_TOKENS,
+                    dedupe_threshold=settings.CONTEXT_DEDUPE_THRESHOLD,
+                )
+
+                # 5. Global Search (answers broad questions from community summaries)
+                self._global_search = GlobalSearch(
+                    llm=llm,
+                    embed_model=embed_model,
+                    graph_store=graph_store,
+                    top_k=settings.GLOBAL_SEARCH_TOP_COMMUNITIES,
+                    map_calls=settings.GLOBAL_SEARCH_MAP_CALLS,
+                )
+                self._llm = llm
+                self._embed_model = embed_model
+                self._graph_store = graph_store
+                logger.info("✅ Chat Engine Ready.")
+
+            except Exception as e:
+                logger.error(f"❌ Failed to init Chat Engine: {e}")
+                raise e
+
+    def _create_session(self, session_id: str) -> ChatSession:
+        """
+        Builds a 'context' mode chat engine (retrieve first, then answer) with its own memory.
+        Older turns are compacted into a summary once the history exceeds the token budget.
+        """
+        memory = ChatSummaryMemoryBuffer.from_defaults(
+            llm=self._llm,
+            token_limit=settings.CHAT_MEMORY_TOKEN_LIMIT,
+        )
+        engine = ContextChatEngine.from_defaults(
+            retriever=self._retriever,
+            llm=self._llm,
+            memory=memory,
+            node_postprocessors=[self._assembler],
+        )
+        return ChatSession(session_id=session_id, engine=engine, memory=memory)
+
+    def reset_session(self, session_id: str) -> bool:
+        return self._sessions.drop(session_id)
+
+    def session_stats(self) -> dict:
+        return self._sessions.stats()
+
+    async def _source_entity_ids(self, source_nodes) -> set[str]:
+        """Graph entities mentioned by the retrieved chunks (scope for cache invalidation)."""
+        chunk_ids = [n.node.node_id for n in source_nodes]
+        if not chunk_ids:
+            return set()
+        rows = await self._graph_store.astructured_query(
+            """
+            MATCH (c:__Node__)-[:MENTIONS]->(e:__Entity__)
+            WHERE c.id IN $ids
+            RETURN DISTINCT e.id AS id
+            """,
+            param_map={"ids": chunk_ids},
+        )
+        return {row["id"] for row in rows}
+
+    async def _cache_answer(self, message, embedding, answer, source_nodes, graph_version, namespace):
+        if not answer or answer.startswith("[Error:"):
             return
         try:
-            logger.info("🔌 Connecting Chat Engine to Knowledge Graph...")
-            
-            # 1. Setup Models
-            llm = SyncGeminiLLM(api_key=settings.GOOGLE_API_KEY)
-            embed_model = SyncGeminiEmbedding(api_key=settings.GOOGLE_API_KEY)
-            
-            Settings.llm = llm
-            Settings.embed_model = embed_model
-            Settings.chunk_size = 512 # optimize for context window
-
-            # 2. Connect to Neo4j
-            graph_store = Neo4jPropertyGraphStore(
-                username=settings.NEO4J_USER,
-                password=settings.NEO4J_PASSWORD,
-                url=settings.NEO4J_URI,
+            entity_ids = await self._source_entity_ids(source_nodes)
+            await asyncio.to_thread(
+                semantic_cache.store,
+                question=message,
+                embedding=embedding,
+                answer=answer,
+                source_nodes=source_nodes,
+                entity_ids=entity_ids,
+                graph_version=graph_version,
+                namespace=namespace,
             )
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to cache answer: {e}")
 
-            # 3. Load Index
-            index = PropertyGraphIndex.from_existing(
-                property_graph_store=graph_store,
-                embed_model=embed_model,
-                llm=llm
-            )
+    def _finish_trace(self, trace: ChatTrace, started: float, answer: str):
+        trace.total_ms = (time.perf_counter() - started) * 1000
+        trace.output_tokens = len(get_tokenizer()(answer))
+        if trace.ttft_ms is not None and trace.total_ms > trace.ttft_ms:
+            trace.tokens_per_sec = trace.output_tokens / ((trace.total_ms - trace.ttft_ms) / 1000)
+        chat_metrics.record(trace)
+        if trace.retrieval_ms is not None and not trace.cache_hit:
+            STAGE_SECONDS.labels(stage="retrieval").observe(trace.retrieval_ms / 1000)
+        if trace.ttft_ms is not None:
+            STAGE_SECONDS.labels(stage="ttft").observe(trace.ttft_ms / 1000)
 
-            # 4. Create Chat Engine (Switching to 'context' mode for reliability)
-            # This forces it to retrieve nodes first, then answer.
-            # We explicitly tell it to include text (chunks) in the search.
-            self._engine = index.as_chat_engine(
-                chat_mode="context", 
-                llm=llm,
-                verbose=True,
-                similarity_top_k=5  # Retrieve top 5 matching chunks
-            )
-            logger.info("✅ Chat Engine Ready.")
+        retrieval = f"{trace.retrieval_ms:.0f}ms" if trace.retrieval_ms is not None else "-"
+        ttft = f"{trace.ttft_ms:.0f}ms" if trace.ttft_ms is not None else "-"
+        speed = f"{trace.tokens_per_sec:.1f} tok/s" if trace.tokens_per_sec is not None else "-"
+        logger.info(
+            f"⏱️ retrieval={retrieval} ttft={ttft} total={trace.total_ms:.0f}ms "
+            f"tokens={trace.output_tokens} ({speed}) cache_hit={trace.cache_hit}"
+        )
 
-        except Exception as e:
-            logger.error(f"❌ Failed to init Chat Engine: {e}")
-            raise e
-
-    def stream_chat(self, message: str):
-        self._initialize_engine()
-        
-        logger.info(f"💬 Querying Chat Engine: {message}")
-        
-        # Stream Response
-        response = self._engine.stream_chat(message)
-        
-        # Yield tokens and log the first one to confirm flow
-        first = True
-        for token in response.response_gen:
-            if first:
-                logger.info(f"⚡ Stream started! First token: '{token}'")
-                first = False
+    async def _astream_global(self, message: str, session: ChatSession, trace: ChatTrace, started: float):
+        """
+        Global mode: map-reduce over community summaries instead of top-k chunk retrieval.
+        Costs at most GLOBAL_SEARCH_MAP_CALLS + 1 LLM calls.
+        """
+        communities = await self._global_search.arank(message)
+        trace.source_nodes = communities
+        if not communities:
+            yield "No community summaries are available yet. Ingest some documents and try again shortly."
+            return
+
+        points = await self._global_search.amap(message, communities)
+        trace.retrieval_ms = (time.perf_counter() - started) * 1000
+        logger.info(f"🌐 Global search: {len(communities)} communities -> {len(points)} key points")
+
+        answer = ""
+        async for token in self._global_search.astream_answer(message, points):
+            if trace.ttft_ms is None:
+                trace.ttft_ms = (time.perf_counter() - started) * 1000
+            answer += token
             yield token
 
-chat_service = ChatService()
\ No newline at end of file
+        await session.memory.aput(ChatMessage(role=MessageRole.USER, content=message))
+        await session.memory.aput(ChatMessage(role=MessageRole.ASSISTANT, content=answer))
+
+    async def astream_chat(
+        self,
+        message: str,
+        session_id: Optional[str] = None,
+        trace: Optional[ChatTrace] = None,
+        mode: str = "local",
+        namespace: Optional[str] = None,
+    ):
+        """
+        Async generator of answer tokens. Retrieval, generation and pacing all run on the
+        event loop, so concurrent streams don't each hold a threadpool worker.
+        `mode="global"` answers from community summaries (broad, corpus-wide questions).
+        `namespace` restricts local retrieval to one ingested topic / collection.
+        """
+        started = time.perf_counter()
+        await asyncio.to_thread(self._initialize_engine)
+        trace = trace if trace is not None else ChatTrace()
+
+        # Anonymous requests get a throwaway session so they never share memory
+        if session_id:
+            session = self._sessions.get(session_id)
+        else:
+            session = self._create_session("anonymous")
+
+        logger.info(f"💬 Querying Chat Engine [{session.session_id}]: {message}")
+
+        # Same-session requests are serialized; different sessions run in parallel
+        answer = ""
+        try:
+            async with session.lock:
+                # 1. Semantic Cache (only for fresh conversations; follow-ups depend on history)
+                cached, embedding, graph_version = None, None, None
+                if mode == "local" and settings.SEMANTIC_CACHE_ENABLED and not session.memory.get_all():
+                    embedding = await self._embed_model.aget_query_embedding(message)
+                    cached = await asyncio.to_thread(semantic_cache.lookup, embedding, namespace)
+
+                if mode == "global":
+                    async for token in self._astream_global(message, session, trace, started):
+                        answer += token
+                        yield token
+                elif cached:
+                    logger.info(f"🎯 Semantic cache hit ({cached.similarity:.3f}): '{cached.question}'")
+                    trace.cache_hit = True
+                    trace.source_nodes = cached.source_nodes()
+                    trace.retrieval_ms = (time.perf_counter() - started) * 1000
+                    for token in cached.replay():
+                        if trace.ttft_ms is None:
+                            trace.ttft_ms = (time.perf_counter() - started) * 1000
+                        answer += token
+                        yield token
+
+                    # Keep the session consistent so follow-ups see this turn
+                    await session.memory.aput(ChatMessage(role=MessageRole.USER, content=message))
+                    await session.memory.aput(ChatMessage(role=MessageRole.ASSISTANT, content=cached.answer))
+                else:
+                    if embedding is not None:
+                        try:
+                            graph_version = await asyncio.to_thread(graph_versions.current)
+                        except Exception:
+                            embedding = None  # Can't version the answer; don't cache it
+
+                    # 2. Retrieve, assemble context + open the generation stream
+                    tokenizer = get_tokenizer()
+                    base_tokens = len(tokenizer(message)) + session.token_count()
+                    stats = {}
+                    stats_token = assembly_stats.set(stats)
+                    namespace_token = retrieval_namespace.set(namespace)
+                    try:
+                        response = await session.engine.astream_chat(message)
+                    finally:
+                        retrieval_namespace.reset(namespace_token)
+                        assembly_stats.reset(stats_token)
+                    trace.source_nodes = response.source_nodes
+                    trace.retrieval_ms = (time.perf_counter() - started) * 1000
+                    if stats:
+                        trace.prompt_tokens_before = base_tokens + stats["context_tokens_before"]
+                        trace.prompt_tokens_after = base_tokens + stats["context_tokens_after"]
+                        logger.info(
+                            f"🧱 Context: {stats['nodes_before']}→{stats['nodes_after']} nodes, "
+                            f"prompt {trace.prompt_tokens_before}→{trace.prompt_tokens_after} tokens"
+                        )
+
+                    # 3. Stream Response (log the first token to confirm flow)
+                    async for token in response.async_response_gen():
+                        if not token:
+                            continue
+                        if trace.ttft_ms is None:
+                            trace.ttft_ms = (time.perf_counter() - started) * 1000
+                            logger.info(f"⚡ Stream started! First token: '{token}'")
+                        answer += token
+                        yield token
+
+                    # 4. Remember the answer for similar questions
+                    if embedding is not None:
+                        await self._cache_answer(message, embedding, answer, response.source_nodes, graph_version, namespace)
+        finally:
+            # Also when the client disconnects mid-stream (generator closed / cancelled)
+            if session_id:
+                self._sessions.release(session)
+            self._finish_trace(trace, started, answer)
+
+    async def abatch(self, questions: List[str], concurrency: int = 8, namespace: Optional[str] = None):
+        """
+        Answers a list of independent questions (no chat memory, no semantic cache),
+        optionally retrieving from one namespace only.
+        Yields one result dict per question, in completion order, then a summary dict.
+
+        1. All questions are embedded in batched API calls.
+        2. Retrieval runs concurrently, with one shared subgraph fetch for all seed entities.
+        3. Context assembly + generation run `concurrency` at a time under the shared Gemini limiter.
+        """
+        started = time.perf_counter()
+        await asyncio.to_thread(self._initialize_engine)
+
+        # 1. Embed
+        embeddings = await self._embed_model.aget_query_embedding_batch(questions)
+        embed_ms = (time.perf_counter() - started) * 1000
+
+        # 2. Retrieve
+        bundles = [QueryBundle(query_str=q, embedding=e) for q, e in zip(questions, embeddings)]
+        retrieval_started = time.perf_counter()
+        namespace_token = retrieval_namespace.set(namespace)
+        try:
+            retrieved = await self._retriever.abatch_retrieve(bundles, concurrency=concurrency)
+        finally:
+            retrieval_namespace.reset(namespace_token)
+        retrieval_ms = (time.perf_counter() - retrieval_started) * 1000
+        logger.info(f"📦 Batch: {len(questions)} questions embedded in {embed_ms:.0f}ms, retrieved in {retrieval_ms:.0f}ms")
+
+        # 3. Generate
+        synthesizer = get_response_synthesizer(llm=self._llm, response_mode=ResponseMode.COMPACT)
+        semaphore = asyncio.Semaphore(concurrency)
+        tokenizer = get_tokenizer()
+
+        async def answer(index: int) -> dict:
+            async with semaphore:
+                question, bundle = questions[index], bundles[index]
+                generation_started = time.perf_counter()
+                result = {"index": index, "question": question}
+                try:
+                    if isinstance(retrieved[index], Exception):
+                        raise retrieved[index]  # Retrieval failed for this question only
+                    stats = {}
+                    stats_token = assembly_stats.set(stats)
+                    try:
+                        nodes = self._assembler.postprocess_nodes(retrieved[index], query_bundle=bundle)
+                    finally:
+                        assembly_stats.reset(stats_token)
+                    response = await synthesizer.asynthesize(bundle, nodes)
+                    result["answer"] = str(response)
+                    result["sources"] = [
+                        {"id": n.node.node_id, "url": n.node.metadata.get("url"), "score": n.score}
+                        for n in nodes
+                    ]
+                    result["prompt_tokens"] = len(tokenizer(question)) + stats.get("context_tokens_after", 0)
+                except Exception as e:
+                    result["error"] = str(e)
+                result["timings"] = {
+                    "generation_ms": round((time.perf_counter() - generation_started) * 1000, 1),
+                    "total_ms": round((time.perf_counter() - started) * 1000, 1),
+                }
+                return result
+
+        failed = 0
+        tasks = [asyncio.create_task(answer(i)) for i in range(len(questions))]
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                result = await next_result
+                failed += "error" in result
+                yield result
+        finally:
+            # The consumer went away: stop generations nobody will read (they cost quota)
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+        yield {
+            "summary": {
+                "questions": len(questions),
+                "failed": failed,
+                "embed_ms": round(embed_ms, 1),
+                "retrieval_ms": round(retrieval_ms, 1),
+                "total_ms": round((time.perf_counter() - started) * 1000, 1),
+            }
+        }
+
+chat_service = ChatService()
@@ -0,0 +1,122 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger("chat_sessions")
+
+@dataclass
+class ChatSession:
+    """
+    A single user's conversation: its own chat engine + memory.
+    The lock serializes concurrent requests that reuse the same session id.
+    """
+    session_id: str
+    engine: Any
+    memory: Any
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    last_used: float = field(default_factory=time.monotonic)
+
+    def token_count(self) -> int:
+        try:
+            return self.memory.get_token_count()
+        except Exception:
+            return 0
+
+class ChatSessionPool:
+    """
+    Bounded LRU of chat sessions.
+
+    Sessions are evicted when:
+      1. They have been idle longer than `idle_ttl` seconds.
+      2. The pool holds more than `max_sessions` entries (least recently used first).
+      3. The summed history of all sessions exceeds `max_total_tokens`.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[str], ChatSession],
+        max_sessions: int,
+        idle_ttl: float,
+        max_total_tokens: int,
+    ):
+        self._factory = factory
+        self._max_sessions = max_sessions
+        self._idle_ttl = idle_ttl
+        self._max_total_tokens = max_total_tokens
+        self._sessions: "OrderedDict[str, ChatSession]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> ChatSession:
+        """Returns the session for `session_id`, creating it if needed."""
+        now = time.monotonic()
+        with self._lock:
+            self._evict_expired(now)
+
+            session = self._sessions.get(session_id)
+            if session is not None:
+                self._sessions.move_to_end(session_id)
+                session.last_used = now
+                return session
+
+        # Build outside the pool lock (engine construction is not free)
+        session = self._factory(session_id)
+
+        with self._lock:
+            # Another request may have created it meanwhile; keep the first one
+            existing = self._sessions.get(session_id)
+            if existing is not None:
+                self._sessions.move_to_end(session_id)
+                return existing
+
+            self._sessions[session_id] = session
+            while len(self._sessions) > self._max_sessions:
+                evicted_id, _ = self._sessions.popitem(last=False)
+                logger.info(f"♻️ Evicted chat session (LRU): {evicted_id}")
+            return session
+
+    def release(self, session: ChatSession) -> None:
+        """Marks a session as used and enforces the pool-wide memory budget."""
+        with self._lock:
+            session.last_used = time.monotonic()
+            self._enforce_memory_cap(keep=session.session_id)
+
+    def drop(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "max_sessions": self._max_sessions,
+                "history_tokens": sum(s.token_count() for s in self._sessions.values()),
+                "max_total_tokens": self._max_total_tokens,
+            }
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    # --- Internal helpers (caller holds self._lock) ---
+
+    def _evict_expired(self, now: float) -> None:
+        # OrderedDict is in LRU order, so we can stop at the first fresh entry
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session.last_used <= self._idle_ttl:
+                break
+            self._sessions.popitem(last=False)
+            logger.info(f"⌛ Expired idle chat session: {session_id}")
+
+    def _enforce_memory_cap(self, keep: Optional[str] = None) -> None:
+        total = sum(s.token_count() for s in self._sessions.values())
+        for session_id in list(self._sessions.keys()):
+            if total <= self._max_total_tokens:
+                break
+            if session_id == keep:
+                continue
+            total -= self._sessions.pop(session_id).token_count()
+            logger.info(f"♻️ Evicted chat session (memory cap): {session_id}")
@@ -0,0 +1,245 @@
+import hashlib
+import re
+import time
+import uuid
+from typing import Dict, Set
+import networkx as nx
+from neo4j import GraphDatabase
+from app.core.config import settings
+from app.core.graph_schema import COMMUNITY_LABEL, COMMUNITY_REL
+from app.core.llm import SyncGeminiLLM, SyncGeminiEmbedding
+from app.services.graph_version import graph_versions
+
+ENTITY_EDGES_QUERY = f"""
+MATCH (a:__Entity__)-[r]->(b:__Entity__)
+WHERE type(r) <> 'MENTIONS' AND type(r) <> '{COMMUNITY_REL}' AND a.id <> b.id
+RETURN a.id AS source, b.id AS target, count(r) AS weight
+"""
+
+COMMUNITY_RELATIONS_QUERY = f"""
+MATCH (a:__Entity__)-[r]->(b:__Entity__)
+WHERE a.id IN $ids AND b.id IN $ids AND type(r) <> 'MENTIONS' AND type(r) <> '{COMMUNITY_REL}'
+RETURN a.id AS source,
+       [l IN labels(a) WHERE NOT l IN ['__Entity__', '__Node__']][0] AS source_type,
+       type(r) AS type,
+       b.id AS target,
+       [l IN labels(b) WHERE NOT l IN ['__Entity__', '__Node__']][0] AS target_type
+LIMIT toInteger($limit)
+"""
+
+SUMMARY_PROMPT = """You are summarizing one community of a knowledge graph built from web pages.
+Below are the relationships between its entities.
+
+{relations}
+
+Write a short title (max 8 words) and a dense summary (max 150 words) describing what
+ties these entities together, the key players and the most important relationships.
+Use only the information given.
+
+Respond exactly in this format:
+TITLE: <title>
+SUMMARY: <summary>"""
+
+class CommunityService:
+    """
+    Offline community detection over the entity graph built by GraphService.
+
+    1. Loads entity-to-entity relationships and clusters them with Louvain (networkx).
+    2. Stores each cluster as a (:Community) node linked from its members via IN_COMMUNITY.
+    3. Summarizes communities with the LLM. Only communities that are new (membership
+       changed) or whose members were touched by an ingest since the last refresh
+       are re-summarized.
+    The global chat mode answers broad questions from these summaries.
+    """
+    VERSION_KEY = "rag:communities:version"  # Graph version the summaries are current with
+    LOCK_KEY = "rag:communities:lock"
+    LOCK_SECONDS = 1800
+    PENDING_KEY = "rag:communities:pending"  # Set while a debounced refresh is queued
+    PENDING_GRACE_SECONDS = 300              # Queue wait after which a lost refresh stops blocking new ones
+
+    def claim_pending(self) -> bool:
+        """
+        Debounce gate (SET NX): True if the caller should enqueue a refresh, False if one is
+        already queued. Without Redis the caller enqueues (the refresh itself will report it).
+        """
+        try:
+            return bool(graph_versions.client.set(
+                self.PENDING_KEY, "1", nx=True,
+                ex=settings.COMMUNITY_REFRESH_DELAY_SECONDS + self.PENDING_GRACE_SECONDS,
+            ))
+        except Exception as e:
+            print(f"⚠️ Community refresh debounce unavailable: {e}")
+            return True
+
+    def clear_pending(self) -> None:
+        """Called when a queued refresh starts: changes from here on need a new run."""
+        graph_versions.client.delete(self.PENDING_KEY)
+
+    def refresh(self, force: bool = False) -> dict:
+        """
+        Re-detects communities and refreshes stale summaries.
+        Returns run stats, or {"status": "locked"} if another refresh is running.
+        """
+        client = graph_versions.client
+        token = str(uuid.uuid4())
+        if not client.set(self.LOCK_KEY, token, nx=True, ex=self.LOCK_SECONDS):
+            print("⏳ Community refresh already running, skipping.")
+            return {"status": "locked"}
+
+        driver = GraphDatabase.driver(settings.NEO4J_URI, auth=(settings.NEO4J_USER, settings.NEO4J_PASSWORD))
+        try:
+            start = time.time()
+
+            # 1. What changed since the last refresh
+            last_version = int(client.get(self.VERSION_KEY) or 0)
+            current, touched = graph_versions.touched_since(last_version)
+            existing = self._existing(driver)
+            if not force and current == last_version and existing and all(existing.values()):
+                print("✅ Communities are up to date.")
+                return {"status": "up_to_date", "graph_version": current}
+
+            # 2. Detect
+            communities = self._detect(driver)
+            print(f"🧩 Detected {len(communities)} communities (min size {settings.COMMUNITY_MIN_SIZE})")
+
+            # 3. Store structure, keeping summaries of unchanged communities
+            self._write_structure(driver, communities)
+
+            # 4. Summarize the stale ones (largest first, bounded per run)
+            stale = [
+                cid for cid, members in communities.items()
+                if force or not existing.get(cid) or members & touched
+            ]
+            stale.sort(key=lambda cid: len(communities[cid]), reverse=True)
+            budget = stale[:settings.COMMUNITY_MAX_SUMMARIES_PER_RUN]
+            summarized = self._summarize(driver, {cid: communities[cid] for cid in budget}, current)
+
+            # Pending summaries keep `summary: null` and are picked up by the next run
+            client.set(self.VERSION_KEY, current)
+            stats = {
+                "status": "completed",
+                "graph_version": current,
+                "communities": len(communities),
+                "summarized": summarized,
+                "pending": len(stale) - len(budget),
+                "seconds": round(time.time() - start, 1),
+            }
+            print(f"✅ Community refresh done: {stats}")
+            return stats
+        finally:
+            driver.close()
+            # Compare-and-delete: a run that outlived LOCK_SECONDS must not drop the next run's lock
+            client.eval(
+                "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0",
+                1, self.LOCK_KEY, token,
+            )
+
+    # --- Detection ---
+
+    def _detect(self, driver) -> Dict[str, Set[str]]:
+        records, _, _ = driver.execute_query(ENTITY_EDGES_QUERY)
+        graph = nx.Graph()
+        for r in records:
+            # Direction doesn't matter for clustering; parallel edges add up
+            weight = graph.get_edge_data(r["source"], r["target"], {}).get("weight", 0)
+            graph.add_edge(r["source"], r["target"], weight=weight + r["weight"])
+
+        if graph.number_of_edges() == 0:
+            return {}
+
+        clusters = nx.community.louvain_communities(
+            graph, weight="weight", resolution=settings.COMMUNITY_RESOLUTION, seed=42
+        )
+        return {
+            self._community_id(members): set(members)
+            for members in clusters
+            if len(members) >= settings.COMMUNITY_MIN_SIZE
+        }
+
+    @staticmethod
+    def _community_id(members) -> str:
+        # Same membership -> same id, so unchanged communities keep their summary
+        digest = hashlib.sha1("\x1f".join(sorted(members)).encode("utf-8")).hexdigest()
+        return f"community-{digest[:16]}"
+
+    # --- Storage ---
+
+    def _existing(self, driver) -> Dict[str, bool]:
+        """Community id -> whether it already has a summary."""
+        records, _, _ = driver.execute_query(
+            f"MATCH (c:{COMMUNITY_LABEL}) RETURN c.id AS id, c.summary IS NOT NULL AS summarized"
+        )
+        return {r["id"]: r["summarized"] for r in records}
+
+    def _write_structure(self, driver, communities: Dict[str, Set[str]]) -> None:
+        rows = [{"id": cid, "size": len(members), "members": sorted(members)} for cid, members in communities.items()]
+
+        # 1. Drop communities that no longer exist
+        driver.execute_query(
+            f"MATCH (c:{COMMUNITY_LABEL}) WHERE NOT c.id IN $ids DETACH DELETE c",
+            parameters_={"ids": list(communities)},
+        )
+        # 2. Upsert the current ones and rewire membership
+        driver.execute_query(f"MATCH (:__Entity__)-[r:{COMMUNITY_REL}]->() DELETE r")
+        driver.execute_query(
+            f"""
+            UNWIND $rows AS row
+            MERGE (c:{COMMUNITY_LABEL} {{id: row.id}})
+            SET c.size = row.size
+            WITH c, row
+            UNWIND row.members AS member_id
+            MATCH (e:__Entity__ {{id: member_id}})
+            MERGE (e)-[:{COMMUNITY_REL}]->(c)
+            """,
+            parameters_={"rows": rows},
+        )
+
+    # --- Summaries ---
+
+    def _summarize(self, driver, communities: Dict[str, Set[str]], version: int) -> int:
+        if not communities:
+            return 0
+
+        llm = SyncGeminiLLM(api_key=settings.GOOGLE_API_KEY)
+        embed_model = SyncGeminiEmbedding(api_key=settings.GOOGLE_API_KEY)
+
+        done = 0
+        for i, (cid, members) in enumerate(communities.items()):
+            print(f"📝 Summarizing community {i + 1}/{len(communities)} ({len(members)} entities)")
+            try:
+                records, _, _ = driver.execute_query(
+                    COMMUNITY_RELATIONS_QUERY,
+                    parameters_={"ids": list(members), "limit": settings.COMMUNITY_SUMMARY_MAX_RELATIONS},
+                )
+                relations = "\n".join(
+                    f"{r['source']} ({r['source_type']}) -[{r['type']}]-> {r['target']} ({r['target_type']})"
+                    for r in records
+                )
+                response = llm.complete(SUMMARY_PROMPT.format(relations=relations))
+                title, summary = self._parse_summary(response.text)
+                embedding = embed_model.get_text_embedding(f"{title}\n{summary}")
+
+                driver.execute_query(
+                    f"""
+                    MATCH (c:{COMMUNITY_LABEL} {{id: $id}})
+                    SET c.title = $title, c.summary = $summary, c.embedding = $embedding,
+                        c.version = $version, c.updated_at = timestamp()
+                    """,
+                    parameters_={"id": cid, "title": title, "summary": summary, "embedding": embedding, "version": version},
+                )
+                done += 1
+            except Exception as e:
+                # Left without a summary; retried on the next refresh
+                print(f"⚠️ Failed to summarize {cid}: {e}")
+        return done
+
+    @staticmethod
+    def _parse_summary(text: str) -> tuple[str, str]:
+        title = re.search(r"TITLE:\s*(.+)", text)
+        summary = re.search(r"SUMMARY:\s*(.+)", text, re.DOTALL)
+        if not summary:
+            return (title.group(1).strip() if title else "Untitled community"), text.strip()
+        return (title.group(1).strip() if title else "Untitled community"), summary.group(1).strip()
+
+# Singleton
+community_service = CommunityService()
@@ -0,0 +1,178 @@
+import math
+import re
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+from llama_index.core.bridge.pydantic import Field
+from llama_index.core.postprocessor.types import BaseNodePostprocessor
+from llama_index.core.schema import MetadataMode, NodeWithScore, QueryBundle, TextNode
+from llama_index.core.utils import get_tokenizer
+
+# Per-request sink for assembly stats; the chat service sets a dict before calling the engine
+assembly_stats: ContextVar[Optional[dict]] = ContextVar("assembly_stats", default=None)
+
+FACT_LINE = re.compile(r"^.+ -> .+ -> .+$")
+PREAMBLE = "Here are some facts extracted from the provided text:"
+SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+")
+WORD = re.compile(r"\w+")
+
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have how in is it of on or that the this to was "
+    "what when where which who why will with does do did can about into".split()
+)
+
+def _terms(text: str) -> List[str]:
+    return [w for w in WORD.findall(text.lower()) if w not in STOPWORDS and len(w) > 1]
+
+def _shingles(words: List[str], size: int = 5) -> set:
+    if len(words) < size:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+class ContextAssembler(BaseNodePostprocessor):
+    """
+    Turns raw retrieval results into a compact, token-bounded context.
+
+    1. Split: each node into knowledge-graph facts ("A -> REL -> B") and body text.
+    2. Dedupe: a fact is kept once across all nodes; near-duplicate bodies
+       (5-word shingle Jaccard) are merged into the higher-ranked node.
+    3. Rerank: BM25 over the candidates (query terms), blended with the retriever's rank.
+    4. Compress: bodies over `max_node_tokens` keep their most query-relevant sentences.
+    5. Pack: nodes are added best-first until `token_budget` is reached.
+    """
+    token_budget: int = Field(default=3000)
+    max_node_tokens: int = Field(default=600)
+    dedupe_threshold: float = Field(default=0.8)
+    retrieval_weight: float = Field(default=0.3)  # Share of the final score taken from retriever rank
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "ContextAssembler"
+
+    def _postprocess_nodes(
+        self,
+        nodes: List[NodeWithScore],
+        query_bundle: Optional[QueryBundle] = None,
+    ) -> List[NodeWithScore]:
+        tokenizer = get_tokenizer()
+        count = lambda text: len(tokenizer(text))
+        tokens_before = sum(count(n.node.get_content(metadata_mode=MetadataMode.LLM)) for n in nodes)
+
+        query_terms = _terms(query_bundle.query_str) if query_bundle else []
+        candidates = self._dedupe([self._split(n) for n in nodes])
+        self._rerank(candidates, query_terms)
+
+        packed, used = [], 0
+        for c in sorted(candidates, key=lambda c: c["score"], reverse=True):
+            body = self._compress(c["body"], query_terms, count)
+            text = "\n".join(c["facts"] + ([body] if body else []))
+            if not text:
+                continue
+            node = TextNode(id_=c["node"].node.node_id, text=text, metadata=dict(c["node"].node.metadata))
+            size = count(node.get_content(metadata_mode=MetadataMode.LLM))
+            if used + size > self.token_budget:
+                continue  # A smaller, lower-ranked node may still fit
+            packed.append(NodeWithScore(node=node, score=c["score"]))
+            used += size
+
+        stats = assembly_stats.get()
+        if stats is not None:
+            stats.update({
+                "nodes_before": len(nodes),
+                "nodes_after": len(packed),
+                "context_tokens_before": tokens_before,
+                "context_tokens_after": used,
+            })
+        return packed
+
+    # --- Stages ---
+
+    @staticmethod
+    def _split(node: NodeWithScore) -> dict:
+        facts, body = [], []
+        for line in node.node.get_content().splitlines():
+            stripped = line.strip()
+            if stripped == PREAMBLE:
+                continue
+            (facts if FACT_LINE.match(stripped) else body).append(line)
+        body_text = "\n".join(body).strip()
+        return {
+            "node": node,
+            "facts": [f.strip() for f in facts],
+            "body": body_text,
+            "shingles": _shingles(_terms(body_text)),
+        }
+
+    def _dedupe(self, candidates: List[dict]) -> List[dict]:
+        # Retriever order decides which copy survives
+        candidates.sort(key=lambda c: c["node"].score or 0.0, reverse=True)
+        kept: List[dict] = []
+        seen_facts = set()
+        for c in candidates:
+            duplicate_of = None
+            for k in kept:
+                union = len(c["shingles"] | k["shingles"])
+                if union and len(c["shingles"] & k["shingles"]) / union >= self.dedupe_threshold:
+                    duplicate_of = k
+                    break
+
+            facts = [f for f in c["facts"] if f not in seen_facts]
+            seen_facts.update(facts)
+            if duplicate_of is not None:
+                duplicate_of["facts"].extend(facts)
+                continue
+            c["facts"] = facts
+            kept.append(c)
+        return kept
+
+    def _rerank(self, candidates: List[dict], query_terms: List[str]) -> None:
+        if not candidates:
+            return
+        docs = [_terms(" ".join(c["facts"]) + " " + c["body"]) for c in candidates]
+        bm25 = self._bm25(docs, set(query_terms))
+        top = max(bm25) or 1.0
+        n = len(candidates)
+        for rank, (c, score) in enumerate(zip(candidates, bm25)):
+            retrieval = 1.0 - rank / n  # Candidates are still in retriever order here
+            c["score"] = (1 - self.retrieval_weight) * (score / top) + self.retrieval_weight * retrieval
+
+    @staticmethod
+    def _bm25(docs: List[List[str]], query: set, k1: float = 1.2, b: float = 0.75) -> List[float]:
+        n = len(docs)
+        avg_len = sum(len(d) for d in docs) / n or 1.0
+        df: Dict[str, int] = {}
+        for d in docs:
+            for term in set(d) & query:
+                df[term] = df.get(term, 0) + 1
+
+        scores = []
+        for d in docs:
+            tf: Dict[str, int] = {}
+            for term in d:
+                if term in query:
+                    tf[term] = tf.get(term, 0) + 1
+            score = 0.0
+            for term, freq in tf.items():
+                idf = math.log(1 + (n - df[term] + 0.5) / (df[term] + 0.5))
+                score += idf * freq * (k1 + 1) / (freq + k1 * (1 - b + b * len(d) / avg_len))
+            scores.append(score)
+        return scores
+
+    def _compress(self, body: str, query_terms: List[str], count) -> str:
+        if not body or count(body) <= self.max_node_tokens:
+            return body
+        query = set(query_terms)
+        sentences = SENTENCE_SPLIT.split(body)
+        ranked = sorted(
+            range(len(sentences)),
+            key=lambda i: len(query & set(_terms(sentences[i]))),
+            reverse=True,
+        )
+        chosen, used = set(), 0
+        for i in ranked:
+            size = count(sentences[i])
+            if used + size > self.max_node_tokens:
+                continue
+            chosen.add(i)
+            used += size
+        # Original order keeps the excerpt readable
+        return " ".join(sentences[i] for i in sorted(chosen))
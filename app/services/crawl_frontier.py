@@ -0,0 +1,242 @@
+import hashlib
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+from sqlalchemy import and_, case, func, literal_column, select, update
+from sqlalchemy.dialects.postgresql import insert
+from app.core.config import settings
+from app.db.postgres import Crawl, FrontierUrl, SessionLocal, init_postgres_tables
+
+@dataclass
+class FrontierEntry:
+    url: str
+    depth: int
+    score: float
+    parent_url: Optional[str] = None
+
+@dataclass
+class ClaimedUrl:
+    id: int
+    url: str
+    depth: int
+    score: float
+    attempts: int
+
+def url_hash(url: str) -> str:
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+class CrawlFrontier:
+    """
+    Persistent crawl frontier in Postgres, shared by every crawl worker.
+
+    1. Dedup: one row per (crawl, normalized URL); re-discovering a pending URL only
+       raises its priority.
+    2. Claims take the best-scoring pending URLs with FOR UPDATE SKIP LOCKED, so
+       concurrent workers never block on or double-claim the same rows.
+    3. Claims are leases: URLs of a worker that died become claimable again once the
+       lease expires, so a crawl resumes where it stopped.
+    4. The page budget is reserved atomically on the crawl row before claiming.
+    """
+
+    def __init__(self):
+        self._schema_ready = False
+
+    async def _ensure_schema(self):
+        if not self._schema_ready:
+            await init_postgres_tables()
+            self._schema_ready = True
+
+    async def create_crawl(self, crawl_id: str, query: str, max_depth: int, max_pages: int, namespace: Optional[str] = None) -> None:
+        await self._ensure_schema()
+        async with SessionLocal.begin() as session:
+            session.add(Crawl(id=crawl_id, query=query, namespace=namespace, max_depth=max_depth, max_pages=max_pages))
+
+    async def get_crawl(self, crawl_id: str) -> Optional[Crawl]:
+        await self._ensure_schema()
+        async with SessionLocal() as session:
+            return await session.get(Crawl, crawl_id)
+
+    async def add(self, crawl_id: str, entries: List[FrontierEntry]) -> int:
+        """Bulk-inserts newly discovered URLs; returns how many were new."""
+        if not entries:
+            return 0
+        # One row per URL within the batch too (ON CONFLICT cannot touch the same row twice)
+        best = {}
+        for entry in entries:
+            if entry.url not in best or entry.score > best[entry.url].score:
+                best[entry.url] = entry
+        rows = [
+            {
+                "crawl_id": crawl_id, "url": e.url, "url_hash": url_hash(e.url), "depth": e.depth,
+                "score": e.score, "parent_url": e.parent_url, "status": "pending", "attempts": 0,
+            }
+            for e in best.values()
+        ]
+        stmt = insert(FrontierUrl).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            constraint="uq_crawl_frontier_url",
+            set_={"score": stmt.excluded.score, "depth": stmt.excluded.depth, "parent_url": stmt.excluded.parent_url},
+            where=and_(FrontierUrl.status == "pending", FrontierUrl.score < stmt.excluded.score),
+        ).returning(literal_column("xmax = 0"))  # True for inserted rows, False for re-scored ones
+        async with SessionLocal.begin() as session:
+            inserted = (await session.execute(stmt)).scalars().all()
+        return sum(1 for new in inserted if new)
+
+    async def claim(self, crawl_id: str, worker_id: str, limit: int) -> List[ClaimedUrl]:
+        """
+        Leases up to `limit` URLs to `worker_id`, best score first.
+        1. URLs whose lease expired (their worker died) are reclaimed first; their budget was already reserved.
+        2. The rest come from pending URLs, after reserving that many pages of the crawl's budget.
+        """
+        now = datetime.now(timezone.utc)
+        lease = {"status": "claimed", "claimed_by": worker_id, "lease_expires_at": now + timedelta(seconds=settings.CRAWL_LEASE_SECONDS)}
+
+        def pick(condition, n: int):
+            ids = (
+                select(FrontierUrl.id)
+                .where(FrontierUrl.crawl_id == crawl_id, condition)
+                .order_by(FrontierUrl.score.desc(), FrontierUrl.id)
+                .limit(n)
+                .with_for_update(skip_locked=True)
+            )
+            return (
+                update(FrontierUrl)
+                .where(FrontierUrl.id.in_(ids.scalar_subquery()))
+                .values(attempts=FrontierUrl.attempts + 1, **lease)
+                .returning(FrontierUrl.id, FrontierUrl.url, FrontierUrl.depth, FrontierUrl.score, FrontierUrl.attempts)
+            )
+
+        # 1. Expired leases (a URL that keeps killing its worker is given up after CRAWL_MAX_ATTEMPTS)
+        async with SessionLocal.begin() as session:
+            expired = and_(FrontierUrl.status == "claimed", FrontierUrl.lease_expires_at < now)
+            await session.execute(
+                update(FrontierUrl)
+                .where(FrontierUrl.crawl_id == crawl_id, expired, FrontierUrl.attempts >= settings.CRAWL_MAX_ATTEMPTS)
+                .values(status="failed", lease_expires_at=None, error="Lease expired (worker lost)")
+            )
+            claimed = [ClaimedUrl(*row) for row in await session.execute(pick(expired, limit))]
+        if len(claimed) >= limit:
+            return claimed
+
+        # 2. Reserve budget (a short row lock on the crawl), then claim pending URLs for it
+        async with SessionLocal.begin() as session:
+            crawl = await session.get(Crawl, crawl_id, with_for_update=True)
+            if not crawl or crawl.status != "running":
+                return claimed
+            granted = max(0, min(limit - len(claimed), crawl.max_pages - crawl.pages_claimed))
+            crawl.pages_claimed += granted
+        if not granted:
+            return claimed
+        async with SessionLocal.begin() as session:
+            fresh = [ClaimedUrl(*row) for row in await session.execute(pick(FrontierUrl.status == "pending", granted))]
+
+        # 3. Give back budget nobody could use (frontier ran dry or other workers were faster)
+        if len(fresh) < granted:
+            async with SessionLocal.begin() as session:
+                await session.execute(
+                    update(Crawl).where(Crawl.id == crawl_id)
+                    .values(pages_claimed=Crawl.pages_claimed - (granted - len(fresh)))
+                )
+        return claimed + fresh
+
+    async def renew(self, ids: List[int], worker_id: str) -> None:
+        """Extends the lease of URLs still being processed (long graph extractions)."""
+        if not ids:
+            return
+        expires = datetime.now(timezone.utc) + timedelta(seconds=settings.CRAWL_LEASE_SECONDS)
+        async with SessionLocal.begin() as session:
+            await session.execute(
+                update(FrontierUrl)
+                .where(FrontierUrl.id.in_(ids), FrontierUrl.claimed_by == worker_id, FrontierUrl.status == "claimed")
+                .values(lease_expires_at=expires)
+            )
+
+    async def complete(self, url_id: int) -> None:
+        async with SessionLocal.begin() as session:
+            await session.execute(
+                update(FrontierUrl).where(FrontierUrl.id == url_id)
+                .values(status="done", lease_expires_at=None, error=None)
+            )
+
+    async def fail(self, url_id: int, error: str) -> None:
+        """
+        Marks the URL failed once it has used CRAWL_MAX_ATTEMPTS; before that it goes back to
+        pending and its page of budget is returned (the retry reserves it again).
+        """
+        async with SessionLocal.begin() as session:
+            row = (await session.execute(
+                update(FrontierUrl).where(FrontierUrl.id == url_id)
+                .values(
+                    status=case((FrontierUrl.attempts >= settings.CRAWL_MAX_ATTEMPTS, "failed"), else_="pending"),
+                    lease_expires_at=None,
+                    claimed_by=None,
+                    error=error[:2000],
+                )
+                .returning(FrontierUrl.crawl_id, FrontierUrl.status)
+            )).first()
+            if row and row.status == "pending":
+                await session.execute(
+                    update(Crawl).where(Crawl.id == row.crawl_id).values(pages_claimed=Crawl.pages_claimed - 1)
+                )
+
+    async def stats(self, crawl_id: str) -> dict:
+        await self._ensure_schema()
+        async with SessionLocal() as session:
+            crawl = await session.get(Crawl, crawl_id)
+            if not crawl:
+                return {}
+            rows = await session.execute(
+                select(FrontierUrl.status, func.count(), func.max(FrontierUrl.depth))
+                .where(FrontierUrl.crawl_id == crawl_id)
+                .group_by(FrontierUrl.status)
+            )
+            counts, depth = {}, 0
+            for status, count, max_depth in rows:
+                counts[status] = count
+                depth = max(depth, max_depth or 0)
+        return {
+            "crawl_id": crawl.id,
+            "query": crawl.query,
+            "namespace": crawl.namespace,
+            "status": crawl.status,
+            "max_depth": crawl.max_depth,
+            "max_pages": crawl.max_pages,
+            "pages_claimed": crawl.pages_claimed,
+            "deepest": depth,
+            "urls": {s: counts.get(s, 0) for s in ("pending", "claimed", "done", "failed")},
+        }
+
+    async def finish_if_idle(self, crawl_id: str) -> bool:
+        """
+        Marks the crawl completed once nothing is claimed and nothing pending can still
+        be claimed (frontier empty or budget spent). True only for the caller that flipped it.
+        """
+        async with SessionLocal.begin() as session:
+            crawl = await session.get(Crawl, crawl_id, with_for_update=True)
+            if not crawl or crawl.status != "running":
+                return False
+            in_flight = await session.scalar(
+                select(func.count()).select_from(FrontierUrl)
+                .where(FrontierUrl.crawl_id == crawl_id, FrontierUrl.status == "claimed")
+            )
+            pending = await session.scalar(
+                select(func.count()).select_from(FrontierUrl)
+                .where(FrontierUrl.crawl_id == crawl_id, FrontierUrl.status == "pending")
+            )
+            if in_flight or (pending and crawl.pages_claimed < crawl.max_pages):
+                return False
+            crawl.status = "completed"
+            crawl.finished_at = func.now()
+            return True
+
+    async def finish(self, crawl_id: str, status: str) -> bool:
+        """Ends a running crawl with `status` (e.g. "failed" when seeding found nothing). True if it was running."""
+        async with SessionLocal.begin() as session:
+            crawl = await session.get(Crawl, crawl_id, with_for_update=True)
+            if not crawl or crawl.status != "running":
+                return False
+            crawl.status = status
+            crawl.finished_at = func.now()
+            return True
+
+crawl_frontier = CrawlFrontier()
@@ -0,0 +1,149 @@
+import re
+import time
+from typing import List, Optional, Set
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from asgiref.sync import async_to_sync
+from app.core.config import settings
+from app.schemas.scrape import ScrapeResult
+from app.services.crawl_frontier import ClaimedUrl, FrontierEntry, crawl_frontier
+from app.services.graph_namespaces import namespace_slug
+from app.services.graph_service import graph_service
+from app.services.scraper_service import scraper_service
+from app.services.search_service import search_service
+
+TOKEN = re.compile(r"[a-z0-9]+")
+STOPWORDS = {"the", "a", "an", "of", "and", "or", "in", "on", "for", "to", "with", "how", "what", "is", "are"}
+SKIP_EXTENSIONS = (
+    ".pdf", ".jpg", ".jpeg", ".png", ".gif", ".svg", ".webp", ".ico", ".zip", ".gz", ".tar",
+    ".mp3", ".mp4", ".avi", ".mov", ".css", ".js", ".json", ".xml", ".rss", ".exe", ".dmg",
+)
+
+def normalize_url(url: str) -> Optional[str]:
+    """Canonical form used for dedup: lower-case host, no fragment, default port or tracking params."""
+    try:
+        parts = urlsplit(url.strip())
+        port = parts.port
+    except ValueError:
+        return None
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        return None
+    if parts.path.lower().endswith(SKIP_EXTENSIONS):
+        return None
+    netloc = parts.hostname.lower()
+    if port and port != {"http": 80, "https": 443}[parts.scheme]:
+        netloc = f"{netloc}:{port}"
+    query = urlencode(sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if not k.lower().startswith("utm_")
+    ))
+    return urlunsplit((parts.scheme, netloc, parts.path or "/", query, ""))
+
+def site(url: str) -> str:
+    host = urlsplit(url).hostname or ""
+    return host[4:] if host.startswith("www.") else host
+
+def query_terms(query: str) -> Set[str]:
+    return {t for t in TOKEN.findall(query.lower()) if t not in STOPWORDS and len(t) > 1}
+
+class CrawlService:
+    """
+    Link-following ingest: search hits seed a persistent frontier (CrawlFrontier), and
+    crawl workers repeatedly claim a batch, scrape it, queue the pages' in-domain links
+    and extract the pages into the graph.
+
+    Links are prioritised by how many query terms appear in their anchor text and URL
+    path, decayed per hop, so the page budget goes to the most relevant pages first.
+    """
+    IDLE_POLL_SECONDS = 5.0  # Frontier empty but other workers may still discover links
+
+    def score_link(self, terms: Set[str], url: str, text: str, depth: int) -> float:
+        tokens = set(TOKEN.findall(f"{text} {urlsplit(url).path}".lower()))
+        overlap = len(terms & tokens) / len(terms) if terms else 0.0
+        return round((0.2 + overlap) * settings.CRAWL_DEPTH_DECAY ** depth, 4)
+
+    def discover(self, result: ScrapeResult, parent: ClaimedUrl, terms: Set[str]) -> List[FrontierEntry]:
+        """In-domain links of a scraped page, best `CRAWL_MAX_LINKS_PER_PAGE` first."""
+        home, depth = site(parent.url), parent.depth + 1
+        entries = {}
+        for link in result.links:
+            url = normalize_url(link.url)
+            if not url or url == parent.url or site(url) != home:
+                continue
+            score = self.score_link(terms, url, link.text, depth)
+            if url not in entries or score > entries[url].score:
+                entries[url] = FrontierEntry(url=url, depth=depth, score=score, parent_url=parent.url)
+        ranked = sorted(entries.values(), key=lambda e: e.score, reverse=True)
+        return ranked[:settings.CRAWL_MAX_LINKS_PER_PAGE]
+
+    def seed(self, crawl_id: str, query: str, num_seeds: int) -> int:
+        """Search results become depth-0 frontier entries, in search-rank order."""
+        results = async_to_sync(search_service.search)(query, num_seeds + 3)  # Buffer for filtered hits
+        urls = []
+        for item in results:
+            url = normalize_url(item.link)
+            if url and "wikipedia.org" not in url and url not in urls:
+                urls.append(url)
+        entries = [FrontierEntry(url=url, depth=0, score=round(1.0 - rank * 0.01, 4)) for rank, url in enumerate(urls[:num_seeds])]
+        return async_to_sync(crawl_frontier.add)(crawl_id, entries)
+
+    def abort(self, crawl_id: str, reason: str) -> None:
+        """Marks a crawl that cannot start as failed, so it is not reported (or resumable) as running."""
+        async_to_sync(crawl_frontier.finish)(crawl_id, "failed")
+        print(f"❌ Crawl {crawl_id} failed: {reason}")
+
+    def run_worker(self, crawl_id: str, worker_id: str) -> dict:
+        """
+        Claims and processes batches until the frontier is exhausted or the page budget is spent.
+        Returns this worker's counts; `finished` is True for the worker that completed the crawl.
+        """
+        crawl = async_to_sync(crawl_frontier.get_crawl)(crawl_id)
+        if not crawl:
+            return {"status": "missing", "crawl_id": crawl_id}
+        terms = query_terms(crawl.query)
+        namespace = crawl.namespace or namespace_slug(crawl.query)
+        pages, failed, discovered, finished = 0, 0, 0, False
+
+        while True:
+            batch = async_to_sync(crawl_frontier.claim)(crawl_id, worker_id, settings.CRAWL_CLAIM_BATCH)
+            if not batch:
+                if async_to_sync(crawl_frontier.finish_if_idle)(crawl_id):
+                    finished = True
+                    break
+                stats = async_to_sync(crawl_frontier.stats)(crawl_id)
+                budget_left = stats["pages_claimed"] < stats["max_pages"]
+                if stats["status"] != "running" or not budget_left or not stats["urls"]["claimed"]:
+                    break
+                time.sleep(self.IDLE_POLL_SECONDS)
+                continue
+
+            # 1. Scrape the batch in parallel (links are collected for the next hop)
+            results = async_to_sync(scraper_service.scrape_urls)([item.url for item in batch], collect_links=True)
+
+            for item, result in zip(batch, results):
+                if result.error:
+                    print(f"⚠️ Crawl {crawl_id}: {item.url} failed (attempt {item.attempts}): {result.error}")
+                    async_to_sync(crawl_frontier.fail)(item.id, result.error)
+                    failed += 1
+                    continue
+
+                # 2. Queue in-domain links before the slow extraction, so other workers can start on them
+                if item.depth < crawl.max_depth:
+                    discovered += async_to_sync(crawl_frontier.add)(crawl_id, self.discover(result, item, terms))
+
+                # 3. Extract into the graph (renewing the batch's lease, extraction can take minutes)
+                async_to_sync(crawl_frontier.renew)([i.id for i in batch], worker_id)
+                try:
+                    graph_service.process_document(result.content, result.url, namespace=namespace)
+                except Exception as e:
+                    print(f"❌ Crawl {crawl_id}: extraction failed for {item.url}: {e}")
+                    async_to_sync(crawl_frontier.fail)(item.id, f"Extraction failed: {e}")
+                    failed += 1
+                    continue
+                finally:
+                    result.content, result.links = "", []  # Release the page before the next one
+                async_to_sync(crawl_frontier.complete)(item.id)
+                pages += 1
+                print(f"🕸️ Crawl {crawl_id}: {item.url} (depth {item.depth}, score {item.score})")
+
+        return {"crawl_id": crawl_id, "pages": pages, "failed": failed, "discovered": discovered, "finished": finished}
+
+crawl_service = CrawlService()
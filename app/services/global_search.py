@@ -0,0 +1,116 @@
+import asyncio
+import logging
+import re
+from typing import List, Tuple
+from llama_index.core.schema import NodeWithScore, TextNode
+from app.core.graph_schema import COMMUNITY_LABEL
+
+logger = logging.getLogger("global_search")
+
+RANK_COMMUNITIES_QUERY = f"""
+MATCH (c:{COMMUNITY_LABEL})
+WHERE c.summary IS NOT NULL AND c.embedding IS NOT NULL
+RETURN c.id AS id, c.title AS title, c.summary AS summary, c.size AS size,
+       vector.similarity.cosine(c.embedding, $embedding) AS score
+ORDER BY score DESC
+LIMIT toInteger($k)
+"""
+
+MAP_PROMPT = """You are helping answer a broad question from summaries of a knowledge graph.
+
+Question: {question}
+
+Community summaries:
+{summaries}
+
+List the key points from these summaries that help answer the question.
+Give each point an importance score from 0 to 100. Use only the summaries.
+Respond with one point per line in this format:
+[score] point
+If nothing is relevant, respond with: [0] none"""
+
+REDUCE_PROMPT = """Answer the question using the key points below, which were extracted from
+summaries of different parts of a knowledge graph (most important first).
+
+Question: {question}
+
+Key points:
+{points}
+
+Write a well-structured, comprehensive answer. If the key points do not cover the
+question, say so."""
+
+POINT_LINE = re.compile(r"^\s*\[(\d{1,3})\]\s*(.+)$")
+
+class GlobalSearch:
+    """
+    Map-reduce answering over precomputed community summaries.
+
+    1. Rank: the most relevant community summaries for the question (one Cypher query).
+    2. Map: the summaries are split into at most `map_calls` batches; each batch is
+       one LLM call that extracts scored key points (run concurrently).
+    3. Reduce: one streaming LLM call writes the answer from the best points.
+    So a global question costs at most `map_calls + 1` LLM calls regardless of graph size.
+    """
+
+    def __init__(self, llm, embed_model, graph_store, top_k: int, map_calls: int, max_points: int = 40):
+        self._llm = llm
+        self._embed_model = embed_model
+        self._graph_store = graph_store
+        self._top_k = top_k
+        self._map_calls = max(1, map_calls)
+        self._max_points = max_points
+
+    async def arank(self, question: str) -> List[NodeWithScore]:
+        embedding = await self._embed_model.aget_query_embedding(question)
+        rows = await self._graph_store.astructured_query(
+            RANK_COMMUNITIES_QUERY,
+            param_map={"embedding": embedding, "k": self._top_k},
+        )
+        return [
+            NodeWithScore(
+                node=TextNode(
+                    id_=row["id"],
+                    text=f"{row['title']}\n{row['summary']}",
+                    metadata={"title": row["title"], "community_size": row["size"]},
+                ),
+                score=row["score"],
+            )
+            for row in rows
+        ]
+
+    async def amap(self, question: str, communities: List[NodeWithScore]) -> List[Tuple[int, str]]:
+        batches = [communities[i::self._map_calls] for i in range(self._map_calls)]
+        results = await asyncio.gather(
+            *[self._amap_batch(question, batch) for batch in batches if batch],
+            return_exceptions=True,
+        )
+        points = []
+        for result in results:
+            if isinstance(result, Exception):
+                logger.warning(f"⚠️ Global search map call failed: {result}")
+                continue
+            points.extend(result)
+        points.sort(key=lambda p: p[0], reverse=True)
+        return points[:self._max_points]
+
+    async def _amap_batch(self, question: str, batch: List[NodeWithScore]) -> List[Tuple[int, str]]:
+        summaries = "\n\n".join(f"- {n.node.get_content()}" for n in batch)
+        response = await self._llm.acomplete(MAP_PROMPT.format(question=question, summaries=summaries))
+        points = []
+        for line in response.text.splitlines():
+            match = POINT_LINE.match(line)
+            if match and int(match.group(1)) > 0:
+                points.append((int(match.group(1)), match.group(2).strip()))
+        return points
+
+    async def astream_answer(self, question: str, points: List[Tuple[int, str]]):
+        """Async generator of answer tokens (the reduce step)."""
+        prompt = REDUCE_PROMPT.format(
+            question=question,
+            points="\n".join(f"- {point}" for _, point in points),
+        )
+        stream = await self._llm.astream_complete(prompt)
+        async for chunk in stream:
+            if chunk.delta:
+                yield chunk.delta
@@ -0,0 +1,226 @@
+import json
+import re
+from typing import Any, List, Optional, Tuple
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.graph_stores.types import KG_NODES_KEY, KG_RELATIONS_KEY, EntityNode, Relation
+from llama_index.core.schema import BaseNode, MetadataMode, TransformComponent
+from app.core.graph_schema import SCHEMA_GUIDELINES, VALID_NODES, VALID_RELATIONS
+from app.core.metrics import EXTRACTION_CHUNKS, EXTRACTION_COERCIONS
+
+# Types the guidelines tell the model to fall back to
+FALLBACK_NODE = "Concept"
+FALLBACK_RELATION = "RELATES_TO"
+
+_ENTITY_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "name": {"type": "string"},
+        "type": {"type": "string", "enum": VALID_NODES},
+    },
+    "required": ["name", "type"],
+}
+
+# Gemini response schema (OpenAPI subset): the model can only emit schema types
+RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "triplets": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "subject": _ENTITY_SCHEMA,
+                    "relation": {"type": "string", "enum": VALID_RELATIONS},
+                    "object": _ENTITY_SCHEMA,
+                },
+                "required": ["subject", "relation", "object"],
+            },
+        },
+    },
+    "required": ["triplets"],
+}
+
+EXTRACT_PROMPT = SCHEMA_GUIDELINES + """
+Extract up to {max_triplets} (subject, relation, object) triplets from the text below.
+Answer with JSON only: {{"triplets": [{{"subject": {{"name": ..., "type": ...}}, "relation": ..., "object": {{"name": ..., "type": ...}}}}]}}
+
+Text:
+-------
+{text}
+-------
+"""
+
+NODE_TYPES = {re.sub(r"[^a-z]", "", t.lower()): t for t in VALID_NODES}
+TRAILING_COMMA = re.compile(r",\s*([}\]])")
+CODE_FENCE = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$", re.IGNORECASE)
+
+def _closers(text: str) -> Optional[str]:
+    """Brackets that close everything still open at the end of `text` (None if it ends inside a string)."""
+    stack, in_string, escaped = [], False, False
+    for ch in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+        elif ch in "}]" and stack:
+            stack.pop()
+    return None if in_string else "".join(reversed(stack))
+
+def parse_json(raw: str, max_cuts: int = 50) -> Tuple[Any, bool]:
+    """
+    Returns (data, repaired). Near-valid output is repaired locally instead of re-asking the model:
+      1. Code fences / prose around the JSON and trailing commas are stripped.
+      2. Truncated output (token limit) is cut back to its last complete object and closed.
+    Raises ValueError if nothing parseable is left.
+    """
+    try:
+        return json.loads(raw), False
+    except (json.JSONDecodeError, TypeError):
+        pass
+
+    text = CODE_FENCE.sub("", raw or "")
+    starts = [i for i in (text.find("{"), text.find("[")) if i != -1]
+    if not starts:
+        raise ValueError("No JSON in model output")
+    text = TRAILING_COMMA.sub(r"\1", text[min(starts):])
+    try:
+        return json.loads(text), True
+    except json.JSONDecodeError:
+        pass
+
+    # 2. Truncated: try the longest prefixes that end in a complete object
+    end = len(text)
+    for _ in range(max_cuts):
+        end = text.rfind("}", 0, end)
+        if end == -1:
+            break
+        head = TRAILING_COMMA.sub(r"\1", text[:end + 1])
+        closers = _closers(head)
+        if closers is not None:
+            try:
+                return json.loads(head + closers), True
+            except json.JSONDecodeError:
+                pass
+    raise ValueError("Unrepairable JSON in model output")
+
+def _entity(value) -> Tuple[str, Optional[str]]:
+    if isinstance(value, dict):
+        return str(value.get("name") or value.get("id") or "").strip(), value.get("type") or value.get("label")
+    return str(value or "").strip(), None
+
+def coerce_node_type(value: Optional[str]) -> Tuple[str, bool]:
+    """
+    (schema type, coerced): case / spacing variants and abbreviations ('tech', 'org') map onto
+    VALID_NODES, anything else to Concept.
+    """
+    key = re.sub(r"[^a-z]", "", str(value or "").lower())
+    if key in NODE_TYPES:
+        return NODE_TYPES[key], False
+    prefixed = [t for k, t in NODE_TYPES.items() if len(key) >= 3 and k.startswith(key)]
+    return (prefixed[0], False) if len(prefixed) == 1 else (FALLBACK_NODE, True)
+
+def coerce_relation(value: Optional[str]) -> Tuple[str, bool]:
+    """(schema relation, coerced): 'works for' -> WORKS_FOR; unknown relations become RELATES_TO."""
+    label = re.sub(r"[^A-Z]+", "_", str(value or "").upper()).strip("_")
+    return (label, False) if label in VALID_RELATIONS else (FALLBACK_RELATION, True)
+
+def coerce_triplets(data: Any, limit: int) -> Tuple[List[Tuple[str, str, str, str, str]], dict]:
+    """
+    Schema-valid (subject, subject type, relation, object, object type) tuples from parsed output,
+    plus how many entity types / relations were coerced. Common key variants (head/tail,
+    source/target) are accepted.
+    """
+    items = (data.get("triplets") or data.get("relationships") or []) if isinstance(data, dict) else data
+    triplets, coerced, seen = [], {"entity_type": 0, "relation": 0}, set()
+    for item in items if isinstance(items, list) else []:
+        if not isinstance(item, dict):
+            continue
+        subject, subject_type = _entity(item.get("subject") or item.get("head") or item.get("source"))
+        obj, obj_type = _entity(item.get("object") or item.get("tail") or item.get("target"))
+        relation = item.get("relation") or item.get("predicate") or item.get("type")
+        if isinstance(relation, dict):
+            relation = relation.get("type") or relation.get("label")
+        if not subject or not obj or subject.lower() == obj.lower():
+            continue
+
+        (subject_type, c1), (obj_type, c2), (relation, c3) = (
+            coerce_node_type(subject_type), coerce_node_type(obj_type), coerce_relation(relation)
+        )
+        coerced["entity_type"] += c1 + c2
+        coerced["relation"] += c3
+
+        key = (subject.lower(), relation, obj.lower())
+        if key not in seen:
+            seen.add(key)
+            triplets.append((subject, subject_type, relation, obj, obj_type))
+        if len(triplets) >= limit:
+            break
+    return triplets, coerced
+
+class JsonSchemaPathExtractor(TransformComponent):
+    """
+    Graph extraction through Gemini's JSON mode, one call per chunk.
+
+    1. The response schema is generated from VALID_NODES / VALID_RELATIONS (enums), so
+       output is valid JSON of schema types by construction.
+    2. Anything near-valid is repaired locally (see parse_json); off-schema types are
+       coerced to Concept / RELATES_TO as SCHEMA_GUIDELINES intends.
+    3. Output that still cannot be used is counted and the chunk is skipped; it is never
+       re-sent, so a bad answer costs no extra calls under the RPM budget.
+    Chunks get the same kg_nodes / kg_relations metadata SchemaLLMPathExtractor writes.
+    """
+    llm: Any
+    max_triplets_per_chunk: int = 10
+
+    _stats: dict = PrivateAttr(default_factory=lambda: {"chunks": 0, "ok": 0, "repaired": 0, "failed": 0, "coerced": 0})
+
+    def __call__(self, nodes: List[BaseNode], **kwargs) -> List[BaseNode]:
+        return [self._extract(node) for node in nodes]
+
+    @property
+    def stats(self) -> dict:
+        return dict(self._stats)
+
+    def _extract(self, node: BaseNode) -> BaseNode:
+        self._stats["chunks"] += 1
+        prompt = EXTRACT_PROMPT.format(
+            max_triplets=self.max_triplets_per_chunk,
+            text=node.get_content(metadata_mode=MetadataMode.LLM),
+        )
+        try:
+            # Rate limits / server errors are retried inside complete_json; nothing else is
+            data, repaired = parse_json(self.llm.complete_json(prompt, RESPONSE_SCHEMA))
+            triplets, coerced = coerce_triplets(data, self.max_triplets_per_chunk)
+        except ValueError as e:  # Unparseable, or no text (e.g. a blocked response)
+            print(f"⚠️ Extraction output unusable for chunk {node.node_id}: {e}")
+            EXTRACTION_CHUNKS.labels(outcome="failed").inc()
+            self._stats["failed"] += 1
+            triplets = []
+        else:
+            outcome = "repaired" if repaired else "ok"
+            EXTRACTION_CHUNKS.labels(outcome=outcome).inc()
+            self._stats[outcome] += 1
+            for kind, count in coerced.items():
+                EXTRACTION_COERCIONS.labels(kind=kind).inc(count)
+                self._stats["coerced"] += count
+
+        nodes = node.metadata.pop(KG_NODES_KEY, [])
+        relations = node.metadata.pop(KG_RELATIONS_KEY, [])
+        metadata = node.metadata.copy()
+        for subject, subject_type, relation, obj, obj_type in triplets:
+            subject_node = EntityNode(name=subject, label=subject_type, properties=dict(metadata))
+            obj_node = EntityNode(name=obj, label=obj_type, properties=dict(metadata))
+            relations.append(Relation(
+                label=relation, source_id=subject_node.id, target_id=obj_node.id, properties=dict(metadata),
+            ))
+            nodes.extend([subject_node, obj_node])
+        node.metadata[KG_NODES_KEY] = nodes
+        node.metadata[KG_RELATIONS_KEY] = relations
+        return node
@@ -0,0 +1,345 @@
+import json
+import time
+import uuid
+from typing import Dict, List
+from neo4j import GraphDatabase
+from app.core.config import settings
+from app.core.graph_schema import (
+    COMMUNITY_LABEL,
+    COMMUNITY_REL,
+    ENTITY_FULLTEXT_INDEX,
+    ENTITY_VECTOR_INDEX,
+)
+from app.core.llm import SyncGeminiEmbedding
+from app.db.init_graph import init_db_constraints
+from app.services.graph_version import graph_versions
+from app.services.hybrid_retriever import ENTITY_FULLTEXT_QUERY, ENTITY_VECTOR_QUERY, to_lucene_query
+
+# Duplicate entities: same name up to case / surrounding whitespace. The best-connected
+# node of each group survives (its id is the one caches and communities already know).
+DUPLICATE_ENTITIES_QUERY = """
+MATCH (e:__Entity__)
+WITH toLower(trim(coalesce(e.name, e.id))) AS key, e, COUNT { (e)--() } AS degree
+ORDER BY degree DESC
+WITH key, collect(elementId(e)) AS ids
+WHERE size(ids) > 1
+RETURN key, ids
+"""
+
+# Re-ingesting a page creates a second copy of each of its chunks (copies in different
+# namespaces are kept: deleting one namespace must not take the other's chunk with it)
+DUPLICATE_CHUNKS_QUERY = """
+MATCH (c:Chunk)
+WITH coalesce(c.url, '') AS url, coalesce(c.namespace, '') AS namespace, c.text AS text, c, COUNT { (c)--() } AS degree
+WHERE text IS NOT NULL
+ORDER BY degree DESC
+WITH url, namespace, text, collect(elementId(c)) AS ids
+WHERE size(ids) > 1
+RETURN url AS key, ids
+"""
+
+MERGE_GROUPS_QUERY = """
+UNWIND $groups AS ids
+CALL (ids) {
+    MATCH (n) WHERE elementId(n) IN ids
+    WITH n ORDER BY apoc.coll.indexOf(ids, elementId(n))
+    WITH collect(n) AS nodes
+    WHERE size(nodes) > 1
+    // The survivor keeps every namespace any of the duplicates was tagged with
+    WITH nodes, apoc.coll.toSet(apoc.coll.flatten([n IN nodes | coalesce(n.namespaces, [])])) AS namespaces
+    // Ids of the survivor and of the merged-away duplicates (caches / the ANN mirror drop the latter)
+    WITH nodes, namespaces, [n IN nodes WHERE n.id IS NOT NULL | n.id] AS merged_ids
+    CALL apoc.refactor.mergeNodes(nodes, {properties: 'discard', mergeRels: true}) YIELD node
+    SET node.namespaces = CASE WHEN size(namespaces) > 0 THEN namespaces ELSE null END
+    RETURN merged_ids
+}
+RETURN apoc.coll.toSet(apoc.coll.flatten(collect(merged_ids))) AS ids
+"""
+
+# Merges can turn A -> a into a self-loop; community edges are rebuilt by the community refresh
+SELF_LOOPS_QUERY = f"""
+MATCH (e:__Entity__)-[r]->(e) WHERE type(r) <> '{COMMUNITY_REL}'
+CALL (r) {{ DELETE r }} IN TRANSACTIONS OF $batch ROWS
+RETURN count(*) AS pruned
+"""
+
+ORPHAN_ENTITIES_QUERY = f"""
+MATCH (e:__Entity__)
+WHERE NOT EXISTS {{ MATCH (e)-[r]-() WHERE type(r) <> '{COMMUNITY_REL}' }}
+CALL (e) {{ WITH e, e.id AS id DETACH DELETE e RETURN id }} IN TRANSACTIONS OF $batch ROWS
+RETURN count(*) AS pruned, collect(id) AS ids
+"""
+
+ORPHAN_CHUNKS_QUERY = """
+MATCH (c:Chunk) WHERE NOT EXISTS { (c)--() }
+CALL (c) { WITH c, c.id AS id DELETE c RETURN id } IN TRANSACTIONS OF $batch ROWS
+RETURN count(*) AS pruned, collect(id) AS ids
+"""
+
+ORPHAN_COMMUNITIES_QUERY = f"""
+MATCH (c:{COMMUNITY_LABEL}) WHERE NOT EXISTS {{ ()-[:{COMMUNITY_REL}]->(c) }}
+CALL (c) {{ DELETE c }} IN TRANSACTIONS OF $batch ROWS
+RETURN count(*) AS pruned
+"""
+
+# Missing vectors, or vectors of another model / dimension
+STALE_EMBEDDINGS_QUERY = """
+MATCH (n:{label})
+WHERE n.embedding IS NULL OR size(n.embedding) <> $dim
+RETURN elementId(n) AS element_id, n.id AS id, {text} AS text
+LIMIT $limit
+"""
+
+SET_EMBEDDINGS_QUERY = """
+UNWIND $rows AS row
+MATCH (n) WHERE elementId(n) = row.element_id
+CALL db.create.setNodeVectorProperty(n, 'embedding', row.embedding)
+RETURN count(*) AS updated
+"""
+
+STATS_QUERY = f"""
+CALL {{ MATCH (e:__Entity__) RETURN count(e) AS entities }}
+CALL {{ MATCH (c:Chunk) RETURN count(c) AS chunks }}
+CALL {{ MATCH (c:{COMMUNITY_LABEL}) RETURN count(c) AS communities }}
+CALL {{ MATCH ()-[r]->() RETURN count(r) AS relationships }}
+CALL {{
+    MATCH (e:__Entity__)
+    WITH COUNT {{ (e)-[r]-() WHERE type(r) <> '{COMMUNITY_REL}' }} AS degree
+    RETURN avg(degree) AS mean, percentileDisc(degree, 0.5) AS p50,
+           percentileDisc(degree, 0.95) AS p95, max(degree) AS max
+}}
+CALL {{
+    MATCH (n) WHERE (n:__Entity__ OR n:Chunk) AND (n.embedding IS NULL OR size(n.embedding) <> $dim)
+    RETURN count(n) AS stale_embeddings
+}}
+RETURN entities, chunks, communities, relationships, mean, p50, p95, max, stale_embeddings
+"""
+
+PROBE_ENTITIES_QUERY = """
+MATCH (e:__Entity__) WHERE e.embedding IS NOT NULL AND size(e.embedding) = $dim
+RETURN e.id AS id, coalesce(e.name, e.id) AS name, e.embedding AS embedding
+ORDER BY rand() LIMIT $limit
+"""
+
+PROBE_EXPANSION_QUERY = f"""
+MATCH (e:__Entity__)-[r]-(n) WHERE e.id IN $ids AND type(r) <> '{COMMUNITY_REL}'
+RETURN count(r) AS triplets
+"""
+
+class GraphMaintenanceService:
+    """
+    Scheduled compaction of the Neo4j knowledge graph.
+
+    1. Merges duplicate entities (case / whitespace variants of a name) and duplicate
+       chunks (same page text ingested twice) with apoc.refactor.mergeNodes.
+    2. Prunes orphans: self-loops left by merges, entities without relationships,
+       chunks linked to nothing and communities without members.
+    3. Re-embeds entities and chunks whose embedding is missing or has the wrong dimension.
+    4. Applies missing / drifted indexes and refreshes index statistics.
+
+    Every step works in bounded transactions and selects its work from the graph's
+    current state, so an interrupted run is simply resumed by the next one. Graph
+    size, degree distribution and the latency of the retriever's queries are
+    measured before and after; the last report is kept in Redis.
+    """
+    LOCK_KEY = "rag:maintenance:lock"
+    LOCK_SECONDS = 3 * 3600
+    REPORT_KEY = "rag:maintenance:last"
+
+    def run(self) -> dict:
+        """Runs every step; returns the report, or {"status": "locked"} if a run is in progress."""
+        client = graph_versions.client
+        token = str(uuid.uuid4())
+        if not client.set(self.LOCK_KEY, token, nx=True, ex=self.LOCK_SECONDS):
+            print("⏳ Graph maintenance already running, skipping.")
+            return {"status": "locked"}
+
+        driver = GraphDatabase.driver(settings.NEO4J_URI, auth=(settings.NEO4J_USER, settings.NEO4J_PASSWORD))
+        try:
+            started = time.time()
+            probes = self._probe_entities(driver)
+            before = {"graph": self._stats(driver), "retrieval_ms": self._probe_latency(driver, probes)}
+            print(f"🧹 Graph maintenance started: {before}")
+
+            steps, touched = {}, set()
+            for name, step in (
+                ("merge", self._merge_duplicates),
+                ("prune", self._prune_orphans),
+                ("reembed", self._reembed_stale),
+                ("indexes", self._refresh_indexes),
+            ):
+                step_started = time.time()
+                try:
+                    steps[name] = step(driver, touched)
+                except Exception as e:
+                    # One failing step (e.g. APOC missing) must not block the others
+                    print(f"⚠️ Maintenance step '{name}' failed: {e}")
+                    steps[name] = {"error": str(e)}
+                steps[name]["seconds"] = round(time.time() - step_started, 1)
+
+            # Caches and the ANN mirror holding merged / deleted / re-embedded nodes must let go of them
+            changed = any(
+                count for step in steps.values() for key, count in step.items()
+                if key not in ("seconds", "error")
+            )
+            if changed:
+                graph_versions.bump(touched)
+
+            after = {"graph": self._stats(driver), "retrieval_ms": self._probe_latency(driver, probes)}
+            report = {
+                "status": "completed",
+                "started_at": started,
+                "seconds": round(time.time() - started, 1),
+                "before": before,
+                "after": after,
+                "steps": steps,
+                "changed": changed,
+            }
+            client.set(self.REPORT_KEY, json.dumps(report))
+            print(f"✅ Graph maintenance done: {steps} -> {after}")
+            return report
+        finally:
+            driver.close()
+            # Compare-and-delete: a run that outlived LOCK_SECONDS must not drop the next run's lock
+            client.eval(
+                "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0",
+                1, self.LOCK_KEY, token,
+            )
+
+    def last_report(self) -> dict | None:
+        raw = graph_versions.client.get(self.REPORT_KEY)
+        return json.loads(raw) if raw else None
+
+    # --- Measurements ---
+
+    def _stats(self, driver) -> dict:
+        record = driver.execute_query(STATS_QUERY, parameters_={"dim": settings.EMBEDDING_DIMENSIONS}).records[0]
+        return {
+            "entities": record["entities"],
+            "chunks": record["chunks"],
+            "communities": record["communities"],
+            "relationships": record["relationships"],
+            "degree": {
+                "mean": round(record["mean"] or 0.0, 2),
+                "p50": record["p50"], "p95": record["p95"], "max": record["max"],
+            },
+            "stale_embeddings": record["stale_embeddings"],
+        }
+
+    def _probe_entities(self, driver) -> List[dict]:
+        """Random entities whose name and stored vector stand in for user questions (no embedding calls)."""
+        records, _, _ = driver.execute_query(
+            PROBE_ENTITIES_QUERY,
+            parameters_={"dim": settings.EMBEDDING_DIMENSIONS, "limit": settings.MAINTENANCE_PROBES},
+        )
+        return [dict(r) for r in records]
+
+    def _probe_latency(self, driver, probes: List[dict]) -> dict:
+        """p50/p95 of the retriever's entity legs plus one-hop expansion, per probe."""
+        timings = []
+        for probe in probes:
+            started = time.perf_counter()
+            try:
+                hits, _, _ = driver.execute_query(ENTITY_VECTOR_QUERY, parameters_={
+                    "index": ENTITY_VECTOR_INDEX, "k": settings.RETRIEVAL_TOP_K, "embedding": probe["embedding"],
+                })
+                driver.execute_query(ENTITY_FULLTEXT_QUERY, parameters_={
+                    "index": ENTITY_FULLTEXT_INDEX, "k": settings.RETRIEVAL_TOP_K, "query": to_lucene_query(probe["name"]) or "*",
+                })
+                driver.execute_query(PROBE_EXPANSION_QUERY, parameters_={"ids": [h["id"] for h in hits]})
+            except Exception as e:
+                print(f"⚠️ Retrieval probe failed: {e}")
+                continue
+            timings.append((time.perf_counter() - started) * 1000)
+        if not timings:
+            return {"probes": 0}
+        timings.sort()
+        pick = lambda q: round(timings[min(len(timings) - 1, int(q * len(timings)))], 1)
+        return {"probes": len(timings), "p50": pick(0.5), "p95": pick(0.95)}
+
+    # --- Steps ---
+
+    def _merge_groups(self, driver, query: str, touched: set) -> int:
+        records, _, _ = driver.execute_query(query)
+        groups = [r["ids"] for r in records]
+        merged = 0
+        batch = settings.MAINTENANCE_BATCH_SIZE
+        for i in range(0, len(groups), batch):
+            chunk = groups[i:i + batch]
+            # One transaction per batch of groups; a crash loses at most the current batch
+            result = driver.execute_query(MERGE_GROUPS_QUERY, parameters_={"groups": chunk}).records[0]
+            touched.update(node_id for node_id in result["ids"] if node_id)
+            merged += sum(len(ids) - 1 for ids in chunk)
+        return merged
+
+    def _merge_duplicates(self, driver, touched: set) -> dict:
+        return {
+            "entities_merged": self._merge_groups(driver, DUPLICATE_ENTITIES_QUERY, touched),
+            "chunks_merged": self._merge_groups(driver, DUPLICATE_CHUNKS_QUERY, touched),
+        }
+
+    def _prune_orphans(self, driver, touched: set) -> dict:
+        params = {"batch": settings.MAINTENANCE_BATCH_SIZE}
+        pruned = {}
+        for name, query in (
+            ("self_loops", SELF_LOOPS_QUERY),
+            ("entities", ORPHAN_ENTITIES_QUERY),
+            ("chunks", ORPHAN_CHUNKS_QUERY),
+            ("communities", ORPHAN_COMMUNITIES_QUERY),
+        ):
+            if name == "chunks" and not settings.MAINTENANCE_PRUNE_UNLINKED_CHUNKS:
+                continue
+            # CALL { } IN TRANSACTIONS needs an auto-commit transaction
+            with driver.session() as session:
+                record = session.run(query, **params).single()
+            pruned[f"{name}_pruned"] = record["pruned"]
+            touched.update(record.get("ids") or [])
+        return pruned
+
+    def _reembed_stale(self, driver, touched: set) -> dict:
+        budget = settings.MAINTENANCE_REEMBED_LIMIT
+        counts: Dict[str, int] = {}
+        embed_model = None
+        # Entities are embedded by name, chunks by text (as at ingest)
+        for label, text in (("__Entity__", "coalesce(n.name, n.id)"), ("Chunk", "n.text")):
+            counts[f"{label.strip('_').lower()}_reembedded"] = 0
+            while budget > 0:
+                records, _, _ = driver.execute_query(
+                    STALE_EMBEDDINGS_QUERY.format(label=label, text=text),
+                    parameters_={"dim": settings.EMBEDDING_DIMENSIONS, "limit": min(budget, settings.MAINTENANCE_BATCH_SIZE)},
+                )
+                rows = [r for r in records if r["text"]]
+                if not rows:
+                    break
+                embed_model = embed_model or SyncGeminiEmbedding(api_key=settings.GOOGLE_API_KEY)
+                embeddings = embed_model.get_document_embedding_batch([r["text"] for r in rows])
+                driver.execute_query(SET_EMBEDDINGS_QUERY, parameters_={"rows": [
+                    {"element_id": r["element_id"], "embedding": e} for r, e in zip(rows, embeddings)
+                ]})
+                counts[f"{label.strip('_').lower()}_reembedded"] += len(rows)
+                touched.update(r["id"] for r in rows if r["id"])
+                budget -= len(rows)
+                if len(rows) < len(records):
+                    break  # Nodes without text cannot be embedded; don't loop on them
+        return counts
+
+    def _refresh_indexes(self, driver, touched: set) -> dict:
+        # 1. Recreate indexes that failed to populate
+        records, _, _ = driver.execute_query(
+            "SHOW INDEXES YIELD name, state WHERE state = 'FAILED' RETURN name"
+        )
+        failed = [r["name"] for r in records]
+        for name in failed:
+            print(f"♻️ Dropping failed index {name}")
+            driver.execute_query(f"DROP INDEX `{name}` IF EXISTS")
+
+        # 2. Apply missing / drifted constraints and indexes (same definitions as at setup)
+        init_db_constraints()
+
+        # 3. Refresh planner statistics and wait for (re)builds to come online
+        with driver.session() as session:
+            session.run("CALL db.resampleOutdatedIndexes()").consume()
+            session.run("CALL db.awaitIndexes(600)").consume()
+        return {"failed_rebuilt": len(failed)}
+
+graph_maintenance = GraphMaintenanceService()
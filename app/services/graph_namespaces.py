@@ -0,0 +1,152 @@
+import re
+from typing import List
+from neo4j import GraphDatabase
+from app.core.config import settings
+from app.services.graph_version import graph_versions
+
+# Explicit collection ids must already look like this; topics are slugified into it
+NAMESPACE_PATTERN = r"^[a-z0-9][a-z0-9_.-]{0,63}$"
+DEFAULT_NAMESPACE = "default"
+
+# Chunks carry one `namespace` (from the document metadata). Entities and relationships are
+# shared between documents, so they collect every namespace that mentioned them.
+TAG_ENTITIES_QUERY = """
+MATCH (c:Chunk {ref_doc_id: $doc_id})-[:MENTIONS]->(e:__Entity__)
+WITH DISTINCT e
+WHERE NOT $namespace IN coalesce(e.namespaces, [])
+SET e.namespaces = coalesce(e.namespaces, []) + $namespace
+RETURN count(e) AS tagged
+"""
+
+# A relationship is tagged by the chunk it was (last) extracted from
+TAG_RELATIONS_QUERY = """
+MATCH (c:Chunk {ref_doc_id: $doc_id})-[:MENTIONS]->(:__Entity__)-[r]->(:__Entity__)
+WHERE r.triplet_source_id = c.id
+WITH DISTINCT r
+WHERE NOT $namespace IN coalesce(r.namespaces, [])
+SET r.namespaces = coalesce(r.namespaces, []) + $namespace
+RETURN count(r) AS tagged
+"""
+
+LIST_QUERY = """
+MATCH (c:Chunk) WHERE c.namespace IS NOT NULL
+RETURN c.namespace AS namespace, count(c) AS chunks, count(DISTINCT c.url) AS documents
+ORDER BY namespace
+"""
+
+NAMESPACE_ENTITIES_QUERY = """
+MATCH (c:Chunk {namespace: $namespace})-[:MENTIONS]->(e:__Entity__)
+RETURN DISTINCT e.id AS id
+"""
+
+# Deletion runs chunks first: whether an entity / relationship survives depends on the chunks
+# left afterwards, not on its `namespaces` list (a namespaced ingest also tags entities that
+# chunks ingested before namespaces existed still mention).
+
+# 1. The namespace's own chunks
+DELETE_CHUNKS_QUERY = """
+MATCH (c:Chunk {namespace: $namespace})
+CALL (c) { WITH c, c.id AS id DETACH DELETE c RETURN id } IN TRANSACTIONS OF $batch ROWS
+RETURN count(*) AS deleted, collect(id) AS ids
+"""
+
+# 2. Relationships between its entities lose the tag; those no remaining chunk mentions both
+#    endpoints of are deleted
+UNTAG_RELATIONS_QUERY = """
+UNWIND $ids AS entity_id
+MATCH (a:__Entity__ {id: entity_id})-[r]->(b:__Entity__)
+WHERE $namespace IN coalesce(r.namespaces, [])
+CALL (a, r, b) {
+    WITH a, r, b, [ns IN r.namespaces WHERE ns <> $namespace] AS rest
+    SET r.namespaces = CASE WHEN size(rest) > 0 THEN rest ELSE null END
+    WITH r, NOT EXISTS { (a)<-[:MENTIONS]-(:Chunk)-[:MENTIONS]->(b) } AS orphan
+    CALL (r, orphan) { WITH r, orphan WHERE orphan DELETE r }
+    RETURN orphan
+} IN TRANSACTIONS OF $batch ROWS
+RETURN count(*) AS untagged, sum(CASE WHEN orphan THEN 1 ELSE 0 END) AS deleted
+"""
+
+# 3. Its entities likewise: those no remaining chunk mentions are deleted (with their
+#    remaining relationships and community memberships)
+UNTAG_ENTITIES_QUERY = """
+UNWIND $ids AS entity_id
+MATCH (e:__Entity__ {id: entity_id})
+CALL (e) {
+    WITH e, [ns IN coalesce(e.namespaces, []) WHERE ns <> $namespace] AS rest
+    SET e.namespaces = CASE WHEN size(rest) > 0 THEN rest ELSE null END
+    WITH e, NOT EXISTS { (:Chunk)-[:MENTIONS]->(e) } AS orphan
+    CALL (e, orphan) { WITH e, orphan WHERE orphan DETACH DELETE e }
+    RETURN orphan
+} IN TRANSACTIONS OF $batch ROWS
+RETURN count(*) AS untagged, sum(CASE WHEN orphan THEN 1 ELSE 0 END) AS deleted
+"""
+
+def namespace_slug(text: str) -> str:
+    """Namespace derived from a topic: 'Rust async runtimes!' -> 'rust-async-runtimes'."""
+    slug = re.sub(r"[^a-z0-9]+", "-", (text or "").lower()).strip("-")[:64].rstrip("-")
+    return slug or DEFAULT_NAMESPACE
+
+class GraphNamespaceService:
+    """
+    Topic-scoped slices of the one Neo4j knowledge graph.
+
+    1. Every ingested document is tagged with a namespace (its topic, or an explicit
+       collection id): chunks get `namespace`, the entities and relationships extracted
+       from them get it appended to `namespaces`.
+    2. Chat retrieval can be restricted to one namespace (see HybridGraphRetriever).
+    3. A namespace can be deleted: its chunks go, and entities / relationships are only
+       deleted once no remaining chunk (of any namespace, or of none) mentions them.
+    Data ingested before namespaces existed carries none and is only seen by unscoped chat.
+    """
+
+    def tag(self, graph_store, doc_id: str, namespace: str) -> None:
+        """Tags the entities and relationships extracted from document `doc_id`."""
+        params = {"doc_id": doc_id, "namespace": namespace}
+        graph_store.structured_query(TAG_ENTITIES_QUERY, param_map=params)
+        graph_store.structured_query(TAG_RELATIONS_QUERY, param_map=params)
+
+    def stats(self) -> List[dict]:
+        """Chunk and document counts per namespace."""
+        driver = self._driver()
+        try:
+            records, _, _ = driver.execute_query(LIST_QUERY)
+            return [r.data() for r in records]
+        finally:
+            driver.close()
+
+    def delete(self, namespace: str) -> dict:
+        """Removes a namespace from the graph; returns what was deleted / untagged."""
+        driver = self._driver()
+        try:
+            records, _, _ = driver.execute_query(NAMESPACE_ENTITIES_QUERY, parameters_={"namespace": namespace})
+            entity_ids = [r["id"] for r in records]
+            params = {"namespace": namespace, "ids": entity_ids, "batch": settings.NAMESPACE_DELETE_BATCH}
+
+            # CALL { } IN TRANSACTIONS needs an auto-commit transaction
+            with driver.session() as session:
+                chunks = session.run(DELETE_CHUNKS_QUERY, **params).single()
+                relations = session.run(UNTAG_RELATIONS_QUERY, **params).single()
+                entities = session.run(UNTAG_ENTITIES_QUERY, **params).single()
+        finally:
+            driver.close()
+
+        # Caches (and the ANN mirror) drop the touched entities and the deleted chunks
+        version = graph_versions.bump(entity_ids + chunks["ids"])
+        report = {
+            "namespace": namespace,
+            "chunks_deleted": chunks["deleted"],
+            "entities_untagged": entities["untagged"],
+            "entities_deleted": entities["deleted"],
+            "relationships_untagged": relations["untagged"],
+            "relationships_deleted": relations["deleted"],
+            "graph_version": version,
+        }
+        print(f"🗑️ Namespace deleted: {report}")
+        return report
+
+    @staticmethod
+    def _driver():
+        return GraphDatabase.driver(settings.NEO4J_URI, auth=(settings.NEO4J_USER, settings.NEO4J_PASSWORD))
+
+# Singleton
+graph_namespaces = GraphNamespaceService()
@@ -1,14 +1,17 @@
 import time
-from typing import Any, List, Optional
+import uuid
+from typing import Any, Callable, List, Optional
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
 
 # LlamaIndex Imports
-from llama_index.core import Document, PropertyGraphIndex
+from llama_index.core import Document, PropertyGraphIndex, Settings
 from llama_index.graph_stores.neo4j import Neo4jPropertyGraphStore
+from app.core.graph_store import InstrumentedNeo4jPropertyGraphStore
 from llama_index.core.indices.property_graph import SimpleLLMPathExtractor, SchemaLLMPathExtractor
 from llama_index.core.llms import CustomLLM, LLMMetadata, CompletionResponse, CompletionResponseGen
 from llama_index.core.llms.callbacks import llm_completion_callback
 from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.schema import TransformComponent
 
 # Google Imports
 import google.generativeai as genai
@@ -16,7 +19,12 @@ from google.api_core.exceptions import ResourceExhausted, InternalServerError
 
 # Config Imports
 from app.core.config import settings
+from app.core.metrics import GEMINI_RETRIES, gemini_request, observe_stage, record_usage
 from app.core.graph_schema import SCHEMA_GUIDELINES, VALID_NODES, VALID_RELATIONS
+from app.services.graph_extraction import JsonSchemaPathExtractor
+from app.services.graph_namespaces import DEFAULT_NAMESPACE, graph_namespaces
+from app.services.graph_version import graph_versions
+from app.services.text_limits import iter_windows
 
 # -----------------------------------------------------------------------------
 # 1. Custom Sync Embedder (Fixes Event Loop Crash)
@@ -27,13 +35,15 @@ class SyncGeminiEmbedding(BaseEmbedding):
         genai.configure(api_key=api_key)
 
     def _get_query_embedding(self, query: str) -> List[float]:
-        return genai.embed_content(model=self.model_name, content=query, task_type="retrieval_query")['embedding']
+        with observe_stage("embedding"), gemini_request("embed"):
+            return genai.embed_content(model=self.model_name, content=query, task_type="retrieval_query")['embedding']
 
     async def _aget_query_embedding(self, query: str) -> List[float]:
         return self._get_query_embedding(query)
 
     def _get_text_embedding(self, text: str) -> List[float]:
-        return genai.embed_content(model=self.model_name, content=text, task_type="retrieval_document")['embedding']
+        with observe_stage("embedding"), gemini_request("embed"):
+            return genai.embed_content(model=self.model_name, content=text, task_type="retrieval_document")['embedding']
 
     async def _aget_text_embedding(self, text: str) -> List[float]:
         return self._get_text_embedding(text)
@@ -64,14 +74,33 @@ class SyncGeminiLLM(CustomLLM):
     @retry(
         retry=retry_if_exception_type((ResourceExhausted, InternalServerError)),
         stop=stop_after_attempt(5),
-        wait=wait_exponential(multiplier=2, min=20, max=60)
+        wait=wait_exponential(multiplier=2, min=20, max=60),
+        before_sleep=lambda _: GEMINI_RETRIES.labels(kind="generate").inc(),
     )
     @llm_completion_callback()
     def complete(self, prompt: str, **kwargs: Any) -> CompletionResponse:
         # Synchronous blocking call
-        response = self._model.generate_content(prompt)
+        with gemini_request("generate"):
+            response = self._model.generate_content(prompt)
+        record_usage(response)
         return CompletionResponse(text=response.text)
 
+    @retry(
+        retry=retry_if_exception_type((ResourceExhausted, InternalServerError)),
+        stop=stop_after_attempt(5),
+        wait=wait_exponential(multiplier=2, min=20, max=60),
+        before_sleep=lambda _: GEMINI_RETRIES.labels(kind="generate").inc(),
+    )
+    def complete_json(self, prompt: str, response_schema: dict) -> str:
+        """JSON-mode call: the output is constrained to `response_schema` (used by graph extraction)."""
+        with gemini_request("generate"):
+            response = self._model.generate_content(
+                prompt,
+                generation_config={"response_mime_type": "application/json", "response_schema": response_schema},
+            )
+        record_usage(response)
+        return response.text
+
     @llm_completion_callback()
     def stream_complete(self, prompt: str, **kwargs: Any) -> CompletionResponseGen:
         # We don't need streaming for graph extraction, but LlamaIndex requires implementation
@@ -80,10 +109,63 @@ class SyncGeminiLLM(CustomLLM):
             yield CompletionResponse(text=chunk.text, delta=chunk.text)
 
 # -----------------------------------------------------------------------------
-# 3. Graph Service
+# 3. Progress-reporting Extractor Wrapper
+# -----------------------------------------------------------------------------
+class ProgressExtractor(TransformComponent):
+    """
+    Runs the wrapped extractor one chunk at a time, timing each into
+    rag_stage_seconds{stage="llm_extraction"} and reporting (done, total) after each.
+    PropertyGraphIndex runs extractors through `acall` inside asyncio.run (use_async=True),
+    so the async path must await the wrapped extractor's `acall`: its sync `__call__`
+    (e.g. SchemaLLMPathExtractor's) would start a nested asyncio.run and crash.
+    """
+    extractor: TransformComponent
+    on_chunk: Optional[Callable[[int, int], None]] = None
+
+    def __call__(self, nodes, **kwargs):
+        results = []
+        for i, node in enumerate(nodes):
+            with observe_stage("llm_extraction"):
+                results.extend(self.extractor([node], **kwargs))
+            if self.on_chunk:
+                self.on_chunk(i + 1, len(nodes))
+        return results
+
+    async def acall(self, nodes, **kwargs):
+        results = []
+        for i, node in enumerate(nodes):
+            with observe_stage("llm_extraction"):
+                results.extend(await self.extractor.acall([node], **kwargs))
+            if self.on_chunk:
+                self.on_chunk(i + 1, len(nodes))
+        return results
+
+class TimedTransformation(TransformComponent):
+    """Times a pipeline step (e.g. chunking) into rag_stage_seconds{stage}."""
+    component: TransformComponent
+    stage: str
+
+    def __call__(self, nodes, **kwargs):
+        with observe_stage(self.stage):
+            return self.component(nodes, **kwargs)
+
+# -----------------------------------------------------------------------------
+# 4. Graph Service
 # -----------------------------------------------------------------------------
 class GraphService:
-    def process_document(self, text: str, source_url: str):
+    def process_document(
+        self,
+        text: str,
+        source_url: str,
+        on_progress: Optional[Callable[..., None]] = None,
+        namespace: str = DEFAULT_NAMESPACE,
+    ):
+        """
+        Extracts a document into the graph, tagged with `namespace` (see GraphNamespaceService).
+        Long texts go through in INGEST_WINDOW_CHARS windows (chunked, extracted, embedded and
+        written one after another), so only one window's nodes are in memory at a time.
+        `on_progress(stage, message, **counts)` is called per extracted chunk and once the nodes are written.
+        """
         if not text or len(text) < 50:
             print(f"Skipping {source_url}: Content too short.")
             return
@@ -101,39 +183,109 @@ class GraphService:
         )
 
         # REQUIREMENT: Neo4j Database must be version 5.x+
-        graph_store = Neo4jPropertyGraphStore(
+        graph_store = InstrumentedNeo4jPropertyGraphStore(
             username=settings.NEO4J_USER,
             password=settings.NEO4J_PASSWORD,
             url=settings.NEO4J_URI,
         )
 
-        # 4. Extraction Logic (FIXED)
-        # Fixes "Chunk" nodes by using SchemaLLMPathExtractor
-        # Fixes Pydantic crash by using strict=False
-        # Fixes deadlock by removing num_workers (running sequentially)
-        extractor = SchemaLLMPathExtractor(
-            llm=llm,
-            possible_entities=VALID_NODES,
-            possible_relations=VALID_RELATIONS,
-            strict=False,
-            num_workers=1
-        )
+        # 4. Extraction Logic
+        # JSON mode: Gemini's output is constrained to the schema, near-misses are repaired
+        # locally, so malformed output never costs a second call (EXTRACTION_MODE="json").
+        if settings.EXTRACTION_MODE == "json":
+            json_extractor = JsonSchemaPathExtractor(
+                llm=llm, max_triplets_per_chunk=settings.EXTRACTION_MAX_TRIPLETS_PER_CHUNK,
+            )
+            extractor = json_extractor
+        else:
+            # Fixes "Chunk" nodes by using SchemaLLMPathExtractor
+            # Fixes Pydantic crash by using strict=False
+            # Fixes deadlock by removing num_workers (running sequentially)
+            json_extractor = None
+            extractor = SchemaLLMPathExtractor(
+                llm=llm,
+                possible_entities=VALID_NODES,
+                possible_relations=VALID_RELATIONS,
+                strict=False,
+                num_workers=1,
+                max_triplets_per_chunk=settings.EXTRACTION_MAX_TRIPLETS_PER_CHUNK,
+            )
+
+        # Chunk numbers continue across windows; the total grows as windows are split
+        counts = {"before": 0, "window_chunks": 0}
+
+        def on_chunk(done, total):
+            counts["window_chunks"] = total
+            chunk = counts["before"] + done
+            on_progress(
+                "chunk_extracted", f"Extracted chunk {chunk}", url=source_url,
+                chunk=chunk, chunks=counts["before"] + total,
+            )
+
+        extractor = ProgressExtractor(extractor=extractor, on_chunk=on_chunk if on_progress else None)
 
         # 5. Index Wrapper
         index = PropertyGraphIndex.from_existing(
             property_graph_store=graph_store,
             embed_model=embed_model,
             kg_extractors=[extractor],
+            # Same splitter LlamaIndex uses by default, timed as its own stage
+            transformations=[TimedTransformation(component=Settings.node_parser, stage="chunking")],
         )
 
-        # 6. Insert
-        doc = Document(text=text, metadata={"url": source_url})
-        index.insert(doc)
-        
-        # 7. Cleanup
+        # 6. Insert window by window; every window's chunks share the page's ref_doc_id
+        #    (the namespace is stored on the chunks but kept out of the extraction / embedding text)
+        started = time.time()
+        doc_id = str(uuid.uuid4())
+        for window in iter_windows(text, settings.INGEST_WINDOW_CHARS):
+            index.insert(Document(
+                text=window,
+                id_=doc_id,
+                metadata={"url": source_url, "namespace": namespace},
+                excluded_llm_metadata_keys=["namespace"],
+                excluded_embed_metadata_keys=["namespace"],
+            ))
+            counts["before"] += counts["window_chunks"]
+            counts["window_chunks"] = 0
+        graph_namespaces.tag(graph_store, doc_id, namespace)
+
+        if json_extractor:
+            stats = json_extractor.stats
+            print(
+                f"🧩 Extraction: {stats['chunks']} chunks, {stats['repaired']} repaired, "
+                f"{stats['failed']} failed, {stats['coerced']} types coerced"
+            )
+
+        # 7. Publish touched entities (API-side caches invalidate on these)
+        entities = self._bump_graph_version(graph_store, doc_id)
+        if on_progress:
+            on_progress(
+                "nodes_written", f"Wrote {entities} entities to the graph",
+                url=source_url, entities=entities, duration_ms=round((time.time() - started) * 1000),
+            )
+
+        # 8. Cleanup
         graph_store._driver.close()
         
-        print(f"✅ Successfully ingested: {source_url}")
+        print(f"✅ Successfully ingested: {source_url} [{namespace}]")
+
+    def _bump_graph_version(self, graph_store: Neo4jPropertyGraphStore, doc_id: str) -> int:
+        """Returns the number of entities the document touched."""
+        try:
+            rows = graph_store.structured_query(
+                """
+                MATCH (c:Chunk {ref_doc_id: $doc_id})-[:MENTIONS]->(e:__Entity__)
+                RETURN DISTINCT e.id AS id
+                """,
+                param_map={"doc_id": doc_id},
+            )
+            version = graph_versions.bump(row["id"] for row in rows)
+            print(f"🔖 Graph version {version}: {len(rows)} entities touched")
+            return len(rows)
+        except Exception as e:
+            # Ingestion itself succeeded; caches fall back to their TTL
+            print(f"⚠️ Failed to bump graph version: {e}")
+            return 0
 
 # Singleton
 graph_service = GraphService()
\ No newline at end of file
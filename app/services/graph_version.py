@@ -0,0 +1,73 @@
+import logging
+from typing import Iterable
+import redis
+from app.core.config import settings
+
+logger = logging.getLogger("graph_version")
+
+# INCR + ZADD + trim as one atomic step: a reader never sees version V before the ids tagged V
+# (ZADD in slices keeps unpack() under Lua's stack limit)
+BUMP_SCRIPT = """
+local version = redis.call('incr', KEYS[1])
+for i = 2, #ARGV, 1000 do
+    local args = {}
+    for j = i, math.min(i + 999, #ARGV) do
+        args[#args + 1] = version
+        args[#args + 1] = ARGV[j]
+    end
+    redis.call('zadd', KEYS[2], unpack(args))
+end
+if #ARGV > 1 then
+    redis.call('zremrangebyrank', KEYS[2], 0, -(tonumber(ARGV[1]) + 1))
+end
+return version
+"""
+
+class GraphVersionService:
+    """
+    A monotonically increasing graph version shared through Redis.
+
+    The ingestion worker bumps it once per ingested document and records which
+    entities were touched at that version. Caches in the API process compare
+    their last seen version with the current one and evict only the entries
+    that depend on touched entities.
+    """
+    VERSION_KEY = "rag:graph:version"
+    TOUCHED_KEY = "rag:graph:touched"  # ZSET: member = entity id, score = last version that touched it
+    TOUCHED_MAX = 100_000              # Oldest touch records are trimmed beyond this
+
+    def __init__(self):
+        self._client = None
+
+    @property
+    def client(self) -> redis.Redis:
+        if self._client is None:
+            self._client = redis.Redis(
+                host=settings.REDIS_HOST,
+                port=settings.REDIS_PORT,
+                db=0,
+                decode_responses=True,
+            )
+        return self._client
+
+    def current(self) -> int:
+        return int(self.client.get(self.VERSION_KEY) or 0)
+
+    def bump(self, entity_ids: Iterable[str]) -> int:
+        """Advances the graph version and marks `entity_ids` as changed at that version."""
+        return int(self.client.eval(
+            BUMP_SCRIPT, 2, self.VERSION_KEY, self.TOUCHED_KEY, self.TOUCHED_MAX, *dict.fromkeys(entity_ids),
+        ))
+
+    def touched_since(self, version: int) -> tuple[int, set[str]]:
+        """
+        Returns (current_version, entity ids touched after `version`), read in one MULTI/EXEC.
+        """
+        pipe = self.client.pipeline()
+        pipe.get(self.VERSION_KEY)
+        pipe.zrangebyscore(self.TOUCHED_KEY, f"({version}", "+inf")
+        current, touched = pipe.execute()
+        return int(current or 0), set(touched)
+
+# Singleton
+graph_versions = GraphVersionService()
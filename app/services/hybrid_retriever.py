@@ -0,0 +1,401 @@
+import asyncio
+import logging
+import re
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple, Union
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.graph_stores.types import EntityNode, KG_SOURCE_REL, PropertyGraphStore
+from llama_index.core.indices.property_graph.sub_retrievers.base import BasePGRetriever
+from llama_index.core.schema import NodeWithScore, QueryBundle, TextNode
+from app.core.graph_schema import (
+    COMMUNITY_REL,
+    ENTITY_VECTOR_INDEX,
+    CHUNK_VECTOR_INDEX,
+    ENTITY_FULLTEXT_INDEX,
+    CHUNK_FULLTEXT_INDEX,
+)
+from app.core.config import settings
+from app.services.subgraph_cache import EXPANSION_QUERY, Subgraph
+
+logger = logging.getLogger("hybrid_retriever")
+
+# Namespace the current request's retrieval is restricted to (None: the whole graph).
+# The retriever is shared by all chat sessions, so the scope travels with the request.
+retrieval_namespace: ContextVar[Optional[str]] = ContextVar("retrieval_namespace", default=None)
+
+# Lucene query syntax characters that must be escaped in full-text queries
+LUCENE_SPECIAL = re.compile(r'([+\-&|!(){}\[\]^"~*?:\\/])')
+
+ENTITY_VECTOR_QUERY = """
+CALL db.index.vector.queryNodes($index, $k, $embedding) YIELD node, score
+RETURN node.id AS id,
+       [l IN labels(node) WHERE NOT l IN ['__Entity__', '__Node__'] | l][0] AS type,
+       node{.*, embedding: Null, name: Null, id: Null} AS properties,
+       score
+"""
+
+ENTITY_FULLTEXT_QUERY = """
+CALL db.index.fulltext.queryNodes($index, $query, {limit: $k}) YIELD node, score
+RETURN node.id AS id,
+       [l IN labels(node) WHERE NOT l IN ['__Entity__', '__Node__'] | l][0] AS type,
+       node{.*, embedding: Null, name: Null, id: Null} AS properties,
+       score
+"""
+
+CHUNK_VECTOR_QUERY = """
+CALL db.index.vector.queryNodes($index, $k, $embedding) YIELD node, score
+RETURN node.id AS id, node.text AS text, node.url AS url, score
+"""
+
+CHUNK_FULLTEXT_QUERY = """
+CALL db.index.fulltext.queryNodes($index, $query, {limit: $k}) YIELD node, score
+RETURN node.id AS id, node.text AS text, node.url AS url, score
+"""
+
+# Namespace-scoped legs: the index returns `$candidates` hits, those outside the namespace are dropped
+ENTITY_VECTOR_SCOPED_QUERY = """
+CALL db.index.vector.queryNodes($index, $candidates, $embedding) YIELD node, score
+WHERE $namespace IN coalesce(node.namespaces, [])
+RETURN node.id AS id,
+       [l IN labels(node) WHERE NOT l IN ['__Entity__', '__Node__'] | l][0] AS type,
+       node{.*, embedding: Null, name: Null, id: Null} AS properties,
+       score
+ORDER BY score DESC
+LIMIT toInteger($k)
+"""
+
+ENTITY_FULLTEXT_SCOPED_QUERY = """
+CALL db.index.fulltext.queryNodes($index, $query, {limit: $candidates}) YIELD node, score
+WHERE $namespace IN coalesce(node.namespaces, [])
+RETURN node.id AS id,
+       [l IN labels(node) WHERE NOT l IN ['__Entity__', '__Node__'] | l][0] AS type,
+       node{.*, embedding: Null, name: Null, id: Null} AS properties,
+       score
+ORDER BY score DESC
+LIMIT toInteger($k)
+"""
+
+CHUNK_VECTOR_SCOPED_QUERY = """
+CALL db.index.vector.queryNodes($index, $candidates, $embedding) YIELD node, score
+WHERE node.namespace = $namespace
+RETURN node.id AS id, node.text AS text, node.url AS url, score
+ORDER BY score DESC
+LIMIT toInteger($k)
+"""
+
+CHUNK_FULLTEXT_SCOPED_QUERY = """
+CALL db.index.fulltext.queryNodes($index, $query, {limit: $candidates}) YIELD node, score
+WHERE node.namespace = $namespace
+RETURN node.id AS id, node.text AS text, node.url AS url, score
+ORDER BY score DESC
+LIMIT toInteger($k)
+"""
+
+def to_lucene_query(text: str) -> str:
+    """Turns a free-text question into an OR query of escaped terms (BM25 scored by Lucene)."""
+    terms = [LUCENE_SPECIAL.sub(r"\\\1", t) for t in re.findall(r"\w[\w.+#-]*", text) if len(t) > 1]
+    return " OR ".join(terms)
+
+def reciprocal_rank_fusion(ranked_lists: List[List[dict]], k: int) -> List[Tuple[dict, float]]:
+    """
+    Merges ranked hit lists by summing 1 / (k + rank) per id.
+    Scores from different legs (cosine vs BM25) are never compared directly.
+    """
+    fused: Dict[str, float] = {}
+    rows: Dict[str, dict] = {}
+    for hits in ranked_lists:
+        for rank, row in enumerate(hits):
+            fused[row["id"]] = fused.get(row["id"], 0.0) + 1.0 / (k + rank + 1)
+            rows.setdefault(row["id"], row)
+    return sorted(((rows[i], score) for i, score in fused.items()), key=lambda x: x[1], reverse=True)
+
+class HybridGraphRetriever(BasePGRetriever):
+    """
+    Hybrid retriever over the Neo4j knowledge graph.
+
+    1. Runs four searches: vector + full-text over entities, vector + full-text over chunks.
+    2. Fuses each pair with reciprocal rank fusion.
+    3. Expands the top fused entities into triplets (graph expansion) and attaches
+       their source text.
+    4. Adds the top fused chunks that were not already pulled in via triplets.
+
+    Unlike the default PropertyGraphIndex retriever this needs no LLM call
+    (no synonym expansion), and every index it hits is explicitly configured
+    by app/db/init_graph.py.
+
+    If a `vector_mirror` is given and ready, the vector legs are answered
+    in-process (see app/services/ann_index.py) and only full-text search and
+    graph expansion go to Neo4j. With a `subgraph_cache`, expansion of
+    popular entities is served from cached neighbourhoods.
+
+    When `retrieval_namespace` is set, every leg and the expansion only see that
+    namespace's chunks, entities and relationships (the mirror is bypassed).
+    """
+
+    def __init__(
+        self,
+        graph_store: PropertyGraphStore,
+        embed_model: BaseEmbedding,
+        similarity_top_k: int = 5,
+        rrf_k: int = 60,
+        path_depth: int = 1,
+        limit: int = 30,
+        include_text: bool = True,
+        vector_mirror: Optional[Any] = None,
+        subgraph_cache: Optional[Any] = None,
+        **kwargs: Any,
+    ) -> None:
+        self._embed_model = embed_model
+        self._vector_mirror = vector_mirror
+        self._subgraph_cache = subgraph_cache
+        # Community membership edges are not facts; never expand through them
+        self._ignore_rels = [KG_SOURCE_REL, COMMUNITY_REL]
+        self._similarity_top_k = similarity_top_k
+        self._rrf_k = rrf_k
+        self._path_depth = path_depth
+        self._limit = limit
+        super().__init__(graph_store=graph_store, include_text=include_text, **kwargs)
+
+    # --- Search legs ---
+
+    def _search_params(self, query_bundle: QueryBundle) -> dict:
+        return {
+            "embedding": query_bundle.embedding,
+            "query": to_lucene_query(query_bundle.query_str),
+            "k": self._similarity_top_k,
+            "candidates": self._similarity_top_k * settings.NAMESPACE_OVERSAMPLE,
+            "namespace": retrieval_namespace.get(),
+        }
+
+    def _mirror_leg(self, index: str, params: dict) -> Optional[List[dict]]:
+        if self._vector_mirror is None or index not in (ENTITY_VECTOR_INDEX, CHUNK_VECTOR_INDEX):
+            return None
+        if params["namespace"]:
+            return None  # The mirror holds no namespaces; Neo4j filters the index hits
+        return self._vector_mirror.search(index, params["embedding"], params["k"])
+
+    def _run_leg(self, cypher: str, index: str, params: dict) -> List[dict]:
+        if index in (ENTITY_FULLTEXT_INDEX, CHUNK_FULLTEXT_INDEX) and not params["query"]:
+            return []  # No usable keywords in the question
+        hits = self._mirror_leg(index, params)
+        if hits is not None:
+            return hits
+        try:
+            return self._graph_store.structured_query(cypher, param_map={**params, "index": index})
+        except Exception as e:
+            logger.warning(f"⚠️ Retrieval leg '{index}' failed (run app/db/init_graph.py?): {e}")
+            return []
+
+    async def _arun_leg(self, cypher: str, index: str, params: dict) -> List[dict]:
+        if index in (ENTITY_FULLTEXT_INDEX, CHUNK_FULLTEXT_INDEX) and not params["query"]:
+            return []  # No usable keywords in the question
+        hits = self._mirror_leg(index, params)
+        if hits is not None:
+            return hits
+        try:
+            return await self._graph_store.astructured_query(cypher, param_map={**params, "index": index})
+        except Exception as e:
+            logger.warning(f"⚠️ Retrieval leg '{index}' failed (run app/db/init_graph.py?): {e}")
+            return []
+
+    def _legs(self, namespace: Optional[str]) -> List[Tuple[str, str]]:
+        if namespace:
+            return [
+                (ENTITY_VECTOR_SCOPED_QUERY, ENTITY_VECTOR_INDEX),
+                (ENTITY_FULLTEXT_SCOPED_QUERY, ENTITY_FULLTEXT_INDEX),
+                (CHUNK_VECTOR_SCOPED_QUERY, CHUNK_VECTOR_INDEX),
+                (CHUNK_FULLTEXT_SCOPED_QUERY, CHUNK_FULLTEXT_INDEX),
+            ]
+        return [
+            (ENTITY_VECTOR_QUERY, ENTITY_VECTOR_INDEX),
+            (ENTITY_FULLTEXT_QUERY, ENTITY_FULLTEXT_INDEX),
+            (CHUNK_VECTOR_QUERY, CHUNK_VECTOR_INDEX),
+            (CHUNK_FULLTEXT_QUERY, CHUNK_FULLTEXT_INDEX),
+        ]
+
+    def _search(self, query_bundle: QueryBundle):
+        if query_bundle.embedding is None:
+            query_bundle.embedding = self._embed_model.get_query_embedding(query_bundle.query_str)
+        params = self._search_params(query_bundle)
+        results = [self._run_leg(cypher, index, params) for cypher, index in self._legs(params["namespace"])]
+        return self._fuse(results)
+
+    async def _asearch(self, query_bundle: QueryBundle):
+        if query_bundle.embedding is None:
+            query_bundle.embedding = await self._embed_model.aget_query_embedding(query_bundle.query_str)
+        params = self._search_params(query_bundle)
+        results = await asyncio.gather(*[self._arun_leg(cypher, index, params) for cypher, index in self._legs(params["namespace"])])
+        return self._fuse(results)
+
+    def _fuse(self, results: List[List[dict]]):
+        entity_vec, entity_ft, chunk_vec, chunk_ft = results
+        top_k = self._similarity_top_k
+        entities = reciprocal_rank_fusion([entity_vec, entity_ft], self._rrf_k)[:top_k]
+        chunks = reciprocal_rank_fusion([chunk_vec, chunk_ft], self._rrf_k)[:top_k]
+        return entities, chunks
+
+    # --- Graph expansion ---
+
+    @staticmethod
+    def _entity_nodes(entities: List[Tuple[dict, float]]) -> List[EntityNode]:
+        return [
+            EntityNode(name=row["id"], label=row["type"] or "entity", properties=row["properties"] or {})
+            for row, _ in entities
+        ]
+
+    def _score_triplets(self, triplets, entities) -> List[NodeWithScore]:
+        # A triplet inherits the best fused score of its endpoints (seed entities)
+        scores = {row["id"]: score for row, score in entities}
+        scored = sorted(
+            ((t, max(scores.get(t[0].id, 0.0), scores.get(t[2].id, 0.0))) for t in triplets),
+            key=lambda x: x[1],
+            reverse=True,
+        )[: self._limit]
+        return self._get_nodes_with_score([t for t, _ in scored], [s for _, s in scored])
+
+    def _expansion_params(self, entities, namespace: str) -> dict:
+        return {
+            "ids": [row["id"] for row, _ in entities], "limit": self._limit,
+            "ignore_rels": self._ignore_rels, "namespace": namespace,
+        }
+
+    def _expand(self, entities) -> List[NodeWithScore]:
+        if not entities:
+            return []
+        namespace = retrieval_namespace.get()
+        if self._subgraph_cache is not None:
+            triplets = self._subgraph_cache.get_rel_map(
+                self._graph_store, [row["id"] for row, _ in entities],
+                depth=self._path_depth, limit=self._limit, ignore_rels=self._ignore_rels, namespace=namespace,
+            )
+        elif namespace:
+            # get_rel_map cannot filter relationships; same query the subgraph cache uses
+            rows = self._graph_store.structured_query(
+                EXPANSION_QUERY.format(depth=int(self._path_depth)), param_map=self._expansion_params(entities, namespace),
+            )
+            triplets = Subgraph.from_rows(rows, version=0).triplets()
+        else:
+            triplets = self._graph_store.get_rel_map(
+                self._entity_nodes(entities), depth=self._path_depth, limit=self._limit, ignore_rels=self._ignore_rels
+            )
+        return self._score_triplets(triplets, entities)
+
+    async def _aexpand(self, entities) -> List[NodeWithScore]:
+        if not entities:
+            return []
+        namespace = retrieval_namespace.get()
+        if self._subgraph_cache is not None:
+            triplets = await self._subgraph_cache.aget_rel_map(
+                self._graph_store, [row["id"] for row, _ in entities],
+                depth=self._path_depth, limit=self._limit, ignore_rels=self._ignore_rels, namespace=namespace,
+            )
+        elif namespace:
+            rows = await self._graph_store.astructured_query(
+                EXPANSION_QUERY.format(depth=int(self._path_depth)), param_map=self._expansion_params(entities, namespace),
+            )
+            triplets = Subgraph.from_rows(rows, version=0).triplets()
+        else:
+            triplets = await self._graph_store.aget_rel_map(
+                self._entity_nodes(entities), depth=self._path_depth, limit=self._limit, ignore_rels=self._ignore_rels
+            )
+        return self._score_triplets(triplets, entities)
+
+    @staticmethod
+    def _in_namespace(nodes: List[NodeWithScore]) -> List[NodeWithScore]:
+        """
+        Drops source texts outside the namespace: other namespaces' chunks (a shared entity may
+        point at one) and chunks ingested before namespaces existed. Triplets left without a
+        source text carry no metadata; they passed the scoped expansion and are kept.
+        """
+        namespace = retrieval_namespace.get()
+        if not namespace:
+            return nodes
+        return [n for n in nodes if not n.node.metadata or n.node.metadata.get("namespace") == namespace]
+
+    @staticmethod
+    def _merge_chunks(nodes: List[NodeWithScore], chunks) -> List[NodeWithScore]:
+        """Adds directly-retrieved chunks unless the triplet expansion already included them."""
+        seen = {n.node.node_id for n in nodes}
+        for row, score in chunks:
+            if row["id"] in seen or not row.get("text"):
+                continue
+            metadata = {"url": row["url"]} if row.get("url") else {}
+            nodes.append(NodeWithScore(node=TextNode(id_=row["id"], text=row["text"], metadata=metadata), score=score))
+            seen.add(row["id"])
+        return nodes
+
+    # --- BasePGRetriever API ---
+
+    def retrieve_from_graph(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        entities, _ = self._search(query_bundle)
+        return self._expand(entities)
+
+    async def aretrieve_from_graph(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        entities, _ = await self._asearch(query_bundle)
+        return await self._aexpand(entities)
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        entities, chunks = self._search(query_bundle)
+        nodes = self._expand(entities)
+        if self.include_text and nodes:
+            nodes = self._in_namespace(self.add_source_text(nodes))
+        return self._merge_chunks(self._dedupe(nodes), chunks)
+
+    async def _aretrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        entities, chunks = await self._asearch(query_bundle)
+        return await self._afinish(entities, chunks)
+
+    async def _afinish(self, entities, chunks) -> List[NodeWithScore]:
+        nodes = await self._aexpand(entities)
+        if self.include_text and nodes:
+            nodes = self._in_namespace(await self.async_add_source_text(nodes))
+        return self._merge_chunks(self._dedupe(nodes), chunks)
+
+    async def abatch_retrieve(
+        self, query_bundles: List[QueryBundle], concurrency: int = 8,
+    ) -> List[Union[List[NodeWithScore], Exception]]:
+        """
+        Retrieves for many questions at once.
+        1. All searches run concurrently (bounded by `concurrency`).
+        2. The union of seed entities is expanded in one fetch, warming the subgraph cache.
+        3. Each question's expansion is then served from that cache.
+        A question whose retrieval fails gets its exception in place of its nodes; the others are unaffected.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def bounded(coro):
+            async with semaphore:
+                return await coro
+
+        searches = await asyncio.gather(*[bounded(self._asearch(qb)) for qb in query_bundles], return_exceptions=True)
+        found = [search for search in searches if not isinstance(search, Exception)]
+
+        if self._subgraph_cache is not None:
+            seeds = list(dict.fromkeys(row["id"] for entities, _ in found for row, _ in entities))
+            if seeds:
+                try:
+                    await self._subgraph_cache.aget_rel_map(
+                        self._graph_store, seeds,
+                        depth=self._path_depth, limit=self._limit, ignore_rels=self._ignore_rels,
+                        namespace=retrieval_namespace.get(),
+                    )
+                except Exception as e:
+                    # Only a warm-up: each question still expands its own seeds below
+                    logger.warning(f"⚠️ Batch subgraph prefetch failed: {e}")
+
+        async def finish(search):
+            if isinstance(search, Exception):
+                return search
+            return await self._afinish(*search)
+
+        return await asyncio.gather(*[bounded(finish(search)) for search in searches], return_exceptions=True)
+
+    @staticmethod
+    def _dedupe(nodes: List[NodeWithScore]) -> List[NodeWithScore]:
+        # Several triplets from the same chunk collapse into one source-text node
+        best: Dict[str, NodeWithScore] = {}
+        for n in nodes:
+            current = best.get(n.node.node_id)
+            if current is None or (n.score or 0.0) > (current.score or 0.0):
+                best[n.node.node_id] = n
+        return sorted(best.values(), key=lambda n: n.score or 0.0, reverse=True)
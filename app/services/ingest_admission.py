@@ -0,0 +1,174 @@
+import json
+import math
+import time
+from typing import Optional
+import redis
+from app.core.config import settings
+
+INTERACTIVE_QUEUE = "ingest.interactive"
+BULK_QUEUE = "ingest.bulk"
+PRIORITY_QUEUES = {"interactive": INTERACTIVE_QUEUE, "bulk": BULK_QUEUE}
+
+class AdmissionRejected(Exception):
+    """Raised when admitting a job would push its queue past the allowed backlog."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.retry_after = retry_after
+
+class IngestAdmission:
+    """
+    Admission control for the ingestion queues, based on estimated Gemini work.
+
+    1. Cost: a job is estimated as `num_results` documents x LLM calls per document
+       (an average learned from finished jobs, seeded from config).
+    2. Backlog: admitted-but-unfinished jobs are kept in a Redis hash with their cost;
+       tasks remove themselves when they finish, stale entries age out.
+    3. Wait: backlog ahead of a job / fleet throughput (GEMINI_RPM x worker processes).
+       Interactive jobs only wait for interactive work; bulk jobs wait for everything.
+    4. Admit: rejected (429 + Retry-After) when the wait would exceed the queue's limit
+       or the queue already holds too many jobs. The check is not atomic across API
+       workers, so the limits are soft by at most a few concurrent submissions.
+    """
+    PENDING_KEY = "rag:ingest:pending"
+    CALLS_PER_DOC_KEY = "rag:ingest:calls_per_doc"
+    EWMA_ALPHA = 0.2
+
+    def __init__(self):
+        self._client = None
+
+    @property
+    def client(self) -> redis.Redis:
+        if self._client is None:
+            self._client = redis.Redis(
+                host=settings.REDIS_HOST,
+                port=settings.REDIS_PORT,
+                db=0,
+                decode_responses=True,
+            )
+        return self._client
+
+    # --- Estimates ---
+
+    @property
+    def throughput(self) -> float:
+        """LLM calls per second the worker fleet can sustain."""
+        return settings.GEMINI_RPM * max(1, settings.INGEST_WORKER_PROCESSES) / 60.0
+
+    def calls_per_document(self) -> float:
+        learned = self.client.get(self.CALLS_PER_DOC_KEY)
+        return float(learned) if learned else float(settings.INGEST_LLM_CALLS_PER_DOCUMENT)
+
+    def estimate_cost(self, num_results: int) -> float:
+        return num_results * self.calls_per_document()
+
+    def _pending(self) -> dict:
+        entries, stale = {}, []
+        cutoff = time.time() - settings.INGEST_PENDING_MAX_AGE_SECONDS
+        for task_id, raw in self.client.hgetall(self.PENDING_KEY).items():
+            entry = json.loads(raw)
+            if entry["admitted_at"] < cutoff:
+                stale.append(task_id)  # Worker died without releasing it
+                continue
+            entries[task_id] = entry
+        if stale:
+            self.client.hdel(self.PENDING_KEY, *stale)
+        return entries
+
+    @staticmethod
+    def _ahead(pending: dict, queue: str, before: Optional[float] = None) -> float:
+        """Cost that will be processed before a job on `queue` admitted at `before`."""
+        return sum(
+            e["cost"] for e in pending.values()
+            if (queue == BULK_QUEUE or e["queue"] == INTERACTIVE_QUEUE)
+            and (before is None or e["admitted_at"] < before)
+        )
+
+    def _limits(self, queue: str):
+        if queue == INTERACTIVE_QUEUE:
+            return settings.INGEST_INTERACTIVE_MAX_WAIT_SECONDS, settings.INGEST_INTERACTIVE_MAX_PENDING
+        return settings.INGEST_BULK_MAX_WAIT_SECONDS, settings.INGEST_BULK_MAX_PENDING
+
+    # --- Admission ---
+
+    def admit(self, task_id: str, queue: str, num_results: int) -> dict:
+        """Records the job or raises AdmissionRejected. Returns the job's estimate."""
+        pending = self._pending()
+        max_wait, max_pending = self._limits(queue)
+        cost = self.estimate_cost(num_results)
+        wait = self._ahead(pending, queue) / self.throughput
+
+        queued = sum(1 for e in pending.values() if e["queue"] == queue)
+        if queued >= max_pending:
+            # A slot frees up once roughly one average job of this queue has drained
+            queue_cost = sum(e["cost"] for e in pending.values() if e["queue"] == queue)
+            retry_after = math.ceil(queue_cost / queued / self.throughput) or 1
+            raise AdmissionRejected(f"{queue} has {queued} pending jobs (limit {max_pending})", retry_after)
+        if wait > max_wait:
+            raise AdmissionRejected(
+                f"{queue} backlog is ~{round(wait)}s of LLM work (limit {max_wait}s)",
+                math.ceil(wait - max_wait) or 1,
+            )
+
+        entry = {"queue": queue, "cost": cost, "admitted_at": time.time()}
+        self.client.hset(self.PENDING_KEY, task_id, json.dumps(entry))
+        return {
+            "queue": queue,
+            "estimated_llm_calls": round(cost),
+            "estimated_wait_seconds": round(wait),
+            "estimated_completion_seconds": round(wait + cost / self.throughput),
+        }
+
+    def estimate(self, task_id: str) -> Optional[dict]:
+        """Current estimate for an admitted job, or None once it finished."""
+        pending = self._pending()
+        entry = pending.get(task_id)
+        if entry is None:
+            return None
+        wait = self._ahead(pending, entry["queue"], before=entry["admitted_at"]) / self.throughput
+        return {
+            "queue": entry["queue"],
+            "estimated_llm_calls": round(entry["cost"]),
+            "estimated_wait_seconds": round(wait),
+            "estimated_completion_seconds": round(wait + entry["cost"] / self.throughput),
+        }
+
+    # --- Worker side ---
+
+    def release(self, task_id: str) -> None:
+        try:
+            self.client.hdel(self.PENDING_KEY, task_id)
+        except Exception as e:
+            print(f"⚠️ Failed to release admission slot for {task_id}: {e}")
+
+    def observe(self, documents: int, llm_calls: int) -> None:
+        """Feeds a finished job's real cost back into the per-document estimate."""
+        if documents <= 0:
+            return
+        try:
+            current = self.calls_per_document()
+            updated = (1 - self.EWMA_ALPHA) * current + self.EWMA_ALPHA * (llm_calls / documents)
+            self.client.set(self.CALLS_PER_DOC_KEY, round(updated, 3))
+        except Exception as e:
+            print(f"⚠️ Failed to update ingest cost estimate: {e}")
+
+    def queue_depths(self) -> dict:
+        """Messages waiting in each broker queue (the Redis transport keeps one list per queue)."""
+        return {queue: self.client.llen(queue) for queue in PRIORITY_QUEUES.values()}
+
+    def stats(self) -> dict:
+        pending = self._pending()
+        return {
+            "calls_per_document": round(self.calls_per_document(), 2),
+            "throughput_calls_per_min": round(self.throughput * 60, 1),
+            "queues": {
+                priority: {
+                    "pending": sum(1 for e in pending.values() if e["queue"] == queue),
+                    "backlog_seconds": round(self._ahead(pending, queue) / self.throughput),
+                }
+                for priority, queue in PRIORITY_QUEUES.items()
+            },
+        }
+
+# Singleton
+ingest_admission = IngestAdmission()
@@ -0,0 +1,95 @@
+import hashlib
+import re
+import uuid
+from typing import Callable, Optional, Tuple
+import redis
+from app.core.config import settings
+
+class IngestRegistry:
+    """
+    Coalesces identical ingest submissions onto one Celery task.
+
+    The first submission for a key claims it with SET NX (the atomic "lock") and stores
+    the task id it is about to dispatch; the key expires after `ttl` seconds. Any
+    concurrent or recent submission with the same key gets that task id back instead
+    of dispatching a duplicate pipeline. A task that did not complete releases its key
+    (and one found FAILED / REVOKED is released on the next submission), so it never blocks retries.
+    """
+    KEY_PREFIX = "rag:ingest:key"
+
+    def __init__(self, ttl: int):
+        self._ttl = ttl
+        self._client = None
+
+    @property
+    def client(self) -> redis.Redis:
+        if self._client is None:
+            self._client = redis.Redis(
+                host=settings.REDIS_HOST,
+                port=settings.REDIS_PORT,
+                db=0,
+                decode_responses=True,
+            )
+        return self._client
+
+    @staticmethod
+    def derive_key(query: str, num_results: int, namespace: Optional[str] = None) -> str:
+        """Same topic, different casing/spacing/punctuation -> same key (per explicit namespace)."""
+        normalized = " ".join(re.sub(r"[^\w\s]", " ", query.lower()).split())
+        scope = f"|{namespace}" if namespace else ""
+        return hashlib.sha256(f"{normalized}|{num_results}{scope}".encode("utf-8")).hexdigest()
+
+    def submit(
+        self,
+        key: str,
+        dispatch: Callable[[str], None],
+        is_failed: Callable[[str], bool],
+    ) -> Tuple[str, bool]:
+        """
+        Returns (task_id, deduplicated).
+        `dispatch(task_id)` starts the task under the given id; it is only called for new work.
+        """
+        redis_key = f"{self.KEY_PREFIX}:{key}"
+        for _ in range(2):
+            task_id = str(uuid.uuid4())
+            if self.client.set(redis_key, task_id, nx=True, ex=self._ttl):
+                try:
+                    dispatch(task_id)
+                except Exception:
+                    self._release(redis_key, task_id)  # Let the next attempt dispatch
+                    raise
+                return task_id, False
+
+            existing = self.client.get(redis_key)
+            if existing is None:
+                continue  # Expired between SET and GET; claim it again
+            if is_failed(existing):
+                self._release(redis_key, existing)
+                continue
+            return existing, True
+
+        # Lost both races; whoever won is dispatching, so attach to it
+        existing = self.client.get(redis_key)
+        if existing is None:
+            raise RuntimeError("Could not claim or find an ingest task for this key")
+        return existing, True
+
+    def _release(self, redis_key: str, task_id: str) -> None:
+        # Compare-and-delete: never drop a key another submission has re-claimed
+        self.client.eval(
+            "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0",
+            1, redis_key, task_id,
+        )
+
+    def release(self, key: str, task_id: str) -> None:
+        """Worker side: frees the key of a task that did not complete, so the next submission re-ingests."""
+        try:
+            self._release(f"{self.KEY_PREFIX}:{key}", task_id)
+        except Exception as e:
+            print(f"⚠️ Failed to release ingest key for {task_id}: {e}")
+
+    def lookup(self, key: str) -> Optional[str]:
+        return self.client.get(f"{self.KEY_PREFIX}:{key}")
+
+# Singleton
+ingest_registry = IngestRegistry(ttl=settings.INGEST_IDEMPOTENCY_TTL_SECONDS)
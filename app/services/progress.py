@@ -0,0 +1,75 @@
+import json
+import time
+from typing import Any, Optional
+import redis
+from app.core.config import settings
+
+TERMINAL_STAGES = ("completed", "failed")
+
+# Fields that carry page text; they never belong in Redis-stored task metadata
+CONTENT_FIELDS = {"content", "html", "text", "links"}
+
+def slim_payload(value: Any, max_chars: Optional[int] = None) -> Any:
+    """
+    Copy of a result / progress payload that is safe to store in Redis.
+    1. Page-content fields are dropped (pydantic models are dumped first, so a ScrapeResult loses its text).
+    2. Any other string longer than `max_chars` (PAYLOAD_MAX_STRING_CHARS) is cut.
+    """
+    limit = max_chars or settings.PAYLOAD_MAX_STRING_CHARS
+    if hasattr(value, "model_dump"):
+        value = value.model_dump()
+    if isinstance(value, dict):
+        return {k: slim_payload(v, limit) for k, v in value.items() if k not in CONTENT_FIELDS}
+    if isinstance(value, (list, tuple)):
+        return [slim_payload(v, limit) for v in value]
+    if isinstance(value, str) and len(value) > limit:
+        return f"{value[:limit]}... [{len(value) - limit} chars cut]"
+    return value
+
+def progress_channel(task_id: str) -> str:
+    return f"rag:progress:{task_id}"
+
+def progress_log_key(task_id: str) -> str:
+    # Replay buffer for clients that subscribe after the task started
+    return f"rag:progress:{task_id}:log"
+
+class ProgressPublisher:
+    """
+    Publishes ingestion stage events for one task over Redis pub/sub.
+
+    Every event is also appended to a short-lived list, so a client that connects
+    late first replays what it missed, then follows the live channel. Events carry
+    a sequence number so the replay and the live feed can be stitched without gaps
+    or duplicates. Publishing never raises: progress is best effort.
+    """
+    LOG_TTL_SECONDS = 3600
+
+    def __init__(self, task_id: str, client: Optional[redis.Redis] = None):
+        self.task_id = task_id
+        self._client = client or redis.Redis(
+            host=settings.REDIS_HOST,
+            port=settings.REDIS_PORT,
+            db=0,
+            decode_responses=True,
+        )
+        self._seq = 0
+        self._started = time.monotonic()
+
+    def publish(self, stage: str, message: str, **fields) -> None:
+        self._seq += 1
+        event = slim_payload({
+            "seq": self._seq,
+            "stage": stage,
+            "message": message,
+            "elapsed_ms": round((time.monotonic() - self._started) * 1000),
+            **fields,
+        })
+        payload = json.dumps(event, ensure_ascii=False)
+        try:
+            pipe = self._client.pipeline()
+            pipe.rpush(progress_log_key(self.task_id), payload)
+            pipe.expire(progress_log_key(self.task_id), self.LOG_TTL_SECONDS)
+            pipe.publish(progress_channel(self.task_id), payload)
+            pipe.execute()
+        except Exception as e:
+            print(f"⚠️ Failed to publish progress ({stage}): {e}")
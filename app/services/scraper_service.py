@@ -1,17 +1,30 @@
 import asyncio
+import time
 from playwright.async_api import async_playwright, Page, BrowserContext
-from app.schemas.scrape import ScrapeResult
+from app.core.config import settings
+from app.core.metrics import BROWSER_PAGES_IN_USE, BROWSER_PAGES_LIMIT, SCRAPE_SECONDS, observe_stage
+from app.schemas.scrape import ScrapedLink, ScrapeResult
+from app.services.text_limits import truncate_at_section
 import trafilatura
 
 class PlaywrightScraper:
+    TIER = "playwright"
+
     def __init__(self, max_concurrent: int = 5):
         self.semaphore = asyncio.Semaphore(max_concurrent)
+        BROWSER_PAGES_LIMIT.set(max_concurrent)
+
+    # Anchors as [absolute href, text] pairs (the browser resolves relative links)
+    LINKS_JS = "els => els.map(a => [a.href, (a.innerText || '').trim().slice(0, 200)])"
 
-    async def _scrape_single_url(self, context: BrowserContext, url: str) -> ScrapeResult:
+    async def _scrape_single_url(self, context: BrowserContext, url: str, collect_links: bool = False) -> ScrapeResult:
         """
         Scrapes a single URL with resource blocking and timeout handling.
         """
+        started = time.perf_counter()
+        outcome = "error"
         page = await context.new_page()
+        BROWSER_PAGES_IN_USE.inc()
         try:
             # 1. Optimize: Block unnecessary resources to speed up loading
             await page.route("**/*", lambda route: route.abort() 
@@ -27,22 +40,48 @@ class PlaywrightScraper:
             title = await page.title()
             
             # 4. Clean HTML to Text using Trafilatura (Best for article extraction)
-            cleaned_text = trafilatura.extract(content_html) or ""
+            with observe_stage("text_extraction"):
+                cleaned_text = trafilatura.extract(content_html) or ""
             
             if not cleaned_text:
                 # Fallback if trafilatura fails: get basic body text
                 cleaned_text = await page.inner_text("body")
+            del content_html  # Can be many MB; not needed past extraction
 
-            return ScrapeResult(url=str(url), title=title, content=cleaned_text)
+            # 5. Cap the page size (docs dumps, forum threads) at a section boundary
+            original_chars = len(cleaned_text)
+            cleaned_text, truncated = truncate_at_section(cleaned_text, settings.PAGE_MAX_CHARS)
+            if truncated:
+                print(f"✂️ Truncated {url}: {original_chars} -> {len(cleaned_text)} chars")
+
+            # 6. Outgoing links for the crawler
+            links = []
+            if collect_links:
+                anchors = await page.eval_on_selector_all("a[href]", self.LINKS_JS)
+                links = [ScrapedLink(url=href, text=text) for href, text in anchors if href]
+
+            outcome = "ok" if cleaned_text else "empty"
+            return ScrapeResult(
+                url=str(url), title=title, content=cleaned_text, links=links,
+                truncated=truncated, original_chars=original_chars if truncated else None,
+            )
 
         except Exception as e:
             return ScrapeResult(url=str(url), title="Error", content="", error=str(e))
         finally:
             await page.close()
+            BROWSER_PAGES_IN_USE.dec()
+            SCRAPE_SECONDS.labels(tier=self.TIER, outcome=outcome).observe(time.perf_counter() - started)
+
+    async def _scrape_bounded(self, context: BrowserContext, url: str, collect_links: bool) -> ScrapeResult:
+        # Holds the semaphore for the whole page lifetime, so at most `max_concurrent` pages are open
+        async with self.semaphore:
+            return await self._scrape_single_url(context, url, collect_links)
 
-    async def scrape_urls(self, urls: list[str]) -> list[ScrapeResult]:
+    async def scrape_urls(self, urls: list[str], collect_links: bool = False) -> list[ScrapeResult]:
         """
         Main entry point: Scrapes a list of URLs in parallel (managed by semaphore).
+        With `collect_links`, each result also lists the page's outgoing links.
         """
         async with async_playwright() as p:
             # Launch browser (headless=True for production)
@@ -51,13 +90,7 @@ class PlaywrightScraper:
                 user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
             )
 
-            tasks = []
-            for url in urls:
-                # Wrap each scrape task with the semaphore to limit concurrency
-                async with self.semaphore:
-                    task = asyncio.create_task(self._scrape_single_url(context, str(url)))
-                    tasks.append(task)
-            
+            tasks = [asyncio.create_task(self._scrape_bounded(context, str(url), collect_links)) for url in urls]
             results = await asyncio.gather(*tasks)
             
             await browser.close()
@@ -1,10 +1,9 @@
 import httpx
 from app.core.config import settings
+from app.core.metrics import observe_stage
 from app.schemas.search import SearchResultItem
 
 class SearchService:
-    BASE_URL = "https://google.serper.dev/search"
-
     async def search(self, query: str, num_results: int = 10) -> list[SearchResultItem]:
         """
         Searches Google via Serper.dev and returns a list of formatted results.
@@ -22,10 +21,11 @@ class SearchService:
             "num": num_results
         }
 
-        async with httpx.AsyncClient() as client:
-            response = await client.post(self.BASE_URL, headers=headers, json=payload)
-            response.raise_for_status()
-            data = response.json()
+        with observe_stage("search"):
+            async with httpx.AsyncClient() as client:
+                response = await client.post(settings.SERPER_URL, headers=headers, json=payload)
+                response.raise_for_status()
+                data = response.json()
 
         # Parse organic results
         results = []
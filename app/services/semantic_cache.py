@@ -0,0 +1,223 @@
+import logging
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Iterator, List, Optional
+import numpy as np
+from llama_index.core.schema import NodeWithScore, TextNode
+from app.core.config import settings
+from app.services.graph_version import graph_versions
+
+logger = logging.getLogger("semantic_cache")
+
+@dataclass
+class CachedAnswer:
+    question: str
+    answer: str
+    sources: List[dict]        # Serialized NodeWithScore (id, text, score, metadata)
+    entity_ids: frozenset      # Graph entities the sources mention (invalidation scope)
+    created_at: float
+    namespace: Optional[str] = None  # Retrieval scope the answer was produced in
+    similarity: float = 0.0    # Set on lookup
+
+    def source_nodes(self) -> List[NodeWithScore]:
+        return [
+            NodeWithScore(
+                node=TextNode(id_=s["node_id"], text=s["text"], metadata=s["metadata"]),
+                score=s["score"],
+            )
+            for s in self.sources
+        ]
+
+    def replay(self, words_per_chunk: int = 4) -> Iterator[str]:
+        """Re-streams the cached answer in small word groups (whitespace preserved)."""
+        words = re.findall(r"\S+\s*|\s+", self.answer)
+        for i in range(0, len(words), words_per_chunk):
+            yield "".join(words[i:i + words_per_chunk])
+
+class SemanticAnswerCache:
+    """
+    In-process semantic cache for chat answers.
+
+    Question embeddings are L2-normalized rows of a fixed-capacity float32 matrix,
+    so a lookup is a single matrix-vector product. Only entries answered in the same
+    namespace (or both unscoped) can match. Entries are dropped when:
+      1. They are older than `ttl` seconds.
+      2. An ingest touches one of the graph entities their sources mention
+         (entries without known entities are dropped on any ingest).
+      3. Capacity is reached (the least recently hit entry is replaced).
+    If Redis (the graph version) is unreachable the cache fails closed.
+    """
+
+    def __init__(self, threshold: float, max_entries: int, ttl: float, sync_interval: float = 1.0):
+        self._threshold = threshold
+        self._capacity = max_entries
+        self._ttl = ttl
+        self._sync_interval = sync_interval
+
+        self._matrix: Optional[np.ndarray] = None   # (capacity, dim), allocated on first insert
+        self._valid = np.zeros(max_entries, dtype=bool)
+        self._last_hit = np.zeros(max_entries, dtype=np.float64)
+        self._namespaces = np.full(max_entries, None, dtype=object)
+        self._entries: List[Optional[CachedAnswer]] = [None] * max_entries
+
+        self._version: Optional[int] = None
+        self._last_sync = 0.0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "invalidations": 0}
+
+    # --- Public API ---
+
+    def lookup(self, embedding: List[float], namespace: Optional[str] = None) -> Optional[CachedAnswer]:
+        query = self._normalize(embedding)
+        with self._lock:
+            if not self._sync() or self._matrix is None or query.shape[0] != self._matrix.shape[1]:
+                self._stats["misses"] += 1
+                return None
+
+            now = time.time()
+            self._expire(now)
+            if not self._valid.any():
+                self._stats["misses"] += 1
+                return None
+
+            scores = self._matrix @ query
+            scores[~self._valid | (self._namespaces != namespace)] = -1.0
+            slot = int(np.argmax(scores))
+            if scores[slot] < self._threshold:
+                self._stats["misses"] += 1
+                return None
+
+            self._last_hit[slot] = now
+            self._stats["hits"] += 1
+            entry = self._entries[slot]
+            entry.similarity = float(scores[slot])
+            return entry
+
+    def store(
+        self,
+        question: str,
+        embedding: List[float],
+        answer: str,
+        source_nodes: List[NodeWithScore],
+        entity_ids: set[str],
+        graph_version: int,
+        namespace: Optional[str] = None,
+    ) -> bool:
+        """
+        Caches an answer retrieved at `graph_version`.
+        Skipped if its entities were re-ingested while the answer was being generated.
+        """
+        vector = self._normalize(embedding)
+        with self._lock:
+            if not self._sync():
+                return False
+            try:
+                _, touched = graph_versions.touched_since(graph_version)
+            except Exception as e:
+                logger.warning(f"⚠️ Semantic cache store skipped (graph version unavailable): {e}")
+                return False
+            if touched and (not entity_ids or touched & entity_ids):
+                return False
+
+            if self._matrix is None:
+                self._matrix = np.zeros((self._capacity, vector.shape[0]), dtype=np.float32)
+            elif vector.shape[0] != self._matrix.shape[1]:
+                return False  # Embedding model changed; ignore
+
+            slot = self._free_slot()
+            self._matrix[slot] = vector
+            self._valid[slot] = True
+            self._last_hit[slot] = time.time()
+            self._namespaces[slot] = namespace
+            self._entries[slot] = CachedAnswer(
+                question=question,
+                answer=answer,
+                sources=[
+                    {
+                        "node_id": n.node.node_id,
+                        "text": n.node.get_content(),
+                        "score": n.score,
+                        "metadata": dict(n.node.metadata),
+                    }
+                    for n in source_nodes
+                ],
+                entity_ids=frozenset(entity_ids),
+                created_at=time.time(),
+                namespace=namespace,
+            )
+            self._stats["stores"] += 1
+            return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._valid[:] = False
+            self._entries = [None] * self._capacity
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "entries": int(self._valid.sum()),
+                "capacity": self._capacity,
+                "hit_rate": self._stats["hits"] / lookups if lookups else 0.0,
+                "graph_version": self._version,
+            }
+
+    # --- Internal helpers (caller holds self._lock) ---
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _sync(self) -> bool:
+        """Pulls entity invalidations from the graph version log (rate limited)."""
+        now = time.monotonic()
+        if self._version is not None and now - self._last_sync < self._sync_interval:
+            return True
+        try:
+            if self._version is None:
+                self._version = graph_versions.current()
+            else:
+                current, touched = graph_versions.touched_since(self._version)
+                if current != self._version:
+                    self._invalidate(touched)
+                    self._version = current
+            self._last_sync = now
+            return True
+        except Exception as e:
+            logger.warning(f"⚠️ Semantic cache bypassed (graph version unavailable): {e}")
+            return False
+
+    def _invalidate(self, touched: set[str]) -> None:
+        for slot in np.flatnonzero(self._valid):
+            entry = self._entries[slot]
+            if not entry.entity_ids or entry.entity_ids & touched:
+                self._drop(slot)
+                self._stats["invalidations"] += 1
+
+    def _expire(self, now: float) -> None:
+        for slot in np.flatnonzero(self._valid):
+            if now - self._entries[slot].created_at > self._ttl:
+                self._drop(slot)
+
+    def _drop(self, slot: int) -> None:
+        self._valid[slot] = False
+        self._entries[slot] = None
+
+    def _free_slot(self) -> int:
+        free = np.flatnonzero(~self._valid)
+        if free.size:
+            return int(free[0])
+        return int(np.argmin(self._last_hit))
+
+# Singleton
+semantic_cache = SemanticAnswerCache(
+    threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+    max_entries=settings.SEMANTIC_CACHE_MAX_ENTRIES,
+    ttl=settings.SEMANTIC_CACHE_TTL_SECONDS,
+)
@@ -0,0 +1,341 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from llama_index.core.graph_stores.types import EntityNode, Relation, Triplet
+from app.core.config import settings
+from app.services.graph_version import graph_versions
+
+logger = logging.getLogger("subgraph_cache")
+
+# One row per relationship within `depth` hops of each seed (per-seed limit, unlike get_rel_map).
+# With a $namespace only relationships tagged with it are followed.
+EXPANSION_QUERY = """
+UNWIND $ids AS seed_id
+CALL {{
+    WITH seed_id
+    MATCH (e:__Entity__ {{id: seed_id}})
+    MATCH p=(e)-[*1..{depth}]-(other)
+    WHERE ALL(rel IN relationships(p) WHERE type(rel) <> 'MENTIONS' AND NOT type(rel) IN $ignore_rels
+              AND ($namespace IS NULL OR $namespace IN coalesce(rel.namespaces, [])))
+    UNWIND relationships(p) AS rel
+    WITH DISTINCT rel
+    LIMIT toInteger($limit)
+    RETURN startNode(rel) AS source, type(rel) AS type, endNode(rel) AS target
+}}
+RETURN seed_id,
+       source.id AS source_id,
+       [l IN labels(source) WHERE NOT l IN ['__Entity__', '__Node__'] | l][0] AS source_type,
+       source.triplet_source_id AS source_chunk,
+       type,
+       target.id AS target_id,
+       [l IN labels(target) WHERE NOT l IN ['__Entity__', '__Node__'] | l][0] AS target_type,
+       target.triplet_source_id AS target_chunk
+"""
+
+@dataclass
+class Subgraph:
+    """
+    Compact adjacency of one seed's neighbourhood.
+    Nodes are stored once; edges reference them by position.
+    """
+    nodes: List[Tuple[str, Optional[str], Optional[str]]]  # (id, label, triplet_source_id)
+    edges: List[Tuple[int, str, int]]                      # (source idx, relation, target idx)
+    version: int                                           # Graph version it is known valid at
+
+    @classmethod
+    def from_rows(cls, rows: List[dict], version: int) -> "Subgraph":
+        index: Dict[str, int] = {}
+        nodes, edges, seen = [], [], set()
+
+        def node(id_, label, chunk):
+            if id_ not in index:
+                index[id_] = len(nodes)
+                nodes.append((id_, label, chunk))
+            return index[id_]
+
+        for r in rows:
+            src = node(r["source_id"], r["source_type"], r["source_chunk"])
+            dst = node(r["target_id"], r["target_type"], r["target_chunk"])
+            if (src, r["type"], dst) not in seen:  # Rows of several seeds can share relationships
+                seen.add((src, r["type"], dst))
+                edges.append((src, r["type"], dst))
+        return cls(nodes=nodes, edges=edges, version=version)
+
+    def node_ids(self) -> frozenset:
+        return frozenset(n[0] for n in self.nodes)
+
+    def triplets(self) -> List[Triplet]:
+        entities = [
+            EntityNode(
+                name=id_,
+                label=label or "entity",
+                properties={"triplet_source_id": chunk} if chunk else {},
+            )
+            for id_, label, chunk in self.nodes
+        ]
+        return [
+            [entities[s], Relation(label=rel, source_id=entities[s].id, target_id=entities[t].id), entities[t]]
+            for s, rel, t in self.edges
+        ]
+
+    def to_json(self) -> str:
+        return json.dumps({"n": self.nodes, "e": self.edges, "v": self.version})
+
+    @classmethod
+    def from_json(cls, raw: str) -> "Subgraph":
+        data = json.loads(raw)
+        return cls(
+            nodes=[tuple(n) for n in data["n"]],
+            edges=[tuple(e) for e in data["e"]],
+            version=data["v"],
+        )
+
+class SubgraphCache:
+    """
+    Cache of k-hop neighbourhoods used by retrieval expansion.
+
+    Keyed by (entity id, hops, ignored relations, namespace). Lookups go:
+      1. In-process LRU.
+      2. Redis (optional, shared by all API workers). An entry is only used if
+         none of its nodes were touched by an ingest after it was built.
+      3. Neo4j, for all remaining seeds in one query.
+    Local entries are dropped when a graph version sync reports one of their
+    nodes as touched. If Redis (the graph version) is unreachable the cache is
+    bypassed and every expansion goes to Neo4j.
+    """
+    KEY_PREFIX = "rag:subgraph"
+
+    def __init__(self, max_entries: int, use_redis: bool, redis_ttl: int, sync_interval: float = 1.0):
+        self._capacity = max_entries
+        self._use_redis = use_redis
+        self._redis_ttl = redis_ttl
+        self._sync_interval = sync_interval
+
+        self._entries: "OrderedDict[tuple, Subgraph]" = OrderedDict()
+        self._node_ids: Dict[tuple, frozenset] = {}
+
+        self._version: Optional[int] = None
+        self._last_sync = 0.0
+        self._lock = threading.Lock()
+        self._stats = {"local_hits": 0, "redis_hits": 0, "misses": 0, "invalidations": 0}
+        self._latency_ms = deque(maxlen=1000)
+
+    # --- Public API ---
+
+    def get_rel_map(
+        self, graph_store, seed_ids: Sequence[str], depth: int, limit: int, ignore_rels: Sequence[str],
+        namespace: Optional[str] = None,
+    ) -> List[Triplet]:
+        start = time.perf_counter()
+        keys = {id_: self._key(id_, depth, ignore_rels, namespace) for id_ in seed_ids}
+        found, version = self._lookup(keys)
+        missing = [id_ for id_ in seed_ids if id_ not in found]
+
+        if missing:
+            rows = graph_store.structured_query(
+                EXPANSION_QUERY.format(depth=int(depth)),
+                param_map={"ids": missing, "limit": limit, "ignore_rels": list(ignore_rels), "namespace": namespace},
+            )
+            found.update(self._fill(keys, missing, rows, version))
+
+        return self._finish(seed_ids, found, start)
+
+    async def aget_rel_map(
+        self, graph_store, seed_ids: Sequence[str], depth: int, limit: int, ignore_rels: Sequence[str],
+        namespace: Optional[str] = None,
+    ) -> List[Triplet]:
+        start = time.perf_counter()
+        keys = {id_: self._key(id_, depth, ignore_rels, namespace) for id_ in seed_ids}
+        # Version sync and the Redis tier are blocking calls; keep them off the event loop
+        found, version = await asyncio.to_thread(self._lookup, keys)
+        missing = [id_ for id_ in seed_ids if id_ not in found]
+
+        if missing:
+            rows = await graph_store.astructured_query(
+                EXPANSION_QUERY.format(depth=int(depth)),
+                param_map={"ids": missing, "limit": limit, "ignore_rels": list(ignore_rels), "namespace": namespace},
+            )
+            found.update(await asyncio.to_thread(self._fill, keys, missing, rows, version))
+
+        return self._finish(seed_ids, found, start)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._node_ids.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            entries = len(self._entries)
+            latencies = np.array(self._latency_ms, dtype=np.float64)
+
+        lookups = stats["local_hits"] + stats["redis_hits"] + stats["misses"]
+        result = {
+            **stats,
+            "entries": entries,
+            "capacity": self._capacity,
+            "hit_rate": (stats["local_hits"] + stats["redis_hits"]) / lookups if lookups else 0.0,
+            "graph_version": self._version,
+            "expansion_ms": None,
+        }
+        if latencies.size:
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+            result["expansion_ms"] = {
+                "p50": round(float(p50), 2),
+                "p95": round(float(p95), 2),
+                "p99": round(float(p99), 2),
+                "mean": round(float(latencies.mean()), 2),
+            }
+        return result
+
+    # --- Internal helpers ---
+
+    def _key(self, entity_id: str, depth: int, ignore_rels: Sequence[str], namespace: Optional[str]) -> tuple:
+        return (entity_id, int(depth), tuple(sorted(ignore_rels)), namespace)
+
+    def _redis_key(self, key: tuple) -> str:
+        entity_id, depth, ignore_rels, namespace = key
+        return f"{self.KEY_PREFIX}:{depth}:{','.join(ignore_rels)}:{namespace or '*'}:{entity_id}"
+
+    def _lookup(self, keys: Dict[str, tuple]) -> Tuple[Dict[str, Subgraph], Optional[int]]:
+        """
+        Returns (cached subgraphs by seed id, version to stamp new entries with).
+        The version is None when the cache is bypassed.
+        """
+        found: Dict[str, Subgraph] = {}
+        with self._lock:
+            if not self._sync():
+                self._stats["misses"] += len(keys)
+                return found, None
+            version = self._version
+            for id_, key in keys.items():
+                subgraph = self._entries.get(key)
+                if subgraph is not None:
+                    self._entries.move_to_end(key)
+                    found[id_] = subgraph
+            self._stats["local_hits"] += len(found)
+
+        remaining = {id_: key for id_, key in keys.items() if id_ not in found}
+        if remaining and self._use_redis:
+            shared = self._redis_get(remaining)
+            with self._lock:
+                for id_, subgraph in shared.items():
+                    self._put(remaining[id_], subgraph)
+                self._stats["redis_hits"] += len(shared)
+            found.update(shared)
+
+        with self._lock:
+            self._stats["misses"] += len(keys) - len(found)
+        return found, version
+
+    def _redis_get(self, keys: Dict[str, tuple]) -> Dict[str, Subgraph]:
+        try:
+            client = graph_versions.client
+            raws = client.mget([self._redis_key(key) for key in keys.values()])
+            candidates = {
+                id_: Subgraph.from_json(raw)
+                for id_, raw in zip(keys.keys(), raws)
+                if raw is not None
+            }
+            if not candidates:
+                return {}
+
+            # Reject entries any of whose nodes were re-ingested after they were built
+            pipe = client.pipeline()
+            for id_, subgraph in candidates.items():
+                pipe.zmscore(graph_versions.TOUCHED_KEY, [id_] + [n[0] for n in subgraph.nodes])
+            fresh = {}
+            for (id_, subgraph), scores in zip(candidates.items(), pipe.execute()):
+                if all(s is None or s <= subgraph.version for s in scores):
+                    fresh[id_] = subgraph
+            return fresh
+        except Exception as e:
+            logger.warning(f"⚠️ Subgraph cache Redis tier unavailable: {e}")
+            return {}
+
+    def _fill(self, keys: Dict[str, tuple], missing: List[str], rows: List[dict], version: Optional[int]) -> Dict[str, Subgraph]:
+        by_seed: Dict[str, List[dict]] = {id_: [] for id_ in missing}
+        for r in rows or []:
+            by_seed.setdefault(r["seed_id"], []).append(r)
+        fetched = {id_: Subgraph.from_rows(by_seed[id_], version or 0) for id_ in missing}
+        if version is None:
+            return fetched
+
+        with self._lock:
+            # A sync that ran during the fetch may already have invalidated these
+            if self._version == version:
+                for id_, subgraph in fetched.items():
+                    self._put(keys[id_], subgraph)
+
+        if self._use_redis:
+            try:
+                pipe = graph_versions.client.pipeline()
+                for id_, subgraph in fetched.items():
+                    pipe.set(self._redis_key(keys[id_]), subgraph.to_json(), ex=self._redis_ttl)
+                pipe.execute()
+            except Exception as e:
+                logger.warning(f"⚠️ Subgraph cache Redis write failed: {e}")
+        return fetched
+
+    def _finish(self, seed_ids: Sequence[str], found: Dict[str, Subgraph], start: float) -> List[Triplet]:
+        # Merge seed neighbourhoods; overlapping ones share relationships
+        triplets, seen = [], set()
+        for id_ in seed_ids:
+            for triplet in found[id_].triplets():
+                edge = (triplet[0].id, triplet[1].label, triplet[2].id)
+                if edge not in seen:
+                    seen.add(edge)
+                    triplets.append(triplet)
+        with self._lock:
+            self._latency_ms.append((time.perf_counter() - start) * 1000)
+        return triplets
+
+    # --- Local tier (caller holds self._lock) ---
+
+    def _put(self, key: tuple, subgraph: Subgraph) -> None:
+        self._entries[key] = subgraph
+        self._entries.move_to_end(key)
+        self._node_ids[key] = subgraph.node_ids()
+        while len(self._entries) > self._capacity:
+            evicted, _ = self._entries.popitem(last=False)
+            self._node_ids.pop(evicted, None)
+
+    def _sync(self) -> bool:
+        """Pulls entity invalidations from the graph version log (rate limited)."""
+        now = time.monotonic()
+        if self._version is not None and now - self._last_sync < self._sync_interval:
+            return True
+        try:
+            if self._version is None:
+                self._version = graph_versions.current()
+            else:
+                current, touched = graph_versions.touched_since(self._version)
+                if current != self._version:
+                    self._invalidate(touched)
+                    self._version = current
+            self._last_sync = now
+            return True
+        except Exception as e:
+            logger.warning(f"⚠️ Subgraph cache bypassed (graph version unavailable): {e}")
+            return False
+
+    def _invalidate(self, touched: set[str]) -> None:
+        # The seed itself is always one of the nodes, so an edge added to it is caught too
+        for key in [k for k, ids in self._node_ids.items() if ids & touched or k[0] in touched]:
+            self._entries.pop(key, None)
+            self._node_ids.pop(key, None)
+            self._stats["invalidations"] += 1
+
+# Singleton
+subgraph_cache = SubgraphCache(
+    max_entries=settings.SUBGRAPH_CACHE_MAX_ENTRIES,
+    use_redis=settings.SUBGRAPH_CACHE_REDIS,
+    redis_ttl=settings.SUBGRAPH_CACHE_REDIS_TTL_SECONDS,
+)
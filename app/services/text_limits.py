@@ -0,0 +1,37 @@
+from typing import Iterator, Tuple
+
+# Boundaries tried in order when text has to be cut: section break, line / paragraph, sentence
+BOUNDARIES = ("\n\n", "\n", ". ")
+
+def cut_point(text: str, start: int, max_chars: int) -> int:
+    """
+    End index for a piece of `text` starting at `start` and at most `max_chars` long,
+    placed on the strongest boundary found in the second half of the budget.
+    """
+    end = start + max_chars
+    if end >= len(text):
+        return len(text)
+    floor = start + max_chars // 2
+    for sep in BOUNDARIES:
+        cut = text.rfind(sep, floor, end)
+        if cut != -1:
+            return cut + len(sep)
+    return end  # One unbroken run of text; cut mid-way
+
+def truncate_at_section(text: str, max_chars: int) -> Tuple[str, bool]:
+    """Returns (text, truncated): `text` itself if it fits, else its head ending at a section boundary."""
+    if not text or len(text) <= max_chars:
+        return text, False
+    return text[:cut_point(text, 0, max_chars)].rstrip(), True
+
+def iter_windows(text: str, max_chars: int) -> Iterator[str]:
+    """Consecutive pieces of at most `max_chars`, each ending on a boundary; slices are made lazily."""
+    if max_chars <= 0:
+        raise ValueError(f"max_chars must be positive, got {max_chars}")  # No window could ever advance
+    start = 0
+    while start < len(text):
+        end = cut_point(text, start, max_chars)
+        window = text[start:end].strip()
+        if window:
+            yield window
+        start = end
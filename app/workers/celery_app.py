@@ -1,14 +1,33 @@
-from celery import Celery
+import os
+from datetime import timedelta
+from celery import Celery, Task
+from celery.signals import worker_init, worker_process_shutdown
+from kombu import Queue
 from app.core.config import settings
+from app.core.metrics import mark_process_dead, start_exporter
+from app.services.progress import slim_payload
 
 # Print to console to verify URL is correct on startup
 print(f"DEBUG: Celery Broker URL -> {settings.CELERY_BROKER_URL}")
 
+class SlimResultTask(Task):
+    """
+    Task base that keeps page content out of the result backend: return values and
+    `update_state` metadata pass through slim_payload before Celery stores them.
+    """
+
+    def __call__(self, *args, **kwargs):
+        return slim_payload(super().__call__(*args, **kwargs))
+
+    def update_state(self, task_id=None, state=None, meta=None, **kwargs):
+        return super().update_state(task_id=task_id, state=state, meta=slim_payload(meta), **kwargs)
+
 celery_app = Celery(
     "worker",
     broker=settings.CELERY_BROKER_URL,
     backend=settings.CELERY_RESULT_BACKEND,
-    include=["app.workers.tasks"]
+    include=["app.workers.tasks"],
+    task_cls=SlimResultTask,
 )
 
 celery_app.conf.update(
@@ -17,4 +36,36 @@ celery_app.conf.update(
     result_serializer="json",
     timezone="UTC",
     enable_utc=True,
-)
\ No newline at end of file
+    # Priority queues: a worker without -Q consumes all of them; run a dedicated
+    # `-Q ingest.interactive` worker to keep user submissions off the bulk backlog
+    task_queues=(Queue("ingest.interactive"), Queue("ingest.bulk")),
+    task_default_queue="ingest.interactive",
+    task_routes={
+        "refresh_communities": {"queue": "ingest.bulk"},
+        "crawl_pipeline": {"queue": "ingest.bulk"},
+        "crawl_worker": {"queue": "ingest.bulk"},
+        "graph_maintenance": {"queue": "ingest.bulk"},
+        "delete_namespace": {"queue": "ingest.bulk"},
+    },
+    # One task at a time per process, so a long bulk job never hides queued interactive ones
+    worker_prefetch_multiplier=1,
+)
+
+# Scheduled jobs (run `celery -A app.workers.celery_app beat` next to the workers)
+if settings.MAINTENANCE_INTERVAL_HOURS > 0:
+    celery_app.conf.beat_schedule = {
+        "graph-maintenance": {
+            "task": "graph_maintenance",
+            "schedule": timedelta(hours=settings.MAINTENANCE_INTERVAL_HOURS),
+        },
+    }
+
+@worker_init.connect
+def start_metrics_exporter(**kwargs):
+    # Main worker process only; with prefork, children report through PROMETHEUS_MULTIPROC_DIR
+    if settings.METRICS_WORKER_PORT:
+        start_exporter(settings.METRICS_WORKER_PORT)
+
+@worker_process_shutdown.connect
+def cleanup_metrics(pid=None, **kwargs):
+    mark_process_dead(pid or os.getpid())
@@ -1,26 +1,55 @@
 import asyncio
 import sys
+import time
+from typing import Optional
 from asgiref.sync import async_to_sync
 from celery import shared_task
 from app.services.search_service import search_service
 from app.services.scraper_service import scraper_service
 from app.services.graph_service import graph_service  # <--- NEW IMPORT
+from app.services.community_service import community_service
+from app.services.crawl_service import crawl_service
+from app.services.graph_maintenance import graph_maintenance
+from app.services.graph_namespaces import graph_namespaces, namespace_slug
+from app.services.ingest_admission import ingest_admission
+from app.services.ingest_registry import ingest_registry
+from app.services.progress import ProgressPublisher
+from app.core.config import settings
+from app.core.metrics import observe_stage
+from app.core.profiling import should_profile, start_profile
 
 # Windows Fix
 if sys.platform.startswith("win"):
     asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
 
 @shared_task(bind=True, name="ingest_pipeline")
-def ingest_pipeline_task(self, query: str, num_results: int):
+def ingest_pipeline_task(
+    self,
+    query: str,
+    num_results: int,
+    profile: bool = False,
+    namespace: Optional[str] = None,
+    idempotency_key: Optional[str] = None,
+):
     """
     Full Pipeline: Search -> Scrape -> Knowledge Graph Injection
+    Documents are tagged with `namespace` (default: the query's slug).
+    Unless the pipeline completes, `idempotency_key` is released so the same ingest can be resubmitted.
+    Stage events are pushed to GET /ingest/progress/{task_id} as they happen.
+    With `profile` (or PROFILE_SAMPLE_RATE) a profile is stored under the task id (GET /profiles/{task_id}).
     """
+    namespace = namespace or namespace_slug(query)
+    progress = ProgressPublisher(self.request.id)
+    session = start_profile(self.request.id, "ingest") if should_profile(profile) else None
+    completed = False
     try:
         # Step 1: Search
         self.update_state(state='PROGRESS', meta={'status': 'Searching Google...'})
+        progress.publish("searching", f"Searching for '{query}'...")
         
         # FIX: Fetch more results (e.g., +3 buffer) to account for filtering
         buffer_size = 3 
+        started = time.time()
         search_results = async_to_sync(search_service.search)(query, num_results + buffer_size)
         
         # Filter Wikipedia
@@ -33,14 +62,31 @@ def ingest_pipeline_task(self, query: str, num_results: int):
         urls = valid_urls[:num_results]
         
         if not urls:
+             progress.publish("failed", "No valid URLs found")
              return {"status": "failed", "reason": "No valid URLs found"}
 
+        progress.publish(
+            "searched", f"Found {len(urls)} URLs",
+            urls=urls, duration_ms=round((time.time() - started) * 1000),
+        )
+
         # Step 2: Scrape
         self.update_state(state='PROGRESS', meta={'status': f'Scraping {len(urls)} sites...'})
-        scrape_results = async_to_sync(scraper_service.scrape_urls)(urls)
+        progress.publish("scraping", f"Scraping {len(urls)} sites...", urls_total=len(urls))
+        started = time.time()
+        with observe_stage("scrape"):
+            scrape_results = async_to_sync(scraper_service.scrape_urls)(urls)
+        scrape_ms = round((time.time() - started) * 1000)
+        for result in scrape_results:
+            progress.publish(
+                "url_scraped", f"{'Failed' if result.error else 'Scraped'}: {result.url}",
+                url=result.url, ok=not result.error, chars=len(result.content or ""),
+                truncated=result.truncated, error=result.error, duration_ms=scrape_ms,
+            )
         
         # Step 3: Graph Injection (NEW STEP)
         total_scraped = len(scrape_results)
+        documents, llm_calls = 0, [0]  # Real cost, fed back into admission estimates
         for i, result in enumerate(scrape_results):
             if result.error:
                 continue
@@ -50,18 +96,118 @@ def ingest_pipeline_task(self, query: str, num_results: int):
                 'status': f'Building Graph: Processing {i+1}/{total_scraped}',
                 'current_url': result.url
             })
+            progress.publish(
+                "extracting", f"Building Graph: Processing {i+1}/{total_scraped}",
+                url=result.url, document=i + 1, documents=total_scraped,
+            )
             
             # INJECT INTO NEO4J
-            graph_service.process_document(result.content, result.url)
+            def on_progress(stage, message, **fields):
+                if stage == "chunk_extracted":
+                    llm_calls[0] += 1
+                progress.publish(stage, message, document=i + 1, documents=total_scraped, **fields)
+
+            graph_service.process_document(result.content, result.url, on_progress=on_progress, namespace=namespace)
+            result.content = ""  # Release the page text before the next document
+            documents += 1
+
+        ingest_admission.observe(documents, llm_calls[0])
 
+        # Step 4: Refresh community summaries (debounced; back-to-back ingests share one run)
+        schedule_community_refresh()
+
+        progress.publish("completed", "Knowledge Graph built successfully.", scraped_count=total_scraped)
+        completed = True
         return {
             "status": "completed",
             "query": query,
+            "namespace": namespace,
             "scraped_count": total_scraped,
+            "documents": documents,  # Scraped pages handed to the graph (failed scrapes excluded)
             "message": "Knowledge Graph built successfully."
         }
 
     except Exception as e:
         print(f"Task Failed: {str(e)}")
+        progress.publish("failed", str(e))
         # Re-raise so Celery marks it as FAILED
-        raise e
\ No newline at end of file
+        raise e
+    finally:
+        ingest_admission.release(self.request.id)
+        if idempotency_key and not completed:
+            ingest_registry.release(idempotency_key, self.request.id)
+        if session:
+            session.stop()
+
+def schedule_community_refresh():
+    """Queues a delayed community refresh unless one is already queued (back-to-back ingests share it)."""
+    if community_service.claim_pending():
+        refresh_communities_task.apply_async(countdown=settings.COMMUNITY_REFRESH_DELAY_SECONDS)
+
+@shared_task(bind=True, name="refresh_communities", max_retries=settings.COMMUNITY_REFRESH_MAX_RETRIES)
+def refresh_communities_task(self, force: bool = False):
+    """
+    Re-detects graph communities and re-summarizes the ones touched since the last run.
+    """
+    community_service.clear_pending()
+    self.update_state(state='PROGRESS', meta={'status': 'Detecting communities...'})
+    stats = community_service.refresh(force=force)
+    if stats["status"] == "locked" and self.request.retries < self.max_retries:
+        # Another refresh is running and may miss recent ingests: retry once it has likely
+        # finished, unless another queued refresh will already cover them
+        if force or community_service.claim_pending():
+            raise self.retry(countdown=settings.COMMUNITY_REFRESH_DELAY_SECONDS)
+    return stats
+
+@shared_task(bind=True, name="crawl_pipeline")
+def crawl_pipeline_task(self, crawl_id: str, query: str, num_seeds: int, workers: int):
+    """
+    Seeds a crawl's frontier from search results and fans out its crawl workers.
+    """
+    self.update_state(state='PROGRESS', meta={'status': 'Searching Google...'})
+    try:
+        seeded = crawl_service.seed(crawl_id, query, num_seeds)
+    except Exception as e:
+        crawl_service.abort(crawl_id, f"Seeding failed: {e}")
+        raise
+    if not seeded:
+        crawl_service.abort(crawl_id, "No valid URLs found")
+        return {"status": "failed", "crawl_id": crawl_id, "reason": "No valid URLs found"}
+
+    worker_ids = [crawl_worker_task.delay(crawl_id).id for _ in range(workers)]
+    return {"status": "started", "crawl_id": crawl_id, "seeded": seeded, "workers": worker_ids}
+
+@shared_task(bind=True, name="crawl_worker")
+def crawl_worker_task(self, crawl_id: str):
+    """
+    Pulls URL batches from the crawl frontier until it is exhausted or the page budget is spent.
+    Several run per crawl; the one that finds the crawl finished triggers the community refresh.
+    """
+    stats = crawl_service.run_worker(crawl_id, worker_id=self.request.id)
+    if stats.get("finished"):
+        schedule_community_refresh()
+    return stats
+
+@shared_task(bind=True, name="graph_maintenance")
+def graph_maintenance_task(self):
+    """
+    Compacts the graph (scheduled by Celery beat): merges duplicates, prunes orphans,
+    re-embeds stale nodes and refreshes indexes. Communities are refreshed if anything merged.
+    """
+    self.update_state(state='PROGRESS', meta={'status': 'Compacting graph...'})
+    report = graph_maintenance.run()
+    if report.get("changed"):
+        schedule_community_refresh()
+    return report
+
+@shared_task(bind=True, name="delete_namespace")
+def delete_namespace_task(self, namespace: str):
+    """
+    Deletes a namespace's chunks, and its entities / relationships no remaining chunk mentions.
+    Communities are refreshed afterwards (members may have been deleted).
+    """
+    self.update_state(state='PROGRESS', meta={'status': f"Deleting namespace '{namespace}'..."})
+    report = graph_namespaces.delete(namespace)
+    if report["chunks_deleted"] or report["entities_untagged"]:
+        schedule_community_refresh()
+    return report
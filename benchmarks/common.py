@@ -0,0 +1,59 @@
+import json
+import os
+import subprocess
+import time
+from pathlib import Path
+from typing import List, Optional
+
+# Shared plumbing for the benchmark scripts: pointing the stack at the throwaway
+# services of benchmarks/docker-compose.yml, and recording results per git commit.
+
+def add_stack_args(parser) -> None:
+    parser.add_argument("--neo4j-uri", default="bolt://localhost:7688")
+    parser.add_argument("--neo4j-user", default="neo4j")
+    parser.add_argument("--neo4j-password", default="benchmark")
+    parser.add_argument("--redis-port", default="6380")
+
+def configure_environment(args, **overrides: str) -> None:
+    """Must run before anything from `app` is imported (settings are read on import)."""
+    os.environ.update({
+        "NEO4J_URI": args.neo4j_uri,
+        "NEO4J_USER": args.neo4j_user,
+        "NEO4J_PASSWORD": args.neo4j_password,
+        "REDIS_PORT": args.redis_port,
+        "GOOGLE_API_KEY": "fake",
+        "SERPER_API_KEY": "fake",
+        "METRICS_WORKER_PORT": "0",
+        **overrides,
+    })
+    for name, value in {"POSTGRES_USER": "bench", "POSTGRES_PASSWORD": "bench",
+                        "POSTGRES_DB": "bench", "POSTGRES_PORT": "5432"}.items():
+        os.environ.setdefault(name, value)
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return "unknown"
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))] if ordered else None
+
+def distribution(values: List[float]) -> dict:
+    """p50/p95/p99 in the values' own unit, rounded for the report."""
+    return {
+        name: round(percentile(values, q), 1) if values else None
+        for name, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))
+    }
+
+def load_history(history: Path) -> List[dict]:
+    if not history.exists():
+        return []
+    return [json.loads(line) for line in history.read_text().splitlines() if line.strip()]
+
+def append_history(history: Path, result: dict) -> None:
+    history.parent.mkdir(parents=True, exist_ok=True)
+    with history.open("a") as f:
+        f.write(json.dumps({"commit": git_commit(), "timestamp": time.time(), **result}) + "\n")
+    print(f"\n💾 Appended to {history}")
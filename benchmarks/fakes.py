@@ -0,0 +1,158 @@
+import asyncio
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from types import SimpleNamespace
+from typing import List
+import numpy as np
+import google.generativeai as genai
+from google.api_core.exceptions import ResourceExhausted
+from app.core.graph_schema import VALID_NODES, VALID_RELATIONS
+
+# Deterministic stand-ins for the Gemini SDK. They replace `genai.GenerativeModel`
+# and `genai.embed_content(_async)`, so everything above the SDK (our LLM/embedding
+# wrappers, retries, rate limiter, metrics) runs exactly as in production.
+
+ENTITY = re.compile(r"\b[A-Z][a-zA-Z0-9]+(?:\s+[A-Z][a-zA-Z0-9]+)*\b")
+TEXT_BLOCK = re.compile(r"-------\n(.*?)\n-------", re.S)
+WORD = re.compile(r"\w+")
+
+@dataclass
+class FakeGeminiConfig:
+    latency: float = 0.4          # Seconds per generate call (before output tokens)
+    per_token: float = 0.002      # Extra seconds per output token
+    embed_latency: float = 0.05   # Seconds per embed call
+    rpm: int = 0                  # Quota per minute; above it calls raise 429 (0 = unlimited)
+    dim: int = 768                # text-embedding-004 dimension
+    max_triplets: int = 10
+
+class _Quota:
+    """Sliding one-minute window shared by every fake model, like a per-key API quota."""
+
+    def __init__(self):
+        self.calls = deque()
+        self.lock = threading.Lock()
+        self.rejected = 0
+
+    def check(self, rpm: int) -> None:
+        if not rpm:
+            return
+        with self.lock:
+            now = time.monotonic()
+            while self.calls and now - self.calls[0] > 60:
+                self.calls.popleft()
+            if len(self.calls) >= rpm:
+                self.rejected += 1
+                raise ResourceExhausted("429 Resource has been exhausted (fake quota)")
+            self.calls.append(now)
+
+CONFIG = FakeGeminiConfig()
+QUOTA = _Quota()
+
+def _extract_triplets(prompt: str, limit: int) -> dict:
+    """Deterministic 'extraction': capitalized phrases become entities, neighbours get related."""
+    match = TEXT_BLOCK.search(prompt)
+    text = match.group(1) if match else prompt
+    names = []
+    for name in ENTITY.findall(text):
+        if name not in names and len(name) > 2:
+            names.append(name)
+
+    def pick(options, key):
+        return options[int(hashlib.md5(key.encode()).hexdigest(), 16) % len(options)]
+
+    triplets = []
+    for subject, obj in zip(names, names[1:]):
+        if len(triplets) >= limit:
+            break
+        triplets.append({
+            "subject": {"type": pick(VALID_NODES, subject), "name": subject},
+            "relation": {"type": pick(VALID_RELATIONS, subject + obj)},
+            "object": {"type": pick(VALID_NODES, obj), "name": obj},
+        })
+    return {"triplets": triplets}
+
+def _response(text: str, prompt: str):
+    usage = SimpleNamespace(prompt_token_count=len(prompt) // 4, candidates_token_count=len(text) // 4)
+    return SimpleNamespace(text=text, parts=[text], usage_metadata=usage)
+
+class FakeGenerativeModel:
+    def __init__(self, model_name: str = "fake", **kwargs):
+        self.model_name = model_name
+
+    def _answer(self, prompt: str) -> str:
+        if "-------" in prompt:
+            return json.dumps(_extract_triplets(prompt, CONFIG.max_triplets))
+        # Chat / summaries: echo a fixed-size answer built from the prompt's words
+        words = WORD.findall(prompt)[-60:]
+        return "Based on the context: " + " ".join(words)
+
+    def _delay(self, text: str) -> float:
+        return CONFIG.latency + CONFIG.per_token * (len(text) // 4)
+
+    # Streams: `latency` until the first chunk, then `per_token` per token of each chunk
+    STREAM_CHUNK_WORDS = 4
+
+    def _chunks(self, text: str) -> List[str]:
+        words = text.split(" ")
+        size = self.STREAM_CHUNK_WORDS
+        return [" ".join(words[i:i + size]) + " " for i in range(0, len(words), size)]
+
+    def generate_content(self, prompt, stream: bool = False, **kwargs):
+        QUOTA.check(CONFIG.rpm)
+        text = self._answer(str(prompt))
+        if stream:
+            def chunks():
+                time.sleep(CONFIG.latency)
+                for chunk in self._chunks(text):
+                    time.sleep(CONFIG.per_token * (len(chunk) // 4))
+                    yield _response(chunk, "")
+            return chunks()
+        time.sleep(self._delay(text))
+        return _response(text, str(prompt))
+
+    async def generate_content_async(self, prompt, stream: bool = False, **kwargs):
+        QUOTA.check(CONFIG.rpm)
+        text = self._answer(str(prompt))
+        if stream:
+            async def chunks():
+                await asyncio.sleep(CONFIG.latency)
+                for chunk in self._chunks(text):
+                    await asyncio.sleep(CONFIG.per_token * (len(chunk) // 4))
+                    yield _response(chunk, "")
+            return chunks()
+        await asyncio.sleep(self._delay(text))
+        return _response(text, str(prompt))
+
+def _embed(text: str) -> List[float]:
+    # Hashed bag of words: similar texts get similar vectors, identical texts identical ones
+    vector = np.zeros(CONFIG.dim, dtype=np.float32)
+    for word in WORD.findall(text.lower()):
+        vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % CONFIG.dim] += 1.0
+    norm = np.linalg.norm(vector)
+    return (vector / norm if norm else vector).tolist()
+
+def fake_embed_content(model=None, content=None, task_type=None, **kwargs):
+    time.sleep(CONFIG.embed_latency)
+    if isinstance(content, list):
+        return {"embedding": [_embed(c) for c in content]}
+    return {"embedding": _embed(content)}
+
+async def fake_embed_content_async(model=None, content=None, task_type=None, **kwargs):
+    await asyncio.sleep(CONFIG.embed_latency)
+    if isinstance(content, list):
+        return {"embedding": [_embed(c) for c in content]}
+    return {"embedding": _embed(content)}
+
+def install_fake_gemini(config: FakeGeminiConfig) -> None:
+    """Swaps the Gemini SDK entry points for the fakes (process-wide)."""
+    global CONFIG
+    CONFIG = config
+    genai.configure = lambda **kwargs: None
+    genai.GenerativeModel = FakeGenerativeModel
+    genai.embed_content = fake_embed_content
+    genai.embed_content_async = fake_embed_content_async
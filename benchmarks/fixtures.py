@@ -0,0 +1,129 @@
+import html
+import json
+import random
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+# Local stand-ins for the web: a Serper-compatible search endpoint and a corpus of
+# article pages, half of them static HTML and half rendered by JavaScript.
+
+TOPICS = [
+    "Retrieval Augmented Generation", "Vector Databases", "Graph Neural Networks",
+    "Large Language Models", "Knowledge Graphs", "Semantic Search",
+]
+ENTITIES = [
+    "OpenAI", "Google DeepMind", "Anthropic", "Meta", "Neo4j", "LlamaIndex", "LangChain",
+    "Transformer", "BERT", "GPT", "Gemini", "PyTorch", "TensorFlow", "Kubernetes", "Redis",
+    "PostgreSQL", "Geoffrey Hinton", "Yann LeCun", "Fei Fei Li", "NeurIPS", "ICML", "Python",
+    "Playwright", "Celery", "FastAPI", "Hugging Face", "Stanford", "MIT", "Nvidia", "CUDA",
+]
+FILLER = (
+    "improves", "depends on", "was introduced alongside", "is often compared with",
+    "scales better than", "was adopted by", "builds on ideas from", "is evaluated against",
+)
+
+def _paragraph(rng: random.Random, sentences: int) -> str:
+    parts = []
+    for _ in range(sentences):
+        a, b = rng.sample(ENTITIES, 2)
+        parts.append(f"{a} {rng.choice(FILLER)} {b} in several production systems and research settings.")
+    return " ".join(parts)
+
+def build_corpus(pages: int, paragraphs: int = 8, seed: int = 7) -> Dict[str, dict]:
+    """slug -> {title, paragraphs, js}; deterministic for a given seed."""
+    rng = random.Random(seed)
+    corpus = {}
+    for i in range(pages):
+        topic = TOPICS[i % len(TOPICS)]
+        corpus[f"page-{i}"] = {
+            "title": f"{topic}: notes {i}",
+            "topic": topic,
+            "paragraphs": [_paragraph(rng, rng.randint(4, 8)) for _ in range(paragraphs)],
+            "js": i % 2 == 1,
+        }
+    return corpus
+
+def _render(page: dict) -> str:
+    title = html.escape(page["title"])
+    if not page["js"]:
+        body = "".join(f"<p>{html.escape(p)}</p>" for p in page["paragraphs"])
+        return f"<html><head><title>{title}</title></head><body><article><h1>{title}</h1>{body}</article></body></html>"
+    # Content only exists after the script runs (what a client-side rendered site looks like)
+    return (
+        f"<html><head><title>{title}</title></head><body><article id='root'></article>"
+        f"<script>const data = {json.dumps(page)};"
+        "const root = document.getElementById('root');"
+        "const h = document.createElement('h1'); h.textContent = data.title; root.appendChild(h);"
+        "for (const text of data.paragraphs) { const p = document.createElement('p'); p.textContent = text; root.appendChild(p); }"
+        "</script></body></html>"
+    )
+
+class FixtureServer:
+    """
+    One local HTTP server for both stand-ins:
+      POST /search          Serper-compatible: organic results for the query's topic
+      GET  /pages/<slug>    corpus page (static or JS-rendered)
+    """
+
+    def __init__(self, corpus: Dict[str, dict], host: str = "127.0.0.1", port: int = 0):
+        self.corpus = corpus
+        self.search_requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, body: str, content_type: str):
+                data = body.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                if self.path != "/search":
+                    return self._send(404, "not found", "text/plain")
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                server.search_requests += 1
+                results = server.search(payload.get("q", ""), int(payload.get("num", 10)))
+                self._send(200, json.dumps({"organic": results}), "application/json")
+
+            def do_GET(self):
+                slug = self.path.rsplit("/", 1)[-1]
+                if not self.path.startswith("/pages/") or slug not in server.corpus:
+                    return self._send(404, "not found", "text/plain")
+                self._send(200, _render(server.corpus[slug]), "text/html; charset=utf-8")
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fixture-server", daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def search(self, query: str, num: int) -> List[dict]:
+        # Pages of the query's topic first, then the rest. A trailing "#k" selects the
+        # k-th page of results, so a benchmark's queries ingest different pages.
+        q = query.lower()
+        ranked = sorted(self.corpus.items(), key=lambda kv: kv[1]["topic"].lower() not in q)
+        match = re.search(r"#(\d+)$", query.strip())
+        offset = int(match.group(1)) * num % len(ranked) if match and ranked else 0
+        ranked = ranked[offset:] + ranked[:offset]
+        return [
+            {"title": page["title"], "link": f"{self.base_url}/pages/{slug}", "snippet": page["paragraphs"][0][:160]}
+            for slug, page in ranked[:num]
+        ]
+
+    def start(self) -> "FixtureServer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
@@ -0,0 +1,189 @@
+"""
+Chat latency / concurrency benchmark.
+
+Drives `POST /api/v1/chat/stream` at increasing concurrency and reports p50/p95/p99 of:
+  - retrieval:   server-side retrieval time (`timings.retrieval_ms` of the `done` event)
+  - ttft:        client-side time to the first `token` event
+  - full stream: client-side time to the `done` event
+Generation is served by the fake streaming Gemini (fixed latency / per-token cost), so the
+numbers isolate our own retrieval, framing and concurrency behaviour. Questions name
+entities sampled from the graph, e.g. one built by `benchmarks.synthetic_graph`.
+
+    python -m benchmarks.synthetic_graph --entities 100000 --clear
+    python -m benchmarks.load_chat --concurrency 1,10,50,100 --requests 200
+"""
+import argparse
+import asyncio
+import random
+import threading
+import time
+from pathlib import Path
+from benchmarks.common import add_stack_args, append_history, configure_environment, distribution
+
+QUESTION_TEMPLATES = [
+    "What is {name} and what is it related to?",
+    "How is {name} connected to other entities?",
+    "Summarize what is known about {name}.",
+]
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Chat load benchmark")
+    parser.add_argument("--concurrency", default="1,10,50,100", help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=100, help="Requests per concurrency level")
+    parser.add_argument("--warmup", type=int, default=5, help="Untimed requests before the sweep")
+    parser.add_argument("--questions", type=int, default=500, help="Distinct entities to ask about")
+    parser.add_argument("--mode", choices=["local", "global"], default="local")
+    parser.add_argument("--url", default="", help="Benchmark a running API instead (it must run its own fake/real LLM)")
+    parser.add_argument("--port", type=int, default=8765, help="Port of the in-process API")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="Fake TTFT of the LLM")
+    parser.add_argument("--per-token", type=float, default=0.002)
+    parser.add_argument("--embed-latency", type=float, default=0.02)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    add_stack_args(parser)
+    parser.add_argument("--history", default="benchmarks/results/chat_load.jsonl")
+    parser.add_argument("--label", default="", help="Free-form note stored with the result")
+    return parser.parse_args()
+
+def sample_questions(count: int, seed: int = 7) -> tuple:
+    import neo4j
+    from app.core.config import settings
+
+    driver = neo4j.GraphDatabase.driver(settings.NEO4J_URI, auth=(settings.NEO4J_USER, settings.NEO4J_PASSWORD))
+    with driver.session() as session:
+        names = [r["name"] for r in session.run(
+            "MATCH (e:__Entity__) RETURN e.id AS name ORDER BY rand() LIMIT $count", count=count,
+        )]
+        counts = session.run(
+            "CALL { MATCH (e:__Entity__) RETURN count(e) AS entities } "
+            "CALL { MATCH ()-[r]->() RETURN count(r) AS relationships } "
+            "RETURN entities, relationships"
+        ).single()
+    driver.close()
+    if not names:
+        raise SystemExit("❌ The graph has no entities; run benchmarks.synthetic_graph first")
+    rng = random.Random(seed)
+    questions = [rng.choice(QUESTION_TEMPLATES).format(name=name) for name in names]
+    return questions, {"entities": counts["entities"], "relationships": counts["relationships"]}
+
+def start_api(port: int):
+    """Serves app.main:app from a background thread (same process, so the fake Gemini applies)."""
+    import uvicorn
+    from app.main import app
+
+    config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="off")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, name="benchmark-api", daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise SystemExit(f"❌ Could not start the API on port {port}")
+        time.sleep(0.05)
+    return server, thread
+
+async def one_request(client, base_url: str, question: str, mode: str) -> dict:
+    from app.core.sse_parser import aiter_sse_events
+
+    started = time.perf_counter()
+    sample = {"ttft_ms": None, "stream_ms": None, "retrieval_ms": None, "error": None}
+    try:
+        async with client.stream("POST", f"{base_url}/api/v1/chat/stream",
+                                 json={"message": question, "mode": mode}) as response:
+            if response.status_code != 200:
+                sample["error"] = f"HTTP {response.status_code}"
+                return sample
+            async for event, data in aiter_sse_events(response.aiter_raw()):
+                if event == "token" and sample["ttft_ms"] is None:
+                    sample["ttft_ms"] = (time.perf_counter() - started) * 1000
+                elif event == "done":
+                    sample["stream_ms"] = (time.perf_counter() - started) * 1000
+                    sample["retrieval_ms"] = (data.get("timings") or {}).get("retrieval_ms")
+                elif event == "error":
+                    sample["error"] = data.get("message", "error")
+    except Exception as e:
+        sample["error"] = type(e).__name__
+    if sample["stream_ms"] is None and sample["error"] is None:
+        sample["error"] = "stream ended without done"
+    return sample
+
+async def run_level(base_url: str, questions: list, concurrency: int, total: int, args) -> dict:
+    """`total` requests with at most `concurrency` in flight (closed loop: each user asks again when answered)."""
+    import httpx
+
+    queue = asyncio.Queue()
+    for i in range(total):
+        queue.put_nowait(questions[i % len(questions)])
+    samples = []
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        async def user():
+            while not queue.empty():
+                samples.append(await one_request(client, base_url, queue.get_nowait(), args.mode))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+        wall = time.perf_counter() - started
+
+    ok = [s for s in samples if s["error"] is None]
+    errors = {}
+    for s in samples:
+        if s["error"]:
+            errors[s["error"]] = errors.get(s["error"], 0) + 1
+    return {
+        "concurrency": concurrency,
+        "requests": len(samples),
+        "errors": errors,
+        "throughput_rps": round(len(ok) / wall, 2) if wall else 0.0,
+        "retrieval_ms": distribution([s["retrieval_ms"] for s in ok if s["retrieval_ms"] is not None]),
+        "ttft_ms": distribution([s["ttft_ms"] for s in ok if s["ttft_ms"] is not None]),
+        "stream_ms": distribution([s["stream_ms"] for s in ok]),
+    }
+
+async def sweep(base_url: str, questions: list, args) -> list:
+    if args.warmup:
+        print(f"🔥 Warming up ({args.warmup} requests)...")
+        await run_level(base_url, questions, 1, args.warmup, args)
+
+    levels = []
+    for concurrency in [int(c) for c in args.concurrency.split(",") if c.strip()]:
+        level = await run_level(base_url, questions, concurrency, max(args.requests, concurrency), args)
+        levels.append(level)
+        print(f"   c={concurrency:<4} {level['throughput_rps']:>7} req/s  "
+              f"retrieval={level['retrieval_ms']}  ttft={level['ttft_ms']}  stream={level['stream_ms']}"
+              + (f"  errors={level['errors']}" if level["errors"] else ""))
+    return levels
+
+def main():
+    args = parse_args()
+    # Generation is faked, so lift our own rate limit; the cache would answer repeats without retrieval
+    configure_environment(args, GEMINI_RPM="1000000", GEMINI_BURST="1000000", SEMANTIC_CACHE_ENABLED="false")
+
+    from benchmarks.fakes import FakeGeminiConfig, install_fake_gemini
+    install_fake_gemini(FakeGeminiConfig(latency=args.llm_latency, per_token=args.per_token,
+                                         embed_latency=args.embed_latency))
+
+    questions, graph = sample_questions(args.questions)
+    print(f"📈 Graph: {graph['entities']} entities, {graph['relationships']} relationships")
+
+    server = None
+    base_url = args.url.rstrip("/")
+    if not base_url:
+        server, thread = start_api(args.port)
+        base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        levels = asyncio.run(sweep(base_url, questions, args))
+    finally:
+        if server:
+            server.should_exit = True
+            thread.join(timeout=10)
+
+    append_history(Path(args.history), {
+        "label": args.label,
+        "external_api": bool(args.url),
+        "graph": graph,
+        "config": {k: getattr(args, k) for k in ("requests", "mode", "llm_latency", "per_token", "embed_latency")},
+        "levels": levels,
+    })
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Offline end-to-end ingestion benchmark.
+
+Runs the real `ingest_pipeline_task` (search -> Playwright scrape -> LlamaIndex
+extraction -> Neo4j) against local stand-ins:
+  1. a deterministic fake Gemini (latency, per-token cost and 429 quota are configurable),
+  2. a Serper-compatible search stub and a local corpus of static + JS-rendered pages,
+  3. a throwaway Neo4j + Redis (benchmarks/docker-compose.yml).
+Reports docs/min, per-stage latency, Gemini call counts and peak RSS, appends the result
+to a history file keyed by git commit and compares it with the previous commit's run.
+
+    docker compose -f benchmarks/docker-compose.yml up -d
+    python -m benchmarks.run_ingest --queries 6 --num-results 2
+"""
+import argparse
+import resource
+import sys
+import time
+from pathlib import Path
+from benchmarks.common import (
+    add_stack_args, append_history, configure_environment, git_commit, load_history, percentile,
+)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Offline ingestion benchmark")
+    parser.add_argument("--queries", type=int, default=4, help="Ingest tasks to run (sequentially)")
+    parser.add_argument("--num-results", type=int, default=2, help="Pages per task")
+    parser.add_argument("--pages", type=int, default=48, help="Corpus size")
+    parser.add_argument("--llm-latency", type=float, default=0.4)
+    parser.add_argument("--per-token", type=float, default=0.002)
+    parser.add_argument("--embed-latency", type=float, default=0.05)
+    parser.add_argument("--fake-rpm", type=int, default=0, help="Fake quota (0 = unlimited)")
+    add_stack_args(parser)
+    parser.add_argument("--history", default="benchmarks/results/history.jsonl")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Relative change counted as a regression")
+    parser.add_argument("--label", default="", help="Free-form note stored with the result")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    return parser.parse_args()
+
+def snapshot(*metrics) -> dict:
+    """{(sample name, sorted labels): value} for the given Prometheus metrics."""
+    values = {}
+    for metric in metrics:
+        for family in metric.collect():
+            for sample in family.samples:
+                values[(sample.name, tuple(sorted(sample.labels.items())))] = sample.value
+    return values
+
+def delta(before: dict, after: dict, name: str, key: str) -> dict:
+    """Per-label-value increase of one sample name (e.g. rag_stage_seconds_sum by stage)."""
+    result = {}
+    for (sample, labels), value in after.items():
+        if sample != name:
+            continue
+        label = "/".join(v for k, v in labels if k in key.split(","))
+        result[label] = result.get(label, 0.0) + value - before.get((sample, labels), 0.0)
+    return result
+
+def run(args) -> dict:
+    from benchmarks.fakes import QUOTA, FakeGeminiConfig, install_fake_gemini
+    from benchmarks.fixtures import TOPICS, FixtureServer, build_corpus
+
+    install_fake_gemini(FakeGeminiConfig(
+        latency=args.llm_latency, per_token=args.per_token,
+        embed_latency=args.embed_latency, rpm=args.fake_rpm,
+    ))
+    server = FixtureServer(build_corpus(args.pages)).start()
+
+    from app.core.config import settings
+    from app.core.metrics import GEMINI_REQUESTS, GEMINI_RETRIES, GEMINI_TOKENS, SCRAPE_SECONDS, STAGE_SECONDS
+    from app.db.init_graph import init_db_constraints
+    from app.workers.tasks import ingest_pipeline_task
+
+    settings.SERPER_URL = f"{server.base_url}/search"
+    init_db_constraints()
+
+    metrics = (STAGE_SECONDS, SCRAPE_SECONDS, GEMINI_REQUESTS, GEMINI_RETRIES, GEMINI_TOKENS)
+    before = snapshot(*metrics)
+    task_seconds, documents, failures = [], 0, 0
+    started = time.perf_counter()
+    for i in range(args.queries):
+        query = f"{TOPICS[i % len(TOPICS)]} #{i}"
+        task_started = time.perf_counter()
+        result = ingest_pipeline_task.apply(args=(query, args.num_results))
+        task_seconds.append(time.perf_counter() - task_started)
+        if result.failed() or (result.result or {}).get("status") != "completed":
+            failures += 1
+            print(f"❌ {query}: {result.result}")
+            continue
+        # Failed scrapes are in scraped_count but never reach the graph
+        documents += result.result["documents"]
+        print(f"✅ {query}: {result.result['documents']}/{result.result['scraped_count']} docs in {task_seconds[-1]:.1f}s")
+    wall = time.perf_counter() - started
+    after = snapshot(*metrics)
+    server.stop()
+
+    stage_sum = delta(before, after, "rag_stage_seconds_sum", "stage")
+    stage_count = delta(before, after, "rag_stage_seconds_count", "stage")
+    scrape_sum = delta(before, after, "rag_scrape_seconds_sum", "tier,outcome")
+    scrape_count = delta(before, after, "rag_scrape_seconds_count", "tier,outcome")
+    self_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    child_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss  # Chromium (after it exits)
+    rss_mb = lambda kb: round(kb / 1024 / (1024 if sys.platform == "darwin" else 1), 1)  # bytes on macOS
+
+    return {
+        "label": args.label,
+        "config": {k: getattr(args, k) for k in ("queries", "num_results", "pages", "llm_latency",
+                                                  "per_token", "embed_latency", "fake_rpm")},
+        "documents": documents,
+        "failures": failures,
+        "wall_seconds": round(wall, 2),
+        "docs_per_min": round(documents / wall * 60, 2) if wall else 0.0,
+        "task_seconds": {"p50": round(percentile(task_seconds, 0.5), 2), "p95": round(percentile(task_seconds, 0.95), 2)},
+        "stages": {
+            stage: {
+                "count": int(stage_count[stage]),
+                "total_s": round(stage_sum[stage], 3),
+                "mean_ms": round(stage_sum[stage] / stage_count[stage] * 1000, 1),
+            }
+            for stage in sorted(stage_count) if stage_count[stage]
+        },
+        "scrape": {
+            key: {"count": int(scrape_count[key]), "mean_ms": round(scrape_sum[key] / scrape_count[key] * 1000, 1)}
+            for key in sorted(scrape_count) if scrape_count[key]
+        },
+        "gemini": {
+            "requests": {k: int(v) for k, v in delta(before, after, "rag_gemini_requests_total", "kind,outcome").items() if v},
+            "retries": int(sum(delta(before, after, "rag_gemini_retries_total", "kind").values())),
+            "tokens": {k: int(v) for k, v in delta(before, after, "rag_gemini_tokens_total", "direction").items()},
+            "quota_rejections": QUOTA.rejected,
+        },
+        "peak_rss_mb": {"self": rss_mb(self_rss), "children": rss_mb(child_rss)},
+    }
+
+def previous_run(history: Path, commit: str):
+    """Latest recorded run of a different commit (the baseline to compare against)."""
+    return next((r for r in reversed(load_history(history)) if r["commit"] != commit), None)
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list:
+    regressions = []
+
+    def check(name, now, then, higher_is_better=False):
+        if not then or now is None:
+            return
+        change = (now - then) / then
+        worse = change < -tolerance if higher_is_better else change > tolerance
+        marker = "❌" if worse else "  "
+        print(f"{marker} {name:<32} {then:>10} -> {now:<10} ({change:+.0%})")
+        if worse:
+            regressions.append(name)
+
+    print(f"\n📊 Compared with {baseline['commit']} ({baseline.get('label') or 'no label'})")
+    check("docs_per_min", current["docs_per_min"], baseline["docs_per_min"], higher_is_better=True)
+    check("task p95 (s)", current["task_seconds"]["p95"], baseline["task_seconds"]["p95"])
+    for stage, stats in current["stages"].items():
+        then = baseline["stages"].get(stage, {}).get("mean_ms")
+        if then and then >= 5:  # Sub-5ms stages are noise at this sample size
+            check(f"stage {stage} mean (ms)", stats["mean_ms"], then)
+    check("peak RSS (MB)", current["peak_rss_mb"]["self"], baseline["peak_rss_mb"]["self"])
+    return regressions
+
+def main():
+    args = parse_args()
+    configure_environment(args)
+    result = run(args)
+
+    print(f"\n🏁 {result['documents']} docs in {result['wall_seconds']}s -> {result['docs_per_min']} docs/min "
+          f"(failures: {result['failures']})")
+    for stage, stats in result["stages"].items():
+        print(f"   {stage:<16} n={stats['count']:<5} mean={stats['mean_ms']:>8}ms total={stats['total_s']}s")
+    print(f"   gemini: {result['gemini']}")
+    print(f"   peak RSS: {result['peak_rss_mb']}")
+
+    history = Path(args.history)
+    baseline = previous_run(history, git_commit())
+    regressions = compare(result, baseline, args.tolerance) if baseline else []
+    append_history(history, result)
+
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Synthetic knowledge graph for retrieval benchmarks.
+
+Writes entities, chunks and relationships with the same labels and properties that
+LlamaIndex's Neo4jPropertyGraphStore produces at ingest (so the chat retriever cannot
+tell the difference), at any size:
+  - entities: __Node__:__Entity__:<VALID_NODES type>, id = name, random unit embedding
+  - chunks:   __Node__:Chunk with text naming the entities they MENTION
+  - relations between entities typed from VALID_RELATIONS; endpoints are drawn from a
+    Zipf-like distribution (--skew 0 = uniform degrees, ~1 = a few heavy hubs)
+
+    python -m benchmarks.synthetic_graph --entities 100000 --avg-degree 6 --clear
+"""
+import argparse
+import time
+import numpy as np
+from benchmarks.common import add_stack_args, configure_environment
+
+SYLLABLES = ["ka", "lo", "mi", "ra", "to", "ve", "zu", "ne", "qua", "shi", "dor", "fen", "gri", "pax", "tor", "wen"]
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Synthetic graph generator")
+    parser.add_argument("--entities", type=int, default=10_000)
+    parser.add_argument("--avg-degree", type=float, default=6.0, help="Mean entity-to-entity relationships per entity")
+    parser.add_argument("--skew", type=float, default=0.8, help="Degree skew (Zipf exponent over node ranks)")
+    parser.add_argument("--entities-per-chunk", type=int, default=6)
+    parser.add_argument("--batch", type=int, default=2_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--clear", action="store_true", help="Delete the existing graph first")
+    add_stack_args(parser)
+    return parser.parse_args()
+
+def entity_name(i: int, rng: np.random.Generator) -> str:
+    word = "".join(rng.choice(SYLLABLES, size=rng.integers(2, 4))).capitalize()
+    return f"{word} {i}"  # Suffix keeps names unique at any scale
+
+def unit_vectors(rng: np.random.Generator, n: int, dim: int) -> list:
+    vectors = rng.standard_normal((n, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors.tolist()
+
+def clear_graph(session) -> list:
+    """Deletes everything; returns the ids of the deleted entities and chunks."""
+    print("🧹 Clearing graph...")
+    ids = session.run("MATCH (n) WHERE n:__Entity__ OR n:Chunk RETURN n.id AS id").value()
+    session.run("MATCH (n) CALL (n) { DETACH DELETE n } IN TRANSACTIONS OF 10000 ROWS").consume()
+    return [id_ for id_ in ids if id_]
+
+def generate(args) -> tuple[dict, list]:
+    """Returns (stats, ids of every entity / chunk written or deleted)."""
+    import neo4j
+    from app.core.config import settings
+    from app.core.graph_schema import VALID_NODES, VALID_RELATIONS
+    from app.db.init_graph import init_db_constraints
+
+    rng = np.random.default_rng(args.seed)
+    dim = settings.EMBEDDING_DIMENSIONS
+    n = args.entities
+    names = [entity_name(i, rng) for i in range(n)]
+    types = rng.choice(VALID_NODES, size=n)
+
+    # Zipf-like endpoint weights over a random permutation (hubs are spread across types)
+    weights = 1.0 / np.arange(1, n + 1) ** args.skew
+    weights = weights[rng.permutation(n)]
+    weights /= weights.sum()
+
+    driver = neo4j.GraphDatabase.driver(settings.NEO4J_URI, auth=(settings.NEO4J_USER, settings.NEO4J_PASSWORD))
+    started = time.perf_counter()
+    touched = list(names)
+    with driver.session() as session:
+        if args.clear:
+            touched.extend(clear_graph(session))
+        init_db_constraints()
+        # The id constraints LlamaIndex's store creates on first connect (the lookups below rely on them)
+        session.run("CREATE CONSTRAINT IF NOT EXISTS FOR (n:__Node__) REQUIRE n.id IS UNIQUE").consume()
+        session.run("CREATE CONSTRAINT IF NOT EXISTS FOR (n:__Entity__) REQUIRE n.id IS UNIQUE").consume()
+
+        # 1. Chunks: consecutive groups of entities, so every entity is mentioned once
+        chunk_count = 0
+        for start in range(0, n, args.batch):
+            rows = []
+            for c in range(start, min(start + args.batch, n), args.entities_per_chunk):
+                members = names[c:c + args.entities_per_chunk]
+                rows.append({
+                    "id": f"synthetic-chunk-{c}",
+                    "text": " ".join(f"{name} is a {types[c + k].lower()} in the synthetic domain." for k, name in enumerate(members)),
+                    "entities": members,
+                })
+            for row, vector in zip(rows, unit_vectors(rng, len(rows), dim)):
+                row["embedding"] = vector
+                touched.append(row["id"])
+            session.run(
+                """
+                UNWIND $rows AS row
+                CREATE (c:__Node__:Chunk {id: row.id, text: row.text, ref_doc_id: row.id, url: 'synthetic://' + row.id})
+                WITH c, row
+                CALL db.create.setNodeVectorProperty(c, 'embedding', row.embedding)
+                RETURN count(*)
+                """,
+                rows=rows,
+            ).consume()
+            chunk_count += len(rows)
+
+        # 2. Entities (+ MENTIONS from their chunk), one query per label
+        for start in range(0, n, args.batch):
+            end = min(start + args.batch, n)
+            vectors = unit_vectors(rng, end - start, dim)
+            by_type = {}
+            for i in range(start, end):
+                chunk_id = f"synthetic-chunk-{i - i % args.entities_per_chunk}"
+                by_type.setdefault(types[i], []).append(
+                    {"name": names[i], "chunk": chunk_id, "embedding": vectors[i - start]}
+                )
+            for label, rows in by_type.items():
+                session.run(
+                    f"""
+                    UNWIND $rows AS row
+                    CREATE (e:__Node__:__Entity__:`{label}` {{id: row.name, name: row.name, triplet_source_id: row.chunk}})
+                    WITH e, row
+                    CALL db.create.setNodeVectorProperty(e, 'embedding', row.embedding)
+                    WITH e, row
+                    MATCH (c:__Node__ {{id: row.chunk}})
+                    CREATE (c)-[:MENTIONS]->(e)
+                    """,
+                    rows=rows,
+                ).consume()
+            print(f"   entities {end}/{n}")
+
+        # 3. Relationships, one query per type (self-loops drawn from the hubs are skipped)
+        rel_count, written = int(n * args.avg_degree / 2), 0
+        for start in range(0, rel_count, args.batch):
+            size = min(args.batch, rel_count - start)
+            sources = rng.choice(n, size=size, p=weights)
+            targets = rng.choice(n, size=size, p=weights)
+            rel_types = rng.choice(VALID_RELATIONS, size=size)
+            by_type = {}
+            for s, t, r in zip(sources, targets, rel_types):
+                if s != t:
+                    by_type.setdefault(r, []).append({
+                        "source": names[s], "target": names[t],
+                        "chunk": f"synthetic-chunk-{s - s % args.entities_per_chunk}",
+                    })
+            for rel, rows in by_type.items():
+                session.run(
+                    f"""
+                    UNWIND $rows AS row
+                    MATCH (s:__Entity__ {{id: row.source}}), (t:__Entity__ {{id: row.target}})
+                    CREATE (s)-[:`{rel}` {{triplet_source_id: row.chunk}}]->(t)
+                    """,
+                    rows=rows,
+                ).consume()
+                written += len(rows)
+            print(f"   relationships {start + size}/{rel_count} drawn, {written} written")
+
+        print("⏳ Waiting for indexes to come online...")
+        session.run("CALL db.awaitIndexes(3600)").consume()
+    driver.close()
+
+    return {
+        "entities": n,
+        "chunks": chunk_count,
+        "relationships": written,
+        "self_loops_skipped": rel_count - written,
+        "seconds": round(time.perf_counter() - started, 1),
+    }, touched
+
+def main():
+    args = parse_args()
+    configure_environment(args)
+    stats, touched = generate(args)
+    print(f"✅ Synthetic graph: {stats}")
+
+    # Publish every written / deleted node: API-side caches drop what they hold of the previous
+    # graph and the ANN mirror picks up the new one (past TOUCHED_MAX ids it rebuilds instead)
+    from app.services.graph_version import graph_versions
+    try:
+        graph_versions.bump(touched)
+    except Exception as e:
+        print(f"⚠️ Could not bump graph version: {e}")
+
+if __name__ == "__main__":
+    main()
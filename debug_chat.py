@@ -1,3 +1,4 @@
+import asyncio
 import logging
 import sys
 from app.services.chat_service import chat_service
@@ -31,13 +32,16 @@ def debug_rag_pipeline():
     # 2. Test Full Chat Service
     print("\n[2] Testing Full Chat Service...")
     try:
-        gen = chat_service.stream_chat("Explain RAG simply.")
+        async def consume():
+            full_msg = ""
+            async for token in chat_service.astream_chat("Explain RAG simply."):
+                # FIX: 'token' is a string, not an object
+                print(token, end="", flush=True)
+                full_msg += token
+            return full_msg
+
         print("   > Stream started...")
-        full_msg = ""
-        for token in gen:
-            # FIX: 'token' is a string, not an object
-            print(token, end="", flush=True)
-            full_msg += token
+        full_msg = asyncio.run(consume())
         print("\n")
         
         if not full_msg:
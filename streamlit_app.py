@@ -2,10 +2,13 @@ import streamlit as st
 import requests
 import json
 import time
+import uuid
+from app.core.sse_parser import iter_sse_events
 
 # --- Configuration ---
 API_URL = "http://127.0.0.1:8000/api/v1"
 HEALTH_URL = "http://127.0.0.1:8000/health"
+RENDER_INTERVAL = 0.1  # Seconds between markdown redraws while streaming
 
 st.set_page_config(
     page_title="GraphRAG Agent", 
@@ -121,6 +124,37 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# --- Ingestion Progress (pushed by the worker over SSE) ---
+def render_ingest_progress(task_id):
+    bar = st.progress(0.0, text="Starting...")
+    log = st.empty()
+    lines = []
+    fraction = 0.0
+    try:
+        with requests.get(f"{API_URL}/ingest/progress/{task_id}", stream=True, timeout=(5, 600)) as r:
+            for event, data in iter_sse_events(r.iter_content(chunk_size=None)):
+                if event != "progress":
+                    continue
+                stage = data["stage"]
+                if stage == "chunk_extracted":
+                    # Finished documents + the current document's chunk progress
+                    fraction = (data["document"] - 1 + data["chunk"] / data["chunks"]) / data["documents"]
+                elif stage == "completed":
+                    fraction = 1.0
+                bar.progress(min(fraction, 1.0), text=data["message"])
+
+                if stage != "chunk_extracted":  # Too chatty for the log
+                    lines.append(f"`{data['elapsed_ms'] / 1000:.1f}s` {data['message']}")
+                    log.markdown("\n\n".join(lines[-6:]))
+                if stage == "failed":
+                    st.error(f"❌ {data['message']}")
+                elif stage in ("unknown", "timeout"):  # Ended by the API, not the worker
+                    st.warning(f"⚠️ {data['message']}")
+                elif stage == "completed":
+                    st.success("✅ Knowledge Graph updated!")
+    except requests.exceptions.RequestException as e:
+        st.warning(f"⚠️ Live progress unavailable ({e}). Check the task status endpoint.")
+
 # --- 1. Sidebar: Knowledge & Controls ---
 with st.sidebar:
     st.image("https://img.icons8.com/fluency/96/artificial-intelligence.png", width=60)
@@ -161,8 +195,16 @@ with st.sidebar:
                         if res.status_code == 200:
                             data = res.json()
                             task_id = data.get("task_id", "Unknown")
-                            st.success(f"✅ Pipeline Active! Task: `{task_id}`")
-                            st.info("Building graph... Check backend logs.")
+                            if data.get("deduplicated"):
+                                st.info(f"🔁 Same topic is already being ingested. Following task `{task_id}`")
+                            else:
+                                st.success(f"✅ Pipeline Active! Task: `{task_id}`")
+                            if data.get("estimated_completion_seconds") is not None:
+                                st.caption(f"⏱️ Estimated completion in ~{data['estimated_completion_seconds']}s")
+                            render_ingest_progress(task_id)
+                        elif res.status_code == 429:
+                            retry = res.headers.get("Retry-After", "?")
+                            st.warning(f"⏳ Ingestion queue is busy. Try again in ~{retry}s.")
                         else:
                             st.error(f"❌ Error: {res.text}")
                     except requests.exceptions.ConnectionError:
@@ -192,8 +234,21 @@ with st.sidebar:
 
     # Clear Chat History Button
     st.markdown("### ⚙️ Settings")
+    chat_mode = st.radio(
+        "Answer mode",
+        options=["local", "global"],
+        format_func=lambda m: "🔎 Specific (entities & chunks)" if m == "local" else "🌐 Broad (community summaries)",
+        key="chat_mode",
+    )
     if st.button("🗑️ Clear Chat History", use_container_width=True, key="clear_btn"):
         st.session_state.messages = []
+        # Drop the server-side memory too, then start a fresh conversation
+        if "session_id" in st.session_state:
+            try:
+                requests.delete(f"{API_URL}/chat/session/{st.session_state.session_id}", timeout=2)
+            except Exception:
+                pass
+        st.session_state.session_id = str(uuid.uuid4())
         st.rerun()
 
 # --- 2. Main Chat Interface ---
@@ -204,6 +259,10 @@ st.markdown("""
 """)
 
 # Initialize Session State
+if "session_id" not in st.session_state:
+    # Scopes the backend's conversation memory to this browser session
+    st.session_state.session_id = str(uuid.uuid4())
+
 if "messages" not in st.session_state:
     st.session_state.messages = [
         {"role": "assistant", "content": "Hello! I am connected to your Neo4j Knowledge Graph. What would you like to know?"}
@@ -225,21 +284,38 @@ if prompt := st.chat_input("Ask a question about your data..."):
     with st.chat_message("assistant"):
         message_placeholder = st.empty()
         full_response = ""
+        done = None
         
         try:
-            # Stream from Backend
-            with requests.post(f"{API_URL}/chat/stream", json={"message": prompt}, stream=True, timeout=60) as r:
+            # Stream from Backend (SSE frames: token / done / error)
+            with requests.post(f"{API_URL}/chat/stream", json={"message": prompt, "session_id": st.session_state.session_id, "mode": chat_mode}, stream=True, timeout=60) as r:
                 if r.status_code == 200:
-                    for chunk in r.iter_content(chunk_size=None):
-                        if chunk:
-                            try:
-                                text = chunk.decode("utf-8")
-                                full_response += text
+                    last_render = 0.0
+                    for event, data in iter_sse_events(r.iter_content(chunk_size=None)):
+                        if event == "token":
+                            full_response += data["text"]
+                            # Throttle redraws: re-rendering markdown per frame is quadratic in answer length
+                            now = time.monotonic()
+                            if now - last_render >= RENDER_INTERVAL:
                                 message_placeholder.markdown(full_response + "▌")
-                            except:
-                                pass 
-                    
+                                last_render = now
+                        elif event == "done":
+                            done = data
+                        elif event == "error":
+                            full_response += f"\n\n❌ {data['message']}"
+
                     message_placeholder.markdown(full_response)
+                    if done:
+                        timings = done["timings"]
+                        parts = [f"{timings[k]:.0f} ms {label}" for k, label in (("ttft_ms", "to first token"), ("total_ms", "total")) if timings.get(k) is not None]
+                        if done.get("cache_hit"):
+                            parts.append("cached answer")
+                        st.caption(" · ".join(parts))
+                        if done["sources"]:
+                            with st.expander(f"📚 Sources ({len(done['sources'])})"):
+                                for source in done["sources"]:
+                                    label = source.get("title") or source.get("url") or source["id"]
+                                    st.markdown(f"- **{label}**: {source['snippet']}…")
                 else:
                     error_msg = f"❌ API Error {r.status_code}: {r.text}"
                     message_placeholder.error(error_msg)
@@ -0,0 +1,74 @@
+import os
+
+# Settings are read on import: the suite needs neither a .env nor running services
+for name, value in {
+    "POSTGRES_USER": "test",
+    "POSTGRES_PASSWORD": "test",
+    "POSTGRES_DB": "test",
+    "POSTGRES_PORT": "5432",
+    "NEO4J_USER": "neo4j",
+    "NEO4J_PASSWORD": "test",
+    "GOOGLE_API_KEY": "fake",
+    "METRICS_WORKER_PORT": "0",
+}.items():
+    os.environ.setdefault(name, value)
+
+import fakeredis
+import pytest
+
+@pytest.fixture
+def redis_client(monkeypatch):
+    """In-memory Redis behind the graph version (add other singletons' `_client` per test)."""
+    from app.services.graph_version import graph_versions
+
+    client = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(graph_versions, "_client", client)
+    return client
+
+@pytest.fixture
+def neo4j_driver(monkeypatch):
+    """
+    A real Neo4j for the Cypher-level tests (TEST_NEO4J_URI, TEST_NEO4J_USER, TEST_NEO4J_PASSWORD);
+    skipped when not configured. The database is wiped before each test.
+    """
+    uri = os.environ.get("TEST_NEO4J_URI")
+    if not uri:
+        pytest.skip("TEST_NEO4J_URI not set")
+    from neo4j import GraphDatabase
+    from app.core.config import settings
+
+    user, password = os.environ.get("TEST_NEO4J_USER", "neo4j"), os.environ.get("TEST_NEO4J_PASSWORD", "")
+    monkeypatch.setattr(settings, "NEO4J_URI", uri)
+    monkeypatch.setattr(settings, "NEO4J_USER", user)
+    monkeypatch.setattr(settings, "NEO4J_PASSWORD", password)
+    driver = GraphDatabase.driver(uri, auth=(user, password))
+    driver.execute_query("MATCH (n) DETACH DELETE n")
+    yield driver
+    driver.close()
+
+@pytest.fixture
+def postgres_frontier(monkeypatch):
+    """
+    The crawl frontier on a real Postgres (TEST_DATABASE_URL, postgresql+asyncpg://...);
+    skipped when not configured. The crawl tables are recreated for each test.
+    """
+    url = os.environ.get("TEST_DATABASE_URL")
+    if not url:
+        pytest.skip("TEST_DATABASE_URL not set")
+    from asgiref.sync import async_to_sync
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    from sqlalchemy.pool import NullPool
+    from app.db import postgres
+    from app.services import crawl_frontier as frontier_module
+
+    engine = create_async_engine(url, poolclass=NullPool)
+    monkeypatch.setattr(postgres, "engine", engine)
+    monkeypatch.setattr(frontier_module, "SessionLocal", async_sessionmaker(engine, expire_on_commit=False))
+
+    async def reset():
+        async with engine.begin() as conn:
+            await conn.run_sync(postgres.Base.metadata.drop_all)
+    async_to_sync(reset)()
+    frontier = frontier_module.CrawlFrontier()
+    yield frontier
+    async_to_sync(reset)()
@@ -0,0 +1,67 @@
+from typing import Callable, Dict, List, NamedTuple
+
+# Stand-ins for the Neo4j driver: tests answer each Cypher query (matched by identity
+# with the module's query constant) from a small in-memory graph.
+
+class FakeRecord(dict):
+    """Just enough of neo4j.Record: item access and `.data()`."""
+
+    def data(self) -> dict:
+        return dict(self)
+
+class FakeResult(list):
+    def single(self):
+        return self[0] if self else None
+
+    def consume(self):
+        return None
+
+    def value(self) -> list:
+        return [next(iter(record.values()), None) for record in self]
+
+class FakeEagerResult(NamedTuple):
+    """neo4j.EagerResult: unpacks as (records, summary, keys) and exposes `.records`."""
+    records: List[FakeRecord]
+    summary: object = None
+    keys: object = None
+
+class FakeSession:
+    def __init__(self, driver: "FakeDriver"):
+        self._driver = driver
+
+    def run(self, query: str, parameters: dict = None, **params):
+        return FakeResult(self._driver.answer(query, {**(parameters or {}), **params}))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+class FakeDriver:
+    """
+    `handlers` maps a query string to fn(params) -> list of row dicts.
+    Every call is recorded in `calls` as (query, params); unknown queries return no rows.
+    """
+
+    def __init__(self, handlers: Dict[str, Callable[[dict], List[dict]]] = None):
+        self.handlers = handlers or {}
+        self.calls = []
+        self.closed = False
+
+    def answer(self, query: str, params: dict) -> List[FakeRecord]:
+        self.calls.append((query, params))
+        handler = self.handlers.get(query)
+        return [FakeRecord(row) for row in (handler(params) if handler else [])]
+
+    def execute_query(self, query: str, parameters_: dict = None, **params):
+        return FakeEagerResult(self.answer(query, {**(parameters_ or {}), **params}))
+
+    def session(self, **kwargs) -> FakeSession:
+        return FakeSession(self)
+
+    def close(self):
+        self.closed = True
+
+    def queries(self) -> List[str]:
+        return [query for query, _ in self.calls]
@@ -0,0 +1,179 @@
+import threading
+import numpy as np
+import pytest
+from app.core.graph_schema import CHUNK_VECTOR_INDEX, ENTITY_VECTOR_INDEX
+from app.services import ann_index
+from app.services.ann_index import IVFIndex, VectorMirror
+from app.services.graph_version import graph_versions
+from tests.fakes import FakeDriver
+
+DIM = 8
+
+def unit(i: int) -> list:
+    vector = np.zeros(DIM, dtype=np.float32)
+    vector[i] = 1.0
+    return vector.tolist()
+
+class Graph:
+    """Entities / chunks the fake driver answers the mirror's queries from."""
+
+    def __init__(self):
+        self.entities = {}  # id -> (type, embedding)
+        self.chunks = {}    # id -> (text, embedding, mentioned entity ids)
+
+    def entity_rows(self, params):
+        ids = params.get("ids")
+        return [
+            {"id": id_, "type": type_, "embedding": embedding}
+            for id_, (type_, embedding) in self.entities.items()
+            if ids is None or id_ in ids
+        ]
+
+    def chunk_rows(self, params):
+        return [
+            {"id": id_, "text": text, "url": f"https://example.com/{id_}", "embedding": embedding}
+            for id_, (text, embedding, _) in self.chunks.items()
+        ]
+
+    def touched_chunk_rows(self, params):
+        ids = set(params["ids"])
+        return [
+            row for row in self.chunk_rows(params)
+            if row["id"] in ids or ids & set(self.chunks[row["id"]][2])
+        ]
+
+    def driver(self) -> FakeDriver:
+        return FakeDriver({
+            ann_index.ENTITY_EMBEDDINGS_QUERY: self.entity_rows,
+            ann_index.CHUNK_EMBEDDINGS_QUERY: self.chunk_rows,
+            ann_index.TOUCHED_CHUNKS_QUERY: self.touched_chunk_rows,
+        })
+
+@pytest.fixture
+def graph():
+    graph = Graph()
+    graph.entities = {"Python": ("Technology", unit(0)), "Guido": ("Person", unit(1))}
+    graph.chunks = {"c1": ("Guido created Python.", unit(2), ["Python", "Guido"])}
+    return graph
+
+@pytest.fixture
+def mirror(tmp_path, graph, redis_client):
+    mirror = VectorMirror(snapshot_dir=str(tmp_path / "ann"), dim=DIM, nprobe=4, sync_interval=60)
+    mirror._driver = graph.driver()
+    mirror.rebuild()
+    return mirror
+
+def ids(hits) -> list:
+    return [hit["id"] for hit in hits]
+
+def test_ivf_search_ranks_by_cosine_and_honours_tombstones():
+    rng = np.random.default_rng(1)
+    vectors = rng.standard_normal((200, DIM)).astype(np.float32)
+    index = IVFIndex(DIM, nprobe=16)
+    index.build([f"v{i}" for i in range(200)], vectors, [{} for _ in range(200)])
+
+    assert index.search(vectors[17], k=1)[0][0] == "v17"
+
+    index.remove("v17")
+    assert "v17" not in [id_ for id_, _, _ in index.search(vectors[17], k=5)]
+
+    index.upsert("v17", -vectors[17], {"moved": True})
+    hit = index.search(-vectors[17], k=1)[0]
+    assert hit[0] == "v17" and hit[2] == {"moved": True}
+    assert len(index) == 200
+
+def test_ivf_snapshot_round_trip_compacts_delta(tmp_path):
+    index = IVFIndex(DIM)
+    index.build(["a", "b"], np.array([unit(0), unit(1)]), [{"n": 0}, {"n": 1}])
+    index.upsert("c", unit(2), {"n": 2})
+    index.remove("a")
+    index.save(str(tmp_path / "index"))
+
+    loaded = IVFIndex(DIM)
+    loaded.load(str(tmp_path / "index"))
+    assert len(loaded) == 2
+    assert loaded.search(unit(2), k=1)[0][0] == "c"
+    assert "a" not in [id_ for id_, _, _ in loaded.search(unit(0), k=3)]
+
+def test_mirror_is_not_ready_before_build(tmp_path):
+    mirror = VectorMirror(snapshot_dir=str(tmp_path), dim=DIM, nprobe=4, sync_interval=60)
+    assert mirror.search(ENTITY_VECTOR_INDEX, unit(0), k=1) is None
+
+def test_rebuild_serves_both_legs(mirror):
+    assert ids(mirror.search(ENTITY_VECTOR_INDEX, unit(0), k=1)) == ["Python"]
+    hit = mirror.search(CHUNK_VECTOR_INDEX, unit(2), k=1)[0]
+    assert hit["id"] == "c1" and hit["text"] == "Guido created Python."
+    assert mirror.stats() == {"ready": True, "version": 0, "entities": 2, "chunks": 1}
+
+def test_sync_without_new_version_does_no_io(mirror):
+    calls = len(mirror._driver.calls)
+    mirror.sync()
+    assert len(mirror._driver.calls) == calls
+
+def test_sync_upserts_touched_entities_and_their_chunks(mirror, graph):
+    graph.entities["Python"] = ("Technology", unit(3))
+    graph.entities["Rust"] = ("Technology", unit(4))
+    graph.chunks["c2"] = ("Rust is not Python.", unit(5), ["Rust", "Python"])
+    version = graph_versions.bump(["Python", "Rust"])
+
+    mirror.sync()
+
+    assert mirror.stats()["version"] == version
+    assert ids(mirror.search(ENTITY_VECTOR_INDEX, unit(3), k=1)) == ["Python"]
+    assert ids(mirror.search(ENTITY_VECTOR_INDEX, unit(4), k=1)) == ["Rust"]
+    assert ids(mirror.search(CHUNK_VECTOR_INDEX, unit(5), k=1)) == ["c2"]
+    assert mirror.stats()["entities"] == 3
+
+def test_sync_removes_deleted_entities_and_chunks(mirror, graph):
+    del graph.entities["Guido"]
+    del graph.chunks["c1"]
+    graph_versions.bump(["Guido", "c1"])
+
+    mirror.sync()
+
+    assert "Guido" not in ids(mirror.search(ENTITY_VECTOR_INDEX, unit(1), k=5))
+    assert mirror.search(CHUNK_VECTOR_INDEX, unit(2), k=5) == []
+
+def test_sync_rebuilds_when_version_counter_was_reset(mirror, graph, redis_client):
+    graph_versions.bump([])
+    graph_versions.bump([])
+    mirror.sync()
+    redis_client.flushall()  # Redis lost its data: version goes back to 0 < mirrored version
+    graph.entities["Rust"] = ("Technology", unit(4))
+    graph_versions.bump([])
+
+    mirror.sync()
+
+    assert mirror.stats()["version"] == 1
+    assert ids(mirror.search(ENTITY_VECTOR_INDEX, unit(4), k=1)) == ["Rust"]
+
+def test_snapshot_reload_replays_later_versions(tmp_path, mirror, graph):
+    graph.entities["Rust"] = ("Technology", unit(4))
+    graph_versions.bump(["Rust"])
+
+    restarted = VectorMirror(snapshot_dir=str(tmp_path / "ann"), dim=DIM, nprobe=4, sync_interval=60)
+    restarted._driver = graph.driver()
+    assert restarted._load_snapshot()
+
+    assert ids(restarted.search(ENTITY_VECTOR_INDEX, unit(4), k=1)) == ["Rust"]
+    assert ann_index.CHUNK_EMBEDDINGS_QUERY not in restarted._driver.queries()
+
+def test_compaction_does_not_block_searches(monkeypatch, mirror, graph):
+    searched, build = threading.Event(), IVFIndex.build
+
+    def slow_build(index, *args, **kwargs):
+        # A search from another thread must finish while k-means "runs"
+        worker = threading.Thread(target=lambda: mirror.search(ENTITY_VECTOR_INDEX, unit(0), k=1) and searched.set())
+        worker.start()
+        worker.join(timeout=5)
+        build(index, *args, **kwargs)
+    monkeypatch.setattr(IVFIndex, "build", slow_build)
+    monkeypatch.setattr(IVFIndex, "needs_compaction", lambda index: bool(index._delta))
+
+    graph.entities["Rust"] = ("Technology", unit(4))
+    graph_versions.bump(["Rust"])
+    mirror.sync()
+
+    assert searched.is_set()
+    assert not mirror._indexes[ENTITY_VECTOR_INDEX]._delta  # Compacted and swapped in
+    assert ids(mirror.search(ENTITY_VECTOR_INDEX, unit(4), k=1)) == ["Rust"]
@@ -0,0 +1,110 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.core.graph_stores import SimplePropertyGraphStore
+from llama_index.core.schema import NodeWithScore, QueryBundle, TextNode
+from app.api.endpoints import chat as chat_endpoints
+from app.services import chat_service as chat_module
+from app.services.chat_service import ChatService
+from app.services.hybrid_retriever import HybridGraphRetriever
+
+def node(text: str) -> NodeWithScore:
+    return NodeWithScore(node=TextNode(id_=text, text=text), score=1.0)
+
+def test_batch_retrieval_isolates_failing_questions():
+    retriever = HybridGraphRetriever(graph_store=SimplePropertyGraphStore(), embed_model=MockEmbedding(embed_dim=8))
+
+    async def search(query_bundle):
+        if query_bundle.query_str == "search fails":
+            raise RuntimeError("fulltext index offline")
+        return [], [query_bundle.query_str]
+
+    async def finish(entities, chunks):
+        if chunks == ["expansion fails"]:
+            raise RuntimeError("expansion timed out")
+        return [node(chunks[0])]
+    retriever._asearch, retriever._afinish = search, finish
+
+    bundles = [QueryBundle(query_str=q) for q in ("ok", "search fails", "expansion fails")]
+    ok, search_failed, expansion_failed = asyncio.run(retriever.abatch_retrieve(bundles))
+
+    assert [n.node.node_id for n in ok] == ["ok"]
+    assert str(search_failed) == "fulltext index offline"
+    assert str(expansion_failed) == "expansion timed out"
+
+def test_batch_reports_a_retrieval_error_on_its_question_only(monkeypatch):
+    service = ChatService()
+    service._initialize_engine = lambda: None
+    service._llm = None
+
+    async def embed(questions):
+        return [[0.0] for _ in questions]
+
+    async def retrieve(bundles, concurrency):
+        return [[node("Python uses Django.")], RuntimeError("Neo4j unavailable")]
+
+    async def synthesize(bundle, nodes):
+        return f"answer to {bundle.query_str}"
+
+    service._embed_model = SimpleNamespace(aget_query_embedding_batch=embed)
+    service._retriever = SimpleNamespace(abatch_retrieve=retrieve)
+    service._assembler = SimpleNamespace(postprocess_nodes=lambda nodes, query_bundle: nodes)
+    monkeypatch.setattr(chat_module, "get_response_synthesizer", lambda **kwargs: SimpleNamespace(asynthesize=synthesize))
+
+    async def collect():
+        return [result async for result in service.abatch(["ok?", "broken?"])]
+    *results, summary = asyncio.run(collect())
+
+    by_index = {r["index"]: r for r in results}
+    assert by_index[0]["answer"] == "answer to ok?"
+    assert by_index[1]["error"] == "Neo4j unavailable"
+    assert summary["summary"]["failed"] == 1
+
+def test_closing_the_batch_cancels_unfinished_answers(monkeypatch):
+    service = ChatService()
+    service._initialize_engine = lambda: None
+    service._llm = None
+    cancelled = []
+
+    async def embed(questions):
+        return [[0.0] for _ in questions]
+
+    async def retrieve(bundles, concurrency):
+        return [[node(bundle.query_str)] for bundle in bundles]
+
+    async def synthesize(bundle, nodes):
+        if bundle.query_str == "fast?":
+            return "fast answer"
+        try:
+            await asyncio.sleep(60)  # A long Gemini generation
+        except asyncio.CancelledError:
+            cancelled.append(bundle.query_str)
+            raise
+
+    service._embed_model = SimpleNamespace(aget_query_embedding_batch=embed)
+    service._retriever = SimpleNamespace(abatch_retrieve=retrieve)
+    service._assembler = SimpleNamespace(postprocess_nodes=lambda nodes, query_bundle: nodes)
+    monkeypatch.setattr(chat_module, "get_response_synthesizer", lambda **kwargs: SimpleNamespace(asynthesize=synthesize))
+
+    async def disconnect_after_first_result():
+        results = service.abatch(["fast?", "slow?", "slower?"], concurrency=3)
+        first = await anext(results)
+        await results.aclose()
+        await asyncio.sleep(0)  # Let the cancellations land (asyncio.run would cancel them anyway on exit)
+        return first, sorted(cancelled)
+
+    first, cancelled_while_running = asyncio.run(disconnect_after_first_result())
+    assert first["answer"] == "fast answer"
+    assert cancelled_while_running == ["slow?", "slower?"]
+
+@pytest.mark.parametrize("concurrency", [0, -3])
+def test_batch_rejects_non_positive_concurrency(concurrency):
+    app = FastAPI()
+    app.include_router(chat_endpoints.router)
+
+    response = TestClient(app).post("/batch", json={"questions": ["q"], "concurrency": concurrency})
+
+    assert response.status_code == 422
@@ -0,0 +1,121 @@
+import asyncio
+import threading
+import pytest
+from llama_index.core.schema import NodeWithScore, TextNode
+from app.services.graph_version import graph_versions
+from app.services.semantic_cache import SemanticAnswerCache
+from app.services.subgraph_cache import SubgraphCache
+
+def edge(seed, source, target, rel="USES"):
+    return {
+        "seed_id": seed, "source_id": source, "source_type": "Technology", "source_chunk": None,
+        "type": rel, "target_id": target, "target_type": "Technology", "target_chunk": None,
+    }
+
+class GraphStore:
+    """Answers the expansion query from a fixed edge list; counts the seeds it was asked for."""
+
+    def __init__(self, edges):
+        self.edges = edges
+        self.queried = []
+
+    def structured_query(self, query, param_map=None):
+        self.queried.append(list(param_map["ids"]))
+        return [r for r in self.edges if r["seed_id"] in param_map["ids"]]
+
+    async def astructured_query(self, query, param_map=None):
+        return self.structured_query(query, param_map)
+
+@pytest.fixture
+def store():
+    return GraphStore([edge("Python", "Python", "Django"), edge("Rust", "Rust", "Cargo")])
+
+def cache(use_redis=False) -> SubgraphCache:
+    return SubgraphCache(max_entries=10, use_redis=use_redis, redis_ttl=60, sync_interval=0)
+
+def expand(cache, store, *seeds):
+    triplets = cache.get_rel_map(store, list(seeds), depth=1, limit=10, ignore_rels=[])
+    return {(s.id, r.label, t.id) for s, r, t in triplets}
+
+def test_subgraph_cache_serves_repeat_expansions_locally(redis_client, store):
+    subgraphs = cache()
+
+    assert expand(subgraphs, store, "Python") == {("Python", "USES", "Django")}
+    assert expand(subgraphs, store, "Python", "Rust") == {("Python", "USES", "Django"), ("Rust", "USES", "Cargo")}
+
+    assert store.queried == [["Python"], ["Rust"]]
+    assert subgraphs.stats()["local_hits"] == 1
+
+def test_subgraph_cache_drops_entries_whose_nodes_were_touched(redis_client, store):
+    subgraphs = cache()
+    expand(subgraphs, store, "Python", "Rust")
+
+    store.edges.append(edge("Python", "Django", "Flask"))
+    graph_versions.bump(["Django"])
+
+    assert expand(subgraphs, store, "Python", "Rust") == {
+        ("Python", "USES", "Django"), ("Django", "USES", "Flask"), ("Rust", "USES", "Cargo"),
+    }
+    assert store.queried[-1] == ["Python"]
+    assert subgraphs.stats()["invalidations"] == 1
+
+def test_shared_tier_rejects_entries_built_before_a_touch(redis_client, store):
+    expand(cache(use_redis=True), store, "Python", "Rust")
+    graph_versions.bump(["Django"])
+
+    other_worker = cache(use_redis=True)
+    expand(other_worker, store, "Python", "Rust")
+
+    assert store.queried[-1] == ["Python"]
+    assert other_worker.stats()["redis_hits"] == 1
+
+def test_subgraph_cache_is_bypassed_without_redis(monkeypatch, store):
+    class Down:
+        def __getattr__(self, name):
+            raise ConnectionError("redis down")
+    monkeypatch.setattr(graph_versions, "_client", Down())
+    subgraphs = cache()
+
+    expand(subgraphs, store, "Python")
+    expand(subgraphs, store, "Python")
+
+    assert store.queried == [["Python"], ["Python"]]
+    assert subgraphs.stats()["entries"] == 0
+
+def test_async_expansion_keeps_redis_calls_off_the_event_loop(monkeypatch, redis_client, store):
+    subgraphs = cache(use_redis=True)
+    threads = []
+    for name in ("_lookup", "_fill"):
+        wrapped = getattr(subgraphs, name)
+        monkeypatch.setattr(subgraphs, name, lambda *args, _f=wrapped: threads.append(threading.get_ident()) or _f(*args))
+
+    async def run():
+        triplets = await subgraphs.aget_rel_map(store, ["Python"], depth=1, limit=10, ignore_rels=[])
+        return threading.get_ident(), triplets
+
+    loop_thread, triplets = asyncio.run(run())
+
+    assert len(triplets) == 1
+    assert len(threads) == 2 and loop_thread not in threads
+
+def answer_sources():
+    return [NodeWithScore(node=TextNode(id_="c1", text="Python uses Django."), score=0.9)]
+
+def test_semantic_cache_invalidates_on_touched_entities_only(redis_client):
+    answers = SemanticAnswerCache(threshold=0.9, max_entries=4, ttl=60, sync_interval=0)
+    version = graph_versions.current()
+    assert answers.store("q", [1.0, 0.0], "a", answer_sources(), {"Python"}, version)
+
+    graph_versions.bump(["Rust"])
+    assert answers.lookup([1.0, 0.01]).answer == "a"
+
+    graph_versions.bump(["Python"])
+    assert answers.lookup([1.0, 0.01]) is None
+
+def test_semantic_cache_skips_answers_whose_entities_changed_meanwhile(redis_client):
+    answers = SemanticAnswerCache(threshold=0.9, max_entries=4, ttl=60, sync_interval=0)
+    retrieved_at = graph_versions.current()
+    graph_versions.bump(["Python"])  # Re-ingested while the answer was generated
+
+    assert not answers.store("q", [1.0, 0.0], "a", answer_sources(), {"Python"}, retrieved_at)
+    assert answers.lookup([1.0, 0.0]) is None
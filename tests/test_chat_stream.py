@@ -0,0 +1,76 @@
+import asyncio
+import pytest
+from app.services import chat_service as chat_module
+from app.services.chat_service import ChatService, ChatTrace
+from app.services.chat_sessions import ChatSession, ChatSessionPool
+
+class Pool(ChatSessionPool):
+    """Memory-less sessions; records every release."""
+
+    def __init__(self):
+        super().__init__(lambda session_id: ChatSession(session_id, None, None), 10, 60, 1_000)
+        self.released = []
+
+    def release(self, session):
+        self.released.append(session.session_id)
+        super().release(session)
+
+@pytest.fixture
+def service():
+    service = ChatService()
+    service._initialize_engine = lambda: None
+    service._sessions = Pool()
+
+    async def answer(message, session, trace, started):
+        for token in ("Python ", "uses ", "Django."):
+            await asyncio.sleep(0)
+            yield token
+    service._astream_global = answer
+    return service
+
+def test_completed_stream_releases_its_session(service):
+    async def consume():
+        return "".join([t async for t in service.astream_chat("q", session_id="s1", mode="global")])
+
+    assert asyncio.run(consume()) == "Python uses Django."
+    assert service._sessions.released == ["s1"]
+
+def test_disconnected_stream_releases_its_session(service):
+    async def disconnect_after_first_token():
+        stream = service.astream_chat("q", session_id="s1", mode="global")
+        await anext(stream)
+        await stream.aclose()
+
+    asyncio.run(disconnect_after_first_token())
+
+    assert service._sessions.released == ["s1"]
+
+def test_cancelled_stream_releases_its_session(service):
+    async def cancel_mid_stream():
+        async def consume():
+            async for _ in service.astream_chat("q", session_id="s1", mode="global"):
+                await asyncio.sleep(10)
+        task = asyncio.create_task(consume())
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_mid_stream())
+
+    assert service._sessions.released == ["s1"]
+
+def test_disconnected_stream_closes_its_trace(monkeypatch, service):
+    recorded = []
+    monkeypatch.setattr(chat_module.chat_metrics, "record", recorded.append)
+    trace = ChatTrace()
+
+    async def disconnect_after_first_token():
+        stream = service.astream_chat("q", session_id="s1", trace=trace, mode="global")
+        await anext(stream)
+        await stream.aclose()
+
+    asyncio.run(disconnect_after_first_token())
+
+    assert recorded == [trace]
+    assert trace.total_ms is not None and trace.output_tokens >= 1  # The partial answer
@@ -0,0 +1,60 @@
+import pytest
+from app.services import community_service as community_module
+from app.services.community_service import CommunityService, community_service
+from app.workers import tasks
+from tests.fakes import FakeDriver
+
+@pytest.fixture
+def queued(monkeypatch, redis_client):
+    calls = []
+    monkeypatch.setattr(tasks.refresh_communities_task, "apply_async", lambda *args, **kwargs: calls.append(kwargs))
+    return calls
+
+def test_back_to_back_ingests_queue_one_refresh(queued):
+    for _ in range(3):
+        tasks.schedule_community_refresh()
+    assert len(queued) == 1
+
+    community_service.clear_pending()  # The queued refresh started
+    tasks.schedule_community_refresh()
+    assert len(queued) == 2
+
+def run_task(monkeypatch, refresh, force=False):
+    monkeypatch.setattr(community_service, "refresh", refresh)
+    return tasks.refresh_communities_task.apply(args=(force,)).get()
+
+def test_locked_refresh_retries_a_bounded_number_of_times(monkeypatch, queued):
+    monkeypatch.setattr(tasks.refresh_communities_task, "max_retries", 2)
+    runs = []
+
+    stats = run_task(monkeypatch, lambda force: runs.append(force) or {"status": "locked"})
+
+    assert stats == {"status": "locked"}
+    assert len(runs) == 3  # First attempt + max_retries
+
+def test_locked_refresh_defers_to_an_already_queued_one(monkeypatch, queued, redis_client):
+    runs = []
+
+    def locked_while_an_ingest_queues_a_refresh(force):
+        runs.append(force)
+        tasks.schedule_community_refresh()
+        return {"status": "locked"}
+
+    assert run_task(monkeypatch, locked_while_an_ingest_queues_a_refresh) == {"status": "locked"}
+    assert len(runs) == 1 and len(queued) == 1
+
+def test_refresh_releases_only_its_own_lock(monkeypatch, redis_client):
+    def lock_expired_and_retaken(params):
+        # This run outlived LOCK_SECONDS and another refresh claimed the lock meanwhile
+        redis_client.set(CommunityService.LOCK_KEY, "next-run")
+        return []
+    driver = FakeDriver({community_module.ENTITY_EDGES_QUERY: lock_expired_and_retaken})
+    monkeypatch.setattr(community_module.GraphDatabase, "driver", lambda *args, **kwargs: driver)
+
+    assert CommunityService().refresh(force=True)["status"] == "completed"
+    assert redis_client.get(CommunityService.LOCK_KEY) == "next-run"
+
+    redis_client.delete(CommunityService.LOCK_KEY)
+    driver.handlers.clear()
+    CommunityService().refresh(force=True)
+    assert redis_client.get(CommunityService.LOCK_KEY) is None
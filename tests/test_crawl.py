@@ -0,0 +1,127 @@
+from datetime import datetime, timedelta, timezone
+import pytest
+from asgiref.sync import async_to_sync
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import update
+from sqlalchemy.exc import OperationalError
+from app.api.endpoints import crawl as crawl_endpoints
+from app.core.config import settings
+from app.db.postgres import FrontierUrl
+from app.services import crawl_frontier as frontier_module
+from app.services.crawl_frontier import FrontierEntry
+from app.services.crawl_service import crawl_service
+from app.workers import tasks
+
+# --- Crawl lifecycle (no services needed) ---
+
+@pytest.fixture
+def finished(monkeypatch):
+    calls = []
+
+    async def finish(crawl_id, status):
+        calls.append((crawl_id, status))
+        return True
+    monkeypatch.setattr(frontier_module.crawl_frontier, "finish", finish)
+    return calls
+
+def test_crawl_without_seeds_is_marked_failed(monkeypatch, finished):
+    monkeypatch.setattr(crawl_service, "seed", lambda *args: 0)
+
+    result = tasks.crawl_pipeline_task.apply(args=("c1", "nothing", 3, 2)).get()
+
+    assert result["status"] == "failed"
+    assert finished == [("c1", "failed")]
+
+def test_crawl_whose_search_fails_is_marked_failed(monkeypatch, finished):
+    def seed(*args):
+        raise RuntimeError("search down")
+    monkeypatch.setattr(crawl_service, "seed", seed)
+
+    assert tasks.crawl_pipeline_task.apply(args=("c1", "query", 3, 2)).failed()
+    assert finished == [("c1", "failed")]
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(crawl_endpoints.router)
+    return TestClient(app)
+
+@pytest.mark.parametrize("method, path", [("get", "/crawl/c1"), ("post", "/crawl/c1/resume")])
+def test_crawl_endpoints_report_an_unavailable_frontier_as_503(monkeypatch, client, method, path):
+    async def stats(crawl_id):
+        raise OperationalError("SELECT", {}, ConnectionRefusedError())
+    monkeypatch.setattr(crawl_endpoints.crawl_frontier, "stats", stats)
+
+    response = getattr(client, method)(path)
+
+    assert response.status_code == 503
+
+def test_failed_crawl_cannot_be_resumed(monkeypatch, client):
+    async def stats(crawl_id):
+        return {"status": "failed", "namespace": "n"}
+    monkeypatch.setattr(crawl_endpoints.crawl_frontier, "stats", stats)
+
+    assert client.post("/crawl/c1/resume").status_code == 409
+
+# --- Frontier claims (Postgres) ---
+
+def entries(*urls):
+    return [FrontierEntry(url=url, depth=0, score=1.0 - i * 0.1) for i, url in enumerate(urls)]
+
+def sync(coroutine_fn, *args):
+    return async_to_sync(coroutine_fn)(*args)
+
+def test_claims_never_overlap_and_respect_the_budget(postgres_frontier):
+    sync(postgres_frontier.create_crawl, "c1", "q", 1, 3)
+    sync(postgres_frontier.add, "c1", entries("https://a/1", "https://a/2", "https://a/3", "https://a/4"))
+
+    first = sync(postgres_frontier.claim, "c1", "w1", 2)
+    second = sync(postgres_frontier.claim, "c1", "w2", 2)
+
+    assert [c.url for c in first] == ["https://a/1", "https://a/2"]
+    assert [c.url for c in second] == ["https://a/3"]  # Budget of 3 pages spent
+    assert sync(postgres_frontier.stats, "c1")["pages_claimed"] == 3
+
+def test_readding_a_url_only_raises_its_score(postgres_frontier):
+    sync(postgres_frontier.create_crawl, "c1", "q", 1, 10)
+    assert sync(postgres_frontier.add, "c1", entries("https://a/1")) == 1
+    assert sync(postgres_frontier.add, "c1", [FrontierEntry(url="https://a/1", depth=1, score=5.0)]) == 0
+    assert sync(postgres_frontier.stats, "c1")["urls"]["pending"] == 1
+
+def test_expired_leases_are_reclaimed(postgres_frontier):
+    sync(postgres_frontier.create_crawl, "c1", "q", 1, 10)
+    sync(postgres_frontier.add, "c1", entries("https://a/1"))
+    [lost] = sync(postgres_frontier.claim, "c1", "dead-worker", 1)
+
+    async def expire():
+        async with frontier_module.SessionLocal.begin() as session:
+            await session.execute(update(FrontierUrl).values(
+                lease_expires_at=datetime.now(timezone.utc) - timedelta(seconds=1),
+            ))
+    sync(expire)
+
+    [reclaimed] = sync(postgres_frontier.claim, "c1", "w2", 1)
+    assert reclaimed.id == lost.id and reclaimed.attempts == 2
+    assert sync(postgres_frontier.stats, "c1")["pages_claimed"] == 1  # Budget is not reserved twice
+
+def test_failed_fetch_returns_its_budget_until_attempts_run_out(monkeypatch, postgres_frontier):
+    monkeypatch.setattr(settings, "CRAWL_MAX_ATTEMPTS", 2)
+    sync(postgres_frontier.create_crawl, "c1", "q", 1, 10)
+    sync(postgres_frontier.add, "c1", entries("https://a/1"))
+
+    [item] = sync(postgres_frontier.claim, "c1", "w1", 1)
+    sync(postgres_frontier.fail, item.id, "timeout")
+    assert sync(postgres_frontier.stats, "c1")["urls"]["pending"] == 1
+
+    [item] = sync(postgres_frontier.claim, "c1", "w1", 1)
+    sync(postgres_frontier.fail, item.id, "timeout")
+    stats = sync(postgres_frontier.stats, "c1")
+    assert stats["urls"]["failed"] == 1 and stats["pages_claimed"] == 1
+
+def test_finish_only_ends_running_crawls(postgres_frontier):
+    sync(postgres_frontier.create_crawl, "c1", "q", 1, 10)
+
+    assert sync(postgres_frontier.finish, "c1", "failed")
+    assert not sync(postgres_frontier.finish, "c1", "completed")
+    assert sync(postgres_frontier.stats, "c1")["status"] == "failed"
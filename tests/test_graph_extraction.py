@@ -0,0 +1,109 @@
+import json
+import pytest
+from llama_index.core.graph_stores.types import KG_NODES_KEY, KG_RELATIONS_KEY
+from llama_index.core.schema import TextNode
+from app.services.graph_extraction import (
+    JsonSchemaPathExtractor,
+    coerce_node_type,
+    coerce_relation,
+    coerce_triplets,
+    parse_json,
+)
+
+def triplet(subject, relation, obj, subject_type="Person", obj_type="Organization"):
+    return {"subject": {"name": subject, "type": subject_type}, "relation": relation, "object": {"name": obj, "type": obj_type}}
+
+VALID = json.dumps({"triplets": [triplet("Sam Altman", "WORKS_FOR", "OpenAI"), triplet("GPT-4", "PRODUCED_BY", "OpenAI", "Product")]})
+
+# --- Local JSON repair ---
+
+def test_valid_output_is_not_repaired():
+    assert parse_json(VALID) == (json.loads(VALID), False)
+
+def test_fences_prose_and_trailing_commas_are_stripped():
+    raw = 'Here are the triplets:\n```json\n{"triplets": [' + json.dumps(triplet("A", "USES", "B")) + ",]}\n```"
+
+    data, repaired = parse_json(raw)
+
+    assert repaired and data == {"triplets": [triplet("A", "USES", "B")]}
+
+def test_truncated_output_keeps_its_complete_triplets():
+    raw = VALID[:VALID.index("GPT-4") + 3]  # Cut off mid-string by the token limit
+
+    data, repaired = parse_json(raw)
+
+    assert repaired and data == {"triplets": [triplet("Sam Altman", "WORKS_FOR", "OpenAI")]}
+
+@pytest.mark.parametrize("raw", ["", None, "No triplets found.", '{"triplets": [{"subject": "A", "rel'])
+def test_unrepairable_output_raises(raw):
+    with pytest.raises(ValueError):
+        parse_json(raw)
+
+# --- Schema coercion ---
+
+@pytest.mark.parametrize("value, expected", [
+    ("Technology", ("Technology", False)),
+    ("technology", ("Technology", False)),
+    ("tech", ("Technology", False)),
+    ("org", ("Organization", False)),
+    ("PERSON", ("Person", False)),
+    ("pro", ("Product", False)),
+    ("Location", ("Concept", True)),
+    ("p", ("Concept", True)),  # Too short to pick a prefix (Person / Product)
+    (None, ("Concept", True)),
+])
+def test_node_types_are_coerced_onto_the_schema(value, expected):
+    assert coerce_node_type(value) == expected
+
+@pytest.mark.parametrize("value, expected", [
+    ("WORKS_FOR", ("WORKS_FOR", False)),
+    ("works for", ("WORKS_FOR", False)),
+    ("is-part-of", ("IS_PART_OF", False)),
+    ("FOUNDED", ("RELATES_TO", True)),
+    (None, ("RELATES_TO", True)),
+])
+def test_relations_are_coerced_onto_the_schema(value, expected):
+    assert coerce_relation(value) == expected
+
+def test_triplets_accept_key_variants_and_drop_unusable_items():
+    data = {"relationships": [
+        {"head": "Python", "type": "uses", "tail": {"id": "CPython", "label": "tech"}},
+        {"source": {"name": "Python"}, "predicate": {"type": "USES"}, "target": "cpython"},  # Duplicate
+        triplet("OpenAI", "RELATES_TO", "openai"),  # Self-loop
+        triplet("", "USES", "B"),
+        "not a triplet",
+    ]}
+
+    triplets, coerced = coerce_triplets(data, limit=10)
+
+    assert triplets == [("Python", "Concept", "USES", "CPython", "Technology")]
+    assert coerced == {"entity_type": 3, "relation": 0}  # Untyped entities, counted before de-duplication
+
+def test_triplets_stop_at_the_limit():
+    data = [triplet(f"P{i}", "WORKS_FOR", "OpenAI") for i in range(5)]
+    triplets, _ = coerce_triplets(data, limit=2)
+    assert [t[0] for t in triplets] == ["P0", "P1"]
+
+# --- Extractor ---
+
+class LLM:
+    def __init__(self, *answers):
+        self.answers = list(answers)
+        self.calls = 0
+
+    def complete_json(self, prompt, schema):
+        self.calls += 1
+        return self.answers.pop(0)
+
+def test_extractor_writes_graph_metadata_and_counts_outcomes():
+    llm = LLM(VALID[:VALID.index("GPT-4") + 3], "I cannot help with that.")
+    extractor = JsonSchemaPathExtractor(llm=llm)
+
+    repaired, failed = extractor([TextNode(text="a", metadata={"url": "u"}), TextNode(text="b")])
+
+    assert [r.label for r in repaired.metadata[KG_RELATIONS_KEY]] == ["WORKS_FOR"]
+    assert {n.name for n in repaired.metadata[KG_NODES_KEY]} == {"Sam Altman", "OpenAI"}
+    assert repaired.metadata[KG_RELATIONS_KEY][0].properties == {"url": "u"}
+    assert failed.metadata[KG_NODES_KEY] == [] and failed.metadata[KG_RELATIONS_KEY] == []
+    assert llm.calls == 2  # Failed output is never re-asked
+    assert extractor.stats == {"chunks": 2, "ok": 0, "repaired": 1, "failed": 1, "coerced": 0}
@@ -0,0 +1,72 @@
+import pytest
+from app.core.config import settings
+from app.services import graph_maintenance as maintenance
+from app.services.graph_maintenance import GraphMaintenanceService
+from app.services.graph_version import graph_versions
+from tests.fakes import FakeDriver
+
+STATS = {
+    "entities": 2, "chunks": 3, "communities": 0, "relationships": 1,
+    "mean": 1.0, "p50": 1, "p95": 1, "max": 1, "stale_embeddings": 0,
+}
+
+class FakeEmbedding:
+    def __init__(self, **kwargs):
+        pass
+
+    def get_document_embedding_batch(self, texts):
+        return [[0.0] * settings.EMBEDDING_DIMENSIONS for _ in texts]
+
+def stale_chunks(params):
+    rows, stale_chunks.rows = stale_chunks.rows, []  # Re-embedded after the first batch
+    return rows
+
+@pytest.fixture
+def driver(monkeypatch, redis_client):
+    stale_chunks.rows = [{"element_id": "4:c4", "id": "c4", "text": "Re-embed me."}]
+    driver = FakeDriver({
+        maintenance.STATS_QUERY: lambda p: [STATS],
+        maintenance.DUPLICATE_CHUNKS_QUERY: lambda p: [{"key": "https://example.com", "ids": ["4:c1", "4:c2"]}],
+        maintenance.MERGE_GROUPS_QUERY: lambda p: [{"ids": ["c1", "c2"]}],
+        maintenance.SELF_LOOPS_QUERY: lambda p: [{"pruned": 0}],
+        maintenance.ORPHAN_ENTITIES_QUERY: lambda p: [{"pruned": 0, "ids": []}],
+        maintenance.ORPHAN_CHUNKS_QUERY: lambda p: [{"pruned": 1, "ids": ["c3"]}],
+        maintenance.ORPHAN_COMMUNITIES_QUERY: lambda p: [{"pruned": 0}],
+        maintenance.STALE_EMBEDDINGS_QUERY.format(label="Chunk", text="n.text"): stale_chunks,
+    })
+    monkeypatch.setattr(maintenance.GraphDatabase, "driver", lambda *args, **kwargs: driver)
+    monkeypatch.setattr(maintenance, "SyncGeminiEmbedding", FakeEmbedding)
+    monkeypatch.setattr(maintenance, "init_db_constraints", lambda: None)
+    return driver
+
+def test_run_publishes_merged_pruned_and_reembedded_chunks(driver):
+    report = GraphMaintenanceService().run()
+
+    assert report["steps"]["merge"]["chunks_merged"] == 1
+    assert report["steps"]["prune"]["chunks_pruned"] == 1
+    assert report["steps"]["reembed"]["chunk_reembedded"] == 1
+    version, touched = graph_versions.touched_since(0)
+    assert version == 1
+    assert {"c1", "c2", "c3", "c4"} <= touched
+    assert driver.closed
+
+def test_run_is_skipped_while_locked(driver, redis_client):
+    redis_client.set(GraphMaintenanceService.LOCK_KEY, "other-run")
+
+    assert GraphMaintenanceService().run() == {"status": "locked"}
+    assert redis_client.get(GraphMaintenanceService.LOCK_KEY) == "other-run"
+
+def test_run_releases_only_its_own_lock(driver, redis_client):
+    def lock_expired_and_retaken(params):
+        # This run outlived LOCK_SECONDS and another run claimed the lock meanwhile
+        redis_client.set(GraphMaintenanceService.LOCK_KEY, "next-run")
+        return []
+    driver.handlers[maintenance.PROBE_ENTITIES_QUERY] = lock_expired_and_retaken
+
+    GraphMaintenanceService().run()
+    assert redis_client.get(GraphMaintenanceService.LOCK_KEY) == "next-run"
+
+    redis_client.delete(GraphMaintenanceService.LOCK_KEY)
+    driver.handlers.pop(maintenance.PROBE_ENTITIES_QUERY)
+    GraphMaintenanceService().run()
+    assert redis_client.get(GraphMaintenanceService.LOCK_KEY) is None
@@ -0,0 +1,112 @@
+import pytest
+from llama_index.core.schema import NodeWithScore, TextNode
+from app.services import graph_namespaces as ns_module
+from app.services.graph_namespaces import GraphNamespaceService, namespace_slug
+from app.services.graph_version import graph_versions
+from app.services.hybrid_retriever import HybridGraphRetriever, retrieval_namespace
+from tests.fakes import FakeDriver
+
+def test_namespace_slug():
+    assert namespace_slug("Rust async runtimes!") == "rust-async-runtimes"
+    assert namespace_slug("  ---  ") == "default"
+    assert len(namespace_slug("x" * 200)) == 64
+
+# --- Deletion order (fake driver) ---
+
+@pytest.fixture
+def fake_delete(monkeypatch, redis_client):
+    driver = FakeDriver({
+        ns_module.NAMESPACE_ENTITIES_QUERY: lambda p: [{"id": "Python"}, {"id": "Rust"}],
+        ns_module.DELETE_CHUNKS_QUERY: lambda p: [{"deleted": 2, "ids": ["c1", "c2"]}],
+        ns_module.UNTAG_RELATIONS_QUERY: lambda p: [{"untagged": 1, "deleted": 0}],
+        ns_module.UNTAG_ENTITIES_QUERY: lambda p: [{"untagged": 2, "deleted": 1}],
+    })
+    monkeypatch.setattr(GraphNamespaceService, "_driver", staticmethod(lambda: driver))
+    return driver
+
+def test_delete_removes_chunks_before_deciding_on_entities(fake_delete):
+    report = GraphNamespaceService().delete("a")
+
+    queries = fake_delete.queries()
+    assert queries.index(ns_module.DELETE_CHUNKS_QUERY) < queries.index(ns_module.UNTAG_RELATIONS_QUERY)
+    assert queries.index(ns_module.UNTAG_RELATIONS_QUERY) < queries.index(ns_module.UNTAG_ENTITIES_QUERY)
+    assert report["chunks_deleted"] == 2
+    assert report["entities_deleted"] == 1 and report["relationships_untagged"] == 1
+    assert fake_delete.closed
+
+def test_delete_publishes_entities_and_deleted_chunks(fake_delete):
+    report = GraphNamespaceService().delete("a")
+
+    version, touched = graph_versions.touched_since(0)
+    assert version == report["graph_version"]
+    assert touched == {"Python", "Rust", "c1", "c2"}
+
+# --- Scoped source texts ---
+
+def node(text: str, **metadata) -> NodeWithScore:
+    return NodeWithScore(node=TextNode(text=text, metadata=metadata), score=1.0)
+
+@pytest.mark.parametrize("namespace, expected", [
+    (None, ["a chunk", "b chunk", "legacy chunk", "triplet"]),
+    ("a", ["a chunk", "triplet"]),
+])
+def test_scoped_source_texts_exclude_other_and_unnamespaced_chunks(namespace, expected):
+    nodes = [
+        node("a chunk", url="u1", namespace="a"),
+        node("b chunk", url="u2", namespace="b"),
+        node("legacy chunk", url="u3"),
+        node("triplet"),  # Triplet whose source text was not found
+    ]
+    token = retrieval_namespace.set(namespace)
+    try:
+        kept = HybridGraphRetriever._in_namespace(nodes)
+    finally:
+        retrieval_namespace.reset(token)
+    assert [n.node.text for n in kept] == expected
+
+# --- Cypher semantics (real Neo4j, see conftest.neo4j_driver) ---
+
+SEED_QUERY = """
+CREATE (legacy:__Node__:Chunk {id: 'c0', text: 'old', url: 'u0', ref_doc_id: 'd0'})
+CREATE (a1:__Node__:Chunk {id: 'c1', text: 'new', url: 'u1', ref_doc_id: 'd1', namespace: 'a'})
+CREATE (b1:__Node__:Chunk {id: 'c2', text: 'other', url: 'u2', ref_doc_id: 'd2', namespace: 'b'})
+CREATE (python:__Node__:__Entity__:Technology {id: 'Python', name: 'Python'})
+CREATE (guido:__Node__:__Entity__:Person {id: 'Guido', name: 'Guido'})
+CREATE (rust:__Node__:__Entity__:Technology {id: 'Rust', name: 'Rust'})
+CREATE (go:__Node__:__Entity__:Technology {id: 'Go', name: 'Go'})
+CREATE (legacy)-[:MENTIONS]->(python), (legacy)-[:MENTIONS]->(guido)
+CREATE (a1)-[:MENTIONS]->(python), (a1)-[:MENTIONS]->(guido), (a1)-[:MENTIONS]->(rust), (a1)-[:MENTIONS]->(go)
+CREATE (b1)-[:MENTIONS]->(go)
+CREATE (python)-[:PRODUCED_BY {triplet_source_id: 'c1'}]->(guido)
+CREATE (rust)-[:RELATES_TO {triplet_source_id: 'c1'}]->(python)
+CREATE (go)-[:RELATES_TO {triplet_source_id: 'c1'}]->(rust)
+"""
+
+def ids(driver, query: str) -> set:
+    records, _, _ = driver.execute_query(query)
+    return {r["id"] for r in records}
+
+def test_deleting_a_namespace_keeps_entities_other_chunks_mention(neo4j_driver, redis_client):
+    neo4j_driver.execute_query(SEED_QUERY)
+
+    class Store:  # The part of the graph store `tag` uses
+        def structured_query(self, query, param_map):
+            neo4j_driver.execute_query(query, parameters_=param_map)
+
+    GraphNamespaceService().tag(Store(), "d1", "a")
+    GraphNamespaceService().tag(Store(), "d2", "b")
+    assert ids(neo4j_driver, "MATCH (e:__Entity__) WHERE 'a' IN e.namespaces RETURN e.id AS id") == {"Python", "Guido", "Rust", "Go"}
+
+    report = GraphNamespaceService().delete("a")
+
+    # Python / Guido: still mentioned by the chunk ingested before namespaces; Go: by namespace b
+    assert ids(neo4j_driver, "MATCH (e:__Entity__) RETURN e.id AS id") == {"Python", "Guido", "Go"}
+    assert ids(neo4j_driver, "MATCH (c:Chunk) RETURN c.id AS id") == {"c0", "c2"}
+    records, _, _ = neo4j_driver.execute_query(
+        "MATCH (a)-[r]->(b) WHERE type(r) <> 'MENTIONS' RETURN a.id AS a, type(r) AS type, b.id AS b, r.namespaces AS ns"
+    )
+    assert [(r["a"], r["type"], r["b"], r["ns"]) for r in records] == [("Python", "PRODUCED_BY", "Guido", None)]
+    records, _, _ = neo4j_driver.execute_query("MATCH (e:__Entity__) RETURN e.id AS id, e.namespaces AS ns")
+    assert {r["id"]: r["ns"] for r in records} == {"Python": None, "Guido": None, "Go": ["b"]}
+    assert report["chunks_deleted"] == 1
+    assert report["entities_deleted"] == 1 and report["relationships_deleted"] == 2
@@ -0,0 +1,72 @@
+import json
+import pytest
+from llama_index.core import Document, PropertyGraphIndex
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.core.graph_stores import SimplePropertyGraphStore
+from llama_index.core.indices.property_graph import SchemaLLMPathExtractor
+from llama_index.core.llms import CompletionResponse, CustomLLM, LLMMetadata
+from llama_index.core.llms.callbacks import llm_completion_callback
+from app.core.graph_schema import VALID_NODES, VALID_RELATIONS
+from app.services.graph_extraction import JsonSchemaPathExtractor
+from app.services.graph_service import ProgressExtractor
+
+TRIPLETS = {"triplets": [{
+    "subject": {"type": "Technology", "name": "Python"},
+    "relation": {"type": "PRODUCED_BY"},
+    "object": {"type": "Person", "name": "Guido"},
+}]}
+
+class FakeLLM(CustomLLM):
+    """Answers every extraction prompt with the same triplet (plain and JSON mode)."""
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(model_name="fake")
+
+    @llm_completion_callback()
+    def complete(self, prompt: str, **kwargs) -> CompletionResponse:
+        return CompletionResponse(text=json.dumps(TRIPLETS))
+
+    @llm_completion_callback()
+    def stream_complete(self, prompt: str, **kwargs):
+        raise NotImplementedError
+
+    def complete_json(self, prompt: str, response_schema: dict) -> str:
+        return json.dumps({"triplets": [{**t, "relation": t["relation"]["type"]} for t in TRIPLETS["triplets"]]})
+
+def extractors(llm):
+    return {
+        "schema_llm": SchemaLLMPathExtractor(
+            llm=llm, possible_entities=VALID_NODES, possible_relations=VALID_RELATIONS, strict=False, num_workers=1,
+        ),
+        "json": JsonSchemaPathExtractor(llm=llm),
+    }
+
+@pytest.mark.parametrize("mode", ["schema_llm", "json"])
+def test_progress_extractor_runs_inside_async_index_insert(mode):
+    # PropertyGraphIndex runs extractors via acall inside asyncio.run (use_async=True);
+    # SchemaLLMPathExtractor.__call__ would start a nested asyncio.run and crash
+    progress = []
+    extractor = ProgressExtractor(
+        extractor=extractors(FakeLLM())[mode], on_chunk=lambda done, total: progress.append((done, total)),
+    )
+    store = SimplePropertyGraphStore()
+    index = PropertyGraphIndex.from_existing(
+        property_graph_store=store, embed_model=MockEmbedding(embed_dim=8), kg_extractors=[extractor], embed_kg_nodes=False,
+    )
+
+    index.insert(Document(text="Guido van Rossum created Python. " * 10))
+
+    triplets = {(s.name, r.label, o.name) for s, r, o in store.graph.get_triplets()}
+    assert ("Python", "PRODUCED_BY", "Guido") in triplets
+    assert progress and progress[-1][0] == progress[-1][1]
+
+def test_progress_extractor_sync_path_reports_each_chunk():
+    progress = []
+    extractor = ProgressExtractor(extractor=extractors(FakeLLM())["json"], on_chunk=lambda d, t: progress.append((d, t)))
+    from llama_index.core.schema import TextNode
+
+    nodes = extractor([TextNode(text="Guido created Python."), TextNode(text="Guido created Python again.")])
+
+    assert progress == [(1, 2), (2, 2)]
+    assert all(node.metadata["relations"] for node in nodes)
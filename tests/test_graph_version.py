@@ -0,0 +1,43 @@
+import fakeredis
+from app.services.graph_version import GraphVersionService
+
+class InterleavedRedis(fakeredis.FakeRedis):
+    """Runs `between` after every command, i.e. at each point another process could step in."""
+    between = None
+
+    def execute_command(self, *args, **options):
+        result = super().execute_command(*args, **options)
+        if self.between:
+            self.between()
+        return result
+
+def services():
+    server = fakeredis.FakeServer()
+    writer, reader = GraphVersionService(), GraphVersionService()
+    writer._client = InterleavedRedis(server=server, decode_responses=True)
+    reader._client = fakeredis.FakeRedis(server=server, decode_responses=True)
+    return writer, reader
+
+def test_readers_never_see_a_version_before_its_touched_ids():
+    writer, reader = services()
+    seen = []
+    writer._client.between = lambda: seen.append(reader.touched_since(0))
+
+    writer.bump(["Python", "Django"])
+    writer.bump(["Rust"])
+
+    assert seen  # The reader did step in
+    for version, touched in seen:
+        expected = {1: {"Python", "Django"}, 2: {"Python", "Django", "Rust"}}.get(version, set())
+        assert touched == expected
+
+def test_bump_trims_the_oldest_touch_records(monkeypatch):
+    writer, reader = services()
+    monkeypatch.setattr(GraphVersionService, "TOUCHED_MAX", 3)
+
+    writer.bump(["a", "b"])
+    assert writer.bump(["c", "d", "d"]) == 2
+    assert writer.bump([]) == 3
+
+    assert reader.touched_since(0) == (3, {"b", "c", "d"})
+    assert reader.touched_since(1) == (3, {"c", "d"})
@@ -0,0 +1,56 @@
+import pytest
+from app.schemas.scrape import ScrapeResult
+from app.schemas.search import SearchResultItem
+from app.services.ingest_admission import ingest_admission
+from app.services.ingest_registry import IngestRegistry, ingest_registry
+from app.services.progress import ProgressPublisher
+from app.workers import tasks
+
+KEY = f"{IngestRegistry.KEY_PREFIX}:k"
+
+@pytest.fixture
+def pipeline(monkeypatch, redis_client):
+    for singleton in (ingest_registry, ingest_admission):
+        monkeypatch.setattr(singleton, "_client", redis_client)
+    monkeypatch.setattr(tasks, "ProgressPublisher", lambda task_id: ProgressPublisher(task_id, client=redis_client))
+    monkeypatch.setattr(tasks, "schedule_community_refresh", lambda: None)
+
+    def run(search):
+        monkeypatch.setattr(tasks.search_service, "search", search)
+        redis_client.set(KEY, "t1")  # Claimed by the endpoint before dispatch
+        return tasks.ingest_pipeline_task.apply(args=("q", 1), kwargs={"idempotency_key": "k"}, task_id="t1")
+    return run
+
+async def search_down(query, num_results):
+    raise RuntimeError("Serper unavailable")
+
+async def no_results(query, num_results):
+    return []
+
+def test_failed_ingest_releases_its_key(pipeline, redis_client):
+    assert pipeline(search_down).failed()
+    assert redis_client.get(KEY) is None
+
+def test_ingest_without_urls_releases_its_key(pipeline, redis_client):
+    assert pipeline(no_results).get()["status"] == "failed"
+    assert redis_client.get(KEY) is None
+
+def test_completed_ingest_keeps_its_key(monkeypatch, pipeline, redis_client):
+    async def one_result(query, num_results):
+        return [SearchResultItem(title="", link="https://a.example", snippet="")]
+
+    async def scrape(urls):
+        return [ScrapeResult(url=url, title="", content="", error="timeout") for url in urls]
+    monkeypatch.setattr(tasks.scraper_service, "scrape_urls", scrape)
+
+    assert pipeline(one_result).get()["status"] == "completed"
+    assert redis_client.get(KEY) == "t1"  # Later submissions attach to it until the TTL
+
+def test_failed_ingest_keeps_a_key_reclaimed_meanwhile(monkeypatch, pipeline, redis_client):
+    async def search_then_reclaimed(query, num_results):
+        redis_client.set(KEY, "t2")  # The TTL ran out and another submission claimed the key
+        raise RuntimeError("Serper unavailable")
+
+    pipeline(search_then_reclaimed)
+
+    assert redis_client.get(KEY) == "t2"
@@ -0,0 +1,59 @@
+from types import SimpleNamespace
+import fakeredis
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.api.endpoints import ingest as ingest_endpoints
+from app.core.config import settings
+from app.core.sse_parser import iter_sse_events
+from app.services.progress import ProgressPublisher
+
+@pytest.fixture
+def stream(monkeypatch):
+    """Streams GET /ingest/progress/{task_id} against in-memory Redis; returns its progress events."""
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(ingest_endpoints, "aioredis", SimpleNamespace(
+        Redis=lambda **kwargs: fakeredis.FakeAsyncRedis(server=server, decode_responses=True),
+    ))
+    monkeypatch.setattr(settings, "SSE_HEARTBEAT_SECONDS", 0.05)
+    app = FastAPI()
+    app.include_router(ingest_endpoints.router)
+    states, admitted = {}, set()
+    monkeypatch.setattr(ingest_endpoints, "AsyncResult", lambda task_id: SimpleNamespace(state=states.get(task_id, "PENDING")))
+    monkeypatch.setattr(ingest_endpoints.ingest_admission, "estimate", lambda task_id: {} if task_id in admitted else None)
+
+    def run(task_id):
+        with TestClient(app).stream("GET", f"/ingest/progress/{task_id}") as response:
+            return [data for event, data in iter_sse_events(response.iter_bytes()) if event == "progress"]
+    run.states, run.admitted = states, admitted
+    run.publisher = lambda task_id: ProgressPublisher(task_id, client=fakeredis.FakeRedis(server=server, decode_responses=True))
+    return run
+
+def test_unknown_task_ends_the_stream(stream):
+    [event] = stream("mistyped")
+    assert event["stage"] == "unknown"
+
+def test_killed_task_ends_the_stream_as_failed(stream):
+    stream.publisher("t1").publish("scraping", "Scraping 1 sites...")
+    stream.states["t1"] = "FAILURE"  # The worker died before publishing `failed`
+
+    events = stream("t1")
+
+    assert [e["stage"] for e in events] == ["scraping", "failed"]
+    assert events[-1]["seq"] == 2
+
+def test_stream_of_a_silent_task_ends_after_the_max_duration(monkeypatch, stream):
+    monkeypatch.setattr(settings, "INGEST_PROGRESS_MAX_SECONDS", 0.2)
+    stream.states["t1"] = "STARTED"
+
+    [event] = stream("t1")
+
+    assert event["stage"] == "timeout"
+
+def test_queued_task_keeps_the_stream_open(monkeypatch, stream):
+    monkeypatch.setattr(settings, "INGEST_PROGRESS_MAX_SECONDS", 0.2)
+    stream.admitted.add("t1")  # PENDING, but waiting in its queue
+
+    [event] = stream("t1")
+
+    assert event["stage"] == "timeout"
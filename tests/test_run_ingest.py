@@ -0,0 +1,74 @@
+from types import SimpleNamespace
+import fakeredis
+import google.generativeai as genai
+import httpx
+import pytest
+import redis
+import trafilatura
+from llama_index.core.graph_stores import SimplePropertyGraphStore
+from llama_index.core.graph_stores.types import EntityNode
+from app.core.config import settings
+from app.schemas.scrape import ScrapeResult
+from app.services import graph_service as graph_service_module
+from app.services.graph_version import graph_versions
+from app.services.ingest_admission import ingest_admission
+from app.services.scraper_service import scraper_service
+from app.workers import tasks
+from benchmarks import run_ingest
+
+# Smoke test of the offline ingestion benchmark: the real run() and ingest_pipeline_task on
+# one static fixture page. The benchmark's Neo4j / Redis / Chromium are replaced in-process.
+
+class MemoryGraphStore(SimplePropertyGraphStore):
+    """Takes the Neo4j store's constructor arguments; answers the post-insert Cypher from memory."""
+
+    def __init__(self, **kwargs):
+        super().__init__()
+        self._driver = SimpleNamespace(close=lambda: None)
+
+    def structured_query(self, query, param_map=None):
+        # Touched-entity lookup of GraphService._bump_graph_version; namespace tagging is a no-op
+        return [{"id": n.id} for n in self.graph.nodes.values() if isinstance(n, EntityNode)]
+
+async def fetch_static(urls, collect_links=False):
+    """Scraper stand-in without a browser: JS-rendered fixture pages come back as failed scrapes."""
+    results = []
+    async with httpx.AsyncClient() as client:
+        for url in urls:
+            content = trafilatura.extract((await client.get(url)).text) or ""
+            results.append(ScrapeResult(
+                url=url, title="", content=content, error=None if content else "needs a browser",
+            ))
+    return results
+
+@pytest.fixture
+def offline_stack(monkeypatch):
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(redis, "Redis", lambda *args, **kwargs: fakeredis.FakeRedis(server=server, decode_responses=True))
+    monkeypatch.setattr(ingest_admission, "_client", None)
+    monkeypatch.setattr(graph_versions, "_client", None)
+    # install_fake_gemini patches the SDK process-wide; restore it afterwards
+    for name in ("configure", "GenerativeModel", "embed_content", "embed_content_async"):
+        monkeypatch.setattr(genai, name, getattr(genai, name))
+    monkeypatch.setattr(settings, "SERPER_URL", settings.SERPER_URL)
+    monkeypatch.setattr(settings, "SERPER_API_KEY", "fake")
+    monkeypatch.setattr(graph_service_module, "InstrumentedNeo4jPropertyGraphStore", MemoryGraphStore)
+    monkeypatch.setattr("app.db.init_graph.init_db_constraints", lambda: None)
+    monkeypatch.setattr(scraper_service, "scrape_urls", fetch_static)
+    refreshes = []
+    monkeypatch.setattr(tasks.refresh_communities_task, "apply_async", lambda *args, **kwargs: refreshes.append(kwargs))
+    return refreshes
+
+def test_benchmark_ingests_a_single_fixture_page(offline_stack):
+    args = SimpleNamespace(
+        queries=1, num_results=1, pages=1, llm_latency=0.0, per_token=0.0,
+        embed_latency=0.0, fake_rpm=0, label="smoke",
+    )
+
+    result = run_ingest.run(args)
+
+    assert result["documents"] == 1 and result["failures"] == 0
+    assert result["stages"]["llm_extraction"]["count"] >= 1
+    assert result["gemini"]["requests"]
+    assert graph_versions.current() == 1
+    assert offline_stack  # The community refresh was scheduled
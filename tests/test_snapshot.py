@@ -0,0 +1,62 @@
+import pytest
+import pytz
+from neo4j.spatial import CartesianPoint, WGS84Point
+from neo4j.time import Date, DateTime, Duration, Time
+from app.core.config import settings
+from app.db import snapshot as snapshot_module
+from app.db.snapshot import NODE_KINDS, NODES_QUERY, RELATIONSHIPS_QUERY, GraphSnapshot, dump_properties
+from tests.fakes import FakeDriver
+
+PROPERTIES = {
+    "name": "Python",
+    "aliases": ["py", "cpython"],
+    "first_seen": pytz.timezone("Europe/Berlin").localize(DateTime(2024, 5, 1, 12, 30, 15, 123456789)),
+    "checked_at": DateTime(2024, 5, 1, 8, 0, 0),
+    "released": Date(1991, 2, 20),
+    "release_dates": [Date(2008, 12, 3), Date(2023, 10, 2)],
+    "daily_build": Time(3, 15, 0, 500),
+    "support_window": Duration(years=5, days=3, seconds=7, nanoseconds=9),
+    "origin": WGS84Point((4.9, 52.37)),
+    "layout": CartesianPoint((1.0, 2.0, 3.0)),
+    "logo": b"\x89PNG\x00",
+}
+
+@pytest.fixture
+def graphs(monkeypatch, redis_client):
+    """Exports from a one-entity graph; returns the driver the import then writes to."""
+    monkeypatch.setattr(settings, "EMBEDDING_DIMENSIONS", 4)
+    monkeypatch.setattr(snapshot_module, "init_db_constraints", lambda: None)
+    source = FakeDriver({
+        NODES_QUERY.format(label=NODE_KINDS["entities"]["label"]): lambda params: [{
+            "id": "Python", "labels": ["__Node__", "__Entity__", "Technology"],
+            "properties": {"id": "Python", "embedding": [0.5, 0.5, 0.5, 0.5], **PROPERTIES},
+        }],
+        RELATIONSHIPS_QUERY: lambda params: [{
+            "source": "Python", "source_kind": "entity", "type": "USES",
+            "target": "Python", "target_kind": "entity", "properties": {"since": PROPERTIES["released"]},
+        }],
+    })
+    target = FakeDriver()
+    drivers = iter([source, target])
+    monkeypatch.setattr(snapshot_module.GraphDatabase, "driver", lambda *args, **kwargs: next(drivers))
+    return target
+
+def written_rows(driver, query_start):
+    return [row for query, params in driver.calls if query.lstrip().startswith(query_start) for row in params["rows"]]
+
+def test_typed_properties_survive_a_round_trip(tmp_path, graphs):
+    GraphSnapshot().export(str(tmp_path))
+    GraphSnapshot().import_(str(tmp_path))
+
+    [entity] = written_rows(graphs, "UNWIND $rows AS row\nMERGE (n:`__Entity__`")
+    assert entity["properties"] == PROPERTIES
+    assert entity["properties"]["first_seen"].tzinfo.zone == "Europe/Berlin"
+    assert type(entity["properties"]["origin"]) is WGS84Point
+    assert entity["embedding"] == [0.5, 0.5, 0.5, 0.5]
+
+    [relationship] = written_rows(graphs, "UNWIND $rows AS row\nMATCH (s:`__Entity__`")
+    assert relationship["properties"] == {"since": Date(1991, 2, 20)}
+
+def test_unsupported_property_types_are_rejected():
+    with pytest.raises(TypeError, match="Cannot snapshot a property of type object"):
+        dump_properties({"value": object()})
@@ -0,0 +1,30 @@
+import asyncio
+import subprocess
+import sys
+from app.api.sse import sse_comment, sse_event
+from app.core.sse_parser import aiter_sse_events, iter_sse_events
+
+FRAMES = (sse_comment() + sse_event({"text": "Zürich\n→ Bern"}, event="token") + sse_event({"sources": []}, event="done")).encode()
+EXPECTED = [("token", {"text": "Zürich\n→ Bern"}), ("done", {"sources": []})]
+
+def chunked(size: int) -> list:
+    # Splits frames (and multi-byte characters) at arbitrary points
+    return [FRAMES[i:i + size] for i in range(0, len(FRAMES), size)]
+
+def test_parser_reads_the_servers_frames_however_they_are_chunked():
+    for size in (1, 3, 7, len(FRAMES)):
+        assert list(iter_sse_events(chunked(size))) == EXPECTED
+
+def test_async_parser_matches():
+    async def chunks():
+        for chunk in chunked(5):
+            yield chunk
+
+    async def collect():
+        return [event async for event in aiter_sse_events(chunks())]
+
+    assert asyncio.run(collect()) == EXPECTED
+
+def test_parser_imports_without_the_api_stack():
+    code = "import sys, app.core.sse_parser; sys.exit('fastapi' in sys.modules or 'app.core.config' in sys.modules)"
+    assert subprocess.run([sys.executable, "-c", code]).returncode == 0
@@ -0,0 +1,42 @@
+from types import SimpleNamespace
+import neo4j
+import pytest
+from app.services.graph_version import graph_versions
+from benchmarks import synthetic_graph
+from tests.fakes import FakeDriver
+
+PREVIOUS_GRAPH = "MATCH (n) WHERE n:__Entity__ OR n:Chunk RETURN n.id AS id"
+
+@pytest.fixture
+def driver(monkeypatch):
+    driver = FakeDriver({PREVIOUS_GRAPH: lambda params: [{"id": "Old Entity"}, {"id": "old-chunk"}]})
+    monkeypatch.setattr(neo4j.GraphDatabase, "driver", lambda *args, **kwargs: driver)
+    monkeypatch.setattr("app.db.init_graph.init_db_constraints", lambda: None)
+    return driver
+
+def args(**overrides):
+    # A steep skew over few entities draws plenty of self-loops
+    return SimpleNamespace(**{
+        "entities": 40, "avg_degree": 6.0, "skew": 2.0, "entities_per_chunk": 6,
+        "batch": 50, "seed": 7, "clear": True, **overrides,
+    })
+
+def test_reports_the_relationships_actually_written(driver):
+    stats, _ = synthetic_graph.generate(args())
+
+    written = sum(
+        len(params["rows"]) for query, params in driver.calls
+        if "rows" in params and "source" in params["rows"][0]
+    )
+    assert stats["self_loops_skipped"] > 0
+    assert stats["relationships"] == written == 120 - stats["self_loops_skipped"]
+
+def test_publishes_the_written_and_deleted_nodes(monkeypatch, driver, redis_client):
+    monkeypatch.setattr(synthetic_graph, "parse_args", args)
+    monkeypatch.setattr(synthetic_graph, "configure_environment", lambda args: None)
+
+    synthetic_graph.main()
+
+    _, touched = graph_versions.touched_since(0)
+    assert {"Old Entity", "old-chunk", "synthetic-chunk-0", "synthetic-chunk-36"} <= touched
+    assert len(touched) == 2 + 40 + 7  # Deleted + entities + chunks
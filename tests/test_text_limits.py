@@ -0,0 +1,30 @@
+import pytest
+from pydantic import ValidationError
+from app.core.config import Settings
+from app.services.text_limits import cut_point, iter_windows, truncate_at_section
+
+TEXT = "First section.\n\nSecond section is longer. It has two sentences.\n\nThird."
+
+def test_windows_cover_the_text_and_end_on_boundaries():
+    assert list(iter_windows(TEXT, 30)) == [
+        "First section.", "Second section is longer.", "It has two sentences.\n\nThird.",
+    ]
+
+def test_unbroken_text_is_cut_mid_way():
+    assert list(iter_windows("x" * 25, 10)) == ["x" * 10, "x" * 10, "x" * 5]
+    assert cut_point("x" * 25, 0, 10) == 10
+
+def test_truncation_keeps_the_head_up_to_a_section():
+    assert truncate_at_section(TEXT, 20) == ("First section.", True)
+    assert truncate_at_section(TEXT, len(TEXT)) == (TEXT, False)
+
+@pytest.mark.parametrize("max_chars", [0, -1])
+def test_windows_reject_a_non_positive_size(max_chars):
+    with pytest.raises(ValueError):
+        next(iter_windows(TEXT, max_chars))
+
+@pytest.mark.parametrize("name", ["PAGE_MAX_CHARS", "INGEST_WINDOW_CHARS"])
+def test_settings_reject_non_positive_page_limits(monkeypatch, name):
+    monkeypatch.setenv(name, "0")
+    with pytest.raises(ValidationError):
+        Settings()
@@ -2,6 +2,7 @@ import requests
 import time
 import json
 import sys
+from app.core.sse_parser import iter_sse_events
 
 BASE_URL = "http://localhost:8000/api/v1"
 
@@ -39,20 +40,22 @@ def verify_full_pipeline():
     task_id = r.json().get("task_id")
     print_pass(f"Ingestion Task started with ID: {task_id}")
 
-    # 3. Poll for Task Completion
+    # 3. Follow Task Progress (pushed over SSE until completed/failed)
     print("⏳ Waiting for Celery Worker (this may take 30-60s)...")
+    # Read timeout: heartbeats arrive every SSE_HEARTBEAT_SECONDS while the task is quiet
+    with requests.get(f"{BASE_URL}/ingest/progress/{task_id}", stream=True, timeout=(10, 60)) as r_progress:
+        for event, event_data in iter_sse_events(r_progress.iter_content(chunk_size=None)):
+            if event == "progress":
+                print(f"   ... [{event_data['elapsed_ms'] / 1000:.1f}s] {event_data['message']}")
+
+    # Final state still comes from the task result (stored a moment after the last event)
     status = "PENDING"
     while status in ["PENDING", "STARTED", "PROGRESS"]:
-        time.sleep(5)
         r_status = requests.get(f"{BASE_URL}/ingest/status/{task_id}")
         data = r_status.json()
         status = data.get("status")
-        
-        meta = data.get("result", {})
-        if isinstance(meta, dict) and "status" in meta:
-            print(f"   ... Worker Status: {meta['status']}")
-        else:
-            print(f"   ... Task State: {status}")
+        if status in ["PENDING", "STARTED", "PROGRESS"]:
+            time.sleep(0.5)
 
     if status == "SUCCESS" or (isinstance(data.get("result"), dict) and data["result"].get("status") == "completed"):
         print_pass("Ingestion Pipeline Completed Successfully!")
@@ -69,11 +72,12 @@ def verify_full_pipeline():
         if r.status_code == 200:
             print("   Chat Response: ", end="")
             full_response = ""
-            for chunk in r.iter_content(chunk_size=None):
-                if chunk:
-                    text = chunk.decode("utf-8")
-                    print(text, end="", flush=True)
-                    full_response += text
+            for event, data in iter_sse_events(r.iter_content(chunk_size=None)):
+                if event == "token":
+                    print(data["text"], end="", flush=True)
+                    full_response += data["text"]
+                elif event == "error":
+                    print_fail(f"Chat stream error: {data['message']}")
             print("\n")
             
             if len(full_response) > 10: